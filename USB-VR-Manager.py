@@ -5,10 +5,37 @@ import os
 import csv
 import time
 import re
-from datetime import datetime
+import socket
+from datetime import datetime, timedelta
+from collections import Counter
 import threading
+import itertools
+import shlex
 from pathlib import Path
 
+from adb_client import (AdbClient, AdbConnectionError, AdbError, AdbUnsupported,
+                        FINGERPRINT_SCRIPT, adb_exe_shell_lines, parse_fingerprint)
+from fleet import FleetExecutor, take_queue_time
+from device_cache import PropertyCache, TTL_HOUR
+from throughput import ThroughputEstimator
+from breaker import DeviceBreakers, BREAKER_OPEN, BREAKER_CLOSED, is_link_error
+from dumpsys import PACKAGES_COMMAND, parse_system_packages
+from adb_trace import AdbTracer
+from reconnect import ReconnectEngine, RECONNECT_CONNECTED, RECONNECT_CONNECTING, RECONNECT_TIMEOUT
+from device_registry import DeviceRegistry, wireless_id
+from onboarding import (OnboardingQueue, NicknameTable, ONBOARD_QUEUED, ONBOARD_TCPIP,
+                        ONBOARD_READY, ONBOARD_FAILED)
+from subnet_sweep import SubnetSweeper, subnet_hosts, default_subnets
+from device_state import DeviceStateStore
+from install_engine import (InstallEngine, InstallSummary, summarize, INSTALL_MAX_USB, INSTALL_MAX_WIFI,
+                            INSTALL_OK, INSTALL_SKIPPED, STREAM_UNAVAILABLE)
+from apk_info import ApkInspector, parse_package_versions, parse_package_inventory, INVENTORY_COMMAND
+from fanout import FanoutCache
+from audit_matrix import PresenceMatrix, VirtualTable, SORT_PACKAGE, SORT_MISSING, SORT_DEVICE
+from inventory_store import InventoryStore, FINGERPRINT_COMMAND, inventory_fingerprint, parse_md5sum
+from profiles import (ProfileStore, ProfileReconciler, Profile, SyncFolder, PROFILE_DIR,
+                      ACTION_INSTALL, ACTION_PUSH, describe, empty_profile)
+
 
 # =============================================================================
 # GESTIONNAIRE ADB (copié de VR-Casting-Manager)
@@ -17,11 +44,22 @@ from pathlib import Path
 class ADBManager:
     """Gestion des commandes ADB"""
 
-    def __init__(self, adb_path=None):
+    def __init__(self, adb_path=None, trace_path=None):
         if adb_path and os.path.exists(adb_path):
             self.adb_path = adb_path
         else:
             self.adb_path = self.find_adb_path()
+        self.client = AdbClient(self.adb_path)
+        # Chaque appel ADB: ligne JSONL + histogrammes de latence
+        self.tracer = AdbTracer(trace_path)
+        # Propriétés stables (modèle, MAC...) mémorisées jusqu'au redémarrage du casque
+        self.cache = PropertyCache(self.read_boot_id)
+        # Casques WiFi injoignables: échec immédiat au lieu d'attendre les délais
+        self.breakers = DeviceBreakers()
+        self.client.track_devices().subscribe(self._on_device_event)
+        # Même fichier envoyé à plusieurs casques: une seule lecture disque
+        self.fanout = FanoutCache()
+        self.client.open_local = self.fanout.open
 
     def find_adb_path(self):
         """Trouve le chemin vers adb.exe"""
@@ -38,9 +76,23 @@ class ADBManager:
         return None
 
     def run_command(self, command, device_id=None, timeout=30):
-        """Exécute une commande ADB"""
+        """Exécute une commande ADB (client natif, repli sur adb.exe), tracée par self.tracer"""
+        queue = take_queue_time()
+        start = time.monotonic()
+        stdout, stderr, returncode, backend = self._run_command(command, device_id, timeout)
+        self.tracer.record(command, device_id, returncode, time.monotonic() - start, queue,
+                           len(stdout) + len(stderr), backend)
+        return stdout, stderr, returncode
+
+    def _run_command(self, command, device_id, timeout):
         if not self.adb_path:
-            return "", "ADB not found", 1
+            return "", "ADB not found", 1, "none"
+
+        # Client natif: pas de processus adb.exe par commande
+        try:
+            return self.client.run(command, device_id, timeout) + ("native",)
+        except (AdbUnsupported, AdbConnectionError):
+            pass
 
         try:
             if device_id:
@@ -50,18 +102,165 @@ class ADBManager:
 
             result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout,
                                     creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
-            return result.stdout or "", result.stderr or "", result.returncode
+            return result.stdout or "", result.stderr or "", result.returncode, "adb.exe"
         except subprocess.TimeoutExpired:
-            return "", "Command timeout", 1
+            return "", "Command timeout", 1, "adb.exe"
         except Exception as e:
-            return "", str(e), 1
+            return "", str(e), 1, "adb.exe"
+
+    def shell_lines(self, device_id, command, timeout=60):
+        """Sortie d'une commande shell ligne par ligne (l'appelant peut s'arrêter avant la fin)
+
+        Lève AdbError si la sortie s'arrête avant la fin de la commande
+        (connexion perdue, délai dépassé): jamais de sortie tronquée en silence.
+        """
+        queue = take_queue_time()
+        start = time.monotonic()
+        stats = {"bytes": 0, "rc": 0, "backend": "native"}
+        try:
+            for line in self._shell_lines(device_id, command, timeout, stats):
+                stats["bytes"] += len(line) + 1
+                yield line
+        except AdbError:
+            stats["rc"] = 1
+            raise
+        finally:
+            self.tracer.record(["shell", command], device_id, stats["rc"], time.monotonic() - start,
+                               queue, stats["bytes"], stats["backend"])
+
+    def _shell_lines(self, device_id, command, timeout, stats):
+        if not self.adb_path:
+            raise AdbError("adb introuvable")
+        started = False
+        try:
+            for line in self.client.shell_lines(device_id, command, timeout):
+                started = True
+                yield line
+            return
+        except AdbConnectionError:
+            if started:
+                raise
+
+        # Repli adb.exe: pipe lu par morceaux, processus tué si l'appelant s'arrête
+        stats["backend"] = "adb.exe"
+        yield from adb_exe_shell_lines(self.adb_path, device_id, command, timeout)
+
+    def get_device_states(self):
+        """Retourne {device_id: état} (suivi host:track-devices, repli sur adb devices)"""
+        devices = self.client.track_devices().snapshot()
+        if devices is not None:
+            return devices
+
+        devices = {}
+        stdout, _, rc = self.run_command(["devices"])
+        if rc == 0:
+            for line in stdout.strip().split('\n')[1:]:
+                parts = line.split('\t')
+                if len(parts) >= 2:
+                    devices[parts[0]] = parts[1].strip()
+        return devices
+
+    def device_waiter(self):
+        """Attente réveillée dès qu'un appareil est branché, débranché ou autorisé"""
+        return self.client.track_devices().waiter()
+
+    def stat_files(self, device_id, remote_paths, timeout=30):
+        """Taille de plusieurs fichiers distants en une session sync, retourne {chemin: taille ou None}"""
+        try:
+            with self.client.sync(device_id, timeout) as sync:
+                return {path: (st.size if st else None)
+                        for path, st in sync.stat_many(remote_paths).items()}
+        except AdbError:
+            pass
+
+        sizes = {}
+        for path in remote_paths:
+            stdout, _, rc = self.run_command(["shell", "stat", "-c", "%s", path], device_id)
+            sizes[path] = int(stdout.strip()) if rc == 0 and stdout.strip().isdigit() else None
+        return sizes
+
+    def stream_apks(self, device_id, apk_paths, timeout=300):
+        """Écrit les APK en flux dans une session pm, retourne son identifiant
+
+        None si le flux est impossible (pas de 'cmd', client natif indisponible,
+        écriture interrompue): l'appelant repasse par push + pm install.
+        """
+        queue = take_queue_time()
+        start = time.monotonic()
+        command = ["install-write"] + [os.path.basename(path) for path in apk_paths]
+        size = sum(os.path.getsize(path) for path in apk_paths)
+        try:
+            session = self.client.install_streamed(device_id, apk_paths, timeout=timeout)
+        except (AdbUnsupported, AdbError) as e:
+            self.tracer.record(command, device_id, 1, time.monotonic() - start, queue, 0, "native")
+            print(f"[ADB] Installation en flux impossible sur {device_id} ({e}): repli sur push")
+            return None
+        self.tracer.record(command, device_id, 0, time.monotonic() - start, queue, size, "native")
+        return session
+
+    def commit_session(self, device_id, session, timeout=120):
+        """Valide une session pm ouverte par stream_apks, retourne (stdout, stderr, returncode)"""
+        start = time.monotonic()
+        try:
+            stdout, stderr, returncode = self.client.install_commit(device_id, session, timeout), "", 0
+        except AdbError as e:
+            stdout, stderr, returncode = "", f"error: {e}", 1
+        self.tracer.record(["install-commit", session], device_id, returncode, time.monotonic() - start,
+                           take_queue_time(), len(stdout) + len(stderr), "native")
+        return stdout, stderr, returncode
+
+    def list_files(self, device_id, remote_dir, timeout=60):
+        """Fichiers d'un dossier distant (récursif), retourne {chemin relatif: taille ou None}"""
+        try:
+            with self.client.sync(device_id, timeout) as sync:
+                return {path: entry.size for path, entry in sync.list_tree(remote_dir).items()}
+        except AdbError:
+            pass
+
+        files = {}
+        remote_dir = remote_dir.rstrip('/')
+        stdout, _, rc = self.run_command(["shell", "find", remote_dir, "-type", "f"], device_id, timeout)
+        if rc == 0:
+            for line in stdout.strip().split('\n'):
+                if line.startswith(remote_dir):
+                    relative_path = line[len(remote_dir):].lstrip('/')
+                    if relative_path:
+                        files[relative_path] = None
+        return files
+
+    def probe_device(self, device_id):
+        """Empreinte complète de l'appareil (modèle, IP, MAC, SSID, batterie...) en un seul appel shell"""
+        stdout, _, rc = self.run_command(["shell", FINGERPRINT_SCRIPT], device_id)
+        if rc != 0:
+            return None
+        fingerprint = parse_fingerprint(stdout, device_id)
+        if fingerprint:
+            # L'empreinte alimente le cache: pas de nouvelle requête pour le modèle ou la MAC
+            self.cache.set_boot_id(device_id, fingerprint.boot_id)
+            if fingerprint.model != "Unknown":
+                self.cache.put(device_id, "model", fingerprint.model)
+            if fingerprint.mac:
+                self.cache.put(device_id, "mac", fingerprint.mac)
+        return fingerprint
+
+    def read_boot_id(self, device_id):
+        """Identifiant de démarrage du casque (change à chaque redémarrage)"""
+        stdout, _, rc = self.run_command(["shell", "cat", "/proc/sys/kernel/random/boot_id"], device_id)
+        return (stdout.strip() or None) if rc == 0 else None
+
+    def _on_device_event(self, event, device_id, state, previous_state):
+        # Débranché, redémarré ou ré-autorisé: le boot id sera relu au prochain accès
+        self.cache.forget(device_id)
+        # Vu en ligne par le serveur adb: inutile d'attendre la fin de l'attente
+        if state == "device":
+            self.breakers.reset(device_id)
 
     def get_device_model(self, device_id):
         """Récupère le modèle de l'appareil"""
-        stdout, _, rc = self.run_command(["shell", "getprop", "ro.product.model"], device_id)
-        if rc == 0:
-            return stdout.strip()
-        return "Unknown"
+        def load():
+            stdout, _, rc = self.run_command(["shell", "getprop", "ro.product.model"], device_id)
+            return (stdout.strip() or None) if rc == 0 else None
+        return self.cache.get(device_id, "model", load) or "Unknown"
 
     def get_device_ip(self, device_id):
         """Récupère l'adresse IP WiFi de l'appareil"""
@@ -73,32 +272,50 @@ class ADBManager:
         return None
 
     def get_device_mac(self, device_id):
-        """Récupère l'adresse MAC de l'appareil"""
-        stdout, _, rc = self.run_command(["shell", "dumpsys wifi | grep mWifiInfo | head -1"], device_id)
-        if rc == 0:
-            match = re.search(r'MAC: ([0-9a-fA-F:]+)', stdout)
-            if match:
-                return match.group(1).lower()
-        return None
+        """Récupère l'adresse MAC de l'appareil (en cache jusqu'au redémarrage)"""
+        def load():
+            stdout, _, rc = self.run_command(["shell", "dumpsys wifi | grep mWifiInfo | head -1"], device_id)
+            if rc == 0:
+                match = re.search(r'MAC: ([0-9a-fA-F:]+)', stdout)
+                if match:
+                    return match.group(1).lower()
+            return None
+        return self.cache.get(device_id, "mac", load)
 
     def enable_wifi_adb(self, device_id):
         """Active ADB over WiFi"""
         stdout, stderr, rc = self.run_command(["tcpip", "5555"], device_id)
         return rc == 0
 
-    def connect_wifi(self, ip_address):
+    def connect_wifi(self, ip_address, timeout=5):
         """Connecte à un appareil via WiFi (tentative unique)"""
         print(f"[ADB] Connexion à {ip_address}:5555...")
-        stdout, stderr, rc = self.run_command(["connect", f"{ip_address}:5555"], timeout=5)
+        stdout, stderr, rc = self.run_command(["connect", f"{ip_address}:5555"], timeout=timeout)
         print(f"[ADB] Réponse: stdout='{stdout.strip()}', stderr='{stderr.strip()}', rc={rc}")
 
         if "connected" in stdout.lower() or "already connected" in stdout.lower():
-            print(f"[ADB] Connexion réussie!")
+            print("[ADB] Connexion réussie!")
             return True
 
-        print(f"[ADB] Connexion échouée")
+        print("[ADB] Connexion échouée")
         return False
 
+    def connect_when_ready(self, ip_address, timeout=10):
+        """Après 'adb tcpip 5555': attend que le port réponde puis connecte (pas de délai fixe)"""
+        deadline = time.monotonic() + timeout
+        delay = 0.2
+        while True:
+            try:
+                socket.create_connection((ip_address, 5555), timeout=0.5).close()
+                if self.connect_wifi(ip_address):
+                    return True
+            except OSError:
+                pass  # adbd pas encore relancé en mode TCP
+            if time.monotonic() + delay > deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
     def disable_proximity_sensor(self, device_id):
         """Désactive le capteur de proximité"""
         stdout, stderr, rc = self.run_command(
@@ -109,197 +326,96 @@ class ADBManager:
 
 
 # =============================================================================
-# DIALOGUE DE CONFIGURATION D'APPAREIL (copié de VR-Casting-Manager)
+# LISTES DE CASQUES À COCHER (onglets Install APK, Enable / Disable, Casting)
 # =============================================================================
 
-class DeviceSetupDialog:
-    """Dialogue de configuration d'un nouvel appareil (copié de VR-Casting-Manager)"""
-
-    def __init__(self, parent, device_info, adb_manager, log_callback=None):
-        self.result = None
-        self.device_info = device_info
-        self.adb = adb_manager
-        self.log = log_callback if log_callback else print
-
-        self.dialog = tk.Toplevel(parent)
-        self.dialog.title(f"Configuration - {device_info['model']}")
-        self.dialog.geometry("450x350")
-        self.dialog.resizable(False, False)
-        self.dialog.transient(parent)
-        self.dialog.grab_set()
-
-        # Centrer
-        self.dialog.update_idletasks()
-        x = (self.dialog.winfo_screenwidth() - 450) // 2
-        y = (self.dialog.winfo_screenheight() - 350) // 2
-        self.dialog.geometry(f"+{x}+{y}")
-
-        # Titre
-        tk.Label(
-            self.dialog,
-            text=f"Configuration de {device_info['model']}",
-            font=("Helvetica", 12, "bold")
-        ).pack(pady=10)
-
-        # Frame pour les étapes
-        self.steps_frame = tk.Frame(self.dialog)
-        self.steps_frame.pack(fill="x", padx=20, pady=10)
-
-        # Étapes de vérification
-        self.steps = [
-            ("mac", "Adresse MAC"),
-            ("ip", "Adresse IP"),
-            ("model", "Type d'appareil"),
-            ("adb_wifi", "ADB over WiFi"),
-            ("proximity", "Proximity sensor désactivé")
-        ]
-
-        self.step_labels = {}
-        self.step_status = {}
-
-        for key, text in self.steps:
-            frame = tk.Frame(self.steps_frame)
-            frame.pack(fill="x", pady=2)
-
-            status_label = tk.Label(frame, text="[ ]", width=4)
-            status_label.pack(side="left")
-            self.step_status[key] = status_label
-
-            text_label = tk.Label(frame, text=text, anchor="w", width=25)
-            text_label.pack(side="left", padx=5)
-
-            value_label = tk.Label(frame, text="...", anchor="w", fg="gray")
-            value_label.pack(side="left", padx=5)
-            self.step_labels[key] = value_label
-
-        # Boutons
-        self.btn_frame = tk.Frame(self.dialog)
-        self.btn_frame.pack(pady=20)
-
-        self.cancel_btn = tk.Button(
-            self.btn_frame,
-            text="Annuler",
-            command=self.cancel,
-            width=15
-        )
-        self.cancel_btn.pack(side="left", padx=10)
-
-        # Lancer la configuration
-        self.dialog.after(500, self.run_setup)
-
-    def update_step(self, key, success, value=""):
-        """Met à jour l'affichage d'une étape"""
-        if success:
-            self.step_status[key].config(text="[OK]", fg="green")
-            self.step_labels[key].config(text=value, fg="black")
-        else:
-            self.step_status[key].config(text="[X]", fg="red")
-            self.step_labels[key].config(text=value, fg="red")
-        self.dialog.update()
-
-    def run_setup(self):
-        """Exécute les étapes de configuration"""
-        device_id = self.device_info['device_id']
-        success = True
-        print(f"[Setup] Démarrage pour {device_id}")
-
-        # 1. MAC Address
-        print(f"[Setup] Étape 1: MAC Address...")
-        mac = self.adb.get_device_mac(device_id)
-        if mac:
-            self.device_info['mac'] = mac
-            self.update_step("mac", True, mac)
-            print(f"[Setup] MAC: {mac}")
-        else:
-            self.update_step("mac", False, "Non trouvée")
-            print(f"[Setup] MAC: ÉCHEC")
-            success = False
-
-        # 2. IP Address
-        print(f"[Setup] Étape 2: IP Address...")
-        ip = self.adb.get_device_ip(device_id)
-        if ip:
-            self.device_info['ip'] = ip
-            self.update_step("ip", True, ip)
-            print(f"[Setup] IP: {ip}")
-        else:
-            self.update_step("ip", False, "Non trouvée")
-            print(f"[Setup] IP: ÉCHEC")
-            success = False
-
-        # 3. Model (déjà récupéré)
-        self.update_step("model", True, self.device_info['model'])
-        print(f"[Setup] Modèle: {self.device_info['model']}")
-
-        # 4. ADB over WiFi
-        print(f"[Setup] Étape 4: ADB over WiFi...")
-        if success:
-            if self.adb.enable_wifi_adb(device_id):
-                print(f"[Setup] tcpip 5555 OK, attente 3s...")
-                time.sleep(3)
-                if ip and self.adb.connect_wifi(ip):
-                    self.update_step("adb_wifi", True, f"{ip}:5555")
-                    print(f"[Setup] Connexion WiFi: OK")
-                else:
-                    self.update_step("adb_wifi", False, "Connexion échouée")
-                    print(f"[Setup] Connexion WiFi: ÉCHEC")
-                    success = False
-            else:
-                self.update_step("adb_wifi", False, "Activation échouée")
-                print(f"[Setup] tcpip 5555: ÉCHEC")
-                success = False
-        else:
-            self.update_step("adb_wifi", False, "Étape précédente échouée")
-            print(f"[Setup] ADB WiFi: sauté (erreur précédente)")
-
-        # 5. Disable proximity
-        print(f"[Setup] Étape 5: Désactiver proximity...")
-        if success:
-            wifi_device_id = f"{ip}:5555"
-            if self.adb.disable_proximity_sensor(wifi_device_id):
-                self.update_step("proximity", True, "Commande OK")
-                print(f"[Setup] Proximity: commande envoyée (rc=0)")
-            else:
-                self.update_step("proximity", False, "Commande échouée")
-                print(f"[Setup] Proximity: commande ÉCHOUÉE (rc!=0)")
-                success = False
-        else:
-            self.update_step("proximity", False, "Étape précédente échouée")
-            print(f"[Setup] Proximity: sauté (erreur précédente)")
-
-        # Résultat
-        print(f"[Setup] Résultat: {'SUCCÈS' if success else 'ÉCHEC'}")
-        if success:
-            self.result = self.device_info
-            self.ask_nickname()
-        else:
-            messagebox.showerror(
-                "Erreur",
-                "La configuration a échoué. Veuillez reconnecter l'appareil et réessayer.",
-                parent=self.dialog
-            )
-
-    def ask_nickname(self):
-        """Demande le nickname de l'appareil"""
-        default_name = self.device_info.get('mac', 'Device')
-
-        nickname = simpledialog.askstring(
-            "Nom de l'appareil",
-            f"Quel est le nom de cet appareil?\n(exemple: Q3-07 ou A-13)\n\nPar défaut: {default_name}",
-            initialvalue=default_name,
-            parent=self.dialog
-        )
-
-        if nickname:
-            self.device_info['nickname'] = nickname
-        else:
-            self.device_info['nickname'] = default_name
-
-        self.dialog.destroy()
+class DeviceCheckboxList:
+    """Casques à cocher, regroupés en accordéons, redessinés ligne par ligne
+
+    render() ne reconstruit les widgets que si la structure change (groupes,
+    casques, repli, casque devenu sélectionnable); sinon seul le texte des
+    lignes modifiées est mis à jour. Les cases cochées sont conservées.
+    """
+
+    def __init__(self, frame, collapsed=None, on_toggle=None, row_extras=None):
+        self.frame = frame
+        self.collapsed = collapsed  # None: liste simple, sans en-têtes de groupe
+        self.on_toggle = on_toggle
+        self.row_extras = row_extras  # row_extras(row_frame, device_id) pour les casques sélectionnables
+        self.checkboxes = {}  # {device_id: BooleanVar} des casques sélectionnables
+        self.groups = {}      # {device_id: groupe}
+        self.rows = {}        # {device_id: [Checkbutton, texte]}
+        self.headers = {}     # {groupe: [Button, texte]}
+        self.structure = None
+
+    def is_collapsed(self, group):
+        return self.collapsed is not None and self.collapsed.get(group, False)
+
+    def render(self, groups):
+        """groups: [(groupe, en-tête, [(device_id, texte, sélectionnable)])]"""
+        structure = [(group, self.is_collapsed(group), [(device_id, enabled) for device_id, _, enabled in rows])
+                     for group, _, rows in groups]
+        if structure != self.structure:
+            self._rebuild(groups)
+            self.structure = structure
+            return
+        for group, header, rows in groups:
+            if group in self.headers and self.headers[group][1] != header:
+                self.headers[group][0].config(text=header)
+                self.headers[group][1] = header
+            for device_id, text, _ in rows:
+                row = self.rows[device_id]
+                if row[1] != text:
+                    row[0].config(text=text)
+                    row[1] = text
+
+    def _rebuild(self, groups):
+        selected = {device_id for device_id, var in self.checkboxes.items() if var.get()}
+        for widget in self.frame.winfo_children():
+            widget.destroy()
+        self.checkboxes.clear()
+        self.groups.clear()
+        self.rows.clear()
+        self.headers.clear()
+
+        for group, header, rows in groups:
+            parent = self.frame
+            if self.collapsed is not None:
+                # Frame conteneur + bouton accordéon (header cliquable)
+                group_frame = tk.Frame(self.frame)
+                group_frame.pack(fill="x", anchor="w", pady=(5, 0))
+                header_btn = tk.Button(
+                    group_frame,
+                    text=header,
+                    font=("Arial", 9, "bold"),
+                    fg="blue",
+                    bd=0,
+                    cursor="hand2",
+                    anchor="w",
+                    command=lambda g=group: self.on_toggle(g)
+                )
+                header_btn.pack(fill="x", anchor="w")
+                self.headers[group] = [header_btn, header]
+
+                # Frame pour les devices (caché si replié)
+                parent = tk.Frame(group_frame)
+                if not self.is_collapsed(group):
+                    parent.pack(fill="x", anchor="w", padx=(20, 0))
+
+            for device_id, text, enabled in rows:
+                var = tk.BooleanVar(value=device_id in selected)
+                row_frame = tk.Frame(parent)
+                row_frame.pack(anchor="w", fill="x")
+                checkbox = tk.Checkbutton(row_frame, text=text, variable=var,
+                                          state="normal" if enabled else "disabled")
+                checkbox.pack(side="left")
+                self.rows[device_id] = [checkbox, text]
 
-    def cancel(self):
-        self.result = None
-        self.dialog.destroy()
+                if enabled:
+                    self.checkboxes[device_id] = var
+                    self.groups[device_id] = group
+                    if self.row_extras:
+                        self.row_extras(row_frame, device_id)
 
 
 class USBVRManager:
@@ -313,11 +429,40 @@ class USBVRManager:
 
         # Configuration
         self.adb_path = self.find_adb_path()
-        self.adb_manager = ADBManager(self.adb_path)
+        self.adb_manager = ADBManager(self.adb_path, os.path.join(self.script_dir, "adb_trace.jsonl"))
+        self.adb_manager.breakers.subscribe(self._on_breaker_change)
+        # Opérations "sur chaque casque" lancées en parallèle, un seul exécuteur
+        # pour toute l'application (installations, reconnexion, intégration, balayage)
+        self.fleet = FleetExecutor()
+        # Reconnexion WiFi de toute la salle: parallèle, délai global unique
+        self.reconnector = ReconnectEngine(self.adb_manager.connect_wifi, executor=self.fleet)
+        # Casques branchés en USB: configurés en parallèle, noms demandés par lot
+        self.onboarding = OnboardingQueue(self.adb_manager, self._on_onboarding_update,
+                                          self._on_onboarding_batch, executor=self.fleet)
+        # Casques qui ont changé d'IP (DHCP): retrouvés par balayage du sous-réseau
+        self.sweeper = SubnetSweeper(self.adb_manager, executor=self.fleet)
+        self.subnet = ""  # Sous-réseau(x) à balayer (config.csv), sinon les /24 des IP connues
+        # Transferts d'APK simultanés par lien (config.csv: install_usb, install_wifi)
+        self.install_limits = {"install_usb": INSTALL_MAX_USB, "install_wifi": INSTALL_MAX_WIFI}
+        # États adb des casques en mémoire (un seul suivi) partagés par les onglets
+        self.device_states = DeviceStateStore(self.adb_manager.get_device_states,
+                                              lambda callback: self.root.after(0, callback))
+        self.adb_manager.client.track_devices().subscribe(self.device_states.on_device_event)
         self.scrcpy_path = self.find_scrcpy_path()
         self.devices_file = os.path.join(self.script_dir, "devices.csv")
         self.config_file = os.path.join(self.script_dir, "config.csv")
-        self.devices = {}
+        # Débit mesuré de chaque casque: délais de push adaptés au lien réel
+        self.throughput = ThroughputEstimator(os.path.join(self.script_dir, "throughput.json"))
+        # Package et versionCode des APK, lus une fois par contenu de fichier
+        self.apk_inspector = ApkInspector(os.path.join(self.script_dir, "apk_cache.json"))
+        # Casques enregistrés, indexés (série USB, ip:5555, MAC, groupe), partagés par tous les onglets
+        self.devices = DeviceRegistry(self.devices_file)
+        # Inventaires des packages conservés entre les audits (relus seulement s'ils ont changé)
+        self.inventory_store = InventoryStore(os.path.join(self.script_dir, "inventory.db"))
+        # Profils de déploiement par groupe: seules les différences sont appliquées
+        self.profiles = ProfileStore(os.path.join(self.script_dir, PROFILE_DIR))
+        self.reconciler = ProfileReconciler(self.profile_shell, self.adb_manager.list_files, self.push_file,
+                                            self.apk_inspector.inspect, self.fleet)
         self.sync_paths = {
             "videos": "/sdcard/Movies/",
             "photos": "/sdcard/Pictures/",
@@ -325,9 +470,9 @@ class USBVRManager:
             "last_pc_folder": ""
         }
         
-        # Variables pour les cases à cocher sync (utilisées dans pop-ups)
-        self.apply_to_all_devices = False
-        self.apply_to_all_files = False
+        # Un seul avertissement FAT32 par fichier pendant une synchro
+        self._fat32_lock = threading.Lock()
+        self._scan_running = False
 
         # État des accordéons (groupes repliés/dépliés) dans Install APK
         self.group_collapsed = {}  # {"Quest 3": False, "Pico 4": True}
@@ -391,36 +536,11 @@ class USBVRManager:
 
     def load_devices(self):
         """Charge la liste des devices depuis le CSV"""
-        if os.path.exists(self.devices_file):
-            with open(self.devices_file, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    if len(row) >= 3:
-                        device_id, nickname, last_seen = row[0], row[1], row[2]
-                        ip_address = row[3] if len(row) >= 4 else ""
-                        group = row[4] if len(row) >= 5 else "Non assigné"
-                        mac_address = row[5] if len(row) >= 6 else ""
-                        self.devices[device_id] = {
-                            "nickname": nickname,
-                            "last_seen": last_seen,
-                            "ip_address": ip_address,
-                            "group": group,
-                            "mac_address": mac_address
-                        }
+        self.devices.load()
 
     def save_devices(self):
         """Sauvegarde la liste des devices dans le CSV"""
-        with open(self.devices_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            for device_id, info in self.devices.items():
-                writer.writerow([
-                    device_id,
-                    info["nickname"],
-                    info["last_seen"],
-                    info.get("ip_address", ""),
-                    info.get("group", "Non assigné"),
-                    info.get("mac_address", "")
-                ])
+        self.devices.save()
     
     def load_config(self):
         """Charge la configuration depuis le CSV"""
@@ -432,6 +552,10 @@ class USBVRManager:
                         key, value = row[0], row[1]
                         if key in self.sync_paths:
                             self.sync_paths[key] = value
+                        elif key == "subnet":
+                            self.subnet = value
+                        elif key in self.install_limits and value.strip().isdigit():
+                            self.install_limits[key] = int(value)
     
     def save_config(self):
         """Sauvegarde la configuration dans le CSV"""
@@ -439,31 +563,49 @@ class USBVRManager:
             writer = csv.writer(f)
             for key, value in self.sync_paths.items():
                 writer.writerow([key, value])
+            if self.subnet:
+                writer.writerow(["subnet", self.subnet])
+            for key, default in (("install_usb", INSTALL_MAX_USB), ("install_wifi", INSTALL_MAX_WIFI)):
+                if self.install_limits[key] != default:
+                    writer.writerow([key, self.install_limits[key]])
     
     def run_adb_command(self, command, device_id=None, retry_wireless=True, timeout=60):
         """Exécute une commande ADB avec reconnexion auto pour wireless"""
-        try:
-            if device_id:
-                cmd = [self.adb_path, "-s", device_id] + command
-            else:
-                cmd = [self.adb_path] + command
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
-
-            # Si échec et device wireless, tenter reconnexion
-            if result.returncode != 0 and retry_wireless and device_id and ":" in device_id:
-                ip = device_id.split(":")[0]
-                # Tenter reconnexion
-                reconnect_cmd = [self.adb_path, "connect", f"{ip}:5555"]
-                subprocess.run(reconnect_cmd, capture_output=True, text=True, timeout=10)
-                # Réessayer la commande (sans retry pour éviter boucle infinie)
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
-
-            return result.stdout, result.stderr, result.returncode
-        except subprocess.TimeoutExpired:
-            return "", "Command timeout", 1
-        except Exception as e:
-            return "", str(e), 1
+        wireless = bool(device_id) and ":" in device_id
+        breakers = self.adb_manager.breakers
+
+        # Casque WiFi connu hors ligne: échec immédiat jusqu'au prochain essai
+        if wireless and not breakers.allow(device_id):
+            self.adb_manager.tracer.record(command, device_id, 1, 0.0, take_queue_time(), backend="breaker")
+            return "", f"error: {device_id} injoignable (nouvel essai dans {breakers.retry_in(device_id)}s)", 1
+
+        stdout, stderr, returncode = self.adb_manager.run_command(command, device_id, timeout)
+        if not wireless:
+            return stdout, stderr, returncode
+
+        # Si échec de liaison, tenter une reconnexion puis réessayer une fois
+        if returncode != 0 and retry_wireless and is_link_error(stderr):
+            ip = device_id.split(":")[0]
+            connect_out, _, _ = self.adb_manager.run_command(["connect", f"{ip}:5555"], timeout=10)
+            if "connected" in connect_out.lower():
+                stdout, stderr, returncode = self.adb_manager.run_command(command, device_id, timeout)
+
+        if returncode != 0 and is_link_error(stderr):
+            breakers.failure(device_id)
+        elif returncode == 0 or "timeout" not in stderr.lower():
+            # Délai dépassé: ni échec de liaison ni preuve que le casque répond
+            breakers.success(device_id)
+        return stdout, stderr, returncode
+
+    def _on_breaker_change(self, device_id, previous_state, state, retry_in):
+        """Journalise l'ouverture / fermeture du disjoncteur d'un casque WiFi"""
+        # Suffixe "INJOIGNABLE" des listes à redessiner
+        self.device_states.touch([device_id])
+        nickname = self.get_device_nickname(device_id)
+        if state == BREAKER_OPEN:
+            self.log_message(f"⚡ {nickname} injoignable — commandes suspendues {retry_in}s")
+        elif state == BREAKER_CLOSED and previous_state != BREAKER_CLOSED:
+            self.log_message(f"✓ {nickname} de nouveau joignable")
 
     def get_device_ip(self, device_id):
         """Récupère l'IP WiFi d'un device USB connecté"""
@@ -477,31 +619,20 @@ class USBVRManager:
         return None
 
     def get_device_mac(self, device_id):
-        """Récupère l'adresse MAC WiFi de l'appareil"""
-        stdout, stderr, rc = self.run_adb_command(
-            ["shell", "dumpsys wifi | grep mWifiInfo | head -1"], device_id, retry_wireless=False)
-        if rc == 0:
-            match = re.search(r'MAC: ([0-9a-fA-F:]+)', stdout)
-            if match:
-                return match.group(1).lower()
-        return None
+        """Récupère l'adresse MAC WiFi de l'appareil (cache de l'ADBManager)"""
+        return self.adb_manager.get_device_mac(device_id)
 
     def find_device_by_mac(self, mac):
         """Trouve un device enregistré par son adresse MAC"""
-        if not mac:
-            return None, None
-        mac_lower = mac.lower()
-        for device_id, info in self.devices.items():
-            if info.get("mac_address", "").lower() == mac_lower:
-                return device_id, info
-        return None, None
-
-    def setup_wireless(self, device_id):
+        return self.devices.find_by_mac(mac)
+
+    def setup_wireless(self, device_id, ip=None, save=True):
         """Active le mode wireless sur un device USB et connecte automatiquement"""
-        nickname = self.devices.get(device_id, {}).get("nickname", device_id)
+        nickname = self.devices.nickname(device_id, device_id)
 
-        # 1. Récupérer l'IP
-        ip = self.get_device_ip(device_id)
+        # 1. Récupérer l'IP (sauf si déjà connue par l'empreinte de l'appareil)
+        if not ip:
+            ip = self.get_device_ip(device_id)
         if not ip:
             self.log_message(f"✗ Impossible de récupérer l'IP WiFi de {nickname}")
             return False
@@ -515,30 +646,21 @@ class USBVRManager:
             return False
 
         self.log_message(f"Mode TCP/IP activé sur {nickname}, connexion en cours...")
-        time.sleep(2)  # Attendre que le device redémarre adb en mode TCP
 
-        # 3. Connecter en wireless
-        stdout, stderr, rc = self.run_adb_command(["connect", f"{ip}:5555"], retry_wireless=False)
-
-        if "connected" in stdout.lower() or "already connected" in stdout.lower():
+        # 3. Connecter dès que adbd écoute en TCP (sondage du port 5555)
+        if self.adb_manager.connect_when_ready(ip):
             self.log_message(f"✓ Wireless activé: {nickname} → {ip}:5555")
             # Sauvegarder l'IP
-            if device_id in self.devices:
-                self.devices[device_id]["ip_address"] = ip
-            else:
-                self.devices[device_id] = {
-                    "nickname": f"Device_{device_id[:8]}",
-                    "last_seen": datetime.now().strftime('%Y-%m-%d'),
-                    "ip_address": ip
-                }
-            self.save_devices()
+            if not self.devices.update(device_id, ip_address=ip):
+                self.devices.add(device_id,
+                                 last_seen=datetime.now().strftime('%Y-%m-%d'),
+                                 ip_address=ip)
+            if save:
+                self.save_devices()
             return True
         else:
-            if "10060" in stderr or "timeout" in stderr.lower() or "n'a pas répondu" in stderr:
-                self.log_message(f"✗ Échec connexion wireless pour {nickname}")
-                self.log_message(f"   → Vérifiez que le PC et le casque sont sur le même réseau WiFi !")
-            else:
-                self.log_message(f"✗ Échec connexion wireless pour {nickname}: {stderr}")
+            self.log_message(f"✗ Échec connexion wireless pour {nickname} ({ip}:5555)")
+            self.log_message("   → Vérifiez que le PC et le casque sont sur le même réseau WiFi !")
             return False
 
     def try_reconnect_wireless(self, device_id, timeout=5):
@@ -549,65 +671,89 @@ class USBVRManager:
         if not ip:
             return False
 
-        try:
-            cmd = [self.adb_path, "connect", f"{ip}:5555"]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
-            stdout = result.stdout.lower()
-            if "connected" in stdout or "already connected" in stdout:
-                return True
-        except subprocess.TimeoutExpired:
-            pass
-        except Exception:
-            pass
+        stdout, _, _ = self.adb_manager.run_command(["connect", f"{ip}:5555"], timeout=timeout)
+        stdout = stdout.lower()
+        if "connected" in stdout or "already connected" in stdout:
+            # Reconnexion explicite: le disjoncteur ne doit plus bloquer ce casque
+            self.adb_manager.breakers.reset(f"{ip}:5555")
+            return True
         return False
 
-    def _try_reconnect_with_log(self, device_id, info):
-        """Thread-safe reconnection avec logging"""
-        nickname = info.get("nickname", device_id)
-        ip = info.get("ip_address")
+    def reconnect_saved_ips(self, device_ids):
+        """Reconnecte en parallèle les IP sauvegardées, statut de chaque casque au fil de l'eau
 
-        if self.try_reconnect_wireless(device_id, timeout=5):
-            self.log_message(f"✓ Reconnecté: {nickname} via {ip}:5555")
-        else:
-            self.log_message(f"✗ {nickname} non disponible ({ip})")
+        Retourne {ip: état final} (voir reconnect.py).
+        """
+        nicknames = {}
+        for device_id in device_ids:
+            info = self.devices.get(device_id, {})
+            if info.get("ip_address"):
+                nicknames[info["ip_address"]] = info.get("nickname", device_id)
+
+        def on_status(ip, state):
+            nickname = nicknames.get(ip, ip)
+            if state == RECONNECT_CONNECTED:
+                # Reconnexion explicite: le disjoncteur ne doit plus bloquer ce casque
+                self.adb_manager.breakers.reset(f"{ip}:5555")
+                self.log_message(f"✓ Reconnecté: {nickname} via {ip}:5555")
+                self.root.after(0, self.refresh_devices_list)
+            elif state == RECONNECT_TIMEOUT:
+                self.log_message(f"✗ {nickname} non disponible ({ip}) — délai global dépassé")
+            elif state != RECONNECT_CONNECTING:
+                self.log_message(f"✗ {nickname} non disponible ({ip})")
+
+        return self.reconnector.run(list(nicknames), on_status)
+
+    def rediscover_moved_devices(self):
+        """Balaye le sous-réseau (port 5555) et met à jour l'IP des casques enregistrés qui ont changé d'adresse
+
+        Retourne le nombre de casques retrouvés à une nouvelle IP.
+        """
+        known_ips = [info["ip_address"] for _, info in self.devices.items() if info.get("ip_address")]
+        try:
+            hosts = subnet_hosts(self.subnet or default_subnets(known_ips))
+        except ValueError as e:
+            self.log_message(f"✗ Subnet sweep: {e}")
+            return 0
+        self.log_message(f"Sweeping {len(hosts)} address(es) on port 5555 for moved headsets...")
+
+        def registered_serial(identity):
+            return self.devices.resolve(identity.serial) or self.devices.find_by_mac(identity.mac)[0]
+
+        moved = 0
+        for identity in self.sweeper.discover(hosts, registered_serial):
+            serial = registered_serial(identity)
+            info = self.devices.get(serial)
+            if info["ip_address"] == identity.ip:
+                continue
+            self.devices.update(serial, ip_address=identity.ip)
+            self.adb_manager.breakers.reset(wireless_id(identity.ip))
+            self.log_message(f"↻ {info['nickname']}: new IP {info['ip_address'] or '?'} → {identity.ip}")
+            moved += 1
+
+        if moved:
+            self.save_devices()
+        self.log_message(f"Subnet sweep done: {moved} headset(s) found at a new IP")
+        self.root.after(0, self.refresh_devices_list)
+        return moved
 
     def is_wireless_device(self, device_id):
         """Vérifie si un device_id est une adresse wireless (IP:port)"""
         return ":" in device_id and device_id.split(":")[0].replace(".", "").isdigit()
 
-    def detect_device_model(self, device_id):
-        """Détecte le modèle du casque via ADB"""
-        stdout, _, rc = self.run_adb_command(
-            ["shell", "getprop", "ro.product.model"], device_id, retry_wireless=False)
-        if rc == 0 and stdout.strip():
-            return stdout.strip()
-        return "Unknown"
-
     def get_all_groups(self):
         """Retourne la liste unique des groupes"""
-        groups = set()
-        for info in self.devices.values():
-            group = info.get("group", "Non assigné")
-            if group:
-                groups.add(group)
-        return sorted(groups)
+        return self.devices.groups()
 
     def get_devices_by_group(self, group):
         """Retourne les device_ids d'un groupe"""
         if group == "All" or group == "Tous":
-            return list(self.devices.keys())
-        return [d for d, info in self.devices.items()
-                if info.get("group") == group]
+            return self.devices.keys()
+        return self.devices.group_members(group)
 
     def get_connected_devices_by_group(self, group):
         """Retourne les device_ids connectés d'un groupe"""
-        stdout, _, rc = self.run_adb_command(["devices"], retry_wireless=False)
-        connected = set()
-        if rc == 0:
-            for line in stdout.strip().split('\n')[1:]:
-                if '\tdevice' in line:
-                    device_id = line.split('\t')[0]
-                    connected.add(device_id)
+        connected = set(self.device_states.connected())
 
         # Si aucun device connecté, retourner liste vide
         if not connected:
@@ -619,16 +765,15 @@ class USBVRManager:
 
         for device_id in device_ids:
             info = self.devices.get(device_id, {})
-            ip = info.get("ip_address", "")
-            wireless_id = f"{ip}:5555" if ip else None
+            ip_id = wireless_id(info.get("ip_address"))
 
             # Connecté en USB ou WiFi ?
             if device_id in connected:
                 result.append(device_id)
                 matched_connected.add(device_id)
-            elif wireless_id and wireless_id in connected:
-                result.append(wireless_id)
-                matched_connected.add(wireless_id)
+            elif ip_id and ip_id in connected:
+                result.append(ip_id)
+                matched_connected.add(ip_id)
 
         # Ajouter les devices WiFi connectés qui ne sont pas dans self.devices
         # (utile si "Tous" est sélectionné ou si devices non enregistrés)
@@ -641,6 +786,10 @@ class USBVRManager:
 
     def log_message(self, message):
         """Affiche un message dans la zone de logs"""
+        if threading.current_thread() is not threading.main_thread():
+            # Appel depuis un thread de travail: Tk n'est manipulé que par la boucle principale
+            self.root.after(0, self.log_message, message)
+            return
         log_line = f"[{datetime.now().strftime('%H:%M:%S')}] {message}"
         print(log_line, flush=True)  # Console output
         self.log_text.insert(tk.END, log_line + "\n")
@@ -674,8 +823,13 @@ class USBVRManager:
         # Onglet 7: Casting
         self.create_casting_tab(self.notebook)
 
-        # Auto-refresh au changement d'onglet
+        # Onglet 8: Profils de déploiement par groupe
+        self.create_profiles_tab(self.notebook)
+
+        # Auto-refresh au changement d'onglet (depuis la mémoire), et à chaque
+        # changement d'état d'un casque pour l'onglet affiché
         self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.device_states.subscribe(self._on_device_states_changed)
         
         # Zone de logs en bas
         log_frame = tk.Frame(self.root)
@@ -714,6 +868,9 @@ class USBVRManager:
         # Reconnect All WiFi button
         tk.Button(control_frame, text="Reconnect All WiFi", command=self.reconnect_all_wifi).pack(side="left", padx=5)
 
+        # Latences ADB (commandes et casques les plus lents)
+        tk.Button(control_frame, text="ADB Stats", command=self.show_adb_stats).pack(side="left", padx=5)
+
         # Status label
         self.detection_status_label = tk.Label(frame, text="USB Detection: OFF", fg="gray", font=("Arial", 9))
         self.detection_status_label.pack(anchor="w", padx=10)
@@ -814,15 +971,22 @@ class USBVRManager:
         self.install_canvas.bind_all("<MouseWheel>", on_mousewheel)
         
         # Message d'avertissement
-        warning_label = tk.Label(frame, text="The APKs will be installed on selected devices, one after the other.\nDo NOT disconnect headsets during installation.", 
+        warning_label = tk.Label(frame, text="The APKs will be installed on several selected devices at once (up to the USB / WiFi limits).\nDo NOT disconnect headsets during installation.", 
                                fg="red", font=("Arial", 10, "bold"))
         warning_label.pack(pady=10)
         
         # Bouton d'installation
+        self.skip_current_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(frame, text="Skip devices that already have the same version",
+                       variable=self.skip_current_var).pack(anchor="w", padx=10)
+
         install_btn = tk.Button(frame, text="Install APKs", command=self.install_apks, bg="lightgreen")
         install_btn.pack(pady=10)
         
-        self.device_checkboxes = {}
+        self.install_list = DeviceCheckboxList(self.install_devices_frame, self.group_collapsed,
+                                               self.toggle_group_collapse)
+        self.device_checkboxes = self.install_list.checkboxes
+        self.device_groups = self.install_list.groups  # Groupe de chaque device sélectionnable
     
     def create_missing_apk_tab(self, notebook):
         """Crée l'onglet Scan for missing APKs"""
@@ -845,31 +1009,44 @@ class USBVRManager:
         scan_missing_btn.pack(side="left", padx=5)
 
         self.show_missing_only = tk.BooleanVar()
-        missing_checkbox = tk.Checkbutton(control_frame, text="Show missing packages only",
+        missing_checkbox = tk.Checkbutton(control_frame, text="Show missing / outdated packages only",
                                         variable=self.show_missing_only, command=self.filter_missing_packages)
         missing_checkbox.pack(side="left", padx=20)
-        
-        # Tableau avec scrollbars
-        table_frame = tk.Frame(frame)
-        table_frame.pack(fill="both", expand=True, padx=10, pady=5)
-        
-        self.missing_tree = ttk.Treeview(table_frame)
-        
-        # Scrollbars
-        v_scrollbar = tk.Scrollbar(table_frame, orient="vertical", command=self.missing_tree.yview)
-        h_scrollbar = tk.Scrollbar(table_frame, orient="horizontal", command=self.missing_tree.xview)
-        self.missing_tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
-        
-        # Grid layout pour les scrollbars
-        self.missing_tree.grid(row=0, column=0, sticky="nsew")
-        v_scrollbar.grid(row=0, column=1, sticky="ns")
-        h_scrollbar.grid(row=1, column=0, sticky="ew")
-        
-        table_frame.grid_rowconfigure(0, weight=1)
-        table_frame.grid_columnconfigure(0, weight=1)
-        
-        # Stocker les données pour le filtrage
-        self.all_packages_data = []
+
+        # Recherche dans les noms de packages (index de la matrice)
+        tk.Label(control_frame, text="Search:").pack(side="left")
+        self.missing_search_var = tk.StringVar()
+        self.missing_search_var.trace_add("write", lambda *args: self.filter_missing_packages())
+        tk.Entry(control_frame, textvariable=self.missing_search_var, width=25).pack(side="left", padx=5)
+
+        # Historique des inventaires (audits précédents)
+        history_frame = tk.Frame(frame)
+        history_frame.pack(fill="x", padx=10, pady=5)
+        tk.Label(history_frame, text="History of:").pack(side="left")
+        self.history_device_var = tk.StringVar()
+        self.history_device_combo = ttk.Combobox(history_frame, textvariable=self.history_device_var, state="readonly", width=30)
+        self.history_device_combo.pack(side="left", padx=5)
+        tk.Label(history_frame, text="since:").pack(side="left")
+        monday = datetime.now() - timedelta(days=datetime.now().weekday())
+        self.history_since_var = tk.StringVar(value=monday.strftime("%Y-%m-%d"))
+        tk.Entry(history_frame, textvariable=self.history_since_var, width=16).pack(side="left", padx=5)
+        tk.Button(history_frame, text="Show changes", command=self.show_inventory_changes).pack(side="left", padx=5)
+        tk.Button(history_frame, text="Set as group baseline", command=self.set_inventory_baseline).pack(side="left", padx=5)
+        tk.Button(history_frame, text="Drift from baseline", command=self.show_inventory_drift).pack(side="left", padx=5)
+        
+        # Tableau virtualisé: seules les lignes visibles sont créées
+        self.missing_table = VirtualTable(frame)
+        self.missing_table.pack(fill="both", expand=True, padx=10, pady=5)
+        # Installé mais plus ancien que sur un autre casque
+        self.missing_table.tag_configure("outdated", foreground="darkorange")
+
+        # Matrice de l'audit (packages x casques) et tri courant
+        self.audit_matrix = PresenceMatrix([], {})
+        self.audit_sort = (SORT_PACKAGE, None, False)
+        self.inventory_scan = None
+        self.inventory_devices = []
+        self.inventories = {}
+        self.inventory_fetched = set()
     
     def create_uninstall_tab(self, notebook):
         """Crée l'onglet Uninstall APK"""
@@ -1022,10 +1199,6 @@ class USBVRManager:
         frame = ttk.Frame(notebook)
         notebook.add(frame, text="Enable / Disable App")
 
-        # Variables pour les checkboxes des devices
-        self.ed_device_checkboxes = {}
-        self.ed_device_groups = {}
-
         # --- Sélection par groupe ---
         group_frame = tk.Frame(frame)
         group_frame.pack(fill="x", padx=10, pady=5)
@@ -1065,6 +1238,11 @@ class USBVRManager:
         self.ed_devices_frame.bind("<Configure>", on_ed_frame_configure)
         self.ed_canvas.bind("<Configure>", on_ed_canvas_configure)
 
+        # Checkboxes des devices (liste simple, sans accordéons)
+        self.ed_device_list = DeviceCheckboxList(self.ed_devices_frame)
+        self.ed_device_checkboxes = self.ed_device_list.checkboxes
+        self.ed_device_groups = self.ed_device_list.groups
+
         # --- Option pour tous les utilisateurs ---
         self.ed_all_users_var = tk.BooleanVar(value=True)
         tk.Checkbutton(frame, text="Apply to all users on device",
@@ -1093,9 +1271,7 @@ class USBVRManager:
         frame = ttk.Frame(notebook)
         notebook.add(frame, text="Casting")
 
-        # Variables pour les checkboxes des devices
-        self.casting_checkboxes = {}
-        self.casting_device_groups = {}
+        # État des accordéons (les cases à cocher sont créées avec la liste, plus bas)
         self.casting_group_collapsed = {}
 
         # Sélection par groupe
@@ -1138,6 +1314,11 @@ class USBVRManager:
         self.casting_devices_frame.bind("<Configure>", on_frame_configure)
         self.casting_canvas.bind("<Configure>", on_canvas_configure)
 
+        self.casting_list = DeviceCheckboxList(self.casting_devices_frame, self.casting_group_collapsed,
+                                               self.toggle_casting_group_collapse, self.add_casting_links)
+        self.casting_checkboxes = self.casting_list.checkboxes
+        self.casting_device_groups = self.casting_list.groups
+
         # Support molette souris
         def on_mousewheel(event):
             self.casting_canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
@@ -1154,117 +1335,181 @@ class USBVRManager:
                             font=("Arial", 11, "bold"))
         cast_btn.pack(pady=10)
 
-    def scan_devices(self):
-        """Scanne les devices connectés avec support wireless automatique"""
-        self.log_message("Scanning for connected devices...")
-
-        # 1. Obtenir la liste des devices déjà connectés UNE SEULE FOIS
-        stdout, _, _ = self.run_adb_command(["devices"], retry_wireless=False)
-        already_connected = set()
-        if stdout:
-            for line in stdout.strip().split('\n')[1:]:
-                if '\tdevice' in line or '\tunauthorized' in line:
-                    already_connected.add(line.split('\t')[0])
+    def create_profiles_tab(self, notebook):
+        """Crée l'onglet Profiles (état voulu des casques de chaque groupe)"""
+        frame = ttk.Frame(notebook)
+        notebook.add(frame, text="Profiles")
 
-        # Log already connected devices
-        if already_connected:
-            self.log_message(f"Already connected: {len(already_connected)} device(s)")
-            for dev_id in already_connected:
-                self.log_message(f"  - {dev_id}")
+        # Sélection du groupe
+        group_frame = tk.Frame(frame)
+        group_frame.pack(fill="x", padx=10, pady=5)
+        tk.Label(group_frame, text="Profile for group:").pack(side="left")
+        self.profile_group_var = tk.StringVar()
+        self.profile_group_combo = ttk.Combobox(group_frame, textvariable=self.profile_group_var, state="readonly", width=20)
+        self.profile_group_combo.pack(side="left", padx=5)
+        self.profile_group_combo.bind("<<ComboboxSelected>>", lambda e: self.load_profile_form())
+        tk.Button(group_frame, text="Refresh groups", command=self.refresh_profile_groups).pack(side="left", padx=5)
+
+        # APK requis
+        apk_frame = tk.LabelFrame(frame, text="Required APKs (installed or updated if the versionCode differs)")
+        apk_frame.pack(fill="x", padx=10, pady=5)
+        self.profile_apk_listbox = tk.Listbox(apk_frame, height=4, selectmode=tk.EXTENDED)
+        self.profile_apk_listbox.pack(side="left", fill="x", expand=True, padx=5, pady=5)
+        apk_buttons = tk.Frame(apk_frame)
+        apk_buttons.pack(side="right", padx=5)
+        tk.Button(apk_buttons, text="Add APK files", command=self.add_profile_apks).pack(fill="x", pady=2)
+        tk.Button(apk_buttons, text="Remove", command=lambda: self.remove_selected(self.profile_apk_listbox)).pack(fill="x", pady=2)
+
+        # Packages interdits et désactivés (un par ligne)
+        packages_frame = tk.Frame(frame)
+        packages_frame.pack(fill="x", padx=10, pady=5)
+        forbidden_frame = tk.LabelFrame(packages_frame, text="Forbidden packages (uninstalled), one per line")
+        forbidden_frame.pack(side="left", fill="both", expand=True, padx=(0, 5))
+        self.profile_forbidden_text = tk.Text(forbidden_frame, height=4, width=30)
+        self.profile_forbidden_text.pack(fill="both", expand=True, padx=5, pady=5)
+        disabled_frame = tk.LabelFrame(packages_frame, text="Disabled packages (user 0), one per line")
+        disabled_frame.pack(side="left", fill="both", expand=True, padx=(5, 0))
+        self.profile_disabled_text = tk.Text(disabled_frame, height=4, width=30)
+        self.profile_disabled_text.pack(fill="both", expand=True, padx=5, pady=5)
+
+        # Dossiers synchronisés
+        sync_frame = tk.LabelFrame(frame, text="Sync folders (missing or different-size files are copied)")
+        sync_frame.pack(fill="x", padx=10, pady=5)
+        self.profile_sync_listbox = tk.Listbox(sync_frame, height=3)
+        self.profile_sync_listbox.pack(side="left", fill="x", expand=True, padx=5, pady=5)
+        sync_buttons = tk.Frame(sync_frame)
+        sync_buttons.pack(side="right", padx=5)
+        tk.Button(sync_buttons, text="Add folder", command=self.add_profile_folder).pack(fill="x", pady=2)
+        tk.Button(sync_buttons, text="Remove", command=lambda: self.remove_selected(self.profile_sync_listbox)).pack(fill="x", pady=2)
+        self.profile_folders = []
 
-        # 2. Tenter de reconnecter les devices wireless connus EN PARALLELE
-        devices_to_reconnect = []
-        devices_skipped_no_ip = []
-        devices_skipped_connected = []
+        # Boutons d'action
+        btn_frame = tk.Frame(frame)
+        btn_frame.pack(fill="x", padx=10, pady=10)
+        tk.Button(btn_frame, text="Save profile", command=self.save_profile).pack(side="left", padx=5)
+        tk.Button(btn_frame, text="Preview changes", command=lambda: self.reconcile_profiles(apply=False)).pack(side="left", padx=5)
+        tk.Button(btn_frame, text="Apply to group", bg="lightgreen",
+                  command=lambda: self.reconcile_profiles(apply=True)).pack(side="left", padx=5)
+        tk.Button(btn_frame, text="Apply all profiles", bg="orange",
+                  command=lambda: self.reconcile_profiles(apply=True, all_groups=True)).pack(side="left", padx=5)
 
-        for device_id, info in list(self.devices.items()):
-            if info.get("ip_address"):
-                wireless_id = f"{info['ip_address']}:5555"
-                if wireless_id not in already_connected:
-                    devices_to_reconnect.append((device_id, info))
-                else:
-                    devices_skipped_connected.append((info.get("nickname", device_id), wireless_id))
-            else:
-                devices_skipped_no_ip.append(info.get("nickname", device_id))
-
-        # Log skipped devices
-        if devices_skipped_connected:
-            self.log_message(f"Skipped (already connected): {len(devices_skipped_connected)}")
-            for name, ip in devices_skipped_connected:
-                self.log_message(f"  - {name} ({ip})")
-        if devices_skipped_no_ip:
-            self.log_message(f"Skipped (no IP saved): {len(devices_skipped_no_ip)}")
-            for name in devices_skipped_no_ip:
-                self.log_message(f"  - {name}")
-
-        if devices_to_reconnect:
-            self.log_message(f"Tentative reconnexion de {len(devices_to_reconnect)} device(s) en parallèle...")
-            threads = []
-            for device_id, info in devices_to_reconnect:
-                t = threading.Thread(target=self._try_reconnect_with_log, args=(device_id, info))
-                t.daemon = True
-                threads.append(t)
-                t.start()
-
-            # Attendre toutes les reconnexions (max 5 secondes chacune)
-            for t in threads:
-                t.join(timeout=6)
-
-        # 2. Scanner tous les devices (USB + WiFi)
-        stdout, stderr, returncode = self.run_adb_command(["devices"], retry_wireless=False)
+        self.refresh_profile_groups()
 
-        if returncode != 0:
-            self.log_message(f"Error scanning devices: {stderr}")
+    def scan_devices(self):
+        """Scanne les devices connectés avec support wireless automatique (en arrière-plan)"""
+        if self._scan_running:
+            self.log_message("Scan already in progress...")
             return
+        self._scan_running = True
+        self.log_message("Scanning for connected devices...")
+        threading.Thread(target=self._scan_devices_thread, daemon=True).start()
 
-        lines = stdout.strip().split('\n')[1:]  # Skip header
-        current_devices = {}
+    def _scan_devices_thread(self):
+        """Pipeline du scan: reconnexions WiFi, puis par casque USB empreinte → tcpip → connexion"""
+        try:
+            # 1. Devices déjà connectés (suivi adb, sans relancer 'adb devices')
+            already_connected = {device_id for device_id, state in self.adb_manager.get_device_states().items()
+                                 if state in ("device", "unauthorized")}
 
-        for line in lines:
-            if '\tdevice' in line or '\tunauthorized' in line or '\toffline' in line:
-                parts = line.split('\t')
-                if len(parts) >= 2:
-                    device_id = parts[0]
-                    status = parts[1]
-                    current_devices[device_id] = status
+            # Log already connected devices
+            if already_connected:
+                self.log_message(f"Already connected: {len(already_connected)} device(s)")
+                for dev_id in already_connected:
+                    self.log_message(f"  - {dev_id}")
 
-        # 3. Pour chaque device USB autorisé sans IP, activer wireless auto
-        for device_id, status in current_devices.items():
-            if status == "device" and not self.is_wireless_device(device_id):
-                # C'est un device USB
-                is_new_device = device_id not in self.devices
-                if is_new_device:
-                    # Détecter le modèle automatiquement
-                    detected_model = self.detect_device_model(device_id)
-                    self.log_message(f"Modèle détecté: {detected_model}")
-
-                    self.devices[device_id] = {
-                        "nickname": f"Device_{device_id[:8]}",
-                        "last_seen": datetime.now().strftime('%Y-%m-%d'),
-                        "ip_address": "",
-                        "group": detected_model
-                    }
+            # 2. Tenter de reconnecter les devices wireless connus EN PARALLELE
+            devices_to_reconnect = []
+            devices_skipped_no_ip = []
+            devices_skipped_connected = []
+
+            for device_id, info in self.devices.items():
+                if info.get("ip_address"):
+                    wireless_id = f"{info['ip_address']}:5555"
+                    if wireless_id not in already_connected:
+                        devices_to_reconnect.append(device_id)
+                    else:
+                        devices_skipped_connected.append((info.get("nickname", device_id), wireless_id))
                 else:
-                    self.devices[device_id]["last_seen"] = datetime.now().strftime('%Y-%m-%d')
-                    # Si pas de groupe assigné, détecter le modèle
-                    if not self.devices[device_id].get("group") or self.devices[device_id].get("group") == "Non assigné":
-                        detected_model = self.detect_device_model(device_id)
-                        self.devices[device_id]["group"] = detected_model
-                        self.log_message(f"Modèle détecté pour {self.devices[device_id]['nickname']}: {detected_model}")
-
-                # Si pas d'IP sauvegardée, activer wireless automatiquement
-                if not self.devices[device_id].get("ip_address"):
-                    self.log_message(f"Nouveau device USB détecté: {self.devices[device_id]['nickname']}")
-                    self.log_message("Activation wireless automatique...")
-                    self.setup_wireless(device_id)
+                    devices_skipped_no_ip.append(info.get("nickname", device_id))
+
+            # Log skipped devices
+            if devices_skipped_connected:
+                self.log_message(f"Skipped (already connected): {len(devices_skipped_connected)}")
+                for name, ip in devices_skipped_connected:
+                    self.log_message(f"  - {name} ({ip})")
+            if devices_skipped_no_ip:
+                self.log_message(f"Skipped (no IP saved): {len(devices_skipped_no_ip)}")
+                for name in devices_skipped_no_ip:
+                    self.log_message(f"  - {name}")
+
+            if devices_to_reconnect:
+                self.log_message(f"Tentative reconnexion de {len(devices_to_reconnect)} device(s) en parallèle...")
+                results = self.reconnect_saved_ips(devices_to_reconnect)
+                # IP changées (DHCP): balayage du sous-réseau plutôt que rebrancher en USB
+                if any(state != RECONNECT_CONNECTED for state in results.values()):
+                    self.rediscover_moved_devices()
+
+            # 3. Scanner tous les devices (USB + WiFi)
+            current_devices = {device_id: state for device_id, state in self.adb_manager.get_device_states().items()
+                               if state in ("device", "unauthorized", "offline")}
+
+            # 4. Chaque casque USB autorisé suit son propre pipeline, en parallèle;
+            # la liste est rafraîchie dès qu'un casque a terminé
+            usb_devices = [device_id for device_id, status in current_devices.items()
+                           if status == "device" and not self.is_wireless_device(device_id)]
+            for result in self.fleet.submit(usb_devices, self._scan_usb_device):
+                if not result.ok:
+                    self.log_message(f"✗ Scan failed on {result.device_id}: {result.error}")
+                self.root.after(0, self.refresh_devices_list)
 
-        self.save_devices()
-        self.refresh_devices_list()
+            self.save_devices()
+            self.root.after(0, self.refresh_devices_list)
 
-        # Compter les devices connectés
-        usb_count = sum(1 for d in current_devices if not self.is_wireless_device(d))
-        wifi_count = sum(1 for d in current_devices if self.is_wireless_device(d))
-        self.log_message(f"Found {len(current_devices)} device(s): {usb_count} USB, {wifi_count} WiFi")
+            # Compter les devices connectés
+            current_devices = {device_id: state for device_id, state in self.adb_manager.get_device_states().items()
+                               if state in ("device", "unauthorized", "offline")}
+            usb_count = sum(1 for d in current_devices if not self.is_wireless_device(d))
+            wifi_count = sum(1 for d in current_devices if self.is_wireless_device(d))
+            self.log_message(f"Found {len(current_devices)} device(s): {usb_count} USB, {wifi_count} WiFi")
+            stats = self.adb_manager.cache.stats()
+            self.log_message(f"Device cache: {stats['hits']} hit(s), {stats['misses']} miss(es), "
+                             f"{stats['entries']} entry(ies)")
+        finally:
+            self._scan_running = False
+
+    def _scan_usb_device(self, device_id):
+        """Un casque USB du scan: empreinte, enregistrement puis activation wireless si besoin"""
+        info = self.devices.get(device_id)
+        is_new_device = info is None
+        info = info or {}
+        needs_model = is_new_device or not info.get("group") or info.get("group") == "Non assigné"
+
+        # Une seule empreinte (modèle, IP, MAC) si le modèle ou l'IP manque
+        fingerprint = None
+        if needs_model or not info.get("ip_address"):
+            fingerprint = self.adb_manager.probe_device(device_id)
+        detected_model = fingerprint.model if fingerprint else "Unknown"
+
+        if is_new_device:
+            self.log_message(f"Modèle détecté ({device_id}): {detected_model}")
+
+            self.devices.add(device_id,
+                             last_seen=datetime.now().strftime('%Y-%m-%d'),
+                             group=detected_model,
+                             mac_address=fingerprint.mac if fingerprint else None)
+        else:
+            self.devices.update(device_id, last_seen=datetime.now().strftime('%Y-%m-%d'))
+            # Si pas de groupe assigné, utiliser le modèle détecté
+            if needs_model:
+                self.devices.update(device_id, group=detected_model)
+                self.log_message(f"Modèle détecté pour {info['nickname']}: {detected_model}")
+
+        # Si pas d'IP sauvegardée, activer wireless automatiquement (sauvegarde en fin de scan)
+        info = self.devices[device_id]
+        if not info.get("ip_address"):
+            self.log_message(f"Nouveau device USB détecté: {info['nickname']}")
+            self.log_message("Activation wireless automatique...")
+            self.setup_wireless(device_id, ip=fingerprint.ip if fingerprint else None, save=False)
 
     def toggle_usb_detection(self):
         """Active/désactive la détection USB automatique"""
@@ -1282,168 +1527,143 @@ class USBVRManager:
             self.usb_detection_thread.start()
 
     def usb_detection_loop(self):
-        """Boucle de détection des appareils USB avec logique 'wait for disconnect'"""
-        known_macs = set()
-        current_usb_mac = None  # Track the currently connected USB device's MAC
+        """Boucle de détection: chaque casque branché en USB entre dans la file d'intégration"""
+        seen_usb_devices = set()
 
-        # Récupérer les MAC des appareils déjà connus
-        for device_id, info in self.devices.items():
-            mac = info.get("mac_address", "")
-            if mac:
-                known_macs.add(mac.lower())
+        known_count = len(self.devices.macs())
+        self.root.after(0, lambda: self.log_message(f"USB Detection: {known_count} known device(s) by MAC"))
 
-        self.root.after(0, lambda: self.log_message(f"USB Detection: {len(known_macs)} known device(s) by MAC"))
+        # Réveillé par les événements du serveur adb plutôt que par le seul délai de scrutation
+        waiter = self.adb_manager.device_waiter()
 
         while self.usb_detection_active:
             try:
-                # Get USB devices only (not WiFi connections)
-                stdout, stderr, rc = self.run_adb_command(["devices"], retry_wireless=False)
-                usb_devices = []
-
-                if rc == 0:
-                    for line in stdout.strip().split('\n')[1:]:
-                        if '\tdevice' in line:
-                            device_id = line.split('\t')[0]
-                            # Only USB devices (no ':' in ID)
-                            if ':' not in device_id:
-                                usb_devices.append(device_id)
-
-                if usb_devices:
-                    # Only process ONE USB device (the first one)
-                    device_id = usb_devices[0]
-                    mac = self.get_device_mac(device_id)
-
-                    if mac:
-                        mac_lower = mac.lower()
-
-                        if current_usb_mac is None:
-                            # First detection or after disconnect
-                            current_usb_mac = mac_lower
-
-                            if mac_lower in known_macs:
-                                self.root.after(0, lambda m=mac: self.log_message(f"Known device reconnected (MAC: {m}), re-configuring..."))
-                            else:
-                                self.root.after(0, lambda m=mac: self.log_message(f"NEW device detected (MAC: {m})"))
-
-                            # Configure the device
-                            self.root.after(0, lambda d=device_id, m=mac: self.handle_new_usb_device(d, m))
-                            known_macs.add(mac_lower)
-
-                        elif current_usb_mac != mac_lower:
-                            # Different device connected
-                            self.root.after(0, lambda m=mac: self.log_message(f"Different device detected (MAC: {m})"))
-                            current_usb_mac = mac_lower
-                            self.root.after(0, lambda d=device_id, m=mac: self.handle_new_usb_device(d, m))
-                            known_macs.add(mac_lower)
-                        # If same device still connected (current_usb_mac == mac_lower) → wait
+                # Get USB devices only (not WiFi connections, no ':' in ID)
+                usb_devices = {device_id for device_id, state in self.adb_manager.get_device_states().items()
+                               if state == "device" and ':' not in device_id}
 
-                else:
-                    # No USB device connected - reset tracker
-                    if current_usb_mac is not None:
-                        self.root.after(0, lambda: self.log_message("USB device disconnected, ready for next device..."))
-                        self.root.after(0, lambda: self.detection_status_label.config(
-                            text="USB Detection: ON - Waiting for device...", fg="green"))
-                        current_usb_mac = None
+                # Nouveaux branchements seulement: un casque resté branché n'est pas reconfiguré
+                for device_id in sorted(usb_devices - seen_usb_devices):
+                    self.onboarding.submit(device_id)
+
+                if seen_usb_devices and not usb_devices:
+                    self.log_message("USB devices disconnected, ready for next devices...")
+                    self.root.after(0, self._update_detection_status)
+                seen_usb_devices = usb_devices
 
-                time.sleep(3)  # Poll every 3 seconds
+                waiter.wait(3)  # Next device event, or poll every 3 seconds
 
             except Exception as e:
-                self.root.after(0, lambda err=str(e): self.log_message(f"Detection error: {err}"))
+                self.log_message(f"Detection error: {e}")
                 time.sleep(5)
 
-    def handle_new_usb_device(self, device_id, mac):
-        """Gère un nouvel appareil USB détecté"""
-        self.log_message(f"Configuring {device_id}...")
-        self.detection_status_label.config(text=f"USB Detection: Configuring {device_id[:8]}...", fg="orange")
+        waiter.close()
 
-        # Récupérer le modèle
-        model = self.detect_device_model(device_id)
-        self.log_message(f"  Model: {model}")
+    def _update_detection_status(self):
+        """Libellé de détection USB selon les casques en cours d'intégration"""
+        if not self.usb_detection_active:
+            return
+        active = self.onboarding.active()
+        if active:
+            self.detection_status_label.config(text=f"USB Detection: Configuring {active} device(s)...", fg="orange")
+        else:
+            self.detection_status_label.config(text="USB Detection: ON - Waiting for device...", fg="green")
 
-        device_info = {
-            'device_id': device_id,
-            'mac': mac,
-            'model': model
-        }
+    def _on_onboarding_update(self, job):
+        """Étape franchie par un casque de la file d'intégration (thread de travail)"""
+        if job.state == ONBOARD_QUEUED:
+            self.log_message(f"Configuring {job.serial}...")
+        elif job.state == ONBOARD_TCPIP:
+            known_id, _ = self.devices.find_by_mac(job.mac)
+            if known_id:
+                self.log_message(f"Known device reconnected (MAC: {job.mac}), re-configuring... Model: {job.model}")
+            else:
+                self.log_message(f"NEW device detected (MAC: {job.mac}) Model: {job.model}")
+        elif job.state == ONBOARD_READY:
+            self.log_message(f"✓ {job.serial} ready on WiFi ({job.wireless_id})")
+        elif job.state == ONBOARD_FAILED:
+            self.log_message(f"✗ {job.serial}: {job.error}")
+        self.root.after(0, self._update_detection_status)
+
+    def _on_onboarding_batch(self, ready, failed):
+        """Plus aucun casque en cours: un seul tableau pour nommer tout le lot"""
+        self.log_message(f"Onboarding finished: {len(ready)} ready, {len(failed)} failed")
+        if ready:
+            self.root.after(0, lambda: self.ask_onboarding_nicknames(ready, failed))
+
+    def ask_onboarding_nicknames(self, jobs, failed):
+        """Tableau non modal des noms, pré-rempli avec les noms déjà connus (par MAC)"""
+        default_names = {}
+        for job in jobs:
+            _, info = self.devices.find_by_mac(job.mac)
+            if info:
+                default_names[job.serial] = info["nickname"]
+        NicknameTable(self.root, jobs, lambda nicknames: self.save_onboarded_devices(jobs, nicknames),
+                      default_names, failed)
+
+    def save_onboarded_devices(self, jobs, nicknames):
+        """Enregistre un lot de casques intégrés avec leurs noms"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        for job in jobs:
+            self.devices.add(job.serial,
+                             nickname=nicknames[job.serial],
+                             last_seen=today,
+                             ip_address=job.ip,
+                             group=job.model,
+                             mac_address=job.mac)
+            self.log_message(f"Device configured: {nicknames[job.serial]} (IP: {job.ip}:5555)")
+        self.save_devices()
+        self.refresh_devices_list()
 
-        # Open setup dialog
-        setup_dialog = DeviceSetupDialog(self.root, device_info, self.adb_manager, self.log_message)
-        self.root.wait_window(setup_dialog.dialog)
-
-        if setup_dialog.result:
-            result = setup_dialog.result
-            # Save device with new device_id (could be different from before if reconnected)
-            self.devices[device_id] = {
-                "nickname": result.get('nickname', f"Device_{device_id[:8]}"),
-                "last_seen": datetime.now().strftime('%Y-%m-%d'),
-                "ip_address": result.get('ip', ''),
-                "group": model,
-                "mac_address": mac
-            }
-            self.save_devices()
-            self.log_message(f"Device configured: {result.get('nickname')} (IP: {result.get('ip')}:5555)")
-            self.refresh_devices_list()
-        else:
-            self.log_message("Configuration cancelled or failed")
+    def show_adb_stats(self):
+        """Fenêtre listant les commandes ADB et les casques les plus lents"""
+        window = tk.Toplevel(self.root)
+        window.title("ADB Stats")
+        window.geometry("760x480")
+
+        text = tk.Text(window, font=("Courier", 9), wrap="none")
+        text.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+
+        def refresh():
+            text.config(state="normal")
+            text.delete("1.0", tk.END)
+            text.insert(tk.END, self.adb_manager.tracer.format_summary(limit=15, device_name=self.get_device_nickname))
+            if self.adb_manager.tracer.filepath:
+                text.insert(tk.END, f"Trace complète: {self.adb_manager.tracer.filepath}\n")
+            text.config(state="disabled")
 
-        self.detection_status_label.config(text="USB Detection: ON - Waiting for device...", fg="green")
+        tk.Button(window, text="Refresh", command=refresh).pack(pady=(0, 10))
+        refresh()
 
     def reconnect_all_wifi(self):
         """Tente de reconnecter tous les devices WiFi connus"""
         self.log_message("Reconnecting all WiFi devices...")
 
         def do_reconnect():
-            count_ok = 0
-            count_fail = 0
-            for device_id, info in self.devices.items():
-                ip = info.get("ip_address")
-                if ip:
-                    nickname = info.get("nickname", device_id)
-                    if self.try_reconnect_wireless(device_id, timeout=5):
-                        self.root.after(0, lambda n=nickname: self.log_message(f"  OK: {n}"))
-                        count_ok += 1
-                    else:
-                        self.root.after(0, lambda n=nickname: self.log_message(f"  FAILED: {n}"))
-                        count_fail += 1
-
-            self.root.after(0, lambda: self.log_message(f"Reconnection done: {count_ok} OK, {count_fail} failed"))
+            results = self.reconnect_saved_ips(list(self.devices))
+            count_ok = sum(1 for state in results.values() if state == RECONNECT_CONNECTED)
+            count_fail = len(results) - count_ok
+            self.log_message(f"Reconnection done: {count_ok} OK, {count_fail} failed")
+            if count_fail:
+                self.rediscover_moved_devices()
             self.root.after(0, self.refresh_devices_list)
 
         thread = threading.Thread(target=do_reconnect, daemon=True)
         thread.start()
 
     def refresh_devices_list(self):
-        """Rafraîchit la liste des devices dans l'onglet scan"""
-        self.devices_listbox.delete(0, tk.END)
-
-        # Vérifier quels devices sont actuellement connectés
-        stdout, stderr, returncode = self.run_adb_command(["devices"], retry_wireless=False)
-        current_devices = {}
-
-        if returncode == 0:
-            lines = stdout.strip().split('\n')[1:]
-            for line in lines:
-                if '\tdevice' in line or '\tunauthorized' in line or '\toffline' in line:
-                    parts = line.split('\t')
-                    if len(parts) >= 2:
-                        device_id = parts[0]
-                        status = parts[1].upper()
-                        current_devices[device_id] = status
+        """Rafraîchit la liste des devices dans l'onglet scan (seules les lignes modifiées sont réécrites)"""
+        # Devices actuellement connectés (état partagé en mémoire, sans relancer adb devices)
+        current_devices = {device_id: state.upper()
+                           for device_id, state in self.device_states.states("device", "unauthorized", "offline").items()}
 
         # Track which connected devices we've displayed
         displayed_connected = set()
+        rows = []  # [(texte, couleur)]
 
         # Créer une liste triée par nickname (devices enregistrés)
         sorted_devices = sorted(self.devices.items(), key=lambda x: x[1]["nickname"].lower())
 
-        # Collecter les device_ids déjà couverts par self.devices (USB serial + wireless IDs)
-        known_ids = set()
-        for device_id, info in self.devices.items():
-            known_ids.add(device_id)
-            ip_address = info.get("ip_address", "")
-            if ip_address:
-                known_ids.add(f"{ip_address}:5555")
-
         for device_id, info in sorted_devices:
             # Vérifier si connecté en USB ou WiFi
             ip_address = info.get("ip_address", "")
@@ -1472,17 +1692,17 @@ class USBVRManager:
                 status += " (Accept USB debugging on headset)"
 
             group = info.get("group", "Non assigné")
-            display_text = f"{info['nickname']} ({display_id}) [{group}] {connection_type} - {status}"
-            self.devices_listbox.insert(tk.END, display_text)
+            breaker_text = self.adb_manager.breakers.describe(display_id)
+            display_text = f"{info['nickname']} ({display_id}) [{group}] {connection_type} - {status}{breaker_text}"
 
             # Définir les couleurs
-            index = self.devices_listbox.size() - 1
-            if status.startswith("OFFLINE"):
-                self.devices_listbox.itemconfig(index, fg="red")
+            if status.startswith("OFFLINE") or breaker_text:
+                color = "red"
             elif status.startswith("UNAUTHORIZED"):
-                self.devices_listbox.itemconfig(index, fg="orange")
-            elif status == "DEVICE":
-                self.devices_listbox.itemconfig(index, fg="green")
+                color = "orange"
+            else:
+                color = "green"
+            rows.append((display_text, color))
 
         # Afficher les devices WiFi connectés mais non enregistrés
         for device_id, status in current_devices.items():
@@ -1497,30 +1717,24 @@ class USBVRManager:
                     status_display = status
 
                 display_text = f"New device ({device_id}) [Non enregistré] {connection_type} - {status_display}"
-                self.devices_listbox.insert(tk.END, display_text)
-
-                # Définir les couleurs
-                index = self.devices_listbox.size() - 1
-                if status == "OFFLINE":
-                    self.devices_listbox.itemconfig(index, fg="red")
-                elif status == "UNAUTHORIZED":
-                    self.devices_listbox.itemconfig(index, fg="orange")
-                elif status == "DEVICE":
-                    self.devices_listbox.itemconfig(index, fg="green")
+                color = {"OFFLINE": "red", "UNAUTHORIZED": "orange"}.get(status, "green")
+                rows.append((display_text, color))
+
+        # Réécrire uniquement les lignes qui ont changé (la sélection des autres est conservée)
+        for index, (display_text, color) in enumerate(rows):
+            if index < self.devices_listbox.size():
+                if (self.devices_listbox.get(index) == display_text
+                        and self.devices_listbox.itemcget(index, "fg") == color):
+                    continue
+                self.devices_listbox.delete(index)
+            self.devices_listbox.insert(index, display_text)
+            self.devices_listbox.itemconfig(index, fg=color)
+        if self.devices_listbox.size() > len(rows):
+            self.devices_listbox.delete(len(rows), tk.END)
     
     def find_device_by_display_id(self, display_id):
         """Trouve le device_id original à partir de l'ID affiché (peut être IP:port)"""
-        # Si c'est directement dans devices, retourner tel quel
-        if display_id in self.devices:
-            return display_id
-
-        # Sinon, chercher par IP wireless
-        for device_id, info in self.devices.items():
-            ip = info.get("ip_address", "")
-            if ip and f"{ip}:5555" == display_id:
-                return device_id
-
-        return None
+        return self.devices.resolve(display_id)
 
     def set_nickname(self):
         """Définit un nickname pour le device sélectionné"""
@@ -1543,7 +1757,7 @@ class USBVRManager:
         new_nickname = simpledialog.askstring("Set nickname", f"Enter nickname for device {device_id}:", initialvalue=current_nickname)
 
         if new_nickname:
-            self.devices[device_id]["nickname"] = new_nickname
+            self.devices.update(device_id, nickname=new_nickname)
             self.save_devices()
             self.refresh_devices_list()
             self.log_message(f"Device {device_id} renamed to '{new_nickname}'")
@@ -1571,8 +1785,9 @@ class USBVRManager:
         dialog.geometry("350x200")
         dialog.grab_set()
 
-        current_group = self.devices[device_id].get("group", "Non assigné")
-        nickname = self.devices[device_id]["nickname"]
+        info = self.devices[device_id]
+        current_group = info.get("group", "Non assigné")
+        nickname = info["nickname"]
 
         tk.Label(dialog, text=f"Set group for: {nickname}", font=("Arial", 10, "bold")).pack(pady=10)
 
@@ -1596,7 +1811,7 @@ class USBVRManager:
             selected_group = new_group if new_group else group_var.get()
 
             if selected_group:
-                self.devices[device_id]["group"] = selected_group
+                self.devices.update(device_id, group=selected_group)
                 self.save_devices()
                 self.refresh_devices_list()
                 self.log_message(f"Device {nickname} assigned to group '{selected_group}'")
@@ -1646,7 +1861,7 @@ class USBVRManager:
             return
 
         # Supprimer le device de la liste
-        del self.devices[device_id]
+        self.devices.remove(device_id)
         self.save_devices()
         self.refresh_devices_list()
         self.log_message(f"Device '{nickname}' ({device_id}) removed from list")
@@ -1664,8 +1879,8 @@ class USBVRManager:
         # Trouver le device_id et son IP
         device_id = self.find_device_by_display_id(display_id)
 
-        if device_id and device_id in self.devices:
-            info = self.devices[device_id]
+        info = self.devices.get(device_id) if device_id else None
+        if info:
             ip = info.get("ip_address")
             nickname = info.get("nickname", device_id)
 
@@ -1701,91 +1916,42 @@ class USBVRManager:
         for file in files:
             self.apk_listbox.insert(tk.END, file)
     
-    def refresh_install_devices(self):
-        """Rafraîchit la liste des devices pour l'installation"""
-        # Nettoyer les anciens checkboxes
-        for widget in self.install_devices_frame.winfo_children():
-            widget.destroy()
+    def grouped_device_rows(self, states, label):
+        """Casques connectés regroupés: [(groupe, [(device_id, texte, sélectionnable)])] triés par groupe
 
-        self.device_checkboxes.clear()
-        self.device_groups = {}  # Pour stocker le groupe de chaque device
+        label(device_id, nickname, group, status) -> texte de la ligne.
+        """
+        devices_by_group = {}
+        for device_id, status in states.items():
+            # Trouver le groupe (par ID USB ou par IP)
+            _, info = self.devices.lookup(device_id)
+            info = info or {}
+            group = info.get("group", "Non assigné")
+            nickname = info.get("nickname", f"Device_{device_id[:8]}")
+            devices_by_group.setdefault(group, []).append(
+                (device_id, label(device_id, nickname, group, status), status == "device"))
+        return sorted(devices_by_group.items())
 
+    def device_status_text(self, device_id, status):
+        """Suffixe d'état d'une ligne: état adb s'il n'est pas 'device', puis disjoncteur"""
+        status_text = f" - {status.upper()}" if status != "device" else ""
+        return status_text + self.adb_manager.breakers.describe(device_id)
+
+    def refresh_install_devices(self):
+        """Rafraîchit la liste des devices pour l'installation (depuis l'état en mémoire)"""
         # Mettre à jour le dropdown des groupes
         groups = ["Tous"] + self.get_all_groups()
         self.install_group_combo["values"] = groups
 
-        # Obtenir les devices connectés
-        stdout, stderr, returncode = self.run_adb_command(["devices"])
-
-        if returncode != 0:
-            self.log_message(f"Error getting devices: {stderr}")
-            return
-
-        lines = stdout.strip().split('\n')[1:]
-
-        # Organiser les devices par groupe
-        devices_by_group = {}
-        for line in lines:
-            if '\tdevice' in line or '\tunauthorized' in line or '\toffline' in line:
-                parts = line.split('\t')
-                if len(parts) >= 2:
-                    device_id = parts[0]
-                    status = parts[1]
-
-                    # Trouver le groupe (chercher par ID USB ou par IP)
-                    group = "Non assigné"
-                    nickname = f"Device_{device_id[:8]}"
-                    for did, info in self.devices.items():
-                        ip = info.get("ip_address", "")
-                        if did == device_id or (ip and f"{ip}:5555" == device_id):
-                            group = info.get("group", "Non assigné")
-                            nickname = info.get("nickname", nickname)
-                            break
-
-                    if group not in devices_by_group:
-                        devices_by_group[group] = []
-                    devices_by_group[group].append((device_id, nickname, status))
+        states = self.device_states.states("device", "unauthorized", "offline")
+        rows = self.grouped_device_rows(
+            states, lambda device_id, nickname, group, status:
+            f"{nickname} ({device_id}){self.device_status_text(device_id, status)}")
 
         # Afficher les devices groupés avec accordéons
-        for group in sorted(devices_by_group.keys()):
-            device_count = len(devices_by_group[group])
-            is_collapsed = self.group_collapsed.get(group, False)
-
-            # Frame conteneur pour le groupe
-            group_frame = tk.Frame(self.install_devices_frame)
-            group_frame.pack(fill="x", anchor="w", pady=(5, 0))
-
-            # Bouton accordéon (header cliquable)
-            arrow = "▶" if is_collapsed else "▼"
-            header_btn = tk.Button(
-                group_frame,
-                text=f"{arrow} {group} ({device_count} devices)",
-                font=("Arial", 9, "bold"),
-                fg="blue",
-                bd=0,
-                cursor="hand2",
-                anchor="w",
-                command=lambda g=group: self.toggle_group_collapse(g)
-            )
-            header_btn.pack(fill="x", anchor="w")
-
-            # Frame pour les devices (caché si replié)
-            devices_frame = tk.Frame(group_frame)
-            if not is_collapsed:
-                devices_frame.pack(fill="x", anchor="w", padx=(20, 0))
-
-            for device_id, nickname, status in devices_by_group[group]:
-                var = tk.BooleanVar()
-                status_text = f" - {status.upper()}" if status != "device" else ""
-                checkbox = tk.Checkbutton(devices_frame,
-                                        text=f"{nickname} ({device_id}){status_text}",
-                                        variable=var,
-                                        state="disabled" if status != "device" else "normal")
-                checkbox.pack(anchor="w")
-
-                if status == "device":
-                    self.device_checkboxes[device_id] = var
-                    self.device_groups[device_id] = group
+        self.install_list.render([
+            (group, f"{'▶' if self.group_collapsed.get(group, False) else '▼'} {group} ({len(devices)} devices)", devices)
+            for group, devices in rows])
 
     def select_all_devices(self):
         """Sélectionne tous les devices"""
@@ -1809,18 +1975,10 @@ class USBVRManager:
                 var.set(False)
 
     def toggle_group_collapse(self, group):
-        """Toggle l'état replié/déplié d'un groupe dans Install APK"""
-        # Sauvegarder les devices sélectionnés avant refresh
-        selected_devices = [d for d, var in self.device_checkboxes.items() if var.get()]
-
+        """Toggle l'état replié/déplié d'un groupe dans Install APK (sélections conservées)"""
         self.group_collapsed[group] = not self.group_collapsed.get(group, False)
         self.refresh_install_devices()
 
-        # Restaurer les sélections
-        for device_id in selected_devices:
-            if device_id in self.device_checkboxes:
-                self.device_checkboxes[device_id].set(True)
-
     def install_apks(self):
         """Installe les APK sur les devices sélectionnés"""
         # Vérifier qu'il y a des APK et des devices sélectionnés
@@ -1845,177 +2003,188 @@ class USBVRManager:
         thread.start()
     
     def _install_apks_thread(self, selected_devices):
-        """Thread pour l'installation des APK (push → vérification taille → pm install)"""
+        """Thread pour l'installation des APK: un worker par casque, bilan en tableau"""
         apk_files = [self.apk_listbox.get(i) for i in range(self.apk_listbox.size())]
 
-        total_operations = len(apk_files) * len(selected_devices)
-        current_operation = 0
-
-        for device_id in selected_devices:
-            device_name = self.devices.get(device_id, {}).get("nickname", device_id)
-            self.log_message(f"Starting installation on {device_name}")
-
-            for apk_file in apk_files:
-                current_operation += 1
-                apk_name = os.path.basename(apk_file)
-                remote_path = f"/data/local/tmp/{apk_name}"
-
-                # Taille locale
-                local_size = os.path.getsize(apk_file)
-                self.log_message(f"[{current_operation}/{total_operations}] Transfert de {apk_name} ({local_size // 1024 // 1024} Mo) vers {device_name}...")
-
-                # Calculer un timeout selon la taille : 60s de base + 1s par Mo (min 120s)
-                size_mb = local_size / (1024 * 1024)
-                push_timeout = max(120, 60 + int(size_mb))
-
-                # Étape 1 : push
-                stdout, stderr, returncode = self.run_adb_command(
-                    ["push", apk_file, remote_path], device_id, timeout=push_timeout)
-
-                if returncode != 0:
-                    self.log_message(f"✗ Échec du transfert de {apk_name} vers {device_name}: {stderr}")
-                    continue
-
-                # Étape 2 : vérifier que la taille du fichier distant correspond
-                stdout, stderr, rc = self.run_adb_command(
-                    ["shell", "stat", "-c", "%s", remote_path], device_id)
-                if rc != 0:
-                    self.log_message(f"✗ Impossible de vérifier la taille distante de {apk_name} sur {device_name}: {stderr}")
-                    self.run_adb_command(["shell", "rm", "-f", remote_path], device_id)
-                    continue
-
-                remote_size = int(stdout.strip()) if stdout.strip().isdigit() else -1
-                if remote_size != local_size:
-                    self.log_message(f"✗ Transfert incomplet de {apk_name} sur {device_name}: "
-                                     f"{remote_size} octets reçus / {local_size} attendus — installation annulée")
-                    self.run_adb_command(["shell", "rm", "-f", remote_path], device_id)
-                    continue
-
-                self.log_message(f"Transfert OK ({remote_size} octets). Installation en cours...")
-
-                # Étape 3 : installer depuis le casque
-                stdout, stderr, returncode = self.run_adb_command(
-                    ["shell", "pm", "install", "-r", remote_path], device_id, timeout=120)
+        # Installation en flux (session pm) par défaut, push + pm install en repli;
+        # versions déjà installées comparées avant tout transfert
+        skip_current = self.skip_current_var.get()
+        engine = InstallEngine(self.push_apk, self.pm_install, self.stream_apk, self.commit_apk,
+                               max_usb=self.install_limits["install_usb"],
+                               max_wifi=self.install_limits["install_wifi"], executor=self.fleet,
+                               inspect=self.apk_inspector.inspect if skip_current else None,
+                               installed_versions=self.get_package_versions if skip_current else None)
+        if skip_current:
+            self.log_message("Analyse des APK (package, versionCode, signature)...")
+        tasks = engine.plan(selected_devices, apk_files)
+        for task in tasks[:len(tasks) // len(selected_devices)]:
+            if task.info:
+                self.log_message(f"{task.apk_name}: {task.info.package} versionCode {task.info.version_code} "
+                                 f"({task.info.version_name}), certificat {(task.info.signer or '?')[:16]}")
+        summary_ready = threading.Event()
+        summaries = []
+
+        def open_summary():
+            summaries.append(InstallSummary(self.root, tasks, self.get_device_nickname,
+                                            on_retry=lambda failed: start(failed)))
+            summary_ready.set()
+
+        def on_update(task):
+            if task.finished:
+                device_name = self.devices.nickname(task.device_id, task.device_id)
+                if task.state == INSTALL_OK:
+                    self.log_message(f"✓ {task.apk_name} installé avec succès sur {device_name}")
+                elif task.state == INSTALL_SKIPPED:
+                    self.log_message(f"= {task.apk_name} déjà à jour sur {device_name} "
+                                     f"(versionCode {task.info.version_code})")
+                else:
+                    self.log_message(f"✗ {task.apk_name} sur {device_name}: {task.error}")
+            if summaries:
+                self.root.after(0, lambda: summaries[0].update(task))
+
+        def run(batch):
+            # Chaque APK lu une fois sur le disque pour tous les casques, même par vagues
+            with self.adb_manager.fanout.planned(Counter(path for task in batch for path in task.apk_paths)):
+                engine.run(batch)
+            ok, skipped, failed, total = summarize(tasks)
+            self.log_message(f"Installation process completed! {ok}/{total} installés, "
+                             f"{skipped} déjà à jour, {failed} échecs")
+            self.log_fanout_stats()
+            self.root.after(0, summaries[0].finish)
+
+        def start(batch):
+            # Relance manuelle depuis le tableau (thread Tk): les échecs seulement
+            self.log_message(f"Nouvelle tentative: {len(batch)} installation(s) en échec")
+            threading.Thread(target=run, args=(batch,), daemon=True).start()
+
+        engine.on_update = on_update
+        self.root.after(0, open_summary)
+        summary_ready.wait()
+        self.log_message(f"Installation de {len(apk_files)} APK sur {len(selected_devices)} casque(s)...")
+        run(tasks)
+
+    def log_fanout_stats(self):
+        """Octets lus sur le disque / envoyés aux casques depuis le dernier transfert"""
+        disk, served = self.adb_manager.fanout.stats()
+        if served:
+            self.log_message(f"Lu sur disque: {disk / 1048576:.0f} Mo pour {served / 1048576:.0f} Mo envoyés")
+
+    def get_package_versions(self, device_id):
+        """{package: versionCode} des apps installées, en une seule commande"""
+        stdout, _, returncode = self.run_adb_command(
+            ["shell", "pm", "list", "packages", "--show-versioncode"], device_id)
+        return parse_package_versions(stdout) if returncode == 0 else {}
+
+    def stream_apk(self, task):
+        """Écrit l'APK (et ses splits) en flux dans une session pm, sans copie sur le casque"""
+        device_id = task.device_id
+        if ":" in device_id and not self.adb_manager.breakers.allow(device_id):
+            return f"{device_id} injoignable (nouvel essai dans {self.adb_manager.breakers.retry_in(device_id)}s)"
+        stream_start = time.monotonic()
+        task.session = self.adb_manager.stream_apks(
+            device_id, task.apk_paths, timeout=self.throughput.timeout_for(device_id, task.size))
+        if task.session is None:
+            return STREAM_UNAVAILABLE
+        self.throughput.record(device_id, task.size, time.monotonic() - stream_start)
+        return None
 
-                # Étape 4 : nettoyage du fichier temporaire
-                self.run_adb_command(["shell", "rm", "-f", remote_path], device_id)
+    def commit_apk(self, task):
+        """Valide la session pm ouverte par stream_apk, retourne une erreur ou None"""
+        stdout, stderr, returncode = self.adb_manager.commit_session(task.device_id, task.session)
+        if returncode == 0 and "Success" in stdout:
+            return None
+        return stdout.strip() or stderr.strip() or "install-commit a échoué"
+
+    def push_apk(self, task):
+        """Transfère l'APK (et ses splits) et vérifie leur taille sur le casque, retourne une erreur ou None"""
+        device_id = task.device_id
+        for apk_path, remote_path in zip(task.apk_paths, task.remote_paths):
+            size = os.path.getsize(apk_path)
+            # Timeout selon le débit mesuré de ce casque (60s + 1s par Mo sans mesure)
+            push_timeout = self.throughput.timeout_for(device_id, size)
+
+            push_start = time.monotonic()
+            _, stderr, returncode = self.run_adb_command(
+                ["push", apk_path, remote_path], device_id, timeout=push_timeout)
+            if returncode != 0:
+                self.remove_remote_apks(task)
+                return f"Échec du transfert: {stderr.strip()}"
+            self.throughput.record(device_id, size, time.monotonic() - push_start)
+
+        # Vérifier que la taille des fichiers distants correspond (STAT sync)
+        remote_sizes = self.adb_manager.stat_files(device_id, task.remote_paths)
+        for apk_path, remote_path in zip(task.apk_paths, task.remote_paths):
+            remote_size = remote_sizes.get(remote_path)
+            if remote_size == os.path.getsize(apk_path):
+                continue
+            self.remove_remote_apks(task)
+            if remote_size is None:
+                return "Impossible de vérifier la taille distante"
+            return f"Transfert incomplet: {remote_size} octets reçus / {os.path.getsize(apk_path)} attendus"
+        return None
 
-                if returncode == 0 and "Success" in stdout:
-                    self.log_message(f"✓ {apk_name} installé avec succès sur {device_name}")
+    def pm_install(self, task):
+        """Installe les APK transférés puis supprime les fichiers temporaires, retourne une erreur ou None"""
+        device_id = task.device_id
+        if len(task.remote_paths) == 1:
+            stdout, stderr, returncode = self.run_adb_command(
+                ["shell", "pm", "install", "-r", task.remote_paths[0]], device_id, timeout=120)
+        else:
+            # Splits: session pm alimentée par les fichiers déjà transférés
+            stdout, stderr, returncode = self.run_adb_command(["shell", "pm", "install-create", "-r"], device_id)
+            match = re.search(r'\[(\d+)\]', stdout)
+            if match:
+                session = match.group(1)
+                for index, remote_path in enumerate(task.remote_paths):
+                    stdout, stderr, returncode = self.run_adb_command(
+                        ["shell", "pm", "install-write", session, f"{index}_split", remote_path], device_id)
+                    if "Success" not in stdout:
+                        self.run_adb_command(["shell", "pm", "install-abandon", session], device_id)
+                        break
                 else:
-                    error = stdout.strip() or stderr.strip()
-                    self.log_message(f"✗ Échec installation de {apk_name} sur {device_name}: {error}")
+                    stdout, stderr, returncode = self.run_adb_command(
+                        ["shell", "pm", "install-commit", session], device_id, timeout=120)
+        self.remove_remote_apks(task)
+        if returncode == 0 and "Success" in stdout:
+            return None
+        return stdout.strip() or stderr.strip() or "pm install a échoué"
 
-        self.log_message("Installation process completed!")
+    def remove_remote_apks(self, task):
+        """Supprime les fichiers temporaires d'un transfert"""
+        self.run_adb_command(["shell", "rm", "-f"] + task.remote_paths, task.device_id)
 
     # ==================== CASTING METHODS ====================
 
     def refresh_casting_devices(self):
-        """Rafraîchit la liste des devices pour le casting"""
-        # Nettoyer les anciens checkboxes
-        for widget in self.casting_devices_frame.winfo_children():
-            widget.destroy()
-
-        self.casting_checkboxes.clear()
-        self.casting_device_groups.clear()
-
+        """Rafraîchit la liste des devices pour le casting (depuis l'état en mémoire)"""
         # Mettre à jour le dropdown des groupes
         groups = ["Tous"] + self.get_all_groups()
         self.casting_group_combo["values"] = groups
 
-        # Obtenir les devices connectés
-        stdout, stderr, returncode = self.run_adb_command(["devices"])
-
-        if returncode != 0:
-            self.log_message(f"Error getting devices: {stderr}")
-            return
+        states = self.device_states.states("device", "unauthorized", "offline")
+        rows = self.grouped_device_rows(
+            states, lambda device_id, nickname, group, status:
+            f"{nickname} ({device_id}){self.device_status_text(device_id, status)}")
 
-        lines = stdout.strip().split('\n')[1:]
+        # Afficher les devices groupés avec accordéons (preset scrcpy du groupe dans l'en-tête)
+        self.casting_list.render([
+            (group, f"{'▶' if self.casting_group_collapsed.get(group, False) else '▼'} {group} "
+                    f"({len(devices)} devices) - {self.get_scrcpy_preset_info(group)}", devices)
+            for group, devices in rows])
 
-        # Organiser les devices par groupe
-        devices_by_group = {}
-        for line in lines:
-            if '\tdevice' in line or '\tunauthorized' in line or '\toffline' in line:
-                parts = line.split('\t')
-                if len(parts) >= 2:
-                    device_id = parts[0]
-                    status = parts[1]
-
-                    # Trouver le groupe (chercher par ID USB ou par IP)
-                    group = "Non assigné"
-                    nickname = f"Device_{device_id[:8]}"
-                    for did, info in self.devices.items():
-                        ip = info.get("ip_address", "")
-                        if did == device_id or (ip and f"{ip}:5555" == device_id):
-                            group = info.get("group", "Non assigné")
-                            nickname = info.get("nickname", nickname)
-                            break
-
-                    if group not in devices_by_group:
-                        devices_by_group[group] = []
-                    devices_by_group[group].append((device_id, nickname, status))
+    def add_casting_links(self, row_frame, device_id):
+        """Liens d'action d'une ligne de la liste Casting"""
+        cast_link = tk.Label(row_frame, text="Cast", fg="blue", cursor="hand2")
+        cast_link.pack(side="left", padx=(10, 5))
+        cast_link.bind("<Button-1>", lambda e, d=device_id: self.cast_single_device(d))
 
-        # Afficher les devices groupés avec accordéons
-        for group in sorted(devices_by_group.keys()):
-            device_count = len(devices_by_group[group])
-            is_collapsed = self.casting_group_collapsed.get(group, False)
-
-            # Déterminer le preset pour ce groupe
-            preset_info = self.get_scrcpy_preset_info(group)
-
-            # Frame conteneur pour le groupe
-            group_frame = tk.Frame(self.casting_devices_frame)
-            group_frame.pack(fill="x", anchor="w", pady=(5, 0))
-
-            # Bouton accordéon (header cliquable)
-            arrow = "▶" if is_collapsed else "▼"
-            header_btn = tk.Button(
-                group_frame,
-                text=f"{arrow} {group} ({device_count} devices) - {preset_info}",
-                font=("Arial", 9, "bold"),
-                fg="blue",
-                bd=0,
-                cursor="hand2",
-                anchor="w",
-                command=lambda g=group: self.toggle_casting_group_collapse(g)
-            )
-            header_btn.pack(fill="x", anchor="w")
+        disable_link = tk.Label(row_frame, text="Disable Prox", fg="orange", cursor="hand2")
+        disable_link.pack(side="left", padx=5)
+        disable_link.bind("<Button-1>", lambda e, d=device_id: self.disable_proximity_sensor(d))
 
-            # Frame pour les devices (caché si replié)
-            devices_frame = tk.Frame(group_frame)
-            if not is_collapsed:
-                devices_frame.pack(fill="x", anchor="w", padx=(20, 0))
-
-            for device_id, nickname, status in devices_by_group[group]:
-                var = tk.BooleanVar()
-                status_text = f" - {status.upper()}" if status != "device" else ""
-
-                # Create a row frame for checkbox + action links
-                row_frame = tk.Frame(devices_frame)
-                row_frame.pack(anchor="w", fill="x")
-
-                checkbox = tk.Checkbutton(row_frame,
-                                        text=f"{nickname} ({device_id}){status_text}",
-                                        variable=var,
-                                        state="disabled" if status != "device" else "normal")
-                checkbox.pack(side="left")
-
-                if status == "device":
-                    self.casting_checkboxes[device_id] = var
-                    self.casting_device_groups[device_id] = group
-
-                    # Add action links
-                    cast_link = tk.Label(row_frame, text="Cast", fg="blue", cursor="hand2")
-                    cast_link.pack(side="left", padx=(10, 5))
-                    cast_link.bind("<Button-1>", lambda e, d=device_id: self.cast_single_device(d))
-
-                    disable_link = tk.Label(row_frame, text="Disable Prox", fg="orange", cursor="hand2")
-                    disable_link.pack(side="left", padx=5)
-                    disable_link.bind("<Button-1>", lambda e, d=device_id: self.disable_proximity_sensor(d))
-
-                    enable_link = tk.Label(row_frame, text="Enable Prox", fg="green", cursor="hand2")
-                    enable_link.pack(side="left", padx=5)
-                    enable_link.bind("<Button-1>", lambda e, d=device_id: self.enable_proximity_sensor(d))
+        enable_link = tk.Label(row_frame, text="Enable Prox", fg="green", cursor="hand2")
+        enable_link.pack(side="left", padx=5)
+        enable_link.bind("<Button-1>", lambda e, d=device_id: self.enable_proximity_sensor(d))
 
     def get_scrcpy_preset_info(self, group):
         """Retourne une description du preset pour un groupe"""
@@ -2040,17 +2209,7 @@ class USBVRManager:
 
     def get_device_nickname(self, device_id):
         """Récupère le nickname d'un device (USB ou WiFi)"""
-        # Chercher directement
-        if device_id in self.devices:
-            return self.devices[device_id].get("nickname", device_id)
-
-        # Chercher par IP wireless
-        for did, info in self.devices.items():
-            ip = info.get("ip_address", "")
-            if ip and f"{ip}:5555" == device_id:
-                return info.get("nickname", device_id)
-
-        return device_id[:16]  # Tronquer si pas trouvé
+        return self.devices.nickname(device_id, device_id[:16])  # Tronqué si pas trouvé
 
     def select_all_casting_devices(self):
         """Sélectionne tous les devices pour le casting"""
@@ -2074,18 +2233,10 @@ class USBVRManager:
                 var.set(False)
 
     def toggle_casting_group_collapse(self, group):
-        """Toggle l'état replié/déplié d'un groupe dans Casting"""
-        # Sauvegarder les devices sélectionnés avant refresh
-        selected_devices = [d for d, var in self.casting_checkboxes.items() if var.get()]
-
+        """Toggle l'état replié/déplié d'un groupe dans Casting (sélections conservées)"""
         self.casting_group_collapsed[group] = not self.casting_group_collapsed.get(group, False)
         self.refresh_casting_devices()
 
-        # Restaurer les sélections
-        for device_id in selected_devices:
-            if device_id in self.casting_checkboxes:
-                self.casting_checkboxes[device_id].set(True)
-
     def start_casting(self):
         """Démarre le casting scrcpy pour les devices sélectionnés"""
         if not self.scrcpy_path:
@@ -2165,14 +2316,9 @@ class USBVRManager:
     # ==================== END CASTING METHODS ====================
 
     def scan_missing_apks(self):
-        """Scanne les devices du groupe sélectionné pour les packages installés"""
+        """Scanne les devices du groupe sélectionné: inventaires en parallèle, colonnes remplies à l'arrivée"""
         selected_group = self.missing_group_var.get()
         group_text = f"group '{selected_group}'" if selected_group != "Tous" else "all devices"
-        self.log_message(f"Scanning {group_text} for installed packages...")
-
-        # Nettoyer le tableau
-        self.missing_tree.delete(*self.missing_tree.get_children())
-        self.all_packages_data = []
 
         # Obtenir les devices connectés du groupe sélectionné
         connected_devices = self.get_connected_devices_by_group(selected_group)
@@ -2180,128 +2326,246 @@ class USBVRManager:
         if not connected_devices:
             self.log_message(f"No connected devices found in {group_text}")
             return
-        
-        # Scanner les packages de chaque device
-        all_packages = set()
-        device_packages = {}
-        device_nicknames = {}  # Stocker les nicknames pour les colonnes
-
-        for device_id in connected_devices:
-            # Trouver le nickname (supporte USB et wireless IP:5555)
-            original_id = self.find_device_by_display_id(device_id)
-            if original_id and original_id in self.devices:
-                device_name = self.devices[original_id].get("nickname", device_id)
-            else:
-                device_name = self.devices.get(device_id, {}).get("nickname", device_id)
-            device_nicknames[device_id] = device_name
-
-            self.log_message(f"Scanning packages on {device_name}...")
 
-            stdout, stderr, returncode = self.run_adb_command(["shell", "pm", "list", "packages"], device_id)
+        self.log_message(f"Scanning {group_text} for installed packages...")
 
-            if returncode == 0:
-                packages = [line.replace("package:", "") for line in stdout.strip().split('\n') if line.startswith("package:")]
-                device_packages[device_id] = set(packages)
-                all_packages.update(packages)
-            else:
-                self.log_message(f"Error scanning {device_name}: {stderr}")
-                device_packages[device_id] = set()
+        # Une colonne par casque (identifiée par device_id: deux casques peuvent avoir le même nom),
+        # en attente jusqu'à sa réponse
+        self.inventory_scan = object()
+        self.inventory_devices = list(connected_devices)
+        self.inventories = {}  # {device_id: {package: PackageEntry}, None si échec}
+        self.inventory_fetched = set()  # Casques relus en entier (empreinte changée ou premier audit)
+        self.missing_table.set_columns(
+            [("Package", "Package", 250)] +
+            [(device_id, f"{self.devices.nickname(device_id, device_id)} …", 150) for device_id in self.inventory_devices])
+        self.missing_table.heading("Package", command=self.cycle_package_sort)
+        for column, device_id in enumerate(self.inventory_devices):
+            self.missing_table.heading(device_id, command=lambda column=column: self.sort_by_device(column))
+        self.audit_sort = (SORT_PACKAGE, None, False)
+        self.build_inventory_rows()
+        self.filter_missing_packages(reset=True)
+
+        thread = threading.Thread(target=self._scan_inventory_thread, args=(self.inventory_scan, connected_devices))
+        thread.daemon = True
+        thread.start()
 
-        # Créer les colonnes du tableau avec nicknames
-        columns = ["Package"] + [device_nicknames.get(device_id, device_id) for device_id in connected_devices]
-        self.missing_tree["columns"] = columns
-        self.missing_tree["show"] = "headings"
-        
-        for col in columns:
-            self.missing_tree.heading(col, text=col)
-            self.missing_tree.column(col, width=150)
-        
-        # Stocker les données pour le filtrage
-        for package in sorted(all_packages):
-            row_data = {"package": package, "devices": {}}
-            row_values = [package]
-            has_missing = False
-            
-            for device_id in connected_devices:
-                if package in device_packages[device_id]:
-                    row_values.append("✓")
-                    row_data["devices"][device_id] = True
-                else:
-                    row_values.append("")
-                    row_data["devices"][device_id] = False
-                    has_missing = True
-            
-            row_data["values"] = row_values
-            row_data["has_missing"] = has_missing
-            self.all_packages_data.append(row_data)
-        
+    def _scan_inventory_thread(self, scan, devices):
+        """Thread de l'audit: un appel 'pm list packages' par casque, tous en parallèle"""
+        start = time.monotonic()
+        for result in self.fleet.submit(devices, self.get_package_inventory):
+            self.root.after(0, lambda result=result: self._on_inventory(scan, result))
+        self.root.after(0, lambda: self._on_inventory_done(scan, time.monotonic() - start))
+
+    def get_package_inventory(self, device_id):
+        """({package: PackageEntry}, relu) des apps installées (chemin, versionCode, uid)
+
+        Si l'empreinte calculée sur le casque est celle du dernier audit,
+        l'inventaire enregistré est réutilisé (relu=False); sinon il est relu
+        en une seule commande et enregistré.
+        """
+        device = self.devices.resolve(device_id) or device_id
+        latest = self.inventory_store.latest(device)
+        if latest:
+            stdout, _, returncode = self.run_adb_command(["shell", FINGERPRINT_COMMAND], device_id)
+            if returncode == 0 and parse_md5sum(stdout) == latest.fingerprint:
+                self.inventory_store.confirm(latest.id)
+                return self.inventory_store.packages(latest.id), False
+        stdout, stderr, returncode = self.run_adb_command(["shell", INVENTORY_COMMAND], device_id)
+        if returncode != 0:
+            raise RuntimeError(stderr.strip() or "pm list packages a échoué")
+        inventory = parse_package_inventory(stdout)
+        self.inventory_store.record(device, inventory_fingerprint(stdout), inventory)
+        return inventory, True
+
+    def _on_inventory(self, scan, result):
+        """Inventaire d'un casque reçu (thread Tk): sa colonne est remplie"""
+        if scan is not self.inventory_scan:
+            return  # Résultat d'un scan précédent
+        device_id = result.device_id
+        device_name = self.devices.nickname(device_id, device_id)
+        if result.ok:
+            self.inventories[device_id], fetched = result.value
+            if fetched:
+                self.inventory_fetched.add(device_id)
+            self.missing_table.heading(device_id, text=device_name)
+        else:
+            self.inventories[device_id] = None
+            self.missing_table.heading(device_id, text=f"{device_name} ✗")
+            self.log_message(f"Error scanning {device_name}: {result.error}")
+        self.build_inventory_rows()
         self.filter_missing_packages()
-        self.log_message(f"Scan completed. Found {len(all_packages)} unique packages across {len(connected_devices)} devices")
-    
-    def filter_missing_packages(self):
-        """Filtre les packages selon l'option 'show missing only'"""
-        self.missing_tree.delete(*self.missing_tree.get_children())
-        
-        for row_data in self.all_packages_data:
-            if not self.show_missing_only.get() or row_data["has_missing"]:
-                self.missing_tree.insert("", "end", values=row_data["values"])
-    
-    def refresh_uninstall_devices(self):
-        """Rafraîchit la liste des devices pour la désinstallation"""
+
+    def _on_inventory_done(self, scan, elapsed):
+        if scan is not self.inventory_scan:
+            return
+        matrix = self.audit_matrix
+        self.log_message(f"Scan completed in {elapsed:.1f} s. Found {len(matrix)} unique packages "
+                         f"across {len(self.inventory_devices)} devices ({matrix.missing_count} missing somewhere, "
+                         f"{matrix.outdated_count} outdated somewhere)")
+        scanned = sum(1 for inventory in self.inventories.values() if inventory is not None)
+        self.log_message(f"{len(self.inventory_fetched)} inventaire(s) relu(s), "
+                         f"{scanned - len(self.inventory_fetched)} inchangé(s) depuis le dernier audit")
+        self.refresh_history_devices()
+
+    def build_inventory_rows(self):
+        """Matrice package x casque: versionCode, ⚠ si plus ancien que sur un autre casque, vide si absent"""
+        self.audit_matrix = PresenceMatrix(self.inventory_devices, self.inventories)
+
+    def cycle_package_sort(self):
+        """Clic sur la colonne Package: A→Z, Z→A, puis les plus manquants d'abord"""
+        sort, _, reverse = self.audit_sort
+        if sort == SORT_PACKAGE and not reverse:
+            self.audit_sort = (SORT_PACKAGE, None, True)
+        elif sort == SORT_PACKAGE:
+            self.audit_sort = (SORT_MISSING, None, False)
+        else:
+            self.audit_sort = (SORT_PACKAGE, None, False)
+        self.filter_missing_packages(reset=True)
+
+    def sort_by_device(self, column):
+        """Clic sur la colonne d'un casque: ses packages absents puis plus anciens d'abord (second clic: inverse)"""
+        sort, current, reverse = self.audit_sort
+        self.audit_sort = (SORT_DEVICE, column, sort == SORT_DEVICE and current == column and not reverse)
+        self.filter_missing_packages(reset=True)
+
+    # ---------- Historique des inventaires ----------
+
+    def refresh_history_devices(self):
+        """Casques ayant un inventaire enregistré, pour le dropdown History"""
+        self.history_devices = {f"{self.devices.nickname(device, device)} ({device})": device
+                                for device in self.inventory_store.devices()}
+        self.history_device_combo["values"] = sorted(self.history_devices)
+
+    def selected_history_device(self):
+        device = getattr(self, "history_devices", {}).get(self.history_device_var.get())
+        if not device:
+            messagebox.showwarning("Warning", "Select an audited device first")
+        return device
+
+    def log_inventory_diff(self, difference, indent="   "):
+        for package, version in sorted(difference.added.items()):
+            self.log_message(f"{indent}+ {package} ({version})")
+        for package, version in sorted(difference.removed.items()):
+            self.log_message(f"{indent}- {package} ({version})")
+        for package, (before, after) in sorted(difference.changed.items()):
+            self.log_message(f"{indent}~ {package} {before} -> {after}")
+
+    def show_inventory_changes(self):
+        """Ce qui a changé sur un casque depuis une date (inventaires enregistrés, sans adb)"""
+        device = self.selected_history_device()
+        if not device:
+            return
+        since = None
+        for date_format in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+            try:
+                since = datetime.strptime(self.history_since_var.get().strip(), date_format)
+                break
+            except ValueError:
+                pass
+        if since is None:
+            messagebox.showerror("Error", "Date format: YYYY-MM-DD or YYYY-MM-DD HH:MM")
+            return
+        device_name = self.devices.nickname(device, device)
+        start, difference = self.inventory_store.changes_since(device, since.timestamp())
+        latest = self.inventory_store.latest(device)
+        start_text = datetime.fromtimestamp(start.taken_at).strftime("%Y-%m-%d %H:%M")
+        checked_text = datetime.fromtimestamp(latest.checked_at).strftime("%Y-%m-%d %H:%M")
+        if not any(difference):
+            self.log_message(f"{device_name}: aucun changement depuis {start_text} (vérifié le {checked_text})")
+            return
+        self.log_message(f"{device_name}: changements depuis {start_text} (vérifié le {checked_text}):")
+        self.log_inventory_diff(difference)
+
+    def set_inventory_baseline(self):
+        """Le dernier inventaire du casque choisi devient la référence de son groupe"""
+        device = self.selected_history_device()
+        if not device:
+            return
+        group = self.devices.group(device)
+        device_name = self.devices.nickname(device, device)
+        if not messagebox.askyesno("Confirm", f"Use {device_name}'s last inventory as baseline for group '{group}'?"):
+            return
+        self.inventory_store.set_baseline(group, device)
+        self.log_message(f"Référence du groupe '{group}': inventaire de {device_name}")
+
+    def show_inventory_drift(self):
+        """Casques du groupe filtré (ou de tous les groupes) qui s'écartent de la référence de leur groupe"""
+        selected_group = self.missing_group_var.get()
+        groups = self.get_all_groups() if selected_group == "Tous" else [selected_group]
+        audited = set(self.inventory_store.devices())
+        for group in groups:
+            members = [device for device in self.get_devices_by_group(group) if device in audited]
+            drifted = self.inventory_store.drift(group, members)
+            if drifted is None:
+                if selected_group != "Tous":
+                    self.log_message(f"Groupe '{group}': pas de référence (Set as group baseline)")
+                continue
+            if not drifted:
+                self.log_message(f"Groupe '{group}': {len(members)} casque(s) audité(s) conformes à la référence")
+                continue
+            self.log_message(f"Groupe '{group}': {len(drifted)}/{len(members)} casque(s) s'écartent de la référence")
+            for device, difference in drifted.items():
+                self.log_message(f"  {self.devices.nickname(device, device)}:")
+                self.log_inventory_diff(difference, indent="     ")
+
+    def filter_missing_packages(self, reset=False):
+        """Filtre les packages selon l'option 'show missing / outdated only' et la recherche
+
+        Les lignes filtrées et triées viennent de la matrice (mises en cache);
+        le tableau ne remplit que les lignes visibles.
+        """
+        sort, column, reverse = self.audit_sort
+        rows = self.audit_matrix.rows(self.show_missing_only.get(), self.missing_search_var.get(),
+                                      sort, column, reverse)
+        self.missing_table.show(rows, self.audit_matrix.values, keep_position=not reset)
+
+    def refresh_uninstall_devices(self, reset=True):
+        """Rafraîchit la liste des devices pour la désinstallation
+
+        reset=False (changement d'onglet, casque branché): le device choisi et
+        ses packages restent affichés tant qu'il est connecté.
+        """
         # Mettre à jour le dropdown des groupes
         groups = ["Tous"] + self.get_all_groups()
         self.uninstall_group_combo["values"] = groups
 
         selected_group = self.uninstall_group_var.get()
 
-        stdout, stderr, returncode = self.run_adb_command(["devices"])
-
         devices = []
-        if returncode == 0:
-            lines = stdout.strip().split('\n')[1:]
-            for line in lines:
-                if '\tdevice' in line:  # Only show authorized devices for uninstall
-                    device_id = line.split('\t')[0]
-
-                    # Trouver le groupe du device
-                    group = "Non assigné"
-                    nickname = device_id
-                    for did, info in self.devices.items():
-                        ip = info.get("ip_address", "")
-                        if did == device_id or (ip and f"{ip}:5555" == device_id):
-                            group = info.get("group", "Non assigné")
-                            nickname = info.get("nickname", device_id)
-                            break
-
-                    # Filtrer par groupe
-                    if selected_group == "Tous" or group == selected_group:
-                        devices.append(f"{nickname} ({device_id}) [{group}]")
+        for device_id in self.device_states.connected():  # Only show authorized devices for uninstall
+            # Trouver le groupe du device
+            _, info = self.devices.lookup(device_id)
+            info = info or {}
+            group = info.get("group", "Non assigné")
+            nickname = info.get("nickname", device_id)
+
+            # Filtrer par groupe
+            if selected_group == "Tous" or group == selected_group:
+                devices.append(f"{nickname} ({device_id}) [{group}]")
 
         self.uninstall_device_combo["values"] = devices
+        if not reset and self.uninstall_device_var.get() in devices:
+            return
         # Ne pas sélectionner de device par défaut - l'utilisateur doit choisir
         self.uninstall_device_var.set("")
         # Vider la liste des packages
         self.packages_listbox.delete(0, tk.END)
     
     def get_system_packages(self, device_id):
-        """Obtient la liste des packages système"""
-        self.log_message("Detecting system packages...")
-        system_packages = set()
-        
-        # Utiliser dumpsys package pour détecter les flags système
-        stdout, stderr, returncode = self.run_adb_command(["shell", "dumpsys", "package"], device_id)
-        
-        if returncode == 0:
-            current_package = None
-            for line in stdout.split('\n'):
-                line = line.strip()
-                if line.startswith('Package ['):
-                    # Extraire le nom du package
-                    current_package = line.split('[')[1].split(']')[0]
-                elif current_package and 'flags=' in line and 'SYSTEM' in line:
-                    system_packages.add(current_package)
+        """Obtient la liste des packages système (en cache jusqu'au redémarrage, 1 h max)"""
+        def load():
+            if self.adb_manager.breakers.state(device_id) == BREAKER_OPEN:
+                return None
+            self.log_message("Detecting system packages...")
+            # dumpsys package (plusieurs Mo) analysé au fil de l'eau, arrêt en fin de section.
+            # Sortie tronquée: rien en cache (None), la liste sera relue au prochain appel
+            try:
+                return parse_system_packages(self.adb_manager.shell_lines(device_id, PACKAGES_COMMAND))
+            except AdbError as e:
+                self.log_message(f"System package detection interrupted: {e}")
+                return None
         
-        return system_packages
+        return set(self.adb_manager.cache.get(device_id, "system_packages", load, ttl=TTL_HOUR) or ())
     
     def load_device_packages(self):
         """Charge les packages du device sélectionné"""
@@ -2395,19 +2659,7 @@ class USBVRManager:
                 return
         
         # Obtenir tous les devices connectés
-        stdout, stderr, returncode = self.run_adb_command(["devices"])
-        
-        if returncode != 0:
-            self.log_message(f"Error getting devices: {stderr}")
-            return
-        
-        lines = stdout.strip().split('\n')[1:]
-        connected_devices = []
-        
-        for line in lines:
-            if '\tdevice' in line:
-                device_id = line.split('\t')[0]
-                connected_devices.append(device_id)
+        connected_devices = self.device_states.connected()
         
         if not connected_devices:
             self.log_message("No connected devices found")
@@ -2423,9 +2675,9 @@ class USBVRManager:
         thread.start()
     
     def _uninstall_from_all_thread(self, package, devices):
-        """Thread pour la désinstallation sur tous les devices"""
-        for device_id in devices:
-            device_name = self.devices.get(device_id, {}).get("nickname", device_id)
+        """Thread pour la désinstallation sur tous les devices (en parallèle)"""
+        def uninstall_on_device(device_id):
+            device_name = self.devices.nickname(device_id, device_id)
             self.log_message(f"Uninstalling {package} from {device_name}...")
             
             stdout, stderr, returncode = self.run_adb_command(["uninstall", package], device_id)
@@ -2437,6 +2689,10 @@ class USBVRManager:
                     self.log_message(f"- {package} was not installed on {device_name}")
                 else:
                     self.log_message(f"✗ Failed to uninstall {package} from {device_name}: {stderr}")
+
+        for result in self.fleet.submit(devices, uninstall_on_device):
+            if not result.ok:
+                self.log_message(f"✗ Failed to uninstall {package} from {result.device_id}: {result.error}")
         
         self.log_message("Uninstall process completed!")
 
@@ -2556,19 +2812,8 @@ class USBVRManager:
     def browse_headset_folder(self):
         """Navigue dans l'arborescence du casque"""
         # Obtenir un device connecté
-        stdout, stderr, returncode = self.run_adb_command(["devices"])
-        
-        if returncode != 0:
-            messagebox.showerror("Error", "Cannot connect to device")
-            return
-        
-        lines = stdout.strip().split('\n')[1:]
-        device_id = None
-        
-        for line in lines:
-            if '\tdevice' in line:
-                device_id = line.split('\t')[0]
-                break
+        connected = self.device_states.connected()
+        device_id = connected[0] if connected else None
         
         if not device_id:
             messagebox.showerror("Error", "No connected device found")
@@ -2577,7 +2822,7 @@ class USBVRManager:
         # Simple dialog pour entrer le chemin (navigation complète serait complexe)
         current_path = self.headset_folder_var.get() or "/sdcard/"
         new_path = simpledialog.askstring("Headset folder", 
-                                        f"Enter headset folder path:\n(Examples: /sdcard/Movies/, /sdcard/Pictures/, /sdcard/Download/)",
+                                        "Enter headset folder path:\n(Examples: /sdcard/Movies/, /sdcard/Pictures/, /sdcard/Download/)",
                                         initialvalue=current_path)
         
         if new_path:
@@ -2623,9 +2868,7 @@ class USBVRManager:
                                  f"Sync {pc_folder} to {headset_folder}\non {len(connected_devices)} device(s) in {group_text}?"):
             return
 
-        # Réinitialiser les options globales
-        self.apply_to_all_devices = False
-        self.apply_to_all_files = False
+        # Réinitialiser les options de la session de synchro
         self.fat32_skipped_files = set()
         self._fs_cache = {}  # cache filesystem type par device_id
 
@@ -2647,41 +2890,44 @@ class USBVRManager:
                 files_to_sync.append((local_path, relative_path))
         
         self.log_message(f"Found {len(files_to_sync)} files to sync")
+        pc_files = {relative_path.replace('\\', '/') for _, relative_path in files_to_sync}
+
+        # Listing de tous les casques d'abord: une seule question pour toute la salle,
+        # avant que les casques ne soient synchronisés en parallèle
+        listings = {}
+        for result in self.fleet.submit(devices, lambda device_id: set(self._get_headset_files(device_id, headset_folder))):
+            if result.ok:
+                listings[result.device_id] = result.value
+            else:
+                device_name = self.devices.nickname(result.device_id, result.device_id)
+                self.log_message(f"✗ Sync failed on {device_name}: {result.error}")
+        extra_files = {device_id: sorted(existing - pc_files) for device_id, existing in listings.items()
+                       if existing - pc_files}
+        conflicts = sum(len(existing & pc_files) for existing in listings.values())
+
+        policy = self._ask_sync_policy(extra_files, conflicts)
+        if policy is None:
+            self.log_message("Sync cancelled")
+            return
         
-        for device_index, device_id in enumerate(devices):
-            device_name = self.devices.get(device_id, {}).get("nickname", device_id)
+        def sync_device(device_id):
+            device_name = self.devices.nickname(device_id, device_id)
             self.log_message(f"Syncing to {device_name}...")
+            existing_files = listings[device_id]
             
-            # Vérifier les fichiers existants sur le casque
-            existing_files = self._get_headset_files(device_id, headset_folder)
-            
-            # Détecter les fichiers à supprimer (présents sur casque mais pas sur PC)
-            files_to_delete = []
-            pc_files = {relative_path for _, relative_path in files_to_sync}
-            
-            for existing_file in existing_files:
-                if existing_file not in pc_files:
-                    files_to_delete.append(existing_file)
-            
-            # Traiter les suppressions si nécessaire
-            if files_to_delete and not self.apply_to_all_files:
-                self._handle_deletions(device_id, device_name, headset_folder, files_to_delete, device_index == 0)
+            # Fichiers présents sur le casque mais pas sur le PC
+            if policy["delete"] and extra_files.get(device_id):
+                self._delete_headset_files(device_id, device_name, headset_folder, extra_files[device_id])
             
             # Synchroniser les fichiers
             for local_path, relative_path in files_to_sync:
                 remote_path = f"{headset_folder}/{relative_path}".replace('\\', '/')
                 
-                # Vérifier si le fichier existe déjà
-                stdout, stderr, returncode = self.run_adb_command(["shell", "ls", "-la", remote_path], device_id)
-                
-                file_exists = (returncode == 0)
-                
-                if file_exists and not self.apply_to_all_files:
-                    # Fichier existe, demander quoi faire
-                    action = self._handle_file_conflict(relative_path, device_name, device_index == 0)
-                    if action == "skip":
+                # Fichier déjà présent (d'après le listing du casque): choix fait avant la synchro
+                if relative_path.replace('\\', '/') in existing_files:
+                    if policy["conflict"] == "skip":
                         continue
-                    elif action == "rename":
+                    elif policy["conflict"] == "rename":
                         # Pour simplicité, ajouter un timestamp
                         name, ext = os.path.splitext(remote_path)
                         timestamp = datetime.now().strftime("_%Y%m%d_%H%M%S")
@@ -2700,21 +2946,28 @@ class USBVRManager:
                         self.log_message(f"⚠ Ignoré (FAT32 >4 Go) : {relative_path}")
                         continue
 
-                # Créer le dossier de destination si nécessaire
-                remote_dir = '/'.join(remote_path.split('/')[:-1])
-                self.run_adb_command(["shell", "mkdir", "-p", remote_dir], device_id)
-
-                # Copier le fichier (timeout dynamique : 120s min + 1s/Mo)
-                size_mb = os.path.getsize(local_path) / (1024 * 1024)
-                push_timeout = max(120, 60 + int(size_mb))
+                # Copier le fichier (timeout selon le débit mesuré du casque),
+                # les dossiers de destination sont créés par le push
+                push_timeout = self.throughput.timeout_for(device_id, local_size)
+                push_start = time.monotonic()
                 stdout, stderr, returncode = self.run_adb_command(["push", local_path, remote_path], device_id, timeout=push_timeout)
                 
                 if returncode == 0:
+                    self.throughput.record(device_id, local_size, time.monotonic() - push_start)
                     self.log_message(f"✓ {relative_path} -> {device_name}")
                 else:
                     self.log_message(f"✗ Failed to copy {relative_path} to {device_name}: {stderr}")
+
+        # Tous les casques en parallèle (limites USB/WiFi gérées par l'exécuteur),
+        # chaque fichier lu une fois sur le disque pour tous les casques
+        with self.adb_manager.fanout.planned({local_path: len(listings) for local_path, _ in files_to_sync}):
+            for result in self.fleet.submit(list(listings), sync_device):
+                if not result.ok:
+                    device_name = self.devices.nickname(result.device_id, result.device_id)
+                    self.log_message(f"✗ Sync failed on {device_name}: {result.error}")
         
         self.log_message("Sync completed!")
+        self.log_fanout_stats()
     
     def _detect_filesystem(self, device_id, path):
         """Retourne 'fat32', 'exfat', ou 'other' pour le FS qui héberge path sur le device."""
@@ -2742,6 +2995,14 @@ class USBVRManager:
 
     def _warn_fat32_skip(self, filename):
         """Affiche un avertissement FAT32 (thread principal) et ajoute le fichier aux skips de session."""
+        # Plusieurs casques synchronisés en parallèle: un seul avertissement par fichier
+        with self._fat32_lock:
+            if filename in self.fat32_skipped_files:
+                return
+            self._warn_fat32_dialog(filename)
+
+    def _warn_fat32_dialog(self, filename):
+        """Affiche le dialogue FAT32 dans le thread Tk et attend sa fermeture"""
         event = threading.Event()
 
         def show():
@@ -2758,142 +3019,104 @@ class USBVRManager:
         event.wait()
 
     def _get_headset_files(self, device_id, headset_folder):
-        """Obtient la liste des fichiers sur le casque"""
-        files = []
-        stdout, stderr, returncode = self.run_adb_command(["shell", "find", headset_folder, "-type", "f"], device_id)
-        
-        if returncode == 0:
-            for line in stdout.strip().split('\n'):
-                if line and line.startswith(headset_folder):
-                    relative_path = line[len(headset_folder):].lstrip('/')
-                    if relative_path:
-                        files.append(relative_path)
-        
-        return files
+        """Obtient la liste des fichiers sur le casque (un seul listing sync)"""
+        return list(self.adb_manager.list_files(device_id, headset_folder))
     
-    def _handle_deletions(self, device_id, device_name, headset_folder, files_to_delete, is_first_device):
-        """Gère les fichiers à supprimer"""
-        if not files_to_delete:
-            return
-        
-        # Créer le dialog dans le thread principal
-        def ask_deletion():
+    def _ask_sync_policy(self, extra_files, conflicts):
+        """Demande une fois, pour tous les casques, quoi faire des fichiers en trop et des conflits
+
+        extra_files: {device_id: [fichiers présents sur le casque mais pas sur le PC]},
+        conflicts: nombre de fichiers déjà présents. Retourne {"delete": bool,
+        "conflict": "overwrite" | "skip" | "rename"}, ou None si la synchro est annulée.
+        Appelé depuis le thread de synchro: le dialogue s'ouvre dans le thread Tk.
+        """
+        policy = {"delete": False, "conflict": "overwrite"}
+        if not extra_files and not conflicts:
+            return policy
+        event = threading.Event()
+
+        def ask():
             dialog = tk.Toplevel(self.root)
-            dialog.title("Files to delete")
-            dialog.geometry("500x400")
+            dialog.title("Sync options")
+            dialog.geometry("520x460")
             dialog.grab_set()
+            delete_var = tk.StringVar(value="keep")
+            conflict_var = tk.StringVar(value="overwrite")
             
-            result = {"action": None, "apply_devices": False, "apply_files": False}
-            
-            tk.Label(dialog, text=f"The following files exist on {device_name} but not on PC:", 
-                    font=("Arial", 10, "bold")).pack(pady=5)
-            
-            # Liste des fichiers
-            listbox = tk.Listbox(dialog, height=10)
-            scrollbar = tk.Scrollbar(dialog, orient="vertical", command=listbox.yview)
-            listbox.configure(yscrollcommand=scrollbar.set)
+            if extra_files:
+                tk.Label(dialog, text="The following files exist on headsets but not on PC:",
+                         font=("Arial", 10, "bold")).pack(pady=5)
+                list_frame = tk.Frame(dialog)
+                list_frame.pack(fill="both", expand=True, padx=10)
+                listbox = tk.Listbox(list_frame, height=10)
+                scrollbar = tk.Scrollbar(list_frame, orient="vertical", command=listbox.yview)
+                listbox.configure(yscrollcommand=scrollbar.set)
+                for device_id, files in extra_files.items():
+                    device_name = self.devices.nickname(device_id, device_id)
+                    for file in files:
+                        listbox.insert(tk.END, f"{device_name}: {file}")
+                listbox.pack(side="left", fill="both", expand=True)
+                scrollbar.pack(side="right", fill="y")
+                tk.Radiobutton(dialog, text="Keep these files", variable=delete_var, value="keep").pack(anchor="w", padx=10)
+                tk.Radiobutton(dialog, text="Delete these files from the headsets", variable=delete_var,
+                               value="delete").pack(anchor="w", padx=10)
             
-            for file in files_to_delete:
-                listbox.insert(tk.END, file)
+            if conflicts:
+                tk.Label(dialog, text=f"{conflicts} file(s) already exist on the headsets:",
+                         font=("Arial", 10, "bold")).pack(pady=(10, 2))
+                for value, text in (("overwrite", "Overwrite"), ("skip", "Skip"), ("rename", "Copy with a new name")):
+                    tk.Radiobutton(dialog, text=text, variable=conflict_var, value=value).pack(anchor="w", padx=10)
             
-            listbox.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=5)
-            scrollbar.pack(side="right", fill="y", pady=5)
-            
-            # Options
-            apply_devices_var = tk.BooleanVar()
-            apply_files_var = tk.BooleanVar()
-            
-            if is_first_device:
-                tk.Checkbutton(dialog, text="Apply to all headsets for this session", 
-                              variable=apply_devices_var).pack(pady=2)
-            
-            tk.Checkbutton(dialog, text="Apply to all files for this session", 
-                          variable=apply_files_var).pack(pady=2)
-            
-            # Boutons
             btn_frame = tk.Frame(dialog)
             btn_frame.pack(pady=10)
             
-            def on_delete():
-                result["action"] = "delete"
-                result["apply_devices"] = apply_devices_var.get()
-                result["apply_files"] = apply_files_var.get()
+            def on_start():
+                policy["delete"] = delete_var.get() == "delete"
+                policy["conflict"] = conflict_var.get()
                 dialog.destroy()
             
-            def on_keep():
-                result["action"] = "keep"
-                result["apply_devices"] = apply_devices_var.get()
-                result["apply_files"] = apply_files_var.get()
+            def on_cancel():
+                policy["cancelled"] = True
                 dialog.destroy()
             
-            tk.Button(btn_frame, text="Delete files", command=on_delete, bg="red", fg="white").pack(side="left", padx=5)
-            tk.Button(btn_frame, text="Keep files", command=on_keep, bg="green", fg="white").pack(side="left", padx=5)
-            
-            dialog.wait_window()
-            return result
+            tk.Button(btn_frame, text="Start sync", command=on_start, bg="green", fg="white").pack(side="left", padx=5)
+            tk.Button(btn_frame, text="Cancel", command=on_cancel).pack(side="left", padx=5)
+            dialog.protocol("WM_DELETE_WINDOW", on_cancel)
+            dialog.bind("<Destroy>", lambda e: event.set() if e.widget is dialog else None)
         
-        # Demander seulement si pas déjà appliqué globalement
-        if not self.apply_to_all_files:
-            result = self.root.after(0, ask_deletion)
-            # Attendre le résultat (simplification - dans un vrai cas il faudrait une queue)
-            # Pour cette démo, on va juste logger
-            self.log_message(f"Found {len(files_to_delete)} files to potentially delete on {device_name}")
+        self.root.after(0, ask)
+        event.wait()
+        return None if policy.get("cancelled") else policy
     
-    def _handle_file_conflict(self, filename, device_name, is_first_device):
-        """Gère les conflits de fichiers"""
-        # Simplification - dans la vraie version il faudrait un dialog
-        # Pour cette démo, on va écraser par défaut
-        return "overwrite"
-    def refresh_ed_devices(self):
-        """Rafraîchit la liste des devices pour l'onglet Enable/Disable avec checkboxes"""
-        # Nettoyer les anciens checkboxes
-        for widget in self.ed_devices_frame.winfo_children():
-            widget.destroy()
+    def _delete_headset_files(self, device_id, device_name, headset_folder, files):
+        """Supprime du casque des fichiers du dossier synchronisé (par lots de commandes rm)"""
+        for i in range(0, len(files), 50):
+            batch = files[i:i + 50]
+            paths = [shlex.quote(f"{headset_folder}/{file}") for file in batch]
+            _, stderr, returncode = self.run_adb_command(["shell", "rm", "-f"] + paths, device_id)
+            if returncode == 0:
+                self.log_message(f"🗑 {len(batch)} file(s) deleted on {device_name}")
+            else:
+                self.log_message(f"✗ Failed to delete files on {device_name}: {stderr}")
 
-        self.ed_device_checkboxes.clear()
-        self.ed_device_groups = {}
+    def refresh_ed_devices(self, reset=True):
+        """Rafraîchit la liste des devices pour l'onglet Enable/Disable avec checkboxes
 
+        reset=False (changement d'onglet, casque branché): la liste des apps est conservée.
+        """
         # Mettre à jour le dropdown des groupes
         groups = ["Tous"] + self.get_all_groups()
         self.ed_group_combo["values"] = groups
 
-        # Obtenir les devices connectés
-        stdout, stderr, returncode = self.run_adb_command(["devices"])
+        # Devices connectés (état en mémoire), liste simple sans accordéons
+        rows = self.grouped_device_rows(
+            self.device_states.states("device"),
+            lambda device_id, nickname, group, status: f"{nickname} ({device_id}) [{group}]")
+        self.ed_device_list.render([(group, None, devices) for group, devices in rows])
 
-        if returncode != 0:
-            self.log_message(f"Error getting devices: {stderr}")
-            return
-
-        lines = stdout.strip().split('\n')[1:]
-
-        for line in lines:
-            if '\tdevice' in line:
-                parts = line.split('\t')
-                if len(parts) >= 2:
-                    device_id = parts[0]
-                    status = parts[1]
-
-                    # Trouver le groupe et nickname
-                    group = "Non assigné"
-                    nickname = f"Device_{device_id[:8]}"
-                    for did, info in self.devices.items():
-                        ip = info.get("ip_address", "")
-                        if did == device_id or (ip and f"{ip}:5555" == device_id):
-                            group = info.get("group", "Non assigné")
-                            nickname = info.get("nickname", nickname)
-                            break
-
-                    var = tk.BooleanVar()
-                    checkbox = tk.Checkbutton(self.ed_devices_frame,
-                                            text=f"{nickname} ({device_id}) [{group}]",
-                                            variable=var)
-                    checkbox.pack(anchor="w")
-
-                    self.ed_device_checkboxes[device_id] = var
-                    self.ed_device_groups[device_id] = group
-
-        # Vider la liste des packages
-        self.ed_listbox.delete(0, tk.END)
+        if reset:
+            # Vider la liste des packages
+            self.ed_listbox.delete(0, tk.END)
 
     def select_all_ed_devices(self):
         """Sélectionne tous les devices pour Enable/Disable"""
@@ -2926,12 +3149,7 @@ class USBVRManager:
 
         # Utiliser le premier device sélectionné pour charger la liste des packages
         device_id = selected_devices[0]
-        nickname = device_id
-        for did, info in self.devices.items():
-            ip = info.get("ip_address", "")
-            if did == device_id or (ip and f"{ip}:5555" == device_id):
-                nickname = info.get("nickname", device_id)
-                break
+        nickname = self.devices.nickname(device_id, device_id)
 
         self.log_message(f"Loading packages from {nickname}...")
 
@@ -3003,28 +3221,24 @@ class USBVRManager:
         thread.start()
 
     def _disable_apps_thread(self, packages, devices):
-        """Thread pour désactiver les apps sur plusieurs devices"""
+        """Thread pour désactiver les apps sur plusieurs devices (en parallèle)"""
         total = len(packages) * len(devices)
-        current = 0
+        progress = itertools.count(1)
+        all_users = self.ed_all_users_var.get()
 
-        for device_id in devices:
+        def disable_on_device(device_id):
             # Trouver le nickname
-            nickname = device_id
-            for did, info in self.devices.items():
-                ip = info.get("ip_address", "")
-                if did == device_id or (ip and f"{ip}:5555" == device_id):
-                    nickname = info.get("nickname", device_id)
-                    break
+            nickname = self.devices.nickname(device_id, device_id)
 
             self.log_message(f"Processing {nickname}...")
 
-            if self.ed_all_users_var.get():
+            if all_users:
                 users = self.get_device_users(device_id)
             else:
                 users = ["0"]
 
             for package in packages:
-                current += 1
+                current = next(progress)
                 for user_id in users:
                     stdout, stderr, returncode = self.run_adb_command(
                         ["shell", "pm", "disable-user", "--user", user_id, package], device_id)
@@ -3033,6 +3247,10 @@ class USBVRManager:
                     else:
                         self.log_message(f"[{current}/{total}] ✗ Failed to disable {package} on {nickname}: {stderr}")
 
+        for result in self.fleet.submit(devices, disable_on_device):
+            if not result.ok:
+                self.log_message(f"✗ Failed to disable apps on {result.device_id}: {result.error}")
+
         self.log_message("Disable operation completed!")
         # Rafraîchir la liste pour mettre à jour les couleurs
         self.root.after(0, self.load_ed_packages)
@@ -3062,28 +3280,24 @@ class USBVRManager:
         thread.start()
 
     def _enable_apps_thread(self, packages, devices):
-        """Thread pour activer les apps sur plusieurs devices"""
+        """Thread pour activer les apps sur plusieurs devices (en parallèle)"""
         total = len(packages) * len(devices)
-        current = 0
+        progress = itertools.count(1)
+        all_users = self.ed_all_users_var.get()
 
-        for device_id in devices:
+        def enable_on_device(device_id):
             # Trouver le nickname
-            nickname = device_id
-            for did, info in self.devices.items():
-                ip = info.get("ip_address", "")
-                if did == device_id or (ip and f"{ip}:5555" == device_id):
-                    nickname = info.get("nickname", device_id)
-                    break
+            nickname = self.devices.nickname(device_id, device_id)
 
             self.log_message(f"Processing {nickname}...")
 
-            if self.ed_all_users_var.get():
+            if all_users:
                 users = self.get_device_users(device_id)
             else:
                 users = ["0"]
 
             for package in packages:
-                current += 1
+                current = next(progress)
                 for user_id in users:
                     stdout, stderr, returncode = self.run_adb_command(
                         ["shell", "pm", "enable", "--user", user_id, package], device_id)
@@ -3092,35 +3306,216 @@ class USBVRManager:
                     else:
                         self.log_message(f"[{current}/{total}] ✗ Failed to enable {package} on {nickname}: {stderr}")
 
+        for result in self.fleet.submit(devices, enable_on_device):
+            if not result.ok:
+                self.log_message(f"✗ Failed to enable apps on {result.device_id}: {result.error}")
+
         self.log_message("Enable operation completed!")
         # Rafraîchir la liste pour mettre à jour les couleurs
         self.root.after(0, self.load_ed_packages)
 
+    # ---------- Profils de déploiement ----------
+
+    def refresh_profile_groups(self):
+        """Met à jour le dropdown des groupes dans Profiles (profil affiché conservé)"""
+        groups = self.get_all_groups()
+        self.profile_group_combo["values"] = groups
+        if self.profile_group_var.get() not in groups:
+            self.profile_group_var.set(groups[0] if groups else "")
+            self.load_profile_form()
+
+    def load_profile_form(self):
+        """Affiche le profil du groupe sélectionné"""
+        group = self.profile_group_var.get()
+        profile = self.profiles.load(group) if group else empty_profile()
+        self.profile_apk_listbox.delete(0, tk.END)
+        for apk in profile.apks:
+            self.profile_apk_listbox.insert(tk.END, apk)
+        for text, packages in ((self.profile_forbidden_text, profile.forbidden),
+                               (self.profile_disabled_text, profile.disabled)):
+            text.delete("1.0", tk.END)
+            text.insert("1.0", "\n".join(packages))
+        self.profile_folders = list(profile.sync)
+        self.profile_sync_listbox.delete(0, tk.END)
+        for folder in self.profile_folders:
+            self.profile_sync_listbox.insert(tk.END, f"{folder.pc} -> {folder.headset}")
+
+    def profile_from_form(self):
+        """Profile saisi dans l'onglet"""
+        def lines(text):
+            return [line.strip() for line in text.get("1.0", tk.END).splitlines() if line.strip()]
+
+        remaining = set(self.profile_sync_listbox.get(0, tk.END))
+        folders = [folder for folder in self.profile_folders if f"{folder.pc} -> {folder.headset}" in remaining]
+        return Profile(list(self.profile_apk_listbox.get(0, tk.END)), lines(self.profile_forbidden_text),
+                       lines(self.profile_disabled_text), folders)
+
+    def save_profile(self):
+        """Enregistre le profil du groupe sélectionné (profiles/<groupe>.json)"""
+        group = self.profile_group_var.get()
+        if not group:
+            messagebox.showwarning("Warning", "Assign devices to a group first")
+            return False
+        try:
+            self.profiles.save(group, self.profile_from_form())
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save profile: {e}")
+            return False
+        self.log_message(f"Profil enregistré pour le groupe '{group}'")
+        self.load_profile_form()
+        return True
+
+    def add_profile_apks(self):
+        """Ajoute des APK requis au profil"""
+        files = filedialog.askopenfilenames(
+            title="Select APK files",
+            filetypes=[("APK files", "*.apk"), ("All files", "*.*")]
+        )
+        existing = set(self.profile_apk_listbox.get(0, tk.END))
+        for file in files:
+            if file not in existing:
+                self.profile_apk_listbox.insert(tk.END, file)
+
+    def add_profile_folder(self):
+        """Ajoute un dossier PC et sa destination sur les casques"""
+        pc_folder = filedialog.askdirectory(title="Select PC folder to sync")
+        if not pc_folder:
+            return
+        group = self.profile_group_var.get()
+        headset_folder = simpledialog.askstring("Headset folder", "Enter headset folder path:",
+                                                initialvalue=self.get_sync_path_for_group(group, "videos"))
+        if not headset_folder:
+            return
+        folder = SyncFolder(pc_folder, headset_folder)
+        self.profile_folders.append(folder)
+        self.profile_sync_listbox.insert(tk.END, f"{folder.pc} -> {folder.headset}")
+
+    def remove_selected(self, listbox):
+        """Retire les lignes sélectionnées d'une liste"""
+        for index in reversed(listbox.curselection()):
+            listbox.delete(index)
+
+    def reconcile_profiles(self, apply, all_groups=False):
+        """Compare les casques connectés à leur profil; apply: exécute les actions manquantes"""
+        if apply and not all_groups and not self.save_profile():
+            return
+        groups = [group for group in self.get_all_groups() if self.profiles.exists(group)] \
+            if all_groups else [self.profile_group_var.get()]
+        targets = {}
+        for group in groups:
+            profile = self.profile_from_form() if group == self.profile_group_var.get() and not all_groups \
+                else self.profiles.load(group)
+            for device_id in self.get_connected_devices_by_group(group):
+                targets[device_id] = profile
+        if not targets:
+            messagebox.showerror("Error", "No connected devices found for these profiles")
+            return
+        if apply and not messagebox.askyesno("Confirm",
+                                             f"Apply {len(groups)} profile(s) to {len(targets)} connected device(s)?"):
+            return
+        thread = threading.Thread(target=self._reconcile_thread, args=(targets, apply))
+        thread.daemon = True
+        thread.start()
+
+    def _reconcile_thread(self, targets, apply):
+        """Thread des profils: relevé parallèle, plan minimal, puis exécution des seules différences"""
+        start = time.monotonic()
+        self.log_message(f"Relevé de l'état de {len(targets)} casque(s)...")
+        plans, errors = self.reconciler.plan(targets)
+        for device_id, error in errors.items():
+            self.log_message(f"✗ {self.devices.nickname(device_id, device_id)}: {error}")
+        total = sum(len(actions) for actions in plans.values())
+        for device_id, actions in plans.items():
+            device_name = self.devices.nickname(device_id, device_id)
+            if not actions:
+                self.log_message(f"= {device_name} conforme au profil")
+                continue
+            self.log_message(f"{device_name}: {len(actions)} action(s)")
+            if not apply:
+                for action in actions:
+                    self.log_message(f"   - {describe(action)}")
+        if not apply or not total:
+            self.log_message(f"Profils: {total} action(s) nécessaire(s) sur {len(plans)} casque(s) "
+                             f"({time.monotonic() - start:.1f} s)")
+            return
+
+        def on_action(device_id, action, error):
+            device_name = self.devices.nickname(device_id, device_id)
+            if error:
+                self.log_message(f"✗ {device_name}: {describe(action)}: {error}")
+            else:
+                self.log_message(f"✓ {device_name}: {describe(action)}")
+
+        engine = InstallEngine(self.push_apk, self.pm_install, self.stream_apk, self.commit_apk,
+                               max_usb=self.install_limits["install_usb"],
+                               max_wifi=self.install_limits["install_wifi"], executor=self.fleet)
+        consumers = Counter()
+        for actions in plans.values():
+            for action in actions:
+                if action.kind == ACTION_INSTALL:
+                    consumers.update(action.target)
+                elif action.kind == ACTION_PUSH:
+                    consumers[action.target[0]] += 1
+        with self.adb_manager.fanout.planned(consumers):
+            results = self.reconciler.apply(plans, engine, on_action)
+        failed = sum(1 for _, _, error in results if error)
+        self.log_message(f"Profils appliqués: {len(results) - failed}/{len(results)} action(s) réussie(s) "
+                         f"en {time.monotonic() - start:.1f} s")
+        if any(action.kind in (ACTION_INSTALL, ACTION_PUSH) for _, action, _ in results):
+            self.log_fanout_stats()
+
+    def profile_shell(self, device_id, command):
+        """Commande shell du réconciliateur, retourne (stdout, code retour)"""
+        stdout, _, returncode = self.run_adb_command(["shell", command], device_id)
+        return stdout, returncode
+
+    def push_file(self, device_id, local_path, remote_path):
+        """Copie un fichier (délai selon le débit mesuré), retourne une erreur ou None"""
+        size = os.path.getsize(local_path)
+        push_start = time.monotonic()
+        _, stderr, returncode = self.run_adb_command(["push", local_path, remote_path], device_id,
+                                                     timeout=self.throughput.timeout_for(device_id, size))
+        if returncode != 0:
+            return stderr.strip() or "échec du transfert"
+        self.throughput.record(device_id, size, time.monotonic() - push_start)
+        return None
+
     def on_tab_changed(self, event):
-        """Rafraîchit automatiquement les données de l'onglet actif"""
-        tab_index = event.widget.index("current")
-        tab_name = event.widget.tab(tab_index, "text")
+        """Rafraîchit automatiquement les données de l'onglet actif (depuis la mémoire, sans adb)"""
+        tab_name = event.widget.tab(event.widget.index("current"), "text")
+
+        if tab_name == "Scan for missing APKs":
+            self.refresh_missing_groups()
+        elif tab_name == "Sync folder":
+            self.refresh_sync_groups()
+        elif tab_name == "Profiles":
+            self.refresh_profile_groups()
+        else:
+            self.render_device_tab(tab_name)
 
+    def render_device_tab(self, tab_name):
+        """Redessine la liste de casques d'un onglet (sélections et apps chargées conservées)"""
         if tab_name == "Scan for devices":
-            pass  # Pas de refresh auto (scan manuel)
+            self.refresh_devices_list()
         elif tab_name == "Install APK":
             self.refresh_install_devices()
-        elif tab_name == "Scan for missing APKs":
-            self.refresh_missing_groups()
         elif tab_name == "Uninstall APK":
-            self.refresh_uninstall_devices()
-        elif tab_name == "Sync folder":
-            self.refresh_sync_groups()
+            self.refresh_uninstall_devices(reset=False)
         elif tab_name == "Enable / Disable App":
-            self.refresh_ed_devices()
+            self.refresh_ed_devices(reset=False)
         elif tab_name == "Casting":
             self.refresh_casting_devices()
 
+    def _on_device_states_changed(self, changed):
+        """Un casque a changé d'état: seul l'onglet affiché est redessiné"""
+        self.render_device_tab(self.notebook.tab(self.notebook.index("current"), "text"))
+
     def refresh_missing_groups(self):
         """Met à jour le dropdown des groupes dans Missing APKs"""
         if hasattr(self, 'missing_group_combo'):
             groups = ["Tous"] + self.get_all_groups()
             self.missing_group_combo["values"] = groups
+            self.refresh_history_devices()
 
     def run(self):
         """Lance l'application"""
@@ -6,17 +6,27 @@ Gestion du casting de casques VR via ADB WiFi et scrcpy
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox
 import subprocess
 import os
 import json
 import re
+import socket
 import threading
 import time
 from datetime import datetime
 from pathlib import Path
 from collections import deque
 
+from adb_client import (AdbClient, AdbConnectionError, AdbError, AdbUnsupported,
+                        FINGERPRINT_SCRIPT, adb_exe_shell_lines, parse_fingerprint)
+from fleet import FleetExecutor
+from device_cache import PropertyCache
+from dumpsys import WINDOWS_COMMAND, BATTERY_COMMAND, parse_current_focus, parse_battery_level
+from reconnect import ReconnectEngine, RECONNECT_CONNECTED, RECONNECT_CONNECTING, RECONNECT_TIMEOUT
+from onboarding import OnboardingQueue, NicknameTable, ONBOARD_QUEUED, ONBOARD_READY, ONBOARD_FAILED
+from subnet_sweep import SubnetSweeper, subnet_hosts, default_subnets
+
 
 # =============================================================================
 # CONFIGURATION ET GESTION DES FICHIERS
@@ -27,6 +37,7 @@ class ConfigManager:
 
     DEFAULT_CONFIG = {
         "ssid": "",
+        "subnet": "",  # Sous-réseau(x) balayé(s) pour retrouver les casques, sinon les /24 des IP connues
         "scrcpy_presets": {
             "Quest 3": ["--no-audio", "--angle=20", "--crop=1500:1500:370:200"],
             "Quest 2": ["--no-audio", "--crop=1080:900:270:270"],
@@ -178,6 +189,10 @@ class ADBManager:
             self.adb_path = adb_path
         else:
             self.adb_path = self.find_adb_path()
+        self.client = AdbClient(self.adb_path)
+        # Propriétés stables (modèle, MAC...) mémorisées jusqu'au redémarrage du casque
+        self.cache = PropertyCache(self.read_boot_id)
+        self.client.track_devices().subscribe(self._on_device_event)
 
     def find_adb_path(self):
         """Trouve le chemin vers adb.exe"""
@@ -194,10 +209,16 @@ class ADBManager:
         return None
 
     def run_command(self, command, device_id=None, timeout=30):
-        """Exécute une commande ADB"""
+        """Exécute une commande ADB (client natif, repli sur adb.exe)"""
         if not self.adb_path:
             return "", "ADB not found", 1
 
+        # Client natif: pas de processus adb.exe par commande
+        try:
+            return self.client.run(command, device_id, timeout)
+        except (AdbUnsupported, AdbConnectionError):
+            pass
+
         try:
             if device_id:
                 cmd = [self.adb_path, "-s", device_id] + command
@@ -212,8 +233,33 @@ class ADBManager:
         except Exception as e:
             return "", str(e), 1
 
+    def shell_lines(self, device_id, command, timeout=60):
+        """Sortie d'une commande shell ligne par ligne (l'appelant peut s'arrêter avant la fin)
+
+        Lève AdbError si la sortie s'arrête avant la fin de la commande.
+        """
+        if not self.adb_path:
+            raise AdbError("adb introuvable")
+        started = False
+        try:
+            for line in self.client.shell_lines(device_id, command, timeout):
+                started = True
+                yield line
+            return
+        except AdbConnectionError:
+            if started:
+                raise
+
+        # Repli adb.exe (serveur adb injoignable)
+        yield from adb_exe_shell_lines(self.adb_path, device_id, command, timeout)
+
     def get_devices(self):
         """Retourne la liste des appareils connectés"""
+        # Suivi host:track-devices tenu à jour par le serveur adb (sans requête)
+        states = self.client.track_devices().snapshot()
+        if states is not None:
+            return [device_id for device_id, state in states.items() if state == "device"]
+
         stdout, stderr, rc = self.run_command(["devices"])
         devices = []
         if rc == 0:
@@ -223,12 +269,40 @@ class ADBManager:
                     devices.append(device_id)
         return devices
 
+    def device_waiter(self):
+        """Attente réveillée dès qu'un appareil est branché, débranché ou autorisé"""
+        return self.client.track_devices().waiter()
+
+    def probe_device(self, device_id):
+        """Empreinte complète de l'appareil (modèle, IP, MAC, SSID, batterie...) en un seul appel shell"""
+        stdout, _, rc = self.run_command(["shell", FINGERPRINT_SCRIPT], device_id)
+        if rc != 0:
+            return None
+        fingerprint = parse_fingerprint(stdout, device_id)
+        if fingerprint:
+            # L'empreinte alimente le cache: pas de nouvelle requête pour le modèle ou la MAC
+            self.cache.set_boot_id(device_id, fingerprint.boot_id)
+            if fingerprint.model != "Unknown":
+                self.cache.put(device_id, "model", fingerprint.model)
+            if fingerprint.mac:
+                self.cache.put(device_id, "mac", fingerprint.mac)
+        return fingerprint
+
+    def read_boot_id(self, device_id):
+        """Identifiant de démarrage du casque (change à chaque redémarrage)"""
+        stdout, _, rc = self.run_command(["shell", "cat", "/proc/sys/kernel/random/boot_id"], device_id)
+        return (stdout.strip() or None) if rc == 0 else None
+
+    def _on_device_event(self, event, device_id, state, previous_state):
+        # Débranché, redémarré ou ré-autorisé: le boot id sera relu au prochain accès
+        self.cache.forget(device_id)
+
     def get_device_model(self, device_id):
         """Récupère le modèle de l'appareil"""
-        stdout, _, rc = self.run_command(["shell", "getprop", "ro.product.model"], device_id)
-        if rc == 0:
-            return stdout.strip()
-        return "Unknown"
+        def load():
+            stdout, _, rc = self.run_command(["shell", "getprop", "ro.product.model"], device_id)
+            return (stdout.strip() or None) if rc == 0 else None
+        return self.cache.get(device_id, "model", load) or "Unknown"
 
     def get_device_ip(self, device_id):
         """Récupère l'adresse IP WiFi de l'appareil"""
@@ -251,23 +325,23 @@ class ADBManager:
         return None
 
     def get_device_mac(self, device_id):
-        """Récupère l'adresse MAC de l'appareil"""
-        # Utilise grep sur le device pour éviter les problèmes d'encodage avec le dump complet
-        stdout, _, rc = self.run_command(["shell", "dumpsys wifi | grep mWifiInfo | head -1"], device_id)
-        if rc == 0:
-            match = re.search(r'MAC: ([0-9a-fA-F:]+)', stdout)
-            if match:
-                return match.group(1).lower()
-        return None
+        """Récupère l'adresse MAC de l'appareil (en cache jusqu'au redémarrage)"""
+        def load():
+            # Utilise grep sur le device pour éviter les problèmes d'encodage avec le dump complet
+            stdout, _, rc = self.run_command(["shell", "dumpsys wifi | grep mWifiInfo | head -1"], device_id)
+            if rc == 0:
+                match = re.search(r'MAC: ([0-9a-fA-F:]+)', stdout)
+                if match:
+                    return match.group(1).lower()
+            return None
+        return self.cache.get(device_id, "mac", load)
 
     def get_battery_level(self, device_id):
         """Récupère le niveau de batterie"""
-        stdout, _, rc = self.run_command(["shell", "dumpsys", "battery"], device_id)
-        if rc == 0:
-            match = re.search(r'level: (\d+)', stdout)
-            if match:
-                return int(match.group(1))
-        return None
+        try:
+            return parse_battery_level(self.shell_lines(device_id, BATTERY_COMMAND))
+        except AdbError:
+            return None
 
     def get_controller_batteries(self, device_id):
         """Récupère les niveaux de batterie des manettes"""
@@ -309,12 +383,10 @@ class ADBManager:
 
     def get_current_app(self, device_id):
         """Récupère l'application en cours"""
-        stdout, _, rc = self.run_command(["shell", "dumpsys", "window"], device_id)
-        if rc == 0:
-            matches = re.findall(r'mCurrentFocus=Window\{[^}]+ ([^\s}]+)\}', stdout)
-            if matches:
-                return matches[-1]
-        return None
+        try:
+            return parse_current_focus(self.shell_lines(device_id, WINDOWS_COMMAND))
+        except AdbError:
+            return None
 
     def close_app(self, device_id, package_name):
         """Ferme une application"""
@@ -343,19 +415,35 @@ class ADBManager:
         stdout, stderr, rc = self.run_command(["tcpip", "5555"], device_id)
         return rc == 0
 
-    def connect_wifi(self, ip_address):
+    def connect_wifi(self, ip_address, timeout=5):
         """Connecte à un appareil via WiFi (tentative unique)"""
         print(f"[ADB] Connexion à {ip_address}:5555...")
-        stdout, stderr, rc = self.run_command(["connect", f"{ip_address}:5555"], timeout=5)
+        stdout, stderr, rc = self.run_command(["connect", f"{ip_address}:5555"], timeout=timeout)
         print(f"[ADB] Réponse: stdout='{stdout.strip()}', stderr='{stderr.strip()}', rc={rc}")
 
         if "connected" in stdout.lower() or "already connected" in stdout.lower():
-            print(f"[ADB] Connexion réussie!")
+            print("[ADB] Connexion réussie!")
             return True
 
-        print(f"[ADB] Connexion échouée")
+        print("[ADB] Connexion échouée")
         return False
 
+    def connect_when_ready(self, ip_address, timeout=10):
+        """Après 'adb tcpip 5555': attend que le port réponde puis connecte (pas de délai fixe)"""
+        deadline = time.monotonic() + timeout
+        delay = 0.2
+        while True:
+            try:
+                socket.create_connection((ip_address, 5555), timeout=0.5).close()
+                if self.connect_wifi(ip_address):
+                    return True
+            except OSError:
+                pass  # adbd pas encore relancé en mode TCP
+            if time.monotonic() + delay > deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
     def disconnect_wifi(self, ip_address):
         """Déconnecte un appareil WiFi"""
         self.run_command(["disconnect", f"{ip_address}:5555"])
@@ -520,200 +608,6 @@ def show_startup_dialog():
     return result["choice"]
 
 
-# =============================================================================
-# DIALOGUE DE CONFIGURATION D'APPAREIL
-# =============================================================================
-
-class DeviceSetupDialog:
-    """Dialogue de configuration d'un nouvel appareil"""
-
-    def __init__(self, parent, device_info, adb_manager, log_callback):
-        self.result = None
-        self.device_info = device_info
-        self.adb = adb_manager
-        self.log = log_callback
-
-        self.dialog = tk.Toplevel(parent)
-        self.dialog.title(f"Configuration - {device_info['model']}")
-        self.dialog.geometry("450x350")
-        self.dialog.resizable(False, False)
-        self.dialog.transient(parent)
-        self.dialog.grab_set()
-
-        # Centrer
-        self.dialog.update_idletasks()
-        x = (self.dialog.winfo_screenwidth() - 450) // 2
-        y = (self.dialog.winfo_screenheight() - 350) // 2
-        self.dialog.geometry(f"+{x}+{y}")
-
-        # Titre
-        tk.Label(
-            self.dialog,
-            text=f"Configuration de {device_info['model']}",
-            font=("Helvetica", 12, "bold")
-        ).pack(pady=10)
-
-        # Frame pour les étapes
-        self.steps_frame = tk.Frame(self.dialog)
-        self.steps_frame.pack(fill="x", padx=20, pady=10)
-
-        # Étapes de vérification
-        self.steps = [
-            ("mac", "Adresse MAC"),
-            ("ip", "Adresse IP"),
-            ("model", "Type d'appareil"),
-            ("adb_wifi", "ADB over WiFi"),
-            ("proximity", "Proximity sensor désactivé")
-        ]
-
-        self.step_labels = {}
-        self.step_status = {}
-
-        for key, text in self.steps:
-            frame = tk.Frame(self.steps_frame)
-            frame.pack(fill="x", pady=2)
-
-            status_label = tk.Label(frame, text="[ ]", width=4)
-            status_label.pack(side="left")
-            self.step_status[key] = status_label
-
-            text_label = tk.Label(frame, text=text, anchor="w", width=25)
-            text_label.pack(side="left", padx=5)
-
-            value_label = tk.Label(frame, text="...", anchor="w", fg="gray")
-            value_label.pack(side="left", padx=5)
-            self.step_labels[key] = value_label
-
-        # Boutons
-        self.btn_frame = tk.Frame(self.dialog)
-        self.btn_frame.pack(pady=20)
-
-        self.cancel_btn = tk.Button(
-            self.btn_frame,
-            text="Annuler",
-            command=self.cancel,
-            width=15
-        )
-        self.cancel_btn.pack(side="left", padx=10)
-
-        # Lancer la configuration
-        self.dialog.after(500, self.run_setup)
-
-    def update_step(self, key, success, value=""):
-        """Met à jour l'affichage d'une étape"""
-        if success:
-            self.step_status[key].config(text="[OK]", fg="green")
-            self.step_labels[key].config(text=value, fg="black")
-        else:
-            self.step_status[key].config(text="[X]", fg="red")
-            self.step_labels[key].config(text=value, fg="red")
-        self.dialog.update()
-
-    def run_setup(self):
-        """Exécute les étapes de configuration"""
-        device_id = self.device_info['device_id']
-        success = True
-        print(f"[Setup] Démarrage pour {device_id}")
-
-        # 1. MAC Address
-        print(f"[Setup] Étape 1: MAC Address...")
-        mac = self.adb.get_device_mac(device_id)
-        if mac:
-            self.device_info['mac'] = mac
-            self.update_step("mac", True, mac)
-            print(f"[Setup] MAC: {mac}")
-        else:
-            self.update_step("mac", False, "Non trouvée")
-            print(f"[Setup] MAC: ÉCHEC")
-            success = False
-
-        # 2. IP Address
-        print(f"[Setup] Étape 2: IP Address...")
-        ip = self.adb.get_device_ip(device_id)
-        if ip:
-            self.device_info['ip'] = ip
-            self.update_step("ip", True, ip)
-            print(f"[Setup] IP: {ip}")
-        else:
-            self.update_step("ip", False, "Non trouvée")
-            print(f"[Setup] IP: ÉCHEC")
-            success = False
-
-        # 3. Model (déjà récupéré)
-        self.update_step("model", True, self.device_info['model'])
-        print(f"[Setup] Modèle: {self.device_info['model']}")
-
-        # 4. ADB over WiFi
-        print(f"[Setup] Étape 4: ADB over WiFi...")
-        if success:
-            if self.adb.enable_wifi_adb(device_id):
-                print(f"[Setup] tcpip 5555 OK, attente 3s...")
-                time.sleep(3)
-                if ip and self.adb.connect_wifi(ip):
-                    self.update_step("adb_wifi", True, f"{ip}:5555")
-                    print(f"[Setup] Connexion WiFi: OK")
-                else:
-                    self.update_step("adb_wifi", False, "Connexion échouée")
-                    print(f"[Setup] Connexion WiFi: ÉCHEC")
-                    success = False
-            else:
-                self.update_step("adb_wifi", False, "Activation échouée")
-                print(f"[Setup] tcpip 5555: ÉCHEC")
-                success = False
-        else:
-            self.update_step("adb_wifi", False, "Étape précédente échouée")
-            print(f"[Setup] ADB WiFi: sauté (erreur précédente)")
-
-        # 5. Disable proximity
-        print(f"[Setup] Étape 5: Désactiver proximity...")
-        if success:
-            wifi_device_id = f"{ip}:5555"
-            if self.adb.disable_proximity_sensor(wifi_device_id):
-                self.update_step("proximity", True, "Commande OK")
-                print(f"[Setup] Proximity: commande envoyée (rc=0)")
-            else:
-                self.update_step("proximity", False, "Commande échouée")
-                print(f"[Setup] Proximity: commande ÉCHOUÉE (rc!=0)")
-                success = False
-        else:
-            self.update_step("proximity", False, "Étape précédente échouée")
-            print(f"[Setup] Proximity: sauté (erreur précédente)")
-
-        # Résultat
-        print(f"[Setup] Résultat: {'SUCCÈS' if success else 'ÉCHEC'}")
-        if success:
-            self.result = self.device_info
-            self.ask_nickname()
-        else:
-            messagebox.showerror(
-                "Erreur",
-                "La configuration a échoué. Veuillez reconnecter l'appareil et réessayer.",
-                parent=self.dialog
-            )
-
-    def ask_nickname(self):
-        """Demande le nickname de l'appareil"""
-        default_name = self.device_info.get('mac', 'Device')
-
-        nickname = simpledialog.askstring(
-            "Nom de l'appareil",
-            f"Quel est le nom de cet appareil?\n(exemple: Q3-07 ou A-13)\n\nPar défaut: {default_name}",
-            initialvalue=default_name,
-            parent=self.dialog
-        )
-
-        if nickname:
-            self.device_info['nickname'] = nickname
-        else:
-            self.device_info['nickname'] = default_name
-
-        self.dialog.destroy()
-
-    def cancel(self):
-        self.result = None
-        self.dialog.destroy()
-
-
 # =============================================================================
 # APPLICATION PRINCIPALE
 # =============================================================================
@@ -732,6 +626,13 @@ class VRCastingManager:
         self.log_manager = LogManager()
         self.adb = ADBManager()
         self.scrcpy = ScrcpyManager()
+        self.fleet = FleetExecutor()  # Télémétrie de tous les casques en parallèle
+        self.reconnector = ReconnectEngine(self.adb.connect_wifi, executor=self.fleet)  # Reconnexion WiFi parallèle
+        self.sweeper = SubnetSweeper(self.adb, executor=self.fleet)  # Casques qui ont changé d'IP (DHCP)
+        # Casques branchés en USB: configurés en parallèle, noms demandés par lot
+        self.onboarding = OnboardingQueue(self.adb, self._on_onboarding_update,
+                                          self._on_onboarding_batch, self._check_onboarding_ssid,
+                                          executor=self.fleet)
 
         # État
         self.usb_detection_active = False
@@ -911,21 +812,19 @@ class VRCastingManager:
             self.usb_detection_thread.start()
 
     def usb_detection_loop(self):
-        """Boucle de détection des appareils USB"""
-        known_macs = set()
+        """Boucle de détection: chaque casque branché en USB entre dans la file d'intégration"""
         seen_usb_devices = set()  # Track les device_id USB actuellement branchés
 
-        # Récupérer les MAC des appareils déjà connus
-        for mac, info in self.session.get_devices().items():
-            known_macs.add(mac)
+        known_count = len(self.session.get_devices())
+        self.root.after(0, lambda: self.log(f"Détection USB: {known_count} appareil(s) déjà connu(s)"))
 
-        self.root.after(0, lambda: self.log(f"Détection USB: {len(known_macs)} appareil(s) déjà connu(s)"))
+        # Réveillé par les événements du serveur adb plutôt que par le seul délai de scrutation
+        waiter = self.adb.device_waiter()
 
         while self.usb_detection_active:
             try:
                 devices = self.adb.get_devices()
-                usb_devices = [d for d in devices if ':' not in d]
-                current_usb_set = set(usb_devices)
+                current_usb_set = {d for d in devices if ':' not in d}
 
                 # Détecter les NOUVEAUX appareils USB (branchés depuis le dernier scan)
                 new_usb_devices = current_usb_set - seen_usb_devices
@@ -936,155 +835,84 @@ class VRCastingManager:
                 if new_usb_devices:
                     self.root.after(0, lambda devs=new_usb_devices: self.log(f"Nouveau(x) branchement(s): {len(devs)} appareil(s)"))
 
-                for device_id in new_usb_devices:
-                    # Récupérer la MAC
-                    mac = self.adb.get_device_mac(device_id)
-
-                    if not mac:
-                        self.root.after(0, lambda d=device_id: self.log(f"  - {d}: impossible de récupérer la MAC"))
-                        continue
+                # Tous configurés en parallèle (empreinte, SSID, ADB WiFi, proximité)
+                for device_id in sorted(new_usb_devices):
+                    self.onboarding.submit(device_id)
 
-                    if mac in known_macs:
-                        # Casque connu - vérifier IP et refaire connexion ADB WiFi
-                        self.root.after(0, lambda d=device_id, m=mac: self.log(f"  - {d}: déjà connu (MAC: {m}), vérification..."))
-                        self.root.after(0, lambda d=device_id, m=mac: self.handle_known_device_reconnect(d, m))
-                        continue
-
-                    # Nouvel appareil détecté
-                    self.root.after(0, lambda d=device_id, m=mac: self.log(f"  - {d}: NOUVEAU! (MAC: {m})"))
-                    self.root.after(0, lambda d=device_id, m=mac: self.handle_new_device(d, m))
-                    known_macs.add(mac)
-
-                time.sleep(3)
+                waiter.wait(3)
             except Exception as e:
                 self.root.after(0, lambda err=str(e): self.log(f"Erreur détection: {err}"))
                 time.sleep(5)
 
-    def handle_new_device(self, device_id, mac):
-        """Gère un nouvel appareil détecté"""
-        self.log(f"Configuration de {device_id}...")
+        waiter.close()
 
-        # Vérifier le SSID
-        self.log(f"  Vérification du SSID...")
-        device_ssid = self.adb.get_device_ssid(device_id)
+    def _check_onboarding_ssid(self, job):
+        """Contrôle de la file d'intégration: le casque doit être sur le WiFi configuré"""
         configured_ssid = self.config.get("ssid")
-        self.log(f"  SSID appareil: {device_ssid}, SSID config: {configured_ssid}")
-
-        if device_ssid != configured_ssid:
-            self.log(f"  ERREUR: Mauvais SSID!")
-            messagebox.showwarning(
-                "Mauvais réseau WiFi",
-                f"L'appareil est sur '{device_ssid}' plutôt que '{configured_ssid}'!\n\n"
-                f"Connecte-le au bon réseau et réessaie.",
-                parent=self.root
-            )
-            # Ouvrir les paramètres WiFi
-            self.adb.open_wifi_settings(device_id)
-            return
-
-        # Récupérer le modèle
-        self.log(f"  Récupération du modèle...")
-        model = self.adb.get_device_model(device_id)
-        self.log(f"  Modèle: {model}")
-
-        # Vérifier si on a déjà un nickname pour cette MAC
-        existing = self.session.get_device(mac)
-        existing_nickname = existing.get('nickname') if existing else None
-        if existing_nickname:
-            self.log(f"  Nickname existant trouvé: {existing_nickname}")
-
-        device_info = {
-            'device_id': device_id,
-            'mac': mac,
-            'model': model,
-            'ssid': device_ssid
-        }
-
-        # Ouvrir le dialogue de configuration
-        self.log(f"  Ouverture du dialogue de configuration...")
-        setup_dialog = DeviceSetupDialog(self.root, device_info, self.adb, self.log)
-        self.root.wait_window(setup_dialog.dialog)
-
-        if setup_dialog.result:
-            # Utiliser le nickname existant si disponible
-            if existing_nickname:
-                setup_dialog.result['nickname'] = existing_nickname
-
-            # Sauvegarder l'appareil
-            self.session.add_device(mac, setup_dialog.result)
-            self.log(f"Appareil configuré: {setup_dialog.result['nickname']}")
-
-            # Initialiser l'état de proximité comme désactivé (fait pendant le setup)
-            ip = setup_dialog.result.get('ip')
-            if ip:
-                self.proximity_states[f"{ip}:5555"] = False
-
-            # Rafraîchir l'affichage
-            self.refresh_devices_display()
+        if job.ssid == configured_ssid:
+            return None
+        # Ouvrir les paramètres WiFi pour corriger directement dans le casque
+        self.adb.open_wifi_settings(job.serial)
+        return f"mauvais WiFi ('{job.ssid}' au lieu de '{configured_ssid}')"
+
+    def _on_onboarding_update(self, job):
+        """Étape franchie par un casque de la file d'intégration (thread de travail)"""
+        if job.state == ONBOARD_QUEUED:
+            message = f"  - {job.serial}: configuration..."
+        elif job.state == ONBOARD_READY:
+            message = f"  - {job.serial}: {job.model} connecté en WiFi ({job.wireless_id})"
+        elif job.state == ONBOARD_FAILED:
+            message = f"  - {job.serial}: ÉCHEC - {job.error}"
         else:
-            self.log(f"  Configuration annulée ou échouée")
-
-    def handle_known_device_reconnect(self, device_id, mac):
-        """Gère la reconnexion d'un casque déjà connu via USB"""
-        existing = self.session.get_device(mac)
-        if not existing:
-            self.log(f"  Erreur: appareil {mac} non trouvé dans la session")
-            return
-
-        nickname = existing.get('nickname', mac)
-        old_ip = existing.get('ip', '')
-        self.log(f"  Reconnexion de {nickname}...")
-
-        # 1. Vérifier le SSID
-        device_ssid = self.adb.get_device_ssid(device_id)
-        configured_ssid = self.config.get("ssid")
-        if device_ssid != configured_ssid:
-            self.log(f"  {nickname}: ERREUR - mauvais WiFi ({device_ssid} au lieu de {configured_ssid})")
-            messagebox.showwarning(
-                "Mauvais réseau WiFi",
-                f"{nickname} est sur '{device_ssid}' au lieu de '{configured_ssid}'!\n\n"
-                f"Connecte-le au bon réseau WiFi.",
-                parent=self.root
-            )
-            return
-
-        # 2. Récupérer l'IP actuelle
-        new_ip = self.adb.get_device_ip(device_id)
-        if not new_ip:
-            self.log(f"  {nickname}: impossible de récupérer l'IP (WiFi connecté?)")
             return
+        self.root.after(0, lambda: self.log(message))
+
+    def _on_onboarding_batch(self, ready, failed):
+        """Plus aucun casque en cours: le lot est traité dans le thread Tk"""
+        self.root.after(0, lambda: self.finish_onboarding(ready, failed))
+
+    def finish_onboarding(self, ready, failed):
+        """Casques connus mis à jour directement, noms des nouveaux demandés en une fois"""
+        new_jobs = []
+        for job in ready:
+            # La proximité a été désactivée pendant l'intégration
+            self.proximity_states[job.wireless_id] = False
+            existing = self.session.get_device(job.mac)
+            if not existing:
+                new_jobs.append(job)
+                continue
+            nickname = existing.get('nickname', job.mac)
+            if existing.get('ip') != job.ip:
+                self.log(f"  {nickname}: IP changée ({existing.get('ip', '')} -> {job.ip})")
+                self.session.update_device(job.mac, 'ip', job.ip)
+            self.log(f"  {nickname}: connecté!")
 
-        # 3. Comparer les IPs
-        if new_ip != old_ip:
-            self.log(f"  {nickname}: IP changée ({old_ip} -> {new_ip})")
-            self.session.update_device(mac, 'ip', new_ip)
-        else:
-            self.log(f"  {nickname}: même IP ({new_ip})")
-
-        # 4. Activer ADB over WiFi (tcpip 5555)
-        self.log(f"  {nickname}: activation ADB WiFi... (accepte le USB Debug dans le casque si demandé!)")
-        if not self.adb.enable_wifi_adb(device_id):
-            self.log(f"  {nickname}: ÉCHEC tcpip 5555 - as-tu accepté le USB Debug dans le casque?")
+        if new_jobs:
+            NicknameTable(self.root, new_jobs, lambda nicknames: self.save_onboarded_devices(new_jobs, nicknames),
+                          failed=failed)
+        elif failed:
             messagebox.showwarning(
-                "USB Debug requis",
-                f"{nickname}: La connexion ADB a échoué.\n\n"
-                f"As-tu accepté la demande 'Autoriser le débogage USB' dans le casque?\n\n"
-                f"Débranche et rebranche le casque, puis accepte la demande.",
+                "Configuration incomplète",
+                "Ces casques n'ont pas pu être configurés:\n\n"
+                + "\n".join(f"{job.serial}: {job.error}" for job in failed)
+                + "\n\nAccepte le débogage USB dans le casque, puis débranche et rebranche-le.",
                 parent=self.root
             )
-            return
-
-        # Attendre que le mode TCP soit actif
-        time.sleep(2)
+        self.refresh_devices_display()
 
-        # 5. Connexion WiFi
-        self.log(f"  {nickname}: connexion à {new_ip}:5555...")
-        if self.adb.connect_wifi(new_ip):
-            self.log(f"  {nickname}: connecté!")
-            # Rafraîchir l'affichage
-            self.root.after(0, self.refresh_devices_display)
-        else:
-            self.log(f"  {nickname}: ÉCHEC connexion WiFi")
+    def save_onboarded_devices(self, jobs, nicknames):
+        """Enregistre un lot de nouveaux casques avec leurs noms"""
+        for job in jobs:
+            self.session.add_device(job.mac, {
+                'device_id': job.serial,
+                'mac': job.mac,
+                'model': job.model,
+                'ssid': job.ssid,
+                'ip': job.ip,
+                'nickname': nicknames[job.serial]
+            })
+            self.log(f"Appareil configuré: {nicknames[job.serial]}")
+        self.refresh_devices_display()
 
     def reconnect_refresh(self):
         """Reconnecte tous les appareils et rafraîchit les infos"""
@@ -1092,15 +920,25 @@ class VRCastingManager:
 
         def do_refresh():
             devices = self.session.get_devices()
-
-            for mac, info in devices.items():
-                ip = info.get('ip')
-                if ip:
-                    nickname = info.get('nickname', mac)
-                    if self.adb.connect_wifi(ip):
-                        self.root.after(0, lambda n=nickname: self.log(f"Connecté: {n}"))
-                    else:
-                        self.root.after(0, lambda n=nickname: self.log(f"Échec connexion: {n}"))
+            nicknames = {info['ip']: info.get('nickname', mac) for mac, info in devices.items() if info.get('ip')}
+
+            # Toutes les connexions en parallèle, statut de chaque casque au fil de l'eau
+            def on_status(ip, state):
+                nickname = nicknames.get(ip, ip)
+                if state == RECONNECT_CONNECTED:
+                    self.root.after(0, lambda: self.log(f"Connecté: {nickname}"))
+                elif state == RECONNECT_TIMEOUT:
+                    self.root.after(0, lambda: self.log(f"Échec connexion: {nickname} (délai dépassé)"))
+                elif state != RECONNECT_CONNECTING:
+                    self.root.after(0, lambda: self.log(f"Échec connexion: {nickname}"))
+
+            results = self.reconnector.run(list(nicknames), on_status)
+
+            # IP changées ou effacées (DHCP, nouvelle session): balayage du
+            # sous-réseau plutôt que rebrancher chaque casque en USB
+            connected = sum(1 for state in results.values() if state == RECONNECT_CONNECTED)
+            if connected < len(devices):
+                self.rediscover_moved_devices(devices)
 
             # Rafraîchir l'affichage
             self.root.after(0, self.refresh_devices_display)
@@ -1108,6 +946,42 @@ class VRCastingManager:
         thread = threading.Thread(target=do_refresh, daemon=True)
         thread.start()
 
+    def rediscover_moved_devices(self, devices):
+        """Balaye le sous-réseau (port 5555) et met à jour l'IP des casques de la session (thread de travail)"""
+        macs_by_serial = {info.get('device_id'): mac for mac, info in devices.items()}
+
+        def session_mac(identity):
+            if identity.mac in devices:
+                return identity.mac
+            return macs_by_serial.get(identity.serial)
+
+        known_ips = [info['ip'] for info in devices.values() if info.get('ip')]
+        try:
+            hosts = subnet_hosts(self.config.get("subnet") or default_subnets(known_ips))
+        except ValueError as e:
+            self.root.after(0, lambda err=str(e): self.log(f"Balayage impossible: {err}"))
+            return
+        self.root.after(0, lambda: self.log(f"Balayage de {len(hosts)} adresse(s) sur le port 5555..."))
+
+        moved = {}
+        for identity in self.sweeper.discover(hosts, session_mac):
+            mac = session_mac(identity)
+            if devices[mac].get('ip') != identity.ip:
+                moved[mac] = identity.ip
+        self.root.after(0, lambda: self.apply_moved_ips(moved))
+
+    def apply_moved_ips(self, moved):
+        """Enregistre les nouvelles IP trouvées par le balayage (thread Tk)"""
+        for mac, ip in moved.items():
+            device = self.session.get_device(mac)
+            if not device:
+                continue
+            nickname = device.get('nickname', mac)
+            self.log(f"{nickname}: nouvelle IP {device.get('ip') or '?'} -> {ip}")
+            self.session.update_device(mac, 'ip', ip)
+        self.log(f"Balayage terminé: {len(moved)} casque(s) retrouvé(s) à une nouvelle IP")
+        self.refresh_devices_display()
+
     def clear_ips(self):
         """Efface toutes les IPs"""
         if messagebox.askyesno("Confirmation", "Effacer toutes les adresses IP?"):
@@ -1211,37 +1085,37 @@ class VRCastingManager:
 
     def update_devices_info(self):
         """Met à jour les informations de tous les appareils"""
-        def do_update():
-            for mac, widgets in list(self.device_widgets.items()):
-                device_id = widgets['device_id']
+        widgets_by_device = {widgets['device_id']: widgets for widgets in self.device_widgets.values()}
 
-                try:
-                    # App en cours
-                    app = self.adb.get_current_app(device_id)
-                    if app:
-                        display_app = app[:25] + "..." if len(app) > 25 else app
-                        self.root.after(0, lambda w=widgets['app'], a=display_app: w.config(text=a))
-
-                    # Volume
-                    vol = self.adb.get_volume(device_id)
-                    if vol is not None:
-                        self.root.after(0, lambda w=widgets['volume'], v=vol: w.config(text=str(v)))
-
-                    # Batterie
-                    battery = self.adb.get_battery_level(device_id)
-                    if battery is not None:
-                        self.root.after(0, lambda w=widgets['battery'], b=battery: w.config(text=f"{b}%"))
-
-                    # Manettes
-                    left, right = self.adb.get_controller_batteries(device_id)
-                    ctrl_text = f"L:{left or '?'} R:{right or '?'}"
-                    self.root.after(0, lambda w=widgets['controllers'], t=ctrl_text: w.config(text=t))
-
-                except Exception:
-                    pass
-
-        thread = threading.Thread(target=do_update, daemon=True)
-        thread.start()
+        def update_device(device_id):
+            widgets = widgets_by_device[device_id]
+            try:
+                # App en cours
+                app = self.adb.get_current_app(device_id)
+                if app:
+                    display_app = app[:25] + "..." if len(app) > 25 else app
+                    self.root.after(0, lambda w=widgets['app'], a=display_app: w.config(text=a))
+
+                # Volume
+                vol = self.adb.get_volume(device_id)
+                if vol is not None:
+                    self.root.after(0, lambda w=widgets['volume'], v=vol: w.config(text=str(v)))
+
+                # Batterie
+                battery = self.adb.get_battery_level(device_id)
+                if battery is not None:
+                    self.root.after(0, lambda w=widgets['battery'], b=battery: w.config(text=f"{b}%"))
+
+                # Manettes
+                left, right = self.adb.get_controller_batteries(device_id)
+                ctrl_text = f"L:{left or '?'} R:{right or '?'}"
+                self.root.after(0, lambda w=widgets['controllers'], t=ctrl_text: w.config(text=t))
+
+            except Exception:
+                pass
+
+        # Tous les casques en parallèle: un casque lent ne retarde plus les autres
+        self.fleet.submit(list(widgets_by_device), update_device, deadline=30)
 
     def toggle_proximity(self, device_id):
         """Toggle le capteur de proximité"""
@@ -1253,21 +1127,21 @@ class VRCastingManager:
             success = self.adb.disable_proximity_sensor(device_id)
             if success:
                 self.proximity_states[device_id] = False
-                self.log(f"Proximity: commande désactivation envoyée")
+                self.log("Proximity: commande désactivation envoyée")
                 # Mettre à jour le bouton
                 self.update_proximity_button(device_id, False)
             else:
-                self.log(f"Proximity: ÉCHEC désactivation (commande ADB échouée)")
+                self.log("Proximity: ÉCHEC désactivation (commande ADB échouée)")
         else:
             # Actuellement désactivé -> activer
             success = self.adb.enable_proximity_sensor(device_id)
             if success:
                 self.proximity_states[device_id] = True
-                self.log(f"Proximity: commande activation envoyée")
+                self.log("Proximity: commande activation envoyée")
                 # Mettre à jour le bouton
                 self.update_proximity_button(device_id, True)
             else:
-                self.log(f"Proximity: ÉCHEC activation (commande ADB échouée)")
+                self.log("Proximity: ÉCHEC activation (commande ADB échouée)")
 
     def update_proximity_button(self, device_id, is_enabled):
         """Met à jour l'apparence du bouton proximity"""
@@ -12,18 +12,32 @@ import sys
 import time
 import winsound
 
+from adb_client import AdbClient, AdbConnectionError, AdbUnsupported
+from throughput import ThroughputEstimator
+
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 ADB = os.path.join(SCRIPT_DIR, "scrcpy-win64-v3.3.1-quest3-fix", "adb.exe")
 if not os.path.exists(ADB):
     ADB = "adb"  # fallback to PATH
 
+# Native client: talks to the adb server directly instead of spawning adb.exe
+CLIENT = AdbClient(ADB)
+
+# Measured link speed per headset, used to size push timeouts
+THROUGHPUT = ThroughputEstimator(os.path.join(SCRIPT_DIR, "throughput.json"))
+
 
 # ─────────────────────────────────────────────
 # Helpers
 # ─────────────────────────────────────────────
 
 def run_adb(*args, device_id=None, timeout=60):
+    try:
+        return CLIENT.run(list(args), device_id, timeout)
+    except (AdbUnsupported, AdbConnectionError):
+        pass  # fall back to adb.exe
+
     cmd = [ADB]
     if device_id:
         cmd += ["-s", device_id]
@@ -38,6 +52,11 @@ def run_adb(*args, device_id=None, timeout=60):
 
 
 def get_connected_device():
+    # Live device list from host:track-devices, no round trip needed
+    states = CLIENT.track_devices().snapshot()
+    if states is not None:
+        return next((serial for serial, state in states.items() if state == "device"), None)
+
     stdout, _, rc = run_adb("devices", timeout=10)
     if rc != 0:
         return None
@@ -161,6 +180,17 @@ def pick_headset_folder(device_id):
 # Copy logic
 # ─────────────────────────────────────────────
 
+def push_file(device_id, local_path, remote_path):
+    """Push with a timeout sized from the headset's measured throughput."""
+    size = os.path.getsize(local_path)
+    start = time.monotonic()
+    stdout, stderr, rc = run_adb("push", local_path, remote_path, device_id=device_id,
+                                 timeout=THROUGHPUT.timeout_for(device_id, size))
+    if rc == 0:
+        THROUGHPUT.record(device_id, size, time.monotonic() - start)
+    return stdout, stderr, rc
+
+
 def copy_new_files(device_id, pc_folder, remote_folder, shutdown_on_success=False, quest3=False):
     remote_folder = remote_folder.rstrip('/')
 
@@ -209,10 +239,8 @@ def copy_new_files(device_id, pc_folder, remote_folder, shutdown_on_success=Fals
 
         run_adb("shell", f"mkdir -p {shell_quote(remote_dir)}", device_id=device_id)
 
-        size_mb = os.path.getsize(local_path) / (1024 * 1024)
-        push_timeout = max(120, 60 + int(size_mb))
         print(f"[{ts()}]   [{i}/{len(new_files)}] Copying: {rel_path}", end="  ", flush=True)
-        stdout, stderr, rc = run_adb("push", local_path, remote_path, device_id=device_id, timeout=push_timeout)
+        stdout, stderr, rc = push_file(device_id, local_path, remote_path)
 
         if rc == 0:
             print("✓")
@@ -282,10 +310,8 @@ def copy_single_file(device_id, local_file, remote_folder, quest3=False):
 
     run_adb("shell", f"mkdir -p {shell_quote(remote_folder)}", device_id=device_id)
 
-    size_mb = os.path.getsize(local_file) / (1024 * 1024)
-    push_timeout = max(120, 60 + int(size_mb))
     print(f"[{ts()}]   Copying: {filename}", end="  ", flush=True)
-    stdout, stderr, rc = run_adb("push", local_file, remote_path, device_id=device_id, timeout=push_timeout)
+    stdout, stderr, rc = push_file(device_id, local_file, remote_path)
 
     if rc == 0:
         print("✓")
@@ -344,6 +370,9 @@ def main():
     print("  (Press Ctrl+C to quit)")
     print()
 
+    # Wakes up as soon as the adb server reports a plug/unplug (2 s polling otherwise)
+    waiter = CLIENT.track_devices().waiter()
+
     try:
         while True:
             device = get_connected_device()
@@ -389,7 +418,7 @@ def main():
                 print("  (Press Ctrl+C to quit)")
                 print()
 
-            time.sleep(2)
+            waiter.wait(2)
 
     except KeyboardInterrupt:
         print()
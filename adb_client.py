@@ -0,0 +1,1119 @@
+"""
+Client ADB natif
+Dialogue directement avec le serveur adb (smart socket, TCP 5037) au lieu de
+lancer un processus adb.exe par commande.
+"""
+
+import codecs
+import os
+import re
+import socket
+import stat as stat_module
+import struct
+import subprocess
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+
+ADB_HOST = "127.0.0.1"
+ADB_PORT = int(os.environ.get("ANDROID_ADB_SERVER_PORT", "5037"))
+
+# Identifiants des paquets du protocole shell v2
+SHELL_STDIN = 0
+SHELL_STDOUT = 1
+SHELL_STDERR = 2
+SHELL_EXIT = 3
+SHELL_CLOSE_STDIN = 4
+
+# Service sync: taille max d'un paquet DATA et taille des lots de STAT pipelinés
+SYNC_DATA_MAX = 64 * 1024
+SYNC_STAT_BATCH = 256
+
+# Détection d'un push bloqué: sur chaque fenêtre de PUSH_STALL_WINDOW secondes,
+# au moins PUSH_MIN_RATE octets/s doivent passer
+PUSH_STALL_WINDOW = 20
+PUSH_MIN_RATE = 64 * 1024
+
+# Événements publiés par DeviceTracker
+DEVICE_CONNECTED = "connected"
+DEVICE_DISCONNECTED = "disconnected"
+DEVICE_STATE_CHANGED = "state"
+
+# Empreinte d'un appareil: tout ce qu'il faut pour l'accueillir, en un seul aller-retour
+DeviceFingerprint = namedtuple("DeviceFingerprint", [
+    "serial", "model", "android_version", "sdk", "build", "boot_id",
+    "ip", "mac", "ssid", "battery", "storage_free"])
+
+# Script composite de probe_device: une section "@@nom" par information
+FINGERPRINT_SCRIPT = (
+    "echo @@model; getprop ro.product.model; "
+    "echo @@serial; getprop ro.serialno; "
+    "echo @@android; getprop ro.build.version.release; "
+    "echo @@sdk; getprop ro.build.version.sdk; "
+    "echo @@build; getprop ro.build.display.id; "
+    "echo @@boot_id; cat /proc/sys/kernel/random/boot_id 2>/dev/null; "
+    "echo @@ip; ip addr show wlan0 2>/dev/null; "
+    "echo @@wifi; dumpsys wifi 2>/dev/null | grep mWifiInfo | head -1; "
+    "echo @@battery; dumpsys battery 2>/dev/null | grep level; "
+    "echo @@storage; df -k /sdcard 2>/dev/null | tail -1; "
+    "echo @@end"
+)
+
+SyncStat = namedtuple("SyncStat", ["mode", "size", "mtime"])
+SyncEntry = namedtuple("SyncEntry", ["name", "mode", "size", "mtime"])
+
+
+# =============================================================================
+# EXCEPTIONS
+# =============================================================================
+
+class AdbError(Exception):
+    """Erreur renvoyée par le serveur adb (réponse FAIL)"""
+
+
+class AdbConnectionError(AdbError):
+    """Serveur adb injoignable"""
+
+
+class AdbTimeout(AdbError):
+    """Délai dépassé pendant un échange avec le serveur adb"""
+
+
+class AdbStalled(AdbTimeout):
+    """Transfert abandonné: débit sous le plancher pendant toute une fenêtre"""
+
+
+class AdbUnsupported(Exception):
+    """Commande non gérée par le client natif (repli sur adb.exe)"""
+
+
+# =============================================================================
+# CONNEXION SMART SOCKET
+# =============================================================================
+
+class AdbConnection:
+    """Une connexion au serveur adb, avec délai global"""
+
+    def __init__(self, host, port, timeout=30):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        try:
+            self.sock = socket.create_connection((host, port), timeout=self._remaining())
+        except socket.timeout:
+            raise AdbTimeout("Command timeout")
+        except OSError as e:
+            raise AdbConnectionError(f"Serveur adb injoignable ({host}:{port}): {e}")
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _remaining(self):
+        if self.deadline is None:
+            return None
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise AdbTimeout("Command timeout")
+        return remaining
+
+    def set_timeout(self, timeout):
+        """Redéfinit le délai global à partir de maintenant"""
+        self.deadline = time.monotonic() + timeout if timeout else None
+
+    def send(self, data):
+        try:
+            self.sock.settimeout(self._remaining())
+            self.sock.sendall(data)
+        except socket.timeout:
+            raise AdbTimeout("Command timeout")
+        except OSError as e:
+            raise AdbError(f"Connexion au serveur adb perdue: {e}")
+
+    def send_request(self, request):
+        """Envoie une requête préfixée par sa longueur en hexadécimal"""
+        data = request.encode('utf-8')
+        self.send(b"%04x" % len(data) + data)
+
+    def recv(self, size):
+        """Lit au plus size octets (b'' en fin de flux)"""
+        try:
+            self.sock.settimeout(self._remaining())
+            return self.sock.recv(size)
+        except socket.timeout:
+            raise AdbTimeout("Command timeout")
+        except OSError as e:
+            raise AdbError(f"Connexion au serveur adb perdue: {e}")
+
+    def read_exactly(self, size):
+        chunks = []
+        while size > 0:
+            chunk = self.recv(min(size, 65536))
+            if not chunk:
+                raise AdbError("Connexion fermée par le serveur adb")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def read_all(self):
+        chunks = []
+        while True:
+            chunk = self.recv(65536)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def read_string(self):
+        """Lit une chaîne préfixée par sa longueur en hexadécimal"""
+        length = int(self.read_exactly(4), 16)
+        return self.read_exactly(length).decode('utf-8', errors='replace')
+
+    def read_status(self):
+        """Lit OKAY ou FAIL (lève AdbError avec le message du serveur)"""
+        status = self.read_exactly(4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbError(self.read_string())
+        raise AdbError(f"Réponse inattendue du serveur adb: {status!r}")
+
+    def close(self):
+        # shutdown réveille un recv bloqué dans un autre thread
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+# =============================================================================
+# CLIENT
+# =============================================================================
+
+def parse_devices(text):
+    """Analyse une liste host:devices(-l), retourne {serial: état} dans l'ordre du serveur"""
+    devices = {}
+    for line in text.splitlines():
+        if '\t' in line:
+            serial, state = line.split('\t', 1)
+            devices[serial.strip()] = state.strip()
+            continue
+        # Format long: serial aligné par des espaces, puis état et détails (usb:, model:...)
+        parts = line.split()
+        if len(parts) < 2:
+            continue
+        state = parts[1]
+        if state == "no" and len(parts) > 2:
+            state = f"no {parts[2]}"  # "no permissions"
+        devices[parts[0]] = state
+    return devices
+
+
+def read_shell_packet(conn):
+    """Lit un paquet shell v2, retourne (id, données) ou None en fin de flux"""
+    header = conn.recv(5)
+    if not header:
+        return None
+    if len(header) < 5:
+        header += conn.read_exactly(5 - len(header))
+    length = int.from_bytes(header[1:5], 'little')
+    return header[0], conn.read_exactly(length) if length else b""
+
+
+def shell_packet(packet_id, data=b""):
+    """Construit un paquet shell v2"""
+    return bytes([packet_id]) + len(data).to_bytes(4, 'little') + data
+
+
+def iter_lines(chunks):
+    """Découpe un flux d'octets en lignes texte au fil de l'eau (UTF-8 décodé par morceaux)"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = ""
+    for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip('\r')
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip('\r')
+
+
+def adb_exe_shell_lines(adb_path, serial, command, timeout):
+    """Repli adb.exe de shell_lines: pipe lu par morceaux, processus tué si l'appelant s'arrête
+
+    Lève AdbTimeout si le délai coupe la commande et AdbError si adb.exe
+    se termine en erreur: une sortie interrompue n'est jamais rendue entière.
+    """
+    process = subprocess.Popen([adb_path, "-s", serial, "shell", command],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+    expired = threading.Event()
+
+    def kill():
+        expired.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    try:
+        yield from iter_lines(iter(lambda: process.stdout.read1(65536), b""))
+        returncode = process.wait()
+        if expired.is_set():
+            raise AdbTimeout("Command timeout")
+        if returncode != 0:
+            raise AdbError(f"adb shell interrompu (code {returncode})")
+    finally:
+        timer.cancel()
+        process.kill()
+        process.wait()
+
+
+def _text(data):
+    """Décode la sortie d'un casque comme le ferait adb.exe en mode texte"""
+    return data.decode('utf-8', errors='replace').replace('\r\n', '\n')
+
+
+def parse_fingerprint(text, serial=None):
+    """Analyse la sortie de FINGERPRINT_SCRIPT en un seul passage, retourne DeviceFingerprint ou None"""
+    sections = {}
+    current = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("@@"):
+            current = line[2:]
+            sections[current] = []
+        elif current and line:
+            sections[current].append(line)
+    if "end" not in sections:
+        return None  # Script interrompu (appareil déconnecté, shell refusé)
+
+    def first(name):
+        lines = sections.get(name)
+        return lines[0] if lines else None
+
+    def search(name, pattern):
+        match = re.search(pattern, "\n".join(sections.get(name, [])))
+        return match.group(1) if match else None
+
+    sdk = first("sdk")
+    battery = search("battery", r'level: (\d+)')
+    storage = (first("storage") or "").split()
+    mac = search("wifi", r'MAC: ([0-9a-fA-F:]+)')
+    return DeviceFingerprint(
+        serial=first("serial") or serial,
+        model=first("model") or "Unknown",
+        android_version=first("android"),
+        sdk=int(sdk) if sdk and sdk.isdigit() else None,
+        build=first("build"),
+        boot_id=first("boot_id"),
+        ip=search("ip", r'inet (\d+\.\d+\.\d+\.\d+)'),
+        mac=mac.lower() if mac else None,
+        # Supporte les deux formats: SSID: vr-cegep, ou SSID: "vr-cegep",
+        ssid=search("wifi", r'SSID: "?([^",]+)"?'),
+        battery=int(battery) if battery else None,
+        # df -k: Filesystem 1K-blocks Used Available Use% Mounted
+        storage_free=int(storage[3]) * 1024 if len(storage) >= 4 and storage[3].isdigit() else None,
+    )
+
+
+class AdbClient:
+    """Client du protocole hôte du serveur adb (host:*, transport, shell:, exec:)"""
+
+    def __init__(self, adb_path=None, host=ADB_HOST, port=ADB_PORT):
+        self.adb_path = adb_path
+        self.host = host
+        self.port = port
+        self._features = {}
+        self._server_checked = False
+        self._tracker = None
+        self._tracker_lock = threading.Lock()
+        self.channels = ShellChannelPool(self)
+        # Ouverture des fichiers envoyés (remplaçable: lecture partagée entre casques)
+        self.open_local = lambda path: open(path, 'rb')
+
+    # ---------- Connexions de base ----------
+
+    def connect(self, timeout=30):
+        """Ouvre une connexion brute vers le serveur adb"""
+        return AdbConnection(self.host, self.port, timeout)
+
+    def ensure_server(self):
+        """Démarre le serveur adb via adb.exe s'il ne répond pas (une seule fois)"""
+        if self._server_checked:
+            return
+        self._server_checked = True
+        try:
+            self.host_query("host:version", timeout=2)
+            return
+        except AdbError:
+            pass
+        if self.adb_path:
+            try:
+                subprocess.run([self.adb_path, "start-server"], capture_output=True, timeout=20,
+                               creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+            except Exception:
+                pass
+
+    def host_query(self, request, timeout=30):
+        """Requête host:* qui renvoie une chaîne préfixée par sa longueur"""
+        with self.connect(timeout) as conn:
+            conn.send_request(request)
+            conn.read_status()
+            return conn.read_string()
+
+    def transport(self, serial=None, timeout=30):
+        """Ouvre une connexion routée vers un appareil (host:transport)"""
+        conn = self.connect(timeout)
+        try:
+            conn.send_request(f"host:transport:{serial}" if serial else "host:transport-any")
+            conn.read_status()
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def open_service(self, serial, service, timeout=30):
+        """Ouvre un service de l'appareil (shell:, exec:, sync:, tcpip:...)"""
+        conn = self.transport(serial, timeout)
+        try:
+            conn.send_request(service)
+            conn.read_status()
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    # ---------- Requêtes hôte ----------
+
+    def devices(self, long_format=False, timeout=10):
+        """Retourne la sortie brute de host:devices (une ligne par appareil)"""
+        return self.host_query("host:devices-l" if long_format else "host:devices", timeout)
+
+    def get_devices(self, timeout=10):
+        """Retourne {serial: état} des appareils vus par le serveur"""
+        return parse_devices(self.devices(timeout=timeout))
+
+    def track_devices(self):
+        """Retourne le suivi des appareils partagé (démarré au premier appel)"""
+        with self._tracker_lock:
+            if self._tracker is None:
+                self._tracker = DeviceTracker(self)
+                self._tracker.start()
+                # Laisse le temps à la première liste d'arriver (quelques ms en local)
+                self._tracker.first_list.wait(1)
+            return self._tracker
+
+    def features(self, serial=None):
+        """Retourne l'ensemble des features du transport (mis en cache)"""
+        key = serial or ""
+        if key not in self._features:
+            request = f"host-serial:{serial}:features" if serial else "host:features"
+            try:
+                self._features[key] = set(self.host_query(request, timeout=10).split(','))
+            except AdbError:
+                return set()
+        return self._features[key]
+
+    def forget_features(self, serial):
+        """Oublie les features d'un appareil (reconnexion, redémarrage)"""
+        self._features.pop(serial or "", None)
+        self.channels.close(serial)
+
+    # ---------- Services appareil ----------
+
+    def shell(self, serial, command, timeout=30):
+        """Exécute une commande shell, retourne (stdout, stderr, returncode) en octets"""
+        if "shell_v2" in self.features(serial):
+            return self._shell_v2(serial, command, timeout)
+        # Protocole v1: pas de stderr séparé ni de code retour (comme adb.exe)
+        with self.open_service(serial, f"shell:{command}", timeout) as conn:
+            return conn.read_all(), b"", 0
+
+    def _shell_v2(self, serial, command, timeout):
+        stdout, stderr, returncode = [], [], 0
+        with self.open_service(serial, f"shell,v2,raw:{command}", timeout) as conn:
+            while True:
+                packet = read_shell_packet(conn)
+                if packet is None:
+                    break
+                packet_id, data = packet
+                if packet_id == SHELL_STDOUT:
+                    stdout.append(data)
+                elif packet_id == SHELL_STDERR:
+                    stderr.append(data)
+                elif packet_id == SHELL_EXIT:
+                    returncode = data[0] if data else 0
+                    break
+        return b"".join(stdout), b"".join(stderr), returncode
+
+    def shell_stream(self, serial, command, timeout=30):
+        """Renvoie la sortie standard d'une commande shell morceau par morceau
+
+        Fermer le générateur avant la fin ferme la connexion, ce qui
+        interrompt la commande sur le casque. En shell v2, une connexion
+        coupée avant le code retour lève AdbError (sortie tronquée).
+        """
+        self.ensure_server()
+        v2 = "shell_v2" in self.features(serial)
+        service = f"shell,v2,raw:{command}" if v2 else f"shell:{command}"
+        with self.open_service(serial, service, timeout) as conn:
+            while True:
+                if not v2:
+                    chunk = conn.recv(65536)
+                    if not chunk:
+                        return
+                    yield chunk
+                    continue
+                packet = read_shell_packet(conn)
+                if packet is None:
+                    raise AdbError("Sortie shell interrompue avant la fin")
+                if packet[0] == SHELL_EXIT:
+                    return
+                if packet[0] == SHELL_STDOUT:
+                    yield packet[1]
+
+    def shell_lines(self, serial, command, timeout=30):
+        """Sortie d'une commande shell ligne par ligne, sans la garder en mémoire"""
+        return iter_lines(self.shell_stream(serial, command, timeout))
+
+    def exec_out(self, serial, command, timeout=30):
+        """Exécute une commande via exec: (sortie binaire brute, sans pty)"""
+        with self.open_service(serial, f"exec:{command}", timeout) as conn:
+            return conn.read_all()
+
+    def sync(self, serial, timeout=30):
+        """Ouvre une session du service sync (SEND/STAT/LIST/RECV)"""
+        self.ensure_server()
+        return SyncConnection(self, serial, timeout)
+
+    def simple_service(self, serial, service, timeout=30):
+        """Ouvre un service qui répond par du texte puis ferme (tcpip:, reboot:...)"""
+        with self.open_service(serial, service, timeout) as conn:
+            return conn.read_all()
+
+    # ---------- Sessions d'installation (cmd package) ----------
+
+    def _exec_text(self, serial, command, timeout):
+        with self.open_service(serial, f"exec:{command}", timeout) as conn:
+            return _text(conn.read_all()).strip()
+
+    def install_create(self, serial, total_size, options=("-r",), timeout=30):
+        """Ouvre une session d'installation pm, retourne son identifiant
+
+        Lève AdbUnsupported si le casque n'a pas 'cmd' (Android < 7).
+        """
+        self.ensure_server()
+        if "cmd" not in self.features(serial):
+            raise AdbUnsupported("cmd package")
+        output = self._exec_text(serial, f"cmd package install-create {' '.join(options)} -S {total_size}", timeout)
+        match = re.search(r'\[(\d+)\]', output)
+        if not output.startswith("Success") or not match:
+            raise AdbError(output or "install-create: pas de réponse")
+        return match.group(1)
+
+    def install_write(self, serial, session, local_path, name, timeout=300, progress=None):
+        """Écrit un APK dans la session via stdin (aucun fichier temporaire sur le casque)"""
+        size = os.path.getsize(local_path)
+        name = re.sub(r'[^\w.-]', '_', name)
+        with self.open_service(serial, f"exec:cmd package install-write -S {size} {session} {name} -", timeout) as conn:
+            sent = 0
+            with self.open_local(local_path) as f:
+                while True:
+                    chunk = f.read(SYNC_DATA_MAX)
+                    if not chunk:
+                        break
+                    conn.send(chunk)
+                    sent += len(chunk)
+                    if progress:
+                        progress(sent)
+            output = _text(conn.read_all()).strip()
+        if not output.startswith("Success"):
+            raise AdbError(output or "install-write: pas de réponse")
+        return sent
+
+    def install_commit(self, serial, session, timeout=120):
+        """Valide la session, retourne la sortie de pm ('Success' ou 'Failure [...]')"""
+        return self._exec_text(serial, f"cmd package install-commit {session}", timeout)
+
+    def install_abandon(self, serial, session, timeout=10):
+        """Abandonne une session (APK partiellement écrits supprimés par pm)"""
+        try:
+            self._exec_text(serial, f"cmd package install-abandon {session}", timeout)
+        except AdbError:
+            pass
+
+    def install_streamed(self, serial, apk_paths, options=("-r",), timeout=300, progress=None):
+        """Crée une session et y écrit les APK (base + splits) en flux, retourne l'identifiant
+
+        La session est abandonnée si une écriture échoue; il reste à appeler
+        install_commit() (l'installation proprement dite).
+        """
+        deadline = time.monotonic() + timeout
+        session = self.install_create(serial, sum(os.path.getsize(path) for path in apk_paths),
+                                      options, min(timeout, 30))
+        try:
+            written = 0
+            for index, path in enumerate(apk_paths):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AdbTimeout("Command timeout")
+                base = written
+                written += self.install_write(
+                    serial, session, path, f"{index}_{os.path.basename(path)}", remaining,
+                    (lambda sent: progress(base + sent)) if progress else None)
+        except Exception:
+            self.install_abandon(serial, session)
+            raise
+        return session
+
+    # ---------- Compatibilité avec la ligne de commande adb ----------
+
+    def run(self, command, device_id=None, timeout=30):
+        """Exécute une commande au format adb.exe, retourne (stdout, stderr, returncode)
+
+        Lève AdbUnsupported si la commande n'est pas gérée nativement et
+        AdbConnectionError si le serveur adb est injoignable.
+        """
+        if not command:
+            raise AdbUnsupported("Commande vide")
+        self.ensure_server()
+        name, args = command[0], list(command[1:])
+        try:
+            if name == "devices":
+                long_format = "-l" in args
+                return "List of devices attached\n" + self.devices(long_format, timeout) + "\n", "", 0
+            if name == "connect" and len(args) == 1:
+                target = args[0] if ":" in args[0] else f"{args[0]}:5555"
+                message = self.host_query(f"host:connect:{target}", timeout)
+                self.forget_features(target)
+                failed = message.lower().startswith(("failed", "unable", "cannot"))
+                return message + "\n", "", 1 if failed else 0
+            if name == "disconnect" and len(args) == 1:
+                message = self.host_query(f"host:disconnect:{args[0]}", timeout)
+                self.forget_features(args[0])
+                return message + "\n", "", 0
+            if name == "get-state" and not args:
+                request = f"host-serial:{device_id}:get-state" if device_id else "host:get-state"
+                return self.host_query(request, timeout) + "\n", "", 0
+            if name == "shell" and args and not args[0].startswith("-"):
+                stdout, stderr, returncode = self.channels.run(device_id, " ".join(args), timeout)
+                return _text(stdout), _text(stderr), returncode
+            if name == "push" and len(args) == 2 and os.path.isfile(args[0]):
+                return self._push(device_id, args[0], args[1], timeout)
+            if name == "exec-out" and args:
+                return _text(self.exec_out(device_id, " ".join(args), timeout)), "", 0
+            if name == "tcpip" and len(args) == 1:
+                self.forget_features(device_id)
+                return _text(self.simple_service(device_id, f"tcpip:{args[0]}", timeout)), "", 0
+            if name == "reboot" and len(args) <= 1:
+                self.simple_service(device_id, f"reboot:{args[0] if args else ''}", timeout)
+                return "", "", 0
+            if name == "uninstall" and len(args) == 1:
+                stdout, stderr, _ = self.channels.run(device_id, f"pm uninstall {args[0]}", timeout)
+                output = _text(stdout) + _text(stderr)
+                if output.startswith("Success"):
+                    return output, "", 0
+                return "", output, 1
+        except AdbTimeout:
+            return "", "Command timeout", 1
+        except AdbConnectionError:
+            raise
+        except AdbError as e:
+            return "", f"error: {e}\n", 1
+        raise AdbUnsupported(name)
+
+    def _push(self, serial, local_path, remote_path, timeout):
+        """Équivalent de 'adb push fichier destination' via le service sync"""
+        start = time.monotonic()
+        with self.sync(serial, timeout) as sync:
+            if remote_path.endswith('/'):
+                remote_path += os.path.basename(local_path)
+            else:
+                remote = sync.stat(remote_path)
+                if remote and stat_module.S_ISDIR(remote.mode):
+                    remote_path = f"{remote_path}/{os.path.basename(local_path)}"
+            try:
+                size = sync.push(local_path, remote_path)
+            except AdbStalled as e:
+                return "", f"adb: error: failed to copy '{local_path}' to '{remote_path}': {e}\n", 1
+            except AdbTimeout:
+                raise
+            except AdbError as e:
+                return "", f"adb: error: failed to copy '{local_path}' to '{remote_path}': {e}\n", 1
+        elapsed = max(time.monotonic() - start, 0.001)
+        return (f"{local_path}: 1 file pushed, 0 skipped. {size / elapsed / 1048576:.1f} MB/s "
+                f"({size} bytes in {elapsed:.3f}s)\n"), "", 0
+
+
+# =============================================================================
+# SHELL PERSISTANT
+# =============================================================================
+
+class ShellChannel:
+    """Session shell v2 longue durée vers un appareil
+
+    Chaque commande est encadrée par un marqueur unique écrit sur stdout
+    (avec le code retour) et sur stderr, ce qui permet de découper les
+    sorties sans rouvrir de session.
+    """
+
+    def __init__(self, client, serial):
+        self.client = client
+        self.serial = serial
+        self.lock = threading.Lock()
+        self.conn = None
+        self.received = False  # Au moins un paquet reçu pour la commande en cours
+
+    def _open(self):
+        self.conn = self.client.open_service(self.serial, "shell,v2,raw:", timeout=10)
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    def run(self, command, timeout=30):
+        """Exécute une commande, retourne (stdout, stderr, returncode) en octets
+
+        Appelant responsable du verrou (voir ShellChannelPool).
+        """
+        reused = self.conn is not None
+        if not reused:
+            self._open()
+        try:
+            return self._exchange(command, timeout)
+        except AdbTimeout:
+            # État du shell inconnu (commande toujours en cours): on repart de zéro
+            self.close()
+            raise
+        except AdbError:
+            self.close()
+            # Une réponse a commencé: la commande a peut-être tourné, pas de renvoi
+            if not reused or self.received:
+                raise
+        # Session coupée pendant l'inactivité (casque débranché, adbd relancé):
+        # envoi refusé ou fin de flux avant le moindre paquet, la commande n'a pas tourné
+        self._open()
+        try:
+            return self._exchange(command, timeout)
+        except AdbError:
+            self.close()
+            raise
+
+    def _exchange(self, command, timeout):
+        conn = self.conn
+        conn.set_timeout(timeout)
+        marker = f"__VRM_{uuid.uuid4().hex}__".encode()
+        # Sous-shell: isole cd/exports, stdin fermé pour ne pas consommer le flux
+        script = b"( " + command.encode('utf-8') + b"\n) </dev/null; echo \"" + marker + \
+                 b" $?\"; echo " + marker + b" >&2\n"
+        self.received = False
+        conn.send(shell_packet(SHELL_STDIN, script))
+
+        stdout, stderr = bytearray(), bytearray()
+        returncode = None
+        stderr_done = False
+        while returncode is None or not stderr_done:
+            packet = read_shell_packet(conn)
+            if packet is None:
+                raise AdbError("Session shell fermée")
+            self.received = True
+            packet_id, data = packet
+            if packet_id == SHELL_STDOUT:
+                stdout += data
+                index = stdout.find(marker + b" ")
+                if index >= 0 and stdout.endswith(b"\n"):
+                    code = stdout[index + len(marker) + 1:].strip()
+                    returncode = int(code) if code.isdigit() else 1
+                    del stdout[index:]
+            elif packet_id == SHELL_STDERR:
+                stderr += data
+                index = stderr.find(marker)
+                if index >= 0 and stderr.endswith(b"\n"):
+                    stderr_done = True
+                    del stderr[index:]
+            elif packet_id == SHELL_EXIT:
+                # La commande a terminé le shell (exit): session à rouvrir
+                self.close()
+                return bytes(stdout), bytes(stderr), data[0] if data else 0
+        conn.set_timeout(None)
+        return bytes(stdout), bytes(stderr), returncode
+
+
+class ShellChannelPool:
+    """Un ShellChannel par appareil, partagé entre les threads"""
+
+    def __init__(self, client):
+        self.client = client
+        self.channels = {}
+        self.lock = threading.Lock()
+
+    def _get(self, serial):
+        with self.lock:
+            channel = self.channels.get(serial or "")
+            if channel is None:
+                channel = ShellChannel(self.client, serial)
+                self.channels[serial or ""] = channel
+            return channel
+
+    def run(self, serial, command, timeout=30):
+        """Exécute une commande courte via le shell persistant de l'appareil
+
+        Si le shell est déjà occupé par un autre thread (ou si l'appareil ne
+        gère pas shell v2), la commande part sur une session ponctuelle.
+        """
+        if "shell_v2" not in self.client.features(serial):
+            return self.client.shell(serial, command, timeout)
+        channel = self._get(serial)
+        if not channel.lock.acquire(blocking=False):
+            return self.client.shell(serial, command, timeout)
+        try:
+            return channel.run(command, timeout)
+        finally:
+            channel.lock.release()
+
+    def close(self, serial=None):
+        """Ferme le shell d'un appareil"""
+        with self.lock:
+            channel = self.channels.pop(serial or "", None)
+        if channel:
+            with channel.lock:
+                channel.close()
+
+    def close_all(self):
+        with self.lock:
+            channels = list(self.channels.values())
+            self.channels.clear()
+        for channel in channels:
+            with channel.lock:
+                channel.close()
+
+
+# =============================================================================
+# SERVICE SYNC
+# =============================================================================
+
+def _stat_v2(data):
+    """Extrait mode, taille et date d'une réponse STA2/DNT2"""
+    return SyncStat(struct.unpack_from("<I", data, 24)[0], struct.unpack_from("<Q", data, 40)[0],
+                    struct.unpack_from("<q", data, 56)[0])
+
+
+class SyncConnection:
+    """Session du service sync: plusieurs STAT/LIST/SEND/RECV sur une seule connexion"""
+
+    def __init__(self, client, serial, timeout=30):
+        features = client.features(serial)
+        self.stat_v2 = "stat_v2" in features
+        self.ls_v2 = "ls_v2" in features
+        self.client = client
+        self.conn = client.open_service(serial, "sync:", timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.conn:
+            try:
+                self._request(b"QUIT")
+            except AdbError:
+                pass
+            self.conn.close()
+            self.conn = None
+
+    def set_timeout(self, timeout):
+        self.conn.set_timeout(timeout)
+
+    def _request(self, command, data=b""):
+        self.conn.send(command + struct.pack("<I", len(data)) + data)
+
+    def _fail(self, length):
+        message = self.conn.read_exactly(length).decode('utf-8', errors='replace')
+        raise AdbError(message)
+
+    # ---------- STAT ----------
+
+    def _stat_request(self, path):
+        command = b"STA2" if self.stat_v2 else b"STAT"
+        return command + struct.pack("<I", len(path.encode('utf-8'))) + path.encode('utf-8')
+
+    def _stat_reply(self):
+        if self.stat_v2:
+            data = self.conn.read_exactly(72)
+            if data[:4] != b"STA2":
+                raise AdbError(f"Réponse STAT inattendue: {data[:4]!r}")
+            if struct.unpack_from("<I", data, 4)[0]:
+                return None
+            return _stat_v2(data)
+        data = self.conn.read_exactly(16)
+        if data[:4] != b"STAT":
+            raise AdbError(f"Réponse STAT inattendue: {data[:4]!r}")
+        mode, size, mtime = struct.unpack("<III", data[4:])
+        return SyncStat(mode, size, mtime) if mode else None
+
+    def stat(self, path):
+        """Retourne SyncStat(mode, size, mtime) ou None si le chemin n'existe pas"""
+        self.conn.send(self._stat_request(path))
+        return self._stat_reply()
+
+    def stat_many(self, paths):
+        """Stat de nombreux chemins en pipeline, retourne {chemin: SyncStat ou None}"""
+        results = {}
+        paths = list(paths)
+        for i in range(0, len(paths), SYNC_STAT_BATCH):
+            batch = paths[i:i + SYNC_STAT_BATCH]
+            self.conn.send(b"".join(self._stat_request(path) for path in batch))
+            for path in batch:
+                results[path] = self._stat_reply()
+        return results
+
+    # ---------- LIST ----------
+
+    def list(self, path):
+        """Liste un dossier (un seul flux), retourne [SyncEntry] sans '.' ni '..'"""
+        entries = []
+        if self.ls_v2:
+            self._request(b"LIS2", path.encode('utf-8'))
+            while True:
+                data = self.conn.read_exactly(76)
+                if data[:4] == b"DONE":
+                    return entries
+                if data[:4] != b"DNT2":
+                    raise AdbError(f"Réponse LIST inattendue: {data[:4]!r}")
+                name = self.conn.read_exactly(struct.unpack_from("<I", data, 72)[0]).decode('utf-8', errors='replace')
+                if name not in (".", ".."):
+                    entries.append(SyncEntry(name, *_stat_v2(data)))
+        self._request(b"LIST", path.encode('utf-8'))
+        while True:
+            data = self.conn.read_exactly(20)
+            if data[:4] == b"DONE":
+                return entries
+            if data[:4] != b"DENT":
+                raise AdbError(f"Réponse LIST inattendue: {data[:4]!r}")
+            mode, size, mtime, length = struct.unpack("<IIII", data[4:])
+            name = self.conn.read_exactly(length).decode('utf-8', errors='replace')
+            if name not in (".", ".."):
+                entries.append(SyncEntry(name, mode, size, mtime))
+
+    def list_tree(self, path):
+        """Liste récursive, retourne {chemin relatif: SyncEntry} des fichiers"""
+        files = {}
+        pending = [""]
+        root = path.rstrip('/')
+        while pending:
+            relative = pending.pop()
+            for entry in self.list(f"{root}/{relative}" if relative else root or "/"):
+                entry_path = f"{relative}/{entry.name}" if relative else entry.name
+                if stat_module.S_ISDIR(entry.mode):
+                    pending.append(entry_path)
+                else:
+                    files[entry_path] = entry
+        return files
+
+    # ---------- SEND / RECV ----------
+
+    def send(self, fileobj, remote_path, mode=0o100644, mtime=None, progress=None,
+             stall_window=None, min_rate=0):
+        """Envoie le contenu d'un objet fichier, retourne le nombre d'octets envoyés
+
+        stall_window: lève AdbStalled si moins de min_rate octets/s passent sur
+        une fenêtre de stall_window secondes (ou si un bloc reste coincé aussi
+        longtemps), sans attendre le délai global de la connexion.
+        """
+        self._request(b"SEND", f"{remote_path},{mode}".encode('utf-8'))
+        deadline = self.conn.deadline
+        sent = 0
+        window_start, window_sent = time.monotonic(), 0
+        while True:
+            chunk = fileobj.read(SYNC_DATA_MAX)
+            if not chunk:
+                break
+            if stall_window:
+                block_deadline = time.monotonic() + stall_window
+                self.conn.deadline = min(deadline, block_deadline) if deadline else block_deadline
+            try:
+                self._request(b"DATA", chunk)
+            except AdbTimeout:
+                if stall_window and (deadline is None or time.monotonic() < deadline):
+                    raise AdbStalled(f"Transfert bloqué: aucun progrès depuis {stall_window}s")
+                raise
+            sent += len(chunk)
+            if progress:
+                progress(sent)
+            if stall_window:
+                now = time.monotonic()
+                if now - window_start >= stall_window:
+                    rate = (sent - window_sent) / (now - window_start)
+                    if rate < min_rate:
+                        raise AdbStalled(f"Transfert bloqué: {rate / 1024:.0f} Ko/s sur {stall_window}s")
+                    window_start, window_sent = now, sent
+        self.conn.deadline = deadline
+        self.conn.send(b"DONE" + struct.pack("<I", int(mtime if mtime is not None else time.time())))
+        reply = self.conn.read_exactly(8)
+        length = struct.unpack("<I", reply[4:])[0]
+        if reply[:4] == b"FAIL":
+            self._fail(length)
+        if reply[:4] != b"OKAY":
+            raise AdbError(f"Réponse SEND inattendue: {reply[:4]!r}")
+        return sent
+
+    def push(self, local_path, remote_path, progress=None,
+             stall_window=PUSH_STALL_WINDOW, min_rate=PUSH_MIN_RATE):
+        """Envoie un fichier local (mode et date conservés comme adb push)"""
+        local_stat = os.stat(local_path)
+        with self.client.open_local(local_path) as f:
+            return self.send(f, remote_path, local_stat.st_mode, local_stat.st_mtime, progress,
+                             stall_window, min_rate)
+
+    def recv(self, remote_path, fileobj):
+        """Reçoit un fichier distant dans un objet fichier, retourne la taille reçue"""
+        self._request(b"RECV", remote_path.encode('utf-8'))
+        received = 0
+        while True:
+            header = self.conn.read_exactly(8)
+            length = struct.unpack("<I", header[4:])[0]
+            if header[:4] == b"DONE":
+                return received
+            if header[:4] == b"FAIL":
+                self._fail(length)
+            if header[:4] != b"DATA":
+                raise AdbError(f"Réponse RECV inattendue: {header[:4]!r}")
+            fileobj.write(self.conn.read_exactly(length))
+            received += length
+
+
+# =============================================================================
+# SUIVI DES APPAREILS
+# =============================================================================
+
+class DeviceTracker:
+    """Suivi en continu des appareils via host:track-devices-l
+
+    Le serveur adb renvoie la liste complète à chaque changement; les
+    différences sont publiées aux abonnés sous forme d'événements
+    callback(événement, serial, état, état précédent).
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.devices = {}
+        self.connected = False
+        self.first_list = threading.Event()
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.conn = None
+        self.thread = None
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._loop, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        conn = self.conn
+        if conn:
+            conn.close()
+
+    def subscribe(self, callback):
+        with self.lock:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def snapshot(self):
+        """Retourne {serial: état} courant, ou None si le flux n'est pas ouvert"""
+        with self.lock:
+            return dict(self.devices) if self.connected else None
+
+    def waiter(self):
+        """Retourne un DeviceWaiter réveillé à chaque événement"""
+        return DeviceWaiter(self)
+
+    def _loop(self):
+        delay = 1
+        while not self.stop_event.is_set():
+            try:
+                self.client.ensure_server()
+                self.conn = self.client.connect(timeout=10)
+                self.conn.send_request("host:track-devices-l")
+                self.conn.read_status()
+                self.conn.set_timeout(None)
+                delay = 1
+                while True:
+                    self._update(parse_devices(self.conn.read_string()))
+            except AdbError:
+                pass
+            finally:
+                with self.lock:
+                    self.connected = False
+                if self.conn:
+                    self.conn.close()
+                    self.conn = None
+            # Serveur arrêté ou redémarré: nouvelle tentative avec attente croissante
+            self.stop_event.wait(delay)
+            delay = min(delay * 2, 5)
+
+    def _update(self, devices):
+        events = []
+        with self.lock:
+            previous = self.devices
+            for serial, state in devices.items():
+                old_state = previous.get(serial)
+                if old_state is None:
+                    events.append((DEVICE_CONNECTED, serial, state, None))
+                elif old_state != state:
+                    events.append((DEVICE_STATE_CHANGED, serial, state, old_state))
+            for serial, old_state in previous.items():
+                if serial not in devices:
+                    events.append((DEVICE_DISCONNECTED, serial, None, old_state))
+            self.devices = devices
+            self.connected = True
+            subscribers = list(self.subscribers)
+        self.first_list.set()
+
+        for event, serial, state, old_state in events:
+            if event != DEVICE_CONNECTED:
+                # Transport différent: features et shell persistant à refaire
+                self.client.forget_features(serial)
+            for callback in subscribers:
+                try:
+                    callback(event, serial, state, old_state)
+                except Exception:
+                    pass
+
+
+class DeviceWaiter:
+    """Remplace un time.sleep de boucle de scrutation: se réveille dès qu'un appareil change"""
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.event = threading.Event()
+        tracker.subscribe(self._notify)
+
+    def _notify(self, *args):
+        self.event.set()
+
+    def wait(self, timeout):
+        """Attend un événement (au plus timeout secondes), retourne True si réveillé"""
+        woken = self.event.wait(timeout)
+        self.event.clear()
+        return woken
+
+    def close(self):
+        self.tracker.unsubscribe(self._notify)
@@ -0,0 +1,194 @@
+"""
+Traces des appels ADB
+Chaque appel est ajouté à un fichier JSONL (une ligne par commande) et compté
+dans des histogrammes de latence par classe de commande et par appareil,
+pour repérer ce qui ralentit un rafraîchissement (adb devices, dumpsys, WiFi...).
+
+Résumé en ligne de commande: python adb_trace.py [adb_trace.jsonl]
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+from fleet import transport_of
+
+
+# Bornes supérieures des cases des histogrammes, en millisecondes
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# Le fichier de trace est renommé en .1 au-delà de cette taille
+TRACE_MAX_BYTES = 10 * 1024 * 1024
+
+# Sous-commandes gardées dans la classe (ex.: "shell dumpsys package")
+SUBCOMMAND_TOOLS = ("dumpsys", "pm", "am", "cmd", "settings")
+
+
+def command_class(command):
+    """Classe d'une commande adb: 'devices', 'push', 'shell getprop', 'shell pm install'..."""
+    if not command:
+        return "?"
+    name = command[0]
+    if name not in ("shell", "exec-out") or len(command) < 2:
+        return name
+    words = " ".join(command[1:]).split()
+    tool = os.path.basename(words[0])
+    if tool in SUBCOMMAND_TOOLS and len(words) > 1 and not words[1].startswith("-"):
+        return f"{name} {tool} {words[1]}"
+    return f"{name} {tool}"
+
+
+class LatencyHistogram:
+    """Histogramme de latences (ms) à cases fixes"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.failures = 0
+
+    def add(self, ms, ok=True):
+        index = 0
+        while index < len(LATENCY_BUCKETS) and ms > LATENCY_BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        if not ok:
+            self.failures += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        """Borne de la case qui contient le percentile p (0-100), max observé pour la dernière"""
+        if not self.count:
+            return 0.0
+        threshold = self.count * p / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= threshold:
+                return min(LATENCY_BUCKETS[index], self.max) if index < len(LATENCY_BUCKETS) else self.max
+        return self.max
+
+
+class AdbTracer:
+    """Enregistre les appels ADB (fichier JSONL + histogrammes en mémoire)"""
+
+    def __init__(self, filepath=None):
+        self.filepath = filepath
+        self.commands = {}
+        self.devices = {}
+        self.lock = threading.Lock()
+        self._file = None
+
+    def _open(self):
+        if self._file is None and self.filepath:
+            try:
+                if os.path.exists(self.filepath) and os.path.getsize(self.filepath) > TRACE_MAX_BYTES:
+                    os.replace(self.filepath, self.filepath + ".1")
+                self._file = open(self.filepath, 'a', encoding='utf-8')
+            except OSError as e:
+                print(f"Trace ADB désactivée ({self.filepath}): {e}")
+                self.filepath = None
+        return self._file
+
+    def _add(self, entry):
+        ok = entry["rc"] == 0
+        for table, key in ((self.commands, entry["cmd"]), (self.devices, entry["device"])):
+            if key is None:
+                continue
+            if key not in table:
+                table[key] = LatencyHistogram()
+            table[key].add(entry["wall_ms"], ok)
+
+    def record(self, command, device_id, returncode, wall, queue=0.0, nbytes=0, backend="native"):
+        """Ajoute un appel (durées en secondes)"""
+        entry = {
+            "ts": round(time.time(), 3),
+            "cmd": command_class(command),
+            "device": device_id,
+            "transport": transport_of(device_id) if device_id else None,
+            "backend": backend,
+            "rc": returncode,
+            "bytes": nbytes,
+            "wall_ms": round(wall * 1000, 1),
+            "queue_ms": round(queue * 1000, 1),
+        }
+        with self.lock:
+            self._add(entry)
+            trace = self._open()
+            if trace:
+                try:
+                    trace.write(json.dumps(entry) + "\n")
+                    trace.flush()
+                except OSError:
+                    pass
+
+    @classmethod
+    def load(cls, filepath):
+        """Reconstruit les histogrammes à partir d'un fichier de trace"""
+        tracer = cls()
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    tracer._add(json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return tracer
+
+    def _slowest(self, table, limit):
+        with self.lock:
+            items = [(key, histogram.count, histogram.mean, histogram.percentile(95),
+                      histogram.max, histogram.failures)
+                     for key, histogram in table.items()]
+        return sorted(items, key=lambda item: (item[3], item[2]), reverse=True)[:limit]
+
+    def slowest_commands(self, limit=10):
+        """[(classe, nombre, moyenne ms, p95 ms, max ms, échecs)] triés par p95 décroissant"""
+        return self._slowest(self.commands, limit)
+
+    def slowest_devices(self, limit=10):
+        """Même format que slowest_commands, par appareil"""
+        return self._slowest(self.devices, limit)
+
+    def format_summary(self, limit=10, device_name=None):
+        """Résumé texte des commandes et appareils les plus lents
+
+        device_name: fonction device_id -> nom affiché (facultative).
+        """
+        device_name = device_name or (lambda device_id: device_id)
+        lines = []
+        for title, rows, is_device in (("Commandes les plus lentes", self.slowest_commands(limit), False),
+                                       ("Appareils les plus lents", self.slowest_devices(limit), True)):
+            lines.append(title)
+            lines.append(f"  {'':<36} {'appels':>7} {'moy.':>8} {'p95':>8} {'max':>8} {'échecs':>7}")
+            for key, count, mean, p95, maximum, failures in rows:
+                if is_device:
+                    key = f"{device_name(key)} ({transport_of(key)})"
+                lines.append(f"  {key[:36]:<36} {count:>7} {mean:>6.0f}ms {p95:>6.0f}ms "
+                             f"{maximum:>6.0f}ms {failures:>7}")
+            if not rows:
+                lines.append("  (aucun appel enregistré)")
+            lines.append("")
+        return "\n".join(lines)
+
+    def close(self):
+        with self.lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "adb_trace.jsonl")
+    if not os.path.exists(path):
+        sys.exit(f"Fichier de trace introuvable: {path}")
+    print(AdbTracer.load(path).format_summary(limit=20))
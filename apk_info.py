@@ -0,0 +1,363 @@
+"""
+Identité d'un APK lue localement (sans adb)
+Nom du package, versionCode et empreinte du certificat de signature, lus
+dans le zip: AndroidManifest.xml binaire (AXML) et bloc de signature APK
+v2/v3 (repli sur la signature v1 META-INF/*.RSA). Comparés aux versions
+installées sur les casques, ils évitent de retransférer un APK déjà à jour.
+Les résultats sont mis en cache par empreinte SHA-256 du fichier.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import zipfile
+from collections import namedtuple
+
+
+ApkInfo = namedtuple("ApkInfo", ["package", "version_code", "version_name", "signer"])
+
+# Package installé sur un casque: versionCode, chemin de l'APK et uid
+PackageEntry = namedtuple("PackageEntry", ["version_code", "path", "uid"])
+
+# Inventaire complet d'un casque en un seul appel
+INVENTORY_COMMAND = "pm list packages -f -U --show-versioncode"
+
+# Types de blocs du format XML binaire d'Android
+AXML_STRING_POOL = 0x0001
+AXML_RESOURCE_MAP = 0x0180
+AXML_START_ELEMENT = 0x0102
+AXML_UTF8_FLAG = 0x100
+
+# Identifiants de ressource des attributs lus dans <manifest>
+ATTR_VERSION_CODE = 0x0101021b
+ATTR_VERSION_NAME = 0x0101021c
+ATTR_VERSION_CODE_MAJOR = 0x01010576
+
+# Types de valeur d'un attribut
+TYPE_STRING = 0x03
+TYPE_INT_DEC = 0x10
+TYPE_INT_HEX = 0x11
+
+# Bloc de signature APK (v2 / v3)
+SIG_BLOCK_MAGIC = b"APK Sig Block 42"
+SIG_V2_ID = 0x7109871a
+SIG_V3_ID = 0xf05368c0
+
+HASH_CHUNK = 1024 * 1024
+
+
+# =============================================================================
+# MANIFESTE BINAIRE (AXML)
+# =============================================================================
+
+def _string_pool(data, offset):
+    header_size, chunk_size = struct.unpack_from("<HI", data, offset + 2)
+    count, _, flags, strings_start = struct.unpack_from("<IIII", data, offset + 8)
+    offsets = struct.unpack_from(f"<{count}I", data, offset + header_size)
+    base = offset + strings_start
+    strings = []
+    for string_offset in offsets:
+        position = base + string_offset
+        if flags & AXML_UTF8_FLAG:
+            # Longueur en caractères puis en octets, chacune sur 1 ou 2 octets
+            for _ in range(2):
+                length = data[position]
+                position += 1
+                if length & 0x80:
+                    length = ((length & 0x7f) << 8) | data[position]
+                    position += 1
+            strings.append(data[position:position + length].decode('utf-8', errors='replace'))
+        else:
+            length = struct.unpack_from("<H", data, position)[0]
+            position += 2
+            if length & 0x8000:
+                length = ((length & 0x7fff) << 16) | struct.unpack_from("<H", data, position)[0]
+                position += 2
+            strings.append(data[position:position + length * 2].decode('utf-16-le', errors='replace'))
+    return strings
+
+
+def parse_manifest(data):
+    """Attributs de <manifest>: (package, versionCode, versionName), None si illisible"""
+    strings, resource_ids = [], []
+    offset = struct.unpack_from("<H", data, 2)[0]
+    while offset + 8 <= len(data):
+        chunk_type, header_size, chunk_size = struct.unpack_from("<HHI", data, offset)
+        if chunk_size < 8:
+            return None
+        if chunk_type == AXML_STRING_POOL:
+            strings = _string_pool(data, offset)
+        elif chunk_type == AXML_RESOURCE_MAP:
+            count = (chunk_size - header_size) // 4
+            resource_ids = list(struct.unpack_from(f"<{count}I", data, offset + header_size))
+        elif chunk_type == AXML_START_ELEMENT:
+            ext = offset + header_size
+            name_index, attr_start, attr_size, attr_count = struct.unpack_from("<4xIHHH", data, ext)
+            if strings[name_index] != "manifest":
+                return None
+            attributes = {}
+            for index in range(attr_count):
+                position = ext + attr_start + index * attr_size
+                attr_name, raw_value, data_type, value = struct.unpack_from("<4xII3xBI", data, position)
+                resource_id = resource_ids[attr_name] if attr_name < len(resource_ids) else None
+                key = resource_id or strings[attr_name]
+                if data_type == TYPE_STRING or raw_value != 0xffffffff:
+                    attributes[key] = strings[raw_value] if raw_value < len(strings) else None
+                elif data_type in (TYPE_INT_DEC, TYPE_INT_HEX):
+                    attributes[key] = value
+                else:
+                    attributes[key] = None
+            package = attributes.get("package")
+            version_code = attributes.get(ATTR_VERSION_CODE, attributes.get("versionCode"))
+            if not package or version_code is None:
+                return None
+            # versionCode long (Android 9+): versionCodeMajor dans les 32 bits de poids fort
+            major = attributes.get(ATTR_VERSION_CODE_MAJOR) or 0
+            version_name = attributes.get(ATTR_VERSION_NAME, attributes.get("versionName"))
+            return package, (int(major) << 32) | int(version_code), version_name
+        offset += chunk_size
+    return None
+
+
+# =============================================================================
+# CERTIFICAT DE SIGNATURE
+# =============================================================================
+
+def _length_prefixed(data, offset):
+    """Éléments d'une séquence préfixée par leur longueur (uint32)"""
+    items = []
+    while offset + 4 <= len(data):
+        length = struct.unpack_from("<I", data, offset)[0]
+        items.append(data[offset + 4:offset + 4 + length])
+        offset += 4 + length
+    return items
+
+
+def _signing_block_certificate(f):
+    """Premier certificat du bloc de signature v3/v2, None sans bloc"""
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+    tail_size = min(file_size, 65536 + 22)
+    f.seek(file_size - tail_size)
+    tail = f.read()
+    eocd = tail.rfind(b"PK\x05\x06")
+    if eocd < 0:
+        return None
+    cd_offset = struct.unpack_from("<I", tail, eocd + 16)[0]
+    if cd_offset < 24:
+        return None
+    f.seek(cd_offset - 24)
+    footer = f.read(24)
+    if footer[8:] != SIG_BLOCK_MAGIC:
+        return None
+    block_size = struct.unpack_from("<Q", footer)[0]
+    if block_size + 8 > cd_offset:
+        return None
+    f.seek(cd_offset - block_size - 8)
+    block = f.read(block_size + 8 - 24)
+
+    pairs = {}
+    offset = 8
+    while offset + 12 <= len(block):
+        length, pair_id = struct.unpack_from("<QI", block, offset)
+        pairs[pair_id] = block[offset + 12:offset + 8 + length]
+        offset += 8 + length
+    for scheme in (SIG_V3_ID, SIG_V2_ID):
+        if scheme not in pairs:
+            continue
+        # signers -> signer -> signed data -> (digests, certificates)
+        signers = _length_prefixed(pairs[scheme][4:], 0)
+        if not signers:
+            continue
+        signed_data = _length_prefixed(signers[0], 0)[0]
+        sections = _length_prefixed(signed_data, 0)
+        if len(sections) >= 2:
+            certificates = _length_prefixed(sections[1], 0)
+            if certificates:
+                return certificates[0]
+    return None
+
+
+def _der_children(data, start, end):
+    """(tag, début du contenu, fin) des éléments DER entre start et end"""
+    children = []
+    while start < end:
+        tag = data[start]
+        length = data[start + 1]
+        position = start + 2
+        if length & 0x80:
+            count = length & 0x7f
+            length = int.from_bytes(data[position:position + count], 'big')
+            position += count
+        children.append((tag, start, position, position + length))
+        start = position + length
+    return children
+
+
+def _pkcs7_certificate(data):
+    """Premier certificat d'une signature PKCS#7 (META-INF/*.RSA), None si illisible"""
+    try:
+        _, _, content, end = _der_children(data, 0, len(data))[0]  # ContentInfo
+        explicit = _der_children(data, content, end)[1]            # [0] signedData
+        _, _, content, end = _der_children(data, explicit[2], explicit[3])[0]
+        for tag, start, content, end in _der_children(data, content, end):
+            if tag == 0xa0:                                         # [0] certificates
+                _, cert_start, _, cert_end = _der_children(data, content, end)[0]
+                return data[cert_start:cert_end]
+    except (IndexError, ValueError):
+        pass
+    return None
+
+
+def signer_digest(apk_path, archive=None):
+    """SHA-256 du certificat de signature (comme apksigner), None si non signé"""
+    with open(apk_path, 'rb') as f:
+        certificate = _signing_block_certificate(f)
+    if certificate is None and archive is not None:
+        for name in archive.namelist():
+            upper = name.upper()
+            if upper.startswith("META-INF/") and upper.endswith((".RSA", ".DSA", ".EC")):
+                certificate = _pkcs7_certificate(archive.read(name))
+                break
+    return hashlib.sha256(certificate).hexdigest() if certificate else None
+
+
+def read_apk(apk_path):
+    """ApkInfo d'un fichier APK, None si ce n'en est pas un"""
+    try:
+        with zipfile.ZipFile(apk_path) as archive:
+            manifest = parse_manifest(archive.read("AndroidManifest.xml"))
+            if manifest is None:
+                return None
+            return ApkInfo(*manifest, signer_digest(apk_path, archive))
+    except (OSError, KeyError, zipfile.BadZipFile, struct.error, IndexError, UnicodeDecodeError):
+        return None
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# =============================================================================
+# CACHE PAR EMPREINTE DE FICHIER
+# =============================================================================
+
+class ApkInspector:
+    """ApkInfo mis en cache par SHA-256 du fichier (sauvegardé entre les sessions)
+
+    Un index (chemin, taille, date) évite de recalculer l'empreinte d'un
+    fichier qui n'a pas changé.
+    """
+
+    def __init__(self, filepath=None):
+        self.filepath = filepath
+        self.infos = {}   # {sha256: ApkInfo}
+        self.files = {}   # {chemin: [taille, date, sha256]}
+        self.changed = False  # Modifié depuis le dernier enregistrement
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.filepath or not os.path.exists(self.filepath):
+            return
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.infos = {digest: ApkInfo(*info) for digest, info in data.get("apks", {}).items()}
+            self.files = dict(data.get("files", {}))
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"Cache des APK illisible ({self.filepath}): {e}")
+
+    def save(self):
+        """Enregistre le cache s'il a changé depuis le dernier enregistrement"""
+        if not self.filepath:
+            return
+        with self.lock:
+            if not self.changed:
+                return
+            self.changed = False
+            data = {"apks": {digest: list(info) for digest, info in self.infos.items()},
+                    "files": dict(self.files)}
+        try:
+            temp_path = self.filepath + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.filepath)
+        except OSError as e:
+            with self.lock:
+                self.changed = True
+            print(f"Erreur sauvegarde cache des APK: {e}")
+
+    def digest(self, apk_path):
+        """SHA-256 du fichier (recalculé seulement si sa taille ou sa date a changé)"""
+        apk_path = os.path.abspath(apk_path)
+        stat = os.stat(apk_path)
+        with self.lock:
+            known = self.files.get(apk_path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime:
+            return known[2]
+        digest = file_sha256(apk_path)
+        with self.lock:
+            self.files[apk_path] = [stat.st_size, stat.st_mtime, digest]
+            self.changed = True
+        return digest
+
+    def inspect(self, apk_path):
+        """ApkInfo de l'APK (lu une seule fois par contenu), None si illisible"""
+        try:
+            digest = self.digest(apk_path)
+        except OSError:
+            return None
+        with self.lock:
+            info = self.infos.get(digest)
+        if info is None:
+            info = read_apk(apk_path)
+            if info is None:
+                return None
+            with self.lock:
+                self.infos[digest] = info
+                self.changed = True
+        self.save()
+        return info
+
+
+def parse_package_versions(text):
+    """Sortie de 'pm list packages --show-versioncode' -> {package: versionCode}"""
+    versions = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith("package:"):
+            continue
+        package, _, version = line[len("package:"):].partition(" versionCode:")
+        if version.strip().isdigit():
+            versions[package.strip()] = int(version.strip())
+    return versions
+
+
+def parse_package_inventory(text):
+    """Sortie de INVENTORY_COMMAND -> {package: PackageEntry}
+
+    Lignes 'package:/data/app/.../base.apk=com.exemple versionCode:12 uid:10123'
+    (versionCode ou uid absents sur les Android anciens: None).
+    """
+    inventory = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith("package:"):
+            continue
+        head, *fields = line[len("package:"):].split(" ")
+        path, _, package = head.rpartition("=")
+        if not package:
+            continue
+        values = dict(field.partition(":")[::2] for field in fields if ":" in field)
+        version = values.get("versionCode", "")
+        uid = values.get("uid", "")
+        inventory[package] = PackageEntry(int(version) if version.isdigit() else None, path or None,
+                                          int(uid) if uid.isdigit() else None)
+    return inventory
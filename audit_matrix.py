@@ -0,0 +1,275 @@
+"""
+Matrice de présence des packages (audit) et tableau virtualisé
+La matrice packages x casques tient dans un entier par package (bit j:
+installé sur le casque j) et un tableau compact de versionCodes; les lignes
+"manquant quelque part" et "plus ancien quelque part" sont calculées une
+fois à la construction, et un index des noms répond aux recherches par
+sous-chaîne. Le tableau ne crée que les lignes visibles du Treeview: filtrer,
+trier ou faire défiler 400 packages x 40 casques ne touche que quelques
+dizaines de lignes.
+"""
+
+import bisect
+import tkinter as tk
+from array import array
+from tkinter import ttk
+
+
+# Valeurs du tableau des versionCodes
+VERSION_MISSING = -1
+VERSION_UNKNOWN = -2  # Installé, versionCode non fourni (Android ancien)
+
+# Tris des lignes
+SORT_PACKAGE = "package"
+SORT_MISSING = "missing"   # Les plus manquants d'abord
+SORT_DEVICE = "device"     # Absents puis plus anciens sur un casque d'abord
+
+ROW_HEIGHT = 20
+
+
+def popcount(value):
+    return bin(value).count("1")
+
+
+class PresenceMatrix:
+    """Packages x casques à partir des inventaires {device_id: {package: PackageEntry}}
+
+    inventories ne contient pas encore les casques en attente; None pour
+    un casque en échec. Les lignes sont triées par nom de package.
+    """
+
+    def __init__(self, devices, inventories):
+        self.devices = list(devices)
+        columns = len(self.devices)
+        self.pending = 0   # Bits des casques sans réponse
+        self.failed = 0    # Bits des casques en échec
+        self.scanned = 0   # Bits des casques inventoriés
+        names = set()
+        for column, device_id in enumerate(self.devices):
+            if device_id not in inventories:
+                self.pending |= 1 << column
+            elif inventories[device_id] is None:
+                self.failed |= 1 << column
+            else:
+                self.scanned |= 1 << column
+                names.update(inventories[device_id])
+        self.packages = sorted(names)
+        self.index = {package: row for row, package in enumerate(self.packages)}
+
+        rows = len(self.packages)
+        self.present = [0] * rows
+        self.versions = array('q', [VERSION_MISSING]) * (rows * columns)
+        for column, device_id in enumerate(self.devices):
+            inventory = inventories.get(device_id)
+            if not inventory:
+                continue
+            bit = 1 << column
+            for package, entry in inventory.items():
+                row = self.index[package]
+                self.present[row] |= bit
+                version = entry.version_code
+                self.versions[row * columns + column] = VERSION_UNKNOWN if version is None else version
+
+        # Lignes signalées, en bits (une ligne = un bit) et en listes prêtes à afficher
+        self.outdated = [0] * rows  # Bits des casques avec une version plus ancienne, par ligne
+        self.missing_rows = 0
+        self.outdated_rows = 0
+        for row in range(rows):
+            if self.present[row] != self.scanned:
+                self.missing_rows |= 1 << row
+            row_versions = self.versions[row * columns:(row + 1) * columns]
+            newest = max(row_versions) if columns else VERSION_MISSING
+            if newest < 0:
+                continue
+            for column, version in enumerate(row_versions):
+                if 0 <= version < newest:
+                    self.outdated[row] |= 1 << column
+            if self.outdated[row]:
+                self.outdated_rows |= 1 << row
+        flagged = self.missing_rows | self.outdated_rows
+        self.flagged = [row for row in range(rows) if flagged >> row & 1]
+
+        # Index de recherche: noms en minuscules bout à bout, début de chaque ligne
+        self.starts = []
+        position = 0
+        for package in self.packages:
+            self.starts.append(position)
+            position += len(package) + 1
+        self.search_text = "\n".join(package.lower() for package in self.packages)
+        self._searches = {}
+        self._views = {}
+
+    def __len__(self):
+        return len(self.packages)
+
+    @property
+    def missing_count(self):
+        return popcount(self.missing_rows)
+
+    @property
+    def outdated_count(self):
+        return popcount(self.outdated_rows)
+
+    def search(self, term):
+        """Lignes dont le nom de package contient term (sans casse), dans l'ordre"""
+        term = term.strip().lower()
+        if term in self._searches:
+            return self._searches[term]
+        rows = []
+        if term and "\n" not in term:
+            position = self.search_text.find(term)
+            while position >= 0:
+                row = bisect.bisect_right(self.starts, position) - 1
+                rows.append(row)
+                # Ligne suivante: une seule occurrence par package
+                next_start = self.starts[row + 1] if row + 1 < len(self.starts) else len(self.search_text)
+                position = self.search_text.find(term, next_start)
+        self._searches[term] = rows
+        return rows
+
+    def rows(self, flagged_only=False, search="", sort=SORT_PACKAGE, column=None, reverse=False):
+        """Lignes à afficher (filtre, recherche, tri), mises en cache par combinaison"""
+        key = (flagged_only, search.strip().lower(), sort, column, reverse)
+        if key in self._views:
+            return self._views[key]
+        rows = self.flagged if flagged_only else range(len(self.packages))
+        if key[1]:
+            hits = self.search(key[1])
+            if flagged_only:
+                flagged = self.missing_rows | self.outdated_rows
+                rows = [row for row in hits if flagged >> row & 1]
+            else:
+                rows = hits
+        rows = list(rows)
+        if sort == SORT_MISSING:
+            rows.sort(key=lambda row: popcount(self.scanned & ~self.present[row]), reverse=not reverse)
+        elif sort == SORT_DEVICE and column is not None:
+            bit = 1 << column
+            columns = len(self.devices)
+            # Absent, puis plus ancien, puis à jour (et par versionCode)
+            rows.sort(key=lambda row: (bool(self.present[row] & bit), not self.outdated[row] & bit,
+                                       self.versions[row * columns + column]), reverse=reverse)
+        elif reverse:
+            rows.reverse()
+        self._views[key] = rows
+        return rows
+
+    def cell(self, row, column):
+        """Texte d'une case: … en attente, ? échec, vide absent, ⚠ plus ancien, ✓ à jour"""
+        bit = 1 << column
+        if self.pending & bit:
+            return "…"
+        if self.failed & bit:
+            return "?"
+        version = self.versions[row * len(self.devices) + column]
+        if version == VERSION_MISSING:
+            return ""
+        if version == VERSION_UNKNOWN:
+            return "✓"
+        return f"⚠ {version}" if self.outdated[row] & bit else f"✓ {version}"
+
+    def values(self, row):
+        """Valeurs d'une ligne du tableau et ses tags"""
+        values = [self.packages[row]] + [self.cell(row, column) for column in range(len(self.devices))]
+        return values, ("outdated",) if self.outdated[row] else ()
+
+    def entry_row(self, package):
+        return self.index.get(package)
+
+
+class VirtualTable:
+    """Treeview à lignes virtuelles: seules les lignes visibles existent
+
+    show(rows, render) affiche la liste rows (clés quelconques), render(clé)
+    -> (valeurs, tags) n'est appelé que pour les lignes à l'écran. Le
+    défilement vertical est géré ici; l'horizontal reste celui du Treeview.
+    """
+
+    def __init__(self, parent):
+        self.frame = tk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, show="headings", selectmode="none")
+        self.v_scrollbar = tk.Scrollbar(self.frame, orient="vertical", command=self.yview)
+        h_scrollbar = tk.Scrollbar(self.frame, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=h_scrollbar.set)
+
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.v_scrollbar.grid(row=0, column=1, sticky="ns")
+        h_scrollbar.grid(row=1, column=0, sticky="ew")
+        self.frame.grid_rowconfigure(0, weight=1)
+        self.frame.grid_columnconfigure(0, weight=1)
+
+        try:
+            self.row_height = int(ttk.Style().lookup("Treeview", "rowheight") or ROW_HEIGHT)
+        except (ValueError, tk.TclError):
+            self.row_height = ROW_HEIGHT
+        self.rows = []
+        self.render = None
+        self.first = 0
+        self.visible = 1
+        self.items = []
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", lambda e: self._scroll(-1 if e.delta > 0 else 1, 3))
+        self.tree.bind("<Button-4>", lambda e: self._scroll(-1, 3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll(1, 3))
+
+    def pack(self, **options):
+        self.frame.pack(**options)
+
+    def tag_configure(self, tag, **options):
+        self.tree.tag_configure(tag, **options)
+
+    def set_columns(self, columns):
+        """columns: [(identifiant, titre, largeur)]"""
+        self.tree.delete(*self.items)
+        self.items = []
+        self.tree["columns"] = [column for column, _, _ in columns]
+        for column, text, width in columns:
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width, stretch=False)
+
+    def heading(self, column, **options):
+        self.tree.heading(column, **options)
+
+    def show(self, rows, render, keep_position=True):
+        self.rows = rows
+        self.render = render
+        if not keep_position:
+            self.first = 0
+        self._refresh()
+
+    def yview(self, *args):
+        """Commande de la barre de défilement (moveto / scroll)"""
+        if args[0] == "moveto":
+            self.first = int(float(args[1]) * len(self.rows))
+            self._refresh()
+        elif args[0] == "scroll":
+            self._scroll(int(args[1]), self.visible if args[2] == "pages" else 1)
+
+    def _scroll(self, direction, step):
+        self.first += direction * step
+        self._refresh()
+        return "break"
+
+    def _on_resize(self, event):
+        # Une ligne pour les titres de colonnes
+        visible = max(1, event.height // self.row_height - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self._refresh()
+
+    def _refresh(self):
+        total = len(self.rows)
+        self.first = max(0, min(self.first, total - self.visible))
+        count = min(self.visible, total - self.first)
+        while len(self.items) < count:
+            self.items.append(self.tree.insert("", "end"))
+        while len(self.items) > count:
+            self.tree.delete(self.items.pop())
+        for item, row in zip(self.items, self.rows[self.first:self.first + count]):
+            values, tags = self.render(row)
+            self.tree.item(item, values=values, tags=tags)
+        if total:
+            self.v_scrollbar.set(self.first / total, (self.first + count) / total)
+        else:
+            self.v_scrollbar.set(0, 1)
@@ -0,0 +1,146 @@
+"""
+Disjoncteur par casque WiFi
+Après des échecs de liaison répétés, les commandes vers un casque injoignable
+échouent immédiatement au lieu d'attendre connect + délais. Un seul essai est
+retenté après une attente qui double à chaque nouvel échec.
+"""
+
+import threading
+import time
+
+
+BREAKER_CLOSED = "closed"        # Commandes normales
+BREAKER_OPEN = "open"            # Casque considéré hors ligne: échec immédiat
+BREAKER_HALF_OPEN = "half-open"  # Un essai en cours décide de la suite
+
+# Échecs consécutifs avant ouverture, puis attente avant nouvel essai
+FAILURE_THRESHOLD = 2
+BACKOFF_BASE = 5
+BACKOFF_MAX = 300
+
+# Messages adb qui signalent un problème de transport (et non de la commande):
+# casque hors ligne ou inconnu du serveur, connexion refusée, serveur adb
+# injoignable (AdbConnectionError). Un délai dépassé ou un flux fermé en cours
+# de commande ne compte pas: une commande lente n'est pas une liaison coupée.
+LINK_ERRORS = ("offline", "device '", "no devices", "failed to connect",
+               "unable to connect", "cannot connect", "connection refused", "injoignable")
+
+
+def is_link_error(message):
+    """Vrai si la sortie d'erreur adb indique un casque injoignable (pas une commande lente)"""
+    message = (message or "").lower()
+    return any(marker in message for marker in LINK_ERRORS)
+
+
+class _Breaker:
+    def __init__(self, backoff):
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.backoff = backoff
+        self.retry_at = 0
+
+
+class DeviceBreakers:
+    """Disjoncteurs fermé / ouvert / semi-ouvert, un par device_id
+
+    Les abonnés sont appelés avec (device_id, ancien état, nouvel état,
+    secondes avant nouvel essai), depuis le thread qui a changé l'état.
+    """
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX):
+        self.threshold = threshold
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breakers = {}
+        self.subscribers = []
+        self.lock = threading.Lock()
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def _get(self, device_id):
+        breaker = self.breakers.get(device_id)
+        if breaker is None:
+            breaker = self.breakers[device_id] = _Breaker(self.backoff_base)
+        return breaker
+
+    def _set_state(self, device_id, breaker, state):
+        # Appelé sous self.lock: retourne la notification à envoyer hors du verrou
+        if breaker.state == state:
+            return None
+        previous, breaker.state = breaker.state, state
+        return device_id, previous, state, self._retry_in(breaker)
+
+    def _notify(self, change):
+        if not change:
+            return
+        for callback in list(self.subscribers):
+            try:
+                callback(*change)
+            except Exception as e:
+                print(f"Erreur abonné disjoncteur: {e}")
+
+    def _retry_in(self, breaker):
+        if breaker.state != BREAKER_OPEN:
+            return 0
+        return max(0, int(breaker.retry_at - time.monotonic() + 0.999))
+
+    def allow(self, device_id):
+        """Vrai si une commande peut partir (un seul essai à la fois en semi-ouvert)"""
+        with self.lock:
+            breaker = self._get(device_id)
+            if breaker.state == BREAKER_CLOSED:
+                return True
+            if breaker.state == BREAKER_HALF_OPEN or time.monotonic() < breaker.retry_at:
+                return False
+            change = self._set_state(device_id, breaker, BREAKER_HALF_OPEN)
+        self._notify(change)
+        return True
+
+    def success(self, device_id):
+        """Le casque a répondu: disjoncteur refermé, attente remise à zéro"""
+        with self.lock:
+            breaker = self._get(device_id)
+            breaker.failures = 0
+            breaker.backoff = self.backoff_base
+            change = self._set_state(device_id, breaker, BREAKER_CLOSED)
+        self._notify(change)
+
+    def failure(self, device_id):
+        """Échec de liaison: ouvre après le seuil, ou immédiatement si l'essai échoue"""
+        with self.lock:
+            breaker = self._get(device_id)
+            breaker.failures += 1
+            if breaker.state == BREAKER_HALF_OPEN:
+                breaker.backoff = min(breaker.backoff * 2, self.backoff_max)
+            elif breaker.state == BREAKER_OPEN or breaker.failures < self.threshold:
+                return
+            breaker.retry_at = time.monotonic() + breaker.backoff
+            change = self._set_state(device_id, breaker, BREAKER_OPEN)
+        self._notify(change)
+
+    def reset(self, device_id):
+        """Casque revu (suivi adb, reconnexion manuelle): disjoncteur refermé"""
+        self.success(device_id)
+
+    def state(self, device_id):
+        with self.lock:
+            breaker = self.breakers.get(device_id)
+            return breaker.state if breaker else BREAKER_CLOSED
+
+    def retry_in(self, device_id):
+        """Secondes avant le prochain essai autorisé (0 si fermé)"""
+        with self.lock:
+            breaker = self.breakers.get(device_id)
+            return self._retry_in(breaker) if breaker else 0
+
+    def describe(self, device_id):
+        """Suffixe d'affichage pour les listes de casques ('' si fermé)"""
+        with self.lock:
+            breaker = self.breakers.get(device_id)
+            if not breaker or breaker.state == BREAKER_CLOSED:
+                return ""
+            if breaker.state == BREAKER_HALF_OPEN:
+                return " - NOUVEL ESSAI EN COURS"
+            return f" - INJOIGNABLE (nouvel essai dans {self._retry_in(breaker)}s)"
@@ -0,0 +1,94 @@
+"""
+Cache des propriétés d'appareil
+Mémorise les valeurs qui ne changent pas avant un redémarrage (modèle, MAC,
+packages système...) par serial adb. Une entrée est invalidée quand le boot
+id du casque change ou quand sa durée de vie (TTL) expire.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+
+# Durée pendant laquelle le boot id connu d'un appareil est cru sans relecture
+BOOT_ID_TTL = 30
+
+# Durées de vie par défaut (None = jusqu'au prochain redémarrage)
+TTL_FOREVER = None
+TTL_HOUR = 3600
+
+CacheEntry = namedtuple("CacheEntry", ["value", "boot_id", "expires"])
+
+
+class PropertyCache:
+    """Cache {(serial, propriété): valeur} invalidé par boot id et TTL
+
+    boot_id_reader(serial) lit /proc/sys/kernel/random/boot_id sur l'appareil
+    (ou None). Ce boot id est lui-même gardé BOOT_ID_TTL secondes, ou jusqu'à
+    forget(serial) quand l'appareil se déconnecte.
+    """
+
+    def __init__(self, boot_id_reader, boot_id_ttl=BOOT_ID_TTL):
+        self.boot_id_reader = boot_id_reader
+        self.boot_id_ttl = boot_id_ttl
+        self.entries = {}
+        self.boot_ids = {}  # serial -> (boot_id, lu à)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _boot_id(self, serial):
+        with self.lock:
+            known = self.boot_ids.get(serial)
+        if known and time.monotonic() - known[1] < self.boot_id_ttl:
+            return known[0]
+        boot_id = self.boot_id_reader(serial)
+        self.set_boot_id(serial, boot_id)
+        return boot_id
+
+    def set_boot_id(self, serial, boot_id):
+        """Enregistre un boot id déjà connu (ex.: relevé par l'empreinte de l'appareil)"""
+        with self.lock:
+            self.boot_ids[serial] = (boot_id, time.monotonic())
+
+    def get(self, serial, name, loader, ttl=TTL_FOREVER):
+        """Retourne la valeur en cache, sinon loader() (None n'est jamais mis en cache)"""
+        boot_id = self._boot_id(serial)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get((serial, name))
+            if entry and entry.boot_id == boot_id and (entry.expires is None or entry.expires > now):
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+        value = loader()
+        if value is not None:
+            self.put(serial, name, value, ttl, boot_id)
+        return value
+
+    def put(self, serial, name, value, ttl=TTL_FOREVER, boot_id=None):
+        """Ajoute une valeur connue par ailleurs"""
+        if boot_id is None:
+            with self.lock:
+                known = self.boot_ids.get(serial)
+            boot_id = known[0] if known else None
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self.lock:
+            self.entries[(serial, name)] = CacheEntry(value, boot_id, expires)
+
+    def forget(self, serial):
+        """Appareil déconnecté: le boot id sera relu (les valeurs survivent si pas de redémarrage)"""
+        with self.lock:
+            self.boot_ids.pop(serial, None)
+
+    def invalidate(self, serial=None, name=None):
+        """Supprime les entrées d'un appareil et/ou d'une propriété (tout si aucun filtre)"""
+        with self.lock:
+            for key in [key for key in self.entries
+                        if (serial is None or key[0] == serial) and (name is None or key[1] == name)]:
+                del self.entries[key]
+
+    def stats(self):
+        """Compteurs pour les logs: {'hits', 'misses', 'entries'}"""
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
@@ -0,0 +1,235 @@
+"""
+Registre des casques enregistrés (devices.csv)
+Index par numéro de série USB, identifiant WiFi (ip:5555), adresse MAC et
+groupe, mis à jour à chaque modification: les recherches des onglets se font
+en temps constant au lieu de parcourir tous les casques, et les threads de
+travail ne modifient plus un dict que l'interface est en train de parcourir.
+"""
+
+import csv
+import os
+import threading
+
+
+DEFAULT_GROUP = "Non assigné"
+WIRELESS_PORT = 5555
+
+# Colonnes de devices.csv (le numéro de série USB vient en premier)
+FIELDS = ("nickname", "last_seen", "ip_address", "group", "mac_address")
+
+
+def wireless_id(ip):
+    """Identifiant adb d'un casque en WiFi ('ip:5555'), None sans IP"""
+    return f"{ip}:{WIRELESS_PORT}" if ip else None
+
+
+class DeviceRegistry:
+    """Casques enregistrés, clés = numéro de série USB
+
+    Les lectures retournent des copies: toute modification passe par add(),
+    update() ou remove() pour garder les index à jour.
+    """
+
+    def __init__(self, filepath=None):
+        self.filepath = filepath
+        self._devices = {}
+        self._by_wireless = {}
+        self._by_mac = {}
+        self._by_group = {}
+        self.lock = threading.RLock()
+
+    # ==================== Index ====================
+
+    def _index(self, serial, info):
+        ip_id = wireless_id(info.get("ip_address"))
+        if ip_id:
+            self._by_wireless[ip_id] = serial
+        mac = info.get("mac_address", "").lower()
+        if mac:
+            self._by_mac[mac] = serial
+        self._by_group.setdefault(info.get("group", DEFAULT_GROUP), set()).add(serial)
+
+    def _unindex(self, serial, info):
+        # Une IP ou une MAC réattribuée peut déjà pointer vers un autre casque
+        ip_id = wireless_id(info.get("ip_address"))
+        if ip_id and self._by_wireless.get(ip_id) == serial:
+            del self._by_wireless[ip_id]
+        mac = info.get("mac_address", "").lower()
+        if mac and self._by_mac.get(mac) == serial:
+            del self._by_mac[mac]
+        group = info.get("group", DEFAULT_GROUP)
+        members = self._by_group.get(group)
+        if members:
+            members.discard(serial)
+            if not members:
+                del self._by_group[group]
+
+    # ==================== Persistance ====================
+
+    def load(self):
+        """Charge devices.csv (remplace le contenu actuel)"""
+        if not self.filepath or not os.path.exists(self.filepath):
+            return
+        with open(self.filepath, 'r', newline='', encoding='utf-8') as f:
+            rows = [row for row in csv.reader(f) if len(row) >= 3]
+        with self.lock:
+            self._devices.clear()
+            self._by_wireless.clear()
+            self._by_mac.clear()
+            self._by_group.clear()
+            for row in rows:
+                self.add(row[0],
+                         nickname=row[1],
+                         last_seen=row[2],
+                         ip_address=row[3] if len(row) >= 4 else "",
+                         group=row[4] if len(row) >= 5 else DEFAULT_GROUP,
+                         mac_address=row[5] if len(row) >= 6 else "")
+
+    def save(self):
+        """Écrit devices.csv (fichier temporaire puis remplacement)"""
+        if not self.filepath:
+            return
+        with self.lock:
+            rows = [[serial] + [info[field] for field in FIELDS]
+                    for serial, info in self._devices.items()]
+            temp_path = self.filepath + ".tmp"
+            with open(temp_path, 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerows(rows)
+            os.replace(temp_path, self.filepath)
+
+    # ==================== Modifications ====================
+
+    def add(self, serial, nickname=None, last_seen="", ip_address="",
+            group=DEFAULT_GROUP, mac_address=""):
+        """Enregistre (ou remplace) un casque"""
+        info = {
+            "nickname": nickname or f"Device_{serial[:8]}",
+            "last_seen": last_seen,
+            "ip_address": ip_address or "",
+            "group": group if group is not None else DEFAULT_GROUP,
+            "mac_address": mac_address or "",
+        }
+        with self.lock:
+            previous = self._devices.get(serial)
+            if previous:
+                self._unindex(serial, previous)
+            self._devices[serial] = info
+            self._index(serial, info)
+
+    def update(self, serial, **fields):
+        """Modifie des champs d'un casque enregistré, False s'il est inconnu"""
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise KeyError(f"Champs inconnus: {', '.join(sorted(unknown))}")
+        with self.lock:
+            info = self._devices.get(serial)
+            if info is None:
+                return False
+            self._unindex(serial, info)
+            info.update(fields)
+            self._index(serial, info)
+            return True
+
+    def remove(self, serial):
+        """Oublie un casque, retourne ses informations (None s'il est inconnu)"""
+        with self.lock:
+            info = self._devices.pop(serial, None)
+            if info:
+                self._unindex(serial, info)
+            return info
+
+    # ==================== Lectures ====================
+
+    def __contains__(self, serial):
+        with self.lock:
+            return serial in self._devices
+
+    def __len__(self):
+        with self.lock:
+            return len(self._devices)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __getitem__(self, serial):
+        with self.lock:
+            return dict(self._devices[serial])
+
+    def get(self, serial, default=None):
+        with self.lock:
+            info = self._devices.get(serial)
+            return dict(info) if info is not None else default
+
+    def keys(self):
+        with self.lock:
+            return list(self._devices)
+
+    def values(self):
+        with self.lock:
+            return [dict(info) for info in self._devices.values()]
+
+    def items(self):
+        """Copie [(serial, infos)]: peut être parcourue pendant que d'autres threads modifient"""
+        with self.lock:
+            return [(serial, dict(info)) for serial, info in self._devices.items()]
+
+    def resolve(self, device_id):
+        """Numéro de série enregistré d'un id adb (série USB ou ip:5555), None si inconnu"""
+        with self.lock:
+            if device_id in self._devices:
+                return device_id
+            return self._by_wireless.get(device_id)
+
+    def lookup(self, device_id):
+        """(serial, infos) d'un id adb (série USB ou ip:5555), (None, None) si inconnu"""
+        with self.lock:
+            serial = self.resolve(device_id)
+            if serial is None:
+                return None, None
+            return serial, dict(self._devices[serial])
+
+    def nickname(self, device_id, default=None):
+        """Surnom d'un id adb (série USB ou ip:5555)"""
+        with self.lock:
+            serial = self.resolve(device_id)
+            if serial is None:
+                return default
+            return self._devices[serial]["nickname"]
+
+    def group(self, device_id, default=DEFAULT_GROUP):
+        """Groupe d'un id adb (série USB ou ip:5555)"""
+        with self.lock:
+            serial = self.resolve(device_id)
+            if serial is None:
+                return default
+            return self._devices[serial]["group"]
+
+    def find_by_mac(self, mac):
+        """(serial, infos) du casque de cette adresse MAC, (None, None) si inconnue"""
+        if not mac:
+            return None, None
+        with self.lock:
+            serial = self._by_mac.get(mac.lower())
+            if serial is None:
+                return None, None
+            return serial, dict(self._devices[serial])
+
+    def macs(self):
+        """Adresses MAC connues (en minuscules)"""
+        with self.lock:
+            return set(self._by_mac)
+
+    def group_members(self, group):
+        """Numéros de série des casques d'un groupe"""
+        with self.lock:
+            return list(self._by_group.get(group, ()))
+
+    def groups(self):
+        """Groupes non vides, triés"""
+        with self.lock:
+            return sorted(group for group in self._by_group if group)
+
+    def known_ids(self):
+        """Tous les ids adb qui désignent un casque enregistré (série USB et ip:5555)"""
+        with self.lock:
+            return set(self._devices) | set(self._by_wireless)
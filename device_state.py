@@ -0,0 +1,72 @@
+"""
+État des casques connectés, partagé par tous les onglets
+Un seul suivi (host:track-devices) tient à jour {device_id: état}: les
+onglets lisent cette liste en mémoire au lieu de lancer chacun 'adb devices',
+et sont prévenus des changements dans le thread Tk, regroupés en un seul
+rafraîchissement même si plusieurs casques changent en même temps.
+"""
+
+import threading
+
+
+class DeviceStateStore:
+    """États adb des casques (série USB ou ip:5555) et abonnés de l'interface
+
+    read_states() -> {device_id: état} lit le suivi (repli 'adb devices'
+    si le flux n'est pas ouvert); schedule(fonction) l'exécute dans le
+    thread Tk (root.after).
+    """
+
+    def __init__(self, read_states, schedule):
+        self.read_states = read_states
+        self.schedule = schedule
+        self.subscribers = []
+        self.changed = set()
+        self.pending = False
+        self.lock = threading.Lock()
+
+    def states(self, *wanted):
+        """{device_id: état} courant, limité aux états demandés ('device', 'offline'...)"""
+        states = self.read_states()
+        if wanted:
+            return {device_id: state for device_id, state in states.items() if state in wanted}
+        return states
+
+    def connected(self):
+        """device_ids autorisés (état 'device'), dans l'ordre du serveur adb"""
+        return list(self.states("device"))
+
+    def subscribe(self, callback):
+        """callback(device_ids changés) dans le thread Tk (ensemble vide: tout redessiner)"""
+        self.subscribers.append(callback)
+
+    def on_device_event(self, event, device_id, state, previous_state):
+        """Abonné du suivi adb (thread du suivi)"""
+        self.touch([device_id])
+
+    def touch(self, device_ids=None):
+        """Changement hors adb (disjoncteur, nom, groupe): les abonnés redessinent
+
+        Sans device_ids, tous les casques sont considérés comme changés.
+        """
+        with self.lock:
+            if device_ids is None:
+                self.changed.add(None)
+            else:
+                self.changed.update(device_ids)
+            if self.pending:
+                return
+            self.pending = True
+        self.schedule(self._flush)
+
+    def _flush(self):
+        with self.lock:
+            changed, self.changed = self.changed, set()
+            self.pending = False
+        if None in changed:
+            changed = set()
+        for callback in list(self.subscribers):
+            try:
+                callback(changed)
+            except Exception as e:
+                print(f"Erreur abonné état des casques: {e}")
@@ -0,0 +1,65 @@
+"""
+Analyse de sorties dumpsys au fil de l'eau
+Les parseurs consomment un itérable de lignes (voir AdbClient.shell_lines) et
+s'arrêtent dès que l'information cherchée est complète: la sortie n'est
+jamais gardée entière en mémoire et la commande est interrompue plus tôt.
+"""
+
+import re
+
+
+# Commandes limitées à la section utile
+PACKAGES_COMMAND = "dumpsys package packages"
+WINDOWS_COMMAND = "dumpsys window windows"
+BATTERY_COMMAND = "dumpsys battery"
+
+CURRENT_FOCUS_RE = re.compile(r'mCurrentFocus=Window\{[^}]+ ([^\s}]+)\}')
+BATTERY_LEVEL_RE = re.compile(r'level: (\d+)')
+
+
+def parse_system_packages(lines):
+    """Packages portant le flag SYSTEM, d'après 'dumpsys package'
+
+    Retourne un frozenset, ou None si la section 'Packages:' est absente
+    (sortie vide ou commande en échec).
+    """
+    system_packages = set()
+    in_packages = False
+    current_package = None
+    for line in lines:
+        if not in_packages:
+            in_packages = line.startswith('Packages:')
+            continue
+        # La section se termine à la prochaine ligne non indentée
+        if line and not line[0].isspace():
+            break
+        line = line.strip()
+        if line.startswith('Package ['):
+            current_package = line.split('[')[1].split(']')[0]
+        elif current_package and 'flags=' in line and 'SYSTEM' in line:
+            system_packages.add(current_package)
+    return frozenset(system_packages) if in_packages else None
+
+
+def parse_current_focus(lines):
+    """Application au premier plan d'après 'dumpsys window' (dernier mCurrentFocus)
+
+    Avec plusieurs écrans, chaque écran a son mCurrentFocus et le focus
+    global vient en dernier: la sortie est lue jusqu'au bout.
+    """
+    focus = None
+    for line in lines:
+        if 'mCurrentFocus=' in line:
+            match = CURRENT_FOCUS_RE.search(line)
+            if match:
+                focus = match.group(1)
+    return focus
+
+
+def parse_battery_level(lines):
+    """Niveau de batterie d'après 'dumpsys battery' (premier 'level:'), None si absent"""
+    for line in lines:
+        match = BATTERY_LEVEL_RE.search(line)
+        if match:
+            return int(match.group(1))
+    return None
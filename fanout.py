@@ -0,0 +1,292 @@
+"""
+Lecture unique d'un fichier envoyé à plusieurs casques
+Quand le même APK ou la même vidéo part vers vingt casques, chaque push
+relisait le fichier: vingt lectures concurrentes à des positions différentes,
+de quoi saturer un disque dur de portable ou un partage réseau. Ici les
+transferts d'un même fichier partagent une fenêtre de blocs en mémoire, lue
+une seule fois; le casque le plus lent freine les autres quand la fenêtre
+est pleine. Un transfert qui démarre en retard relit seul le début déjà
+libéré (au plus une fenêtre) puis rejoint les autres; au-delà, il ouvre une
+nouvelle lecture (génération) au lieu de bloquer tout le monde.
+
+Les transferts ne démarrent pas tous ensemble: les limites USB/WiFi les
+lancent par vagues. planned() annonce à l'avance combien de transferts
+liront chaque fichier; tant qu'ils ne sont pas tous partis, les blocs d'un
+fichier annoncé restent en mémoire, dans la limite de FANOUT_RETAIN_MAX
+pour l'ensemble des fichiers. Ces fichiers sont lus une seule fois sur le
+disque quel que soit le nombre de casques; un fichier plus gros que ce qui
+reste de la limite est lu une fois par vague de transferts simultanés.
+"""
+
+import contextlib
+import os
+import threading
+
+
+# Taille d'un bloc lu sur le disque et nombre de blocs gardés en mémoire
+FANOUT_CHUNK = 1024 * 1024
+FANOUT_WINDOW = 64
+
+# Mémoire maximale des fichiers gardés entiers pour les vagues suivantes
+FANOUT_RETAIN_MAX = 1024 * 1024 * 1024
+
+
+class FanoutSource:
+    """Un fichier en cours de lecture, partagé par les lecteurs attachés"""
+
+    def __init__(self, path, chunk_size=FANOUT_CHUNK, window=FANOUT_WINDOW):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.window = window
+        self.file = open(path, 'rb')
+        self.chunks = {}      # {index: octets}
+        self.positions = {}   # {lecteur: index du bloc en cours}
+        self.evicted = 0      # Blocs < evicted libérés
+        self.loaded = 0       # Prochain bloc à lire sur le disque
+        self.loading = False
+        self.eof = None       # Nombre de blocs, connu en fin de fichier
+        self.error = None     # Erreur de lecture, renvoyée à tous les lecteurs
+        self.pending = 0      # Transferts annoncés (planned) pas encore attachés
+        self.retain = False   # Blocs gardés tant que des transferts annoncés manquent
+        self.disk_bytes = 0
+        self.cond = threading.Condition()
+
+    def attach(self, reader):
+        """Attache un lecteur, retourne le premier bloc partagé qu'il lira (None: trop tard)
+
+        Les blocs précédents, déjà libérés, sont relus par le lecteur lui-même;
+        sa position retient la fenêtre partagée pendant ce rattrapage.
+        """
+        with self.cond:
+            if self.file is None or self.error is not None or self.evicted >= self.window:
+                return None
+            self.pending = max(0, self.pending - 1)
+            self.positions[reader] = self.evicted
+            return self.evicted
+
+    def end_plan(self):
+        """Fin d'un lot annoncé: les transferts qui ne sont pas partis ne viendront plus"""
+        with self.cond:
+            self.pending = 0
+            self.retain = False
+            self._evict()
+            self._close_if_unused()
+
+    def read_direct(self, handle, index):
+        """Relit un bloc déjà libéré avec le fichier du lecteur en retard"""
+        handle.seek(index * self.chunk_size)
+        data = handle.read(self.chunk_size)
+        with self.cond:
+            self.disk_bytes += len(data)
+        return data
+
+    def detach(self, reader):
+        with self.cond:
+            self.positions.pop(reader, None)
+            self._evict()
+            self._close_if_unused()
+            self.cond.notify_all()
+
+    def _close_if_unused(self):
+        if not self.positions and not self.pending and self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _evict(self):
+        # Fichier gardé entier pour les transferts annoncés qui ne sont pas encore partis
+        if self.retain and self.pending:
+            return
+        # Blocs déjà consommés par tous les lecteurs attachés, hors la dernière
+        # fenêtre lue: un transfert qui démarre un peu après les autres s'y raccroche
+        oldest = min(self.positions.values()) if self.positions else self.loaded
+        oldest = min(oldest, self.loaded - self.window)
+        for index in range(self.evicted, oldest):
+            self.chunks.pop(index, None)
+        self.evicted = max(self.evicted, oldest)
+
+    def chunk(self, reader, index):
+        """Bloc index (b'' en fin de fichier); lu sur disque par le premier qui en a besoin
+
+        Une erreur de lecture est relevée chez tous les lecteurs: aucun ne
+        la prend pour la fin du fichier.
+        """
+        with self.cond:
+            self.positions[reader] = max(index, self.positions.get(reader, index))
+            self._evict()
+            self.cond.notify_all()
+            while True:
+                if index in self.chunks:
+                    return self.chunks[index]
+                if self.error is not None:
+                    raise self.error
+                if self.eof is not None and index >= self.eof:
+                    return b""
+                # Fenêtre pleine: attendre le lecteur le plus lent
+                slowest = min(self.positions.values())
+                if not self.loading and index == self.loaded and index - slowest < self.window:
+                    self.loading = True
+                    break
+                self.cond.wait()
+        # Lecture disque hors verrou: les lecteurs en avance sur leurs blocs continuent
+        try:
+            data = self.file.read(self.chunk_size)
+        except Exception as e:
+            with self.cond:
+                self.loading = False
+                self.error = e
+                self.cond.notify_all()
+            raise
+        with self.cond:
+            self.loading = False
+            self.disk_bytes += len(data)
+            if data:
+                self.chunks[index] = data
+                self.loaded += 1
+            else:
+                self.eof = index
+            self.cond.notify_all()
+        return data
+
+
+class FanoutReader:
+    """Objet fichier (read, close) d'un transfert, branché sur une FanoutSource"""
+
+    def __init__(self, cache, source):
+        self.cache = cache
+        self.source = source
+        self.index = 0
+        self.offset = 0
+        self.shared_from = 0   # Blocs < shared_from relus par ce lecteur (arrivé en retard)
+        self.handle = None
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read(self, size=-1):
+        parts = []
+        while size != 0:
+            if self.index < self.shared_from:
+                if self.handle is None:
+                    self.handle = open(self.source.path, 'rb')
+                data = self.source.read_direct(self.handle, self.index)
+            else:
+                data = self.source.chunk(self, self.index)
+            if not data:
+                break
+            piece = data[self.offset:] if size < 0 else data[self.offset:self.offset + size]
+            parts.append(piece)
+            self.offset += len(piece)
+            if size > 0:
+                size -= len(piece)
+            if self.offset >= len(data):
+                self.index += 1
+                self.offset = 0
+        return b"".join(parts)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self.handle is not None:
+                self.handle.close()
+            self.source.detach(self)
+            self.cache._release(self.source)
+
+
+class FanoutCache:
+    """Lectures partagées par chemin de fichier (une instance pour l'application)
+
+    open(chemin) remplace open(chemin, 'rb') pour les transferts: les
+    lecteurs ouverts pendant que le début du fichier est en mémoire
+    partagent la même lecture disque.
+    """
+
+    def __init__(self, chunk_size=FANOUT_CHUNK, window=FANOUT_WINDOW, retain_max=FANOUT_RETAIN_MAX):
+        self.chunk_size = chunk_size
+        self.window = window
+        self.retain_max = retain_max
+        self.retained = 0  # Octets réservés par les fichiers gardés entiers
+        self.sources = {}  # {(chemin, taille, date): FanoutSource}
+        self.disk_bytes = 0
+        self.served_bytes = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(path):
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime), stat.st_size
+
+    @contextlib.contextmanager
+    def planned(self, consumers):
+        """Annonce {chemin: nombre de transferts} pour la durée du bloc with
+
+        Les fichiers qui tiennent dans retain_max (avec les autres fichiers
+        annoncés en cours) sont lus une fois pour tous leurs transferts,
+        même partis par vagues.
+        """
+        planned = []
+        with self.lock:
+            for path, count in consumers.items():
+                if count < 2:
+                    continue
+                try:
+                    key, size = self._key(path)
+                    source = self.sources.get(key)
+                    if source is None or source.evicted or source.error is not None:
+                        source = FanoutSource(path, self.chunk_size, self.window)
+                        self.sources[key] = source
+                except OSError:
+                    continue
+                retain = self.retained + size <= self.retain_max
+                with source.cond:
+                    source.pending += count
+                    source.retain = source.retain or retain
+                if retain:
+                    self.retained += size
+                planned.append((source, size if retain else 0))
+        try:
+            yield
+        finally:
+            for source, reserved in planned:
+                source.end_plan()
+                with self.lock:
+                    self.retained -= reserved
+                self._release(source)
+
+    def open(self, path):
+        key, size = self._key(path)
+        with self.lock:
+            source = self.sources.get(key)
+            reader = FanoutReader(self, source) if source else None
+            shared_from = source.attach(reader) if source else None
+            if shared_from is None:
+                source = FanoutSource(path, self.chunk_size, self.window)
+                self.sources[key] = source
+                reader = FanoutReader(self, source)
+                shared_from = source.attach(reader)
+            reader.shared_from = shared_from
+            self.served_bytes += size
+            return reader
+
+    def _release(self, source):
+        with self.lock:
+            if source.file is None:
+                self.disk_bytes += source.disk_bytes
+                source.disk_bytes = 0
+                for key, current in list(self.sources.items()):
+                    if current is source:
+                        del self.sources[key]
+
+    def stats(self):
+        """(octets lus sur le disque, octets servis aux transferts) depuis le dernier appel"""
+        with self.lock:
+            disk = self.disk_bytes + sum(source.disk_bytes for source in self.sources.values())
+            served = self.served_bytes
+            self.disk_bytes = 0
+            self.served_bytes = 0
+            for source in self.sources.values():
+                source.disk_bytes = 0
+        return disk, served
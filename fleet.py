@@ -0,0 +1,203 @@
+"""
+Exécution parallèle sur la flotte de casques
+Une boucle asyncio dédiée (thread d'arrière-plan) lance une opération sur
+plusieurs appareils à la fois, avec des limites de concurrence par appareil,
+par transport (USB/WiFi) et globale. Les threads Tk y soumettent leur
+travail et récupèrent les résultats au fil de l'eau.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Limites par défaut: le hub USB sature plus vite que le WiFi
+MAX_TOTAL = 16
+MAX_USB = 4
+MAX_WIFI = 12
+MAX_PER_DEVICE = 1
+
+TRANSPORT_USB = "usb"
+TRANSPORT_WIFI = "wifi"
+
+FleetResult = namedtuple("FleetResult", ["device_id", "ok", "value", "error", "elapsed"])
+
+# Attente (créneau + thread libre) de l'opération en cours dans ce thread
+_queue_time = threading.local()
+
+
+def transport_of(device_id):
+    """USB ou WiFi selon l'identifiant adb (IP:port pour le WiFi)"""
+    return TRANSPORT_WIFI if ":" in device_id else TRANSPORT_USB
+
+
+def take_queue_time():
+    """Secondes d'attente avant le début de l'opération en cours (0 ensuite, ou hors flotte)"""
+    queued = getattr(_queue_time, "value", 0.0)
+    _queue_time.value = 0.0
+    return queued
+
+
+def _run_queued(operation, device_id, submitted):
+    _queue_time.value = time.monotonic() - submitted
+    try:
+        return operation(device_id)
+    finally:
+        _queue_time.value = 0.0
+
+
+class FleetCancelled(Exception):
+    """Opération annulée avant ou pendant son exécution"""
+
+
+class FleetTimeout(Exception):
+    """Délai dépassé pour un appareil"""
+
+
+# =============================================================================
+# EXÉCUTION EN COURS
+# =============================================================================
+
+class FleetRun:
+    """Une opération soumise sur plusieurs appareils
+
+    Itérer dessus renvoie les FleetResult dans l'ordre où les appareils
+    terminent; wait() attend la fin et renvoie {device_id: FleetResult}.
+    """
+
+    def __init__(self, executor, devices):
+        self.executor = executor
+        self.devices = list(dict.fromkeys(devices))
+        self.results = {}
+        self.tasks = []
+        self._queue = queue.Queue()
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        if not self.devices:
+            self._done.set()
+
+    @property
+    def cancelled(self):
+        """Vrai après cancel(): les opérations longues peuvent s'arrêter d'elles-mêmes"""
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Annule les appareils pas encore terminés"""
+        self._cancelled.set()
+        self.executor.loop.call_soon_threadsafe(self._cancel_tasks)
+
+    def _cancel_tasks(self):
+        for task in self.tasks:
+            task.cancel()
+
+    def _publish(self, result):
+        self.results[result.device_id] = result
+        self._queue.put(result)
+        if len(self.results) == len(self.devices):
+            self._done.set()
+
+    def __iter__(self):
+        for _ in range(len(self.devices)):
+            yield self._queue.get()
+
+    def wait(self, timeout=None):
+        """Attend la fin de tous les appareils, retourne {device_id: FleetResult}"""
+        self._done.wait(timeout)
+        return dict(self.results)
+
+
+# =============================================================================
+# EXÉCUTEUR
+# =============================================================================
+
+class FleetExecutor:
+    """Lance une opération bloquante operation(device_id) sur N appareils en parallèle"""
+
+    def __init__(self, max_total=MAX_TOTAL, max_usb=MAX_USB, max_wifi=MAX_WIFI,
+                 max_per_device=MAX_PER_DEVICE):
+        self.max_total = max_total
+        self.max_transport = {TRANSPORT_USB: max_usb, TRANSPORT_WIFI: max_wifi}
+        self.max_per_device = max_per_device
+        # Plus de threads que de créneaux: une opération hors délai continue
+        # de tourner en arrière-plan sans bloquer les suivantes
+        self.pool = ThreadPoolExecutor(max_workers=max_total * 2, thread_name_prefix="fleet")
+        self.loop = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self.loop is not None:
+                return
+            ready = threading.Event()
+
+            def run_loop():
+                self.loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self.loop)
+                self._global = asyncio.Semaphore(self.max_total)
+                self._transport = {name: asyncio.Semaphore(limit)
+                                   for name, limit in self.max_transport.items()}
+                self._per_device = {}
+                ready.set()
+                self.loop.run_forever()
+
+            threading.Thread(target=run_loop, daemon=True, name="fleet-loop").start()
+            ready.wait()
+
+    def _device_semaphore(self, device_id):
+        # Appelé uniquement depuis la boucle asyncio: pas de verrou nécessaire
+        semaphore = self._per_device.get(device_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_per_device)
+            self._per_device[device_id] = semaphore
+        return semaphore
+
+    def submit(self, devices, operation, deadline=None):
+        """Soumet operation(device_id) pour chaque appareil, retourne un FleetRun
+
+        deadline: délai maximal en secondes par appareil (hors attente d'un créneau).
+        Utilisable depuis n'importe quel thread, y compris le thread Tk.
+        """
+        self._ensure_loop()
+        run = FleetRun(self, devices)
+
+        def start():
+            run.tasks = [self.loop.create_task(self._run_one(run, device_id, operation, deadline))
+                         for device_id in run.devices]
+
+        self.loop.call_soon_threadsafe(start)
+        return run
+
+    def map(self, devices, operation, deadline=None):
+        """Version bloquante de submit(), retourne {device_id: FleetResult}"""
+        return self.submit(devices, operation, deadline).wait()
+
+    async def _run_one(self, run, device_id, operation, deadline):
+        submitted = start = time.monotonic()
+        try:
+            async with self._device_semaphore(device_id), \
+                    self._transport[transport_of(device_id)], self._global:
+                if run.cancelled:
+                    raise asyncio.CancelledError()
+                start = time.monotonic()
+                future = self.loop.run_in_executor(self.pool, _run_queued, operation, device_id, submitted)
+                if deadline:
+                    value = await asyncio.wait_for(future, deadline)
+                else:
+                    value = await future
+            result = FleetResult(device_id, True, value, None, time.monotonic() - start)
+        except asyncio.TimeoutError:
+            result = FleetResult(device_id, False, None, FleetTimeout(f"Délai dépassé ({deadline}s)"),
+                                 time.monotonic() - start)
+        except asyncio.CancelledError:
+            result = FleetResult(device_id, False, None, FleetCancelled("Annulé"), time.monotonic() - start)
+        except Exception as e:
+            result = FleetResult(device_id, False, None, e, time.monotonic() - start)
+        run._publish(result)
+
+    def shutdown(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.pool.shutdown(wait=False)
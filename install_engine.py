@@ -0,0 +1,391 @@
+"""
+Installation d'APK sur la flotte
+Un worker par casque enchaîne ses APK; les casques avancent en parallèle.
+Chaque APK (avec ses splits) est écrit en flux dans une session pm, sans
+copie dans /data/local/tmp; si le flux est impossible, il est transféré
+(push vérifié) puis installé par pm install. Seul le transfert occupe le
+lien: il est limité par lien (le hub USB, chaque réseau WiFi), l'installation
+sur le casque ne l'est pas. Un APK dont le casque a déjà la même version
+(package et versionCode lus localement) n'est pas transféré. Les échecs de
+transfert sont relancés automatiquement et le bilan s'affiche dans un
+tableau, casque par casque.
+"""
+
+import ipaddress
+import os
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from fleet import FleetExecutor, transport_of, TRANSPORT_WIFI
+
+
+# Transferts simultanés par lien: le hub USB, chaque réseau WiFi (/24)
+INSTALL_MAX_USB = 4
+INSTALL_MAX_WIFI = 6
+
+# Casques traités en même temps (au-delà, ils attendent un worker)
+INSTALL_WORKERS = 32
+
+# Nouvelles tentatives automatiques des APK en échec réessayable
+INSTALL_RETRIES = 1
+
+REMOTE_DIR = "/data/local/tmp"
+
+# stream(task) retourne cette valeur quand le flux est impossible: repli sur push
+STREAM_UNAVAILABLE = object()
+
+# États d'un APK sur un casque
+INSTALL_QUEUED = "queued"
+INSTALL_WAITING = "waiting"
+INSTALL_STREAMING = "streaming"
+INSTALL_PUSHING = "pushing"
+INSTALL_INSTALLING = "installing"
+INSTALL_OK = "installed"
+INSTALL_SKIPPED = "skipped"
+INSTALL_FAILED = "failed"
+
+STATE_LABELS = {
+    INSTALL_QUEUED: "en attente",
+    INSTALL_WAITING: "attente du lien",
+    INSTALL_STREAMING: "envoi en flux",
+    INSTALL_PUSHING: "transfert",
+    INSTALL_INSTALLING: "installation",
+    INSTALL_OK: "installé",
+    INSTALL_SKIPPED: "déjà à jour",
+    INSTALL_FAILED: "échec",
+}
+
+
+def link_of(device_id):
+    """Lien partagé par un casque: 'usb' ou le réseau WiFi /24 de son IP"""
+    if transport_of(device_id) != TRANSPORT_WIFI:
+        return "usb"
+    ip = device_id.rsplit(":", 1)[0]
+    try:
+        return f"wifi {ipaddress.ip_network(f'{ip}/24', strict=False)}"
+    except ValueError:
+        return "wifi"
+
+
+def is_split(apk_path):
+    """APK de configuration d'un bundle (split_config.arm64_v8a.apk...)"""
+    return os.path.basename(apk_path).lower().startswith("split_")
+
+
+def group_splits(apk_paths):
+    """Regroupe chaque APK de base avec les splits de son dossier: [[base, split...]]
+
+    Un split sans APK de base dans son dossier reste seul (pm le refusera).
+    """
+    groups = []
+    bases = {}
+    for apk_path in apk_paths:
+        if not is_split(apk_path):
+            group = [apk_path]
+            groups.append(group)
+            folder = os.path.dirname(os.path.abspath(apk_path))
+            if folder not in bases or os.path.basename(apk_path).lower() == "base.apk":
+                bases[folder] = group
+    for apk_path in apk_paths:
+        if is_split(apk_path):
+            group = bases.get(os.path.dirname(os.path.abspath(apk_path)))
+            if group is None:
+                groups.append([apk_path])
+            else:
+                group.append(apk_path)
+    return groups
+
+
+class InstallTask:
+    """Un APK (avec ses éventuels splits) à installer sur un casque"""
+
+    def __init__(self, device_id, apk_paths):
+        self.device_id = device_id
+        self.apk_paths = list(apk_paths)
+        self.apk_path = self.apk_paths[0]
+        self.apk_name = os.path.basename(self.apk_path)
+        if len(self.apk_paths) > 1:
+            self.apk_name += f" (+{len(self.apk_paths) - 1} splits)"
+        self.remote_paths = [f"{REMOTE_DIR}/{os.path.basename(path)}" for path in self.apk_paths]
+        self.size = sum(os.path.getsize(path) for path in self.apk_paths)
+        self.info = None     # ApkInfo de l'APK de base (package, versionCode), si lisible
+        self.method = None   # "stream" ou "push" une fois le transfert lancé
+        self.session = None  # Session pm ouverte par stream()
+        self.state = INSTALL_QUEUED
+        self.error = ""
+        self.retryable = False
+        self.attempts = 0
+        self.elapsed = 0.0
+
+    @property
+    def finished(self):
+        return self.state in (INSTALL_OK, INSTALL_SKIPPED, INSTALL_FAILED)
+
+
+class InstallEngine:
+    """Installe une liste d'APK sur une liste de casques, un worker par casque
+
+    stream(task) écrit les APK dans une session pm (task.session) et
+    commit(task) la valide; push(task) transfère et vérifie les APK
+    (task.remote_paths) et install(task) lance pm install et nettoie.
+    Chacun retourne un message d'erreur ou None; stream peut retourner
+    STREAM_UNAVAILABLE pour passer par push. Sans stream, push seulement.
+    inspect(apk_path) -> ApkInfo et installed_versions(device_id) ->
+    {package: versionCode} (un seul appel par casque) permettent de sauter
+    les APK déjà installés dans la même version.
+    on_update(task) est appelé à chaque changement (depuis les workers).
+    executor: FleetExecutor partagé de l'application (un worker par casque);
+    sans lui, l'engin crée le sien, à arrêter avec shutdown().
+    """
+
+    def __init__(self, push, install, stream=None, commit=None, max_usb=INSTALL_MAX_USB,
+                 max_wifi=INSTALL_MAX_WIFI, retries=INSTALL_RETRIES, on_update=None,
+                 executor=None, inspect=None, installed_versions=None):
+        self.push = push
+        self.install = install
+        self.stream = stream
+        self.commit = commit
+        self.inspect = inspect
+        self.installed_versions = installed_versions
+        self.max_usb = max_usb
+        self.max_wifi = max_wifi
+        self.retries = retries
+        self.on_update = on_update
+        self.own_executor = executor is None
+        self.executor = executor or FleetExecutor(max_total=INSTALL_WORKERS, max_usb=INSTALL_WORKERS,
+                                                  max_wifi=INSTALL_WORKERS)
+        self.links = {}
+        self.lock = threading.Lock()
+
+    def shutdown(self):
+        """Arrête l'exécuteur créé par l'engin (celui de l'application reste actif)"""
+        if self.own_executor:
+            self.executor.shutdown()
+
+    def _link_slot(self, device_id):
+        link = link_of(device_id)
+        with self.lock:
+            slot = self.links.get(link)
+            if slot is None:
+                limit = self.max_usb if link == "usb" else self.max_wifi
+                slot = self.links[link] = threading.BoundedSemaphore(max(1, limit))
+            return slot
+
+    def _set_state(self, task, state, error=""):
+        task.state = state
+        task.error = error
+        if self.on_update:
+            try:
+                self.on_update(task)
+            except Exception as e:
+                print(f"Erreur suivi installation: {e}")
+
+    def plan(self, devices, apk_paths):
+        """Tâches [InstallTask] de chaque APK (splits regroupés) sur chaque casque"""
+        groups = group_splits(apk_paths)
+        # Chaque APK n'est lu qu'une fois, quel que soit le nombre de casques
+        infos = [self.inspect(group[0]) if self.inspect else None for group in groups]
+        tasks = []
+        for device_id in dict.fromkeys(devices):
+            for group, info in zip(groups, infos):
+                task = InstallTask(device_id, group)
+                task.info = info
+                tasks.append(task)
+        return tasks
+
+    def run(self, tasks):
+        """Exécute les tâches (bloquant), relance les échecs réessayables, retourne tasks
+
+        Des tâches déjà terminées (relance manuelle des échecs) repartent de zéro.
+        """
+        pending = list(tasks)
+        for _ in range(self.retries + 1):
+            if not pending:
+                break
+            by_device = {}
+            for task in pending:
+                by_device.setdefault(task.device_id, []).append(task)
+                self._set_state(task, INSTALL_QUEUED)
+            for result in self.executor.submit(list(by_device), lambda device_id: self._worker(by_device[device_id])):
+                if not result.ok:
+                    # Worker interrompu: ses APK non terminés sont en échec
+                    for task in by_device[result.device_id]:
+                        if not task.finished:
+                            task.retryable = True
+                            self._set_state(task, INSTALL_FAILED, str(result.error))
+            pending = [task for task in pending if task.state == INSTALL_FAILED and task.retryable]
+        return tasks
+
+    def _worker(self, tasks):
+        versions = None
+        for task in tasks:
+            task.attempts += 1
+            start = time.monotonic()
+            try:
+                if self.installed_versions and task.info:
+                    if versions is None:
+                        versions = self.installed_versions(task.device_id) or {}
+                    if versions.get(task.info.package) == task.info.version_code:
+                        task.retryable = False
+                        self._set_state(task, INSTALL_SKIPPED)
+                        continue
+                self._install_one(task)
+            except Exception as e:
+                task.retryable = True
+                self._set_state(task, INSTALL_FAILED, str(e))
+            task.elapsed += time.monotonic() - start
+
+    def _install_one(self, task):
+        slot = self._link_slot(task.device_id)
+        self._set_state(task, INSTALL_WAITING)
+        with slot:
+            error = STREAM_UNAVAILABLE
+            if self.stream:
+                task.method = "stream"
+                self._set_state(task, INSTALL_STREAMING)
+                error = self.stream(task)
+            if error is STREAM_UNAVAILABLE:
+                task.method = "push"
+                self._set_state(task, INSTALL_PUSHING)
+                error = self.push(task)
+        if error:
+            # Transfert: souvent un casque endormi ou un WiFi saturé, à retenter
+            task.retryable = True
+            self._set_state(task, INSTALL_FAILED, error)
+            return
+        self._set_state(task, INSTALL_INSTALLING)
+        error = (self.commit if task.method == "stream" else self.install)(task)
+        if error:
+            # "Failure [INSTALL_FAILED_...]" de pm: même résultat à chaque essai
+            task.retryable = "Failure [" not in error
+            self._set_state(task, INSTALL_FAILED, error)
+            return
+        task.retryable = False
+        self._set_state(task, INSTALL_OK)
+
+
+def summarize(tasks):
+    """(installés, déjà à jour, échecs, total) d'une liste de tâches"""
+    ok = sum(1 for task in tasks if task.state == INSTALL_OK)
+    skipped = sum(1 for task in tasks if task.state == INSTALL_SKIPPED)
+    failed = sum(1 for task in tasks if task.state == INSTALL_FAILED)
+    return ok, skipped, failed, len(tasks)
+
+
+# =============================================================================
+# BILAN DE L'INSTALLATION (tableau non modal, mis à jour en direct)
+# =============================================================================
+
+class InstallSummary:
+    """Tableau casque par casque (une ligne par APK), avancement global en en-tête
+
+    update(task) doit être appelé depuis le thread Tk; finish() active
+    "Relancer les échecs", qui appelle on_retry([tâches en échec]).
+    """
+
+    def __init__(self, parent, tasks, device_name, on_retry=None):
+        self.tasks = tasks
+        self.on_retry = on_retry
+        self.device_name = device_name
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Installation des APK")
+        self.window.geometry("820x420")
+
+        self.status_label = tk.Label(self.window, font=("Helvetica", 10, "bold"), anchor="w")
+        self.status_label.pack(fill="x", padx=10, pady=(10, 5))
+
+        table_frame = tk.Frame(self.window)
+        table_frame.pack(fill="both", expand=True, padx=10)
+        columns = ("state", "attempts", "elapsed", "error")
+        self.tree = ttk.Treeview(table_frame, columns=columns)
+        self.tree.heading("#0", text="Casque / APK")
+        self.tree.heading("state", text="Statut")
+        self.tree.heading("attempts", text="Essais")
+        self.tree.heading("elapsed", text="Durée")
+        self.tree.heading("error", text="Erreur")
+        self.tree.column("#0", width=240)
+        self.tree.column("state", width=110)
+        self.tree.column("attempts", width=50, anchor="center")
+        self.tree.column("elapsed", width=60, anchor="e")
+        self.tree.column("error", width=340)
+        self.tree.tag_configure("ok", foreground="green")
+        self.tree.tag_configure("skipped", foreground="gray")
+        self.tree.tag_configure("failed", foreground="red")
+        v_scrollbar = tk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=v_scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        v_scrollbar.pack(side="right", fill="y")
+
+        btn_frame = tk.Frame(self.window)
+        btn_frame.pack(pady=10)
+        self.retry_btn = tk.Button(btn_frame, text="Relancer les échecs", command=self.retry,
+                                   state="disabled", width=18)
+        self.retry_btn.pack(side="left", padx=10)
+        tk.Button(btn_frame, text="Fermer", command=self.window.destroy, width=15).pack(side="left", padx=10)
+
+        self.rows = {}
+        self.device_rows = {}
+        self.show(tasks)
+
+    def show(self, tasks):
+        """Affiche (ou réaffiche après une relance) la liste des tâches"""
+        self.tasks = tasks
+        self.tree.delete(*self.tree.get_children())
+        self.rows.clear()
+        self.device_rows.clear()
+        for task in tasks:
+            if task.device_id not in self.device_rows:
+                self.device_rows[task.device_id] = self.tree.insert(
+                    "", "end", text=self.device_name(task.device_id), open=True)
+            self.rows[id(task)] = self.tree.insert(self.device_rows[task.device_id], "end", text=task.apk_name)
+            self._update_row(task)
+        for device_id in self.device_rows:
+            self._update_device(device_id)
+        self._update_status(finished=False)
+        self.retry_btn.config(state="disabled")
+
+    def _update_row(self, task):
+        tag = {INSTALL_OK: "ok", INSTALL_SKIPPED: "skipped", INSTALL_FAILED: "failed"}.get(task.state, "")
+        self.tree.item(self.rows[id(task)], tags=(tag,), values=(
+            STATE_LABELS.get(task.state, task.state), task.attempts,
+            f"{task.elapsed:.0f}s" if task.finished else "", task.error))
+
+    def _update_device(self, device_id):
+        device_tasks = [task for task in self.tasks if task.device_id == device_id]
+        ok, skipped, failed, total = summarize(device_tasks)
+        tag = "failed" if failed else "ok" if ok + skipped == total else ""
+        state = f"{ok + skipped}/{total} à jour" + (f", {failed} échecs" if failed else "")
+        self.tree.item(self.device_rows[device_id], tags=(tag,), values=(state, "", "", ""))
+
+    def _update_status(self, finished):
+        ok, skipped, failed, total = summarize(self.tasks)
+        done = ok + skipped + failed
+        text = f"{done}/{total} terminés — {ok} installés, {skipped} déjà à jour, {failed} échecs"
+        self.status_label.config(text=("Terminé: " if finished else "En cours: ") + text)
+
+    def update(self, task):
+        if not self.window.winfo_exists() or id(task) not in self.rows:
+            return
+        self._update_row(task)
+        self._update_device(task.device_id)
+        self._update_status(finished=False)
+
+    def finish(self):
+        if not self.window.winfo_exists():
+            return
+        for task in self.tasks:
+            self._update_row(task)
+        for device_id in self.device_rows:
+            self._update_device(device_id)
+        self._update_status(finished=True)
+        if self.on_retry and any(task.state == INSTALL_FAILED for task in self.tasks):
+            self.retry_btn.config(state="normal")
+
+    def retry(self):
+        failed = [task for task in self.tasks if task.state == INSTALL_FAILED]
+        if failed and self.on_retry:
+            self.retry_btn.config(state="disabled")
+            self.on_retry(failed)
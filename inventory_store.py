@@ -0,0 +1,204 @@
+"""
+Inventaires des packages conservés entre les audits (SQLite)
+Chaque audit enregistre l'inventaire de chaque casque (package, versionCode,
+chemin, uid) avec sa date. L'audit suivant ne relit un casque en entier que
+si l'empreinte de ses packages a changé: une sonde calcule sur le casque le
+MD5 de l'inventaire trié (32 caractères transférés au lieu de l'inventaire
+complet). La sonde exécute toujours le même 'pm list packages' sur le
+casque: le gain porte sur le transfert, l'analyse et l'écriture en base,
+pas sur le travail du package manager. Un nouvel instantané n'est stocké qu'en cas de changement, ce qui
+permet de retrouver ce qui a changé sur un casque depuis une date, ou les
+écarts des casques d'un groupe par rapport à une référence.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from apk_info import PackageEntry, INVENTORY_COMMAND
+
+
+# Empreinte de l'inventaire, calculée sur le casque (même tri que inventory_fingerprint);
+# aussi coûteuse sur le casque que INVENTORY_COMMAND, seule la sortie est réduite
+FINGERPRINT_COMMAND = f"{INVENTORY_COMMAND} | sort | md5sum"
+
+# Un instantané: quand l'inventaire a été lu, et vérifié inchangé pour la dernière fois
+Snapshot = namedtuple("Snapshot", ["id", "device", "taken_at", "checked_at", "fingerprint"])
+
+# Différences entre deux inventaires: {package: versionCode}, {package: (avant, après)}
+InventoryDiff = namedtuple("InventoryDiff", ["added", "removed", "changed"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    device TEXT NOT NULL,
+    taken_at REAL NOT NULL,
+    checked_at REAL NOT NULL,
+    fingerprint TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_device ON snapshots (device, taken_at);
+CREATE TABLE IF NOT EXISTS packages (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id),
+    package TEXT NOT NULL,
+    version_code INTEGER,
+    path TEXT,
+    uid INTEGER,
+    PRIMARY KEY (snapshot_id, package)
+);
+CREATE TABLE IF NOT EXISTS baselines (
+    group_name TEXT PRIMARY KEY,
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id),
+    set_at REAL NOT NULL
+);
+"""
+
+
+def inventory_fingerprint(text):
+    """MD5 de la sortie de INVENTORY_COMMAND, lignes triées (comme FINGERPRINT_COMMAND)"""
+    lines = sorted(line.strip() for line in text.splitlines() if line.strip())
+    return hashlib.md5("".join(line + "\n" for line in lines).encode('utf-8')).hexdigest()
+
+
+def parse_md5sum(text):
+    """Sortie de md5sum -> empreinte, None si illisible"""
+    digest = text.strip().split(" ")[0] if text.strip() else ""
+    return digest if len(digest) == 32 and all(c in "0123456789abcdef" for c in digest) else None
+
+
+def diff_inventories(before, after):
+    """InventoryDiff entre deux inventaires {package: PackageEntry}"""
+    added = {package: entry.version_code for package, entry in after.items() if package not in before}
+    removed = {package: entry.version_code for package, entry in before.items() if package not in after}
+    changed = {package: (before[package].version_code, entry.version_code)
+               for package, entry in after.items()
+               if package in before and before[package].version_code != entry.version_code}
+    return InventoryDiff(added, removed, changed)
+
+
+class InventoryStore:
+    """Instantanés des inventaires par casque (clé: numéro de série enregistré)
+
+    Une seule connexion SQLite partagée par les threads de l'audit, protégée
+    par un verrou.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(filepath, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def _snapshot(self, row):
+        return Snapshot(*row) if row else None
+
+    def latest(self, device):
+        """Dernier instantané du casque, None s'il n'a jamais été audité"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT id, device, taken_at, checked_at, fingerprint FROM snapshots "
+                "WHERE device = ? ORDER BY taken_at DESC, id DESC LIMIT 1", (device,)).fetchone()
+        return self._snapshot(row)
+
+    def at(self, device, when):
+        """Instantané en vigueur à la date when (le premier connu si le casque a été audité après)"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT id, device, taken_at, checked_at, fingerprint FROM snapshots "
+                "WHERE device = ? AND taken_at <= ? ORDER BY taken_at DESC, id DESC LIMIT 1",
+                (device, when)).fetchone()
+            if row is None:
+                row = self.db.execute(
+                    "SELECT id, device, taken_at, checked_at, fingerprint FROM snapshots "
+                    "WHERE device = ? ORDER BY taken_at, id LIMIT 1", (device,)).fetchone()
+        return self._snapshot(row)
+
+    def packages(self, snapshot_id):
+        """{package: PackageEntry} d'un instantané"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT package, version_code, path, uid FROM packages WHERE snapshot_id = ?",
+                (snapshot_id,)).fetchall()
+        return {package: PackageEntry(version_code, path, uid) for package, version_code, path, uid in rows}
+
+    def record(self, device, fingerprint, inventory, when=None):
+        """Enregistre un inventaire lu; inchangé depuis le dernier: seule la date de vérification avance"""
+        when = time.time() if when is None else when
+        latest = self.latest(device)
+        if latest and latest.fingerprint == fingerprint:
+            self.confirm(latest.id, when)
+            return latest.id
+        with self.lock, self.db:
+            cursor = self.db.execute(
+                "INSERT INTO snapshots (device, taken_at, checked_at, fingerprint) VALUES (?, ?, ?, ?)",
+                (device, when, when, fingerprint))
+            snapshot_id = cursor.lastrowid
+            self.db.executemany(
+                "INSERT INTO packages (snapshot_id, package, version_code, path, uid) VALUES (?, ?, ?, ?, ?)",
+                [(snapshot_id, package, entry.version_code, entry.path, entry.uid)
+                 for package, entry in inventory.items()])
+        return snapshot_id
+
+    def confirm(self, snapshot_id, when=None):
+        """L'empreinte du casque n'a pas changé: l'instantané est toujours valable"""
+        with self.lock, self.db:
+            self.db.execute("UPDATE snapshots SET checked_at = ? WHERE id = ?",
+                            (time.time() if when is None else when, snapshot_id))
+
+    def devices(self):
+        """Casques ayant au moins un instantané"""
+        with self.lock:
+            return [row[0] for row in self.db.execute("SELECT DISTINCT device FROM snapshots ORDER BY device")]
+
+    # ---------- Différences ----------
+
+    def changes_since(self, device, when):
+        """(instantané de départ, InventoryDiff) du casque entre la date when et son dernier inventaire"""
+        latest = self.latest(device)
+        if latest is None:
+            return None, None
+        start = self.at(device, when)
+        return start, diff_inventories(self.packages(start.id), self.packages(latest.id))
+
+    def set_baseline(self, group, device):
+        """Le dernier inventaire du casque devient la référence du groupe, retourne l'instantané"""
+        latest = self.latest(device)
+        if latest is None:
+            return None
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO baselines (group_name, snapshot_id, set_at) VALUES (?, ?, ?)",
+                            (group, latest.id, time.time()))
+        return latest
+
+    def baseline(self, group):
+        """Instantané de référence du groupe, None s'il n'y en a pas"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT s.id, s.device, s.taken_at, s.checked_at, s.fingerprint FROM baselines b "
+                "JOIN snapshots s ON s.id = b.snapshot_id WHERE b.group_name = ?", (group,)).fetchone()
+        return self._snapshot(row)
+
+    def drift(self, group, devices):
+        """{casque: InventoryDiff} des casques qui s'écartent de la référence du groupe
+
+        Les casques jamais audités sont absents; None si le groupe n'a pas de référence.
+        """
+        baseline = self.baseline(group)
+        if baseline is None:
+            return None
+        reference = self.packages(baseline.id)
+        drifted = {}
+        for device in devices:
+            latest = self.latest(device)
+            if latest is None or latest.fingerprint == baseline.fingerprint:
+                continue
+            difference = diff_inventories(reference, self.packages(latest.id))
+            if any(difference):
+                drifted[device] = difference
+        return drifted
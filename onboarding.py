@@ -0,0 +1,226 @@
+"""
+Intégration des casques branchés en USB
+Chaque casque branché passe ses étapes (empreinte, tcpip 5555, connexion
+WiFi, capteur de proximité) dans son propre thread, en parallèle des autres:
+vingt casques déballés sur un hub ne sont plus configurés un par un.
+Les noms sont demandés à la fin, en une seule fois (NicknameTable).
+"""
+
+import threading
+import tkinter as tk
+
+from fleet import FleetExecutor
+
+
+# Casques configurés en même temps
+ONBOARD_POOL = 16
+
+# États d'un casque dans la file
+ONBOARD_QUEUED = "queued"
+ONBOARD_PROBING = "probing"
+ONBOARD_TCPIP = "tcpip"
+ONBOARD_CONNECTING = "connecting"
+ONBOARD_PROXIMITY = "proximity"
+ONBOARD_READY = "ready"
+ONBOARD_FAILED = "failed"
+
+STATE_LABELS = {
+    ONBOARD_QUEUED: "en attente",
+    ONBOARD_PROBING: "lecture de l'empreinte",
+    ONBOARD_TCPIP: "activation ADB WiFi",
+    ONBOARD_CONNECTING: "connexion WiFi",
+    ONBOARD_PROXIMITY: "capteur de proximité",
+    ONBOARD_READY: "prêt",
+    ONBOARD_FAILED: "échec",
+}
+
+
+class OnboardingJob:
+    """Un casque en cours d'intégration (numéro de série USB)"""
+
+    def __init__(self, serial):
+        self.serial = serial
+        self.state = ONBOARD_QUEUED
+        self.error = ""
+        self.fingerprint = None
+        self.mac = None
+        self.ip = None
+        self.model = "Unknown"
+        self.ssid = None
+
+    @property
+    def wireless_id(self):
+        return f"{self.ip}:5555" if self.ip else None
+
+    @property
+    def finished(self):
+        return self.state in (ONBOARD_READY, ONBOARD_FAILED)
+
+
+class OnboardingQueue:
+    """File d'intégration: une tâche par casque branché, toutes en parallèle
+
+    adb doit fournir probe_device, enable_wifi_adb, connect_when_ready et
+    disable_proximity_sensor. Rappels (depuis les threads de travail):
+    - on_update(job) à chaque changement d'étape;
+    - on_batch(prêts, échecs) quand plus aucun casque n'est en cours;
+    - check(job) après l'empreinte: message d'erreur pour arrêter, sinon None.
+    executor: FleetExecutor partagé de l'application, sinon un pool propre.
+    """
+
+    def __init__(self, adb, on_update=None, on_batch=None, check=None, pool_size=ONBOARD_POOL,
+                 executor=None):
+        self.adb = adb
+        self.on_update = on_update
+        self.on_batch = on_batch
+        self.check = check
+        self.executor = executor or FleetExecutor(max_total=pool_size, max_usb=pool_size)
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, serial):
+        """Ajoute un casque branché, None s'il est déjà en cours"""
+        with self.lock:
+            if serial in self.jobs:
+                return None
+            job = self.jobs[serial] = OnboardingJob(serial)
+        self._notify(job)
+        self.executor.submit([serial], self._onboard)
+        return job
+
+    def active(self):
+        """Nombre de casques pas encore terminés"""
+        with self.lock:
+            return sum(1 for job in self.jobs.values() if not job.finished)
+
+    def _notify(self, job):
+        if self.on_update:
+            try:
+                self.on_update(job)
+            except Exception as e:
+                print(f"Erreur suivi intégration: {e}")
+
+    def _set_state(self, job, state, error=""):
+        job.state = state
+        job.error = error
+        self._notify(job)
+
+    def _onboard(self, serial):
+        job = self.jobs[serial]
+        try:
+            error = self._run_steps(job)
+        except Exception as e:
+            error = str(e)
+        if error:
+            self._set_state(job, ONBOARD_FAILED, error)
+        else:
+            self._set_state(job, ONBOARD_READY)
+
+        # Dernier casque terminé: le lot part en une fois (noms demandés ensemble)
+        with self.lock:
+            if any(not other.finished for other in self.jobs.values()):
+                return
+            batch = list(self.jobs.values())
+            self.jobs.clear()
+        if self.on_batch:
+            self.on_batch([j for j in batch if j.state == ONBOARD_READY],
+                          [j for j in batch if j.state == ONBOARD_FAILED])
+
+    def _run_steps(self, job):
+        """Étapes d'un casque, retourne un message d'erreur ou None"""
+        self._set_state(job, ONBOARD_PROBING)
+        fingerprint = self.adb.probe_device(job.serial)
+        if not fingerprint:
+            return "empreinte illisible (débogage USB autorisé dans le casque ?)"
+        job.fingerprint = fingerprint
+        job.mac = fingerprint.mac
+        job.ip = fingerprint.ip
+        job.model = fingerprint.model
+        job.ssid = fingerprint.ssid
+        if not job.mac:
+            return "adresse MAC introuvable"
+        if not job.ip:
+            return "adresse IP introuvable (WiFi connecté ?)"
+        if self.check:
+            error = self.check(job)
+            if error:
+                return error
+
+        self._set_state(job, ONBOARD_TCPIP)
+        if not self.adb.enable_wifi_adb(job.serial):
+            return "activation tcpip 5555 échouée (débogage USB autorisé ?)"
+
+        self._set_state(job, ONBOARD_CONNECTING)
+        if not self.adb.connect_when_ready(job.ip):
+            return f"connexion à {job.wireless_id} échouée"
+
+        self._set_state(job, ONBOARD_PROXIMITY)
+        if not self.adb.disable_proximity_sensor(job.wireless_id):
+            return "capteur de proximité non désactivé"
+        return None
+
+
+# =============================================================================
+# NOMS DES CASQUES INTÉGRÉS (tableau non modal)
+# =============================================================================
+
+class NicknameTable:
+    """Tableau éditable des noms d'un lot de casques intégrés
+
+    on_save({serial: nom}) est appelé à l'enregistrement; la fenêtre ne
+    bloque ni l'application ni la détection des casques suivants.
+    """
+
+    def __init__(self, parent, jobs, on_save, default_names=None, failed=None):
+        self.jobs = jobs
+        self.on_save = on_save
+        default_names = default_names or {}
+
+        self.window = tk.Toplevel(parent)
+        self.window.title(f"Nouveaux casques ({len(jobs)})")
+        self.window.transient(parent)
+        self.window.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        tk.Label(
+            self.window,
+            text="Nom de chaque casque (exemple: Q3-07 ou A-13)",
+            font=("Helvetica", 11, "bold")
+        ).pack(pady=10)
+
+        table = tk.Frame(self.window)
+        table.pack(fill="both", expand=True, padx=15)
+        for column, title in enumerate(("Modèle", "Série USB", "IP", "MAC", "Nom")):
+            tk.Label(table, text=title, font=("Helvetica", 9, "bold"), anchor="w").grid(
+                row=0, column=column, sticky="w", padx=4)
+
+        self.entries = {}
+        for row, job in enumerate(jobs, start=1):
+            for column, value in enumerate((job.model, job.serial, job.ip, job.mac)):
+                tk.Label(table, text=value or "", anchor="w").grid(row=row, column=column, sticky="w", padx=4)
+            entry = tk.Entry(table, width=20)
+            entry.insert(0, default_names.get(job.serial) or job.mac or "Device")
+            entry.grid(row=row, column=4, sticky="we", padx=4, pady=1)
+            self.entries[job.serial] = entry
+        if self.entries:
+            next(iter(self.entries.values())).focus_set()
+
+        # Casques en échec du même lot: à rebrancher
+        for job in failed or ():
+            tk.Label(self.window, text=f"✗ {job.model} ({job.serial}): {job.error}",
+                     fg="red", anchor="w").pack(fill="x", padx=15)
+
+        btn_frame = tk.Frame(self.window)
+        btn_frame.pack(pady=10)
+        tk.Button(btn_frame, text="Enregistrer", command=self.save, bg="lightgreen", width=15).pack(side="left", padx=10)
+        tk.Button(btn_frame, text="Annuler", command=self.cancel, width=15).pack(side="left", padx=10)
+        self.window.bind("<Return>", lambda event: self.save())
+
+    def save(self):
+        nicknames = {}
+        for job in self.jobs:
+            nicknames[job.serial] = self.entries[job.serial].get().strip() or job.mac or "Device"
+        self.window.destroy()
+        self.on_save(nicknames)
+
+    def cancel(self):
+        self.window.destroy()
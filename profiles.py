@@ -0,0 +1,363 @@
+"""
+Profils de déploiement par groupe
+Un fichier JSON par groupe de devices.csv décrit l'état voulu des casques:
+APK requis, packages interdits, packages désactivés et dossiers synchronisés.
+Le réconciliateur relève l'état de chaque casque en parallèle (une commande
+shell et un listing sync par dossier), calcule les seules actions
+nécessaires (désinstaller, désactiver, installer, copier) et n'exécute
+qu'elles: réappliquer un profil à une salle déjà conforme ne transfère rien.
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+
+from apk_info import parse_package_versions
+from install_engine import InstallTask, group_splits, INSTALL_FAILED
+
+
+PROFILE_DIR = "profiles"
+
+# État d'un casque en une seule commande shell
+SNAPSHOT_SCRIPT = ("echo @@versions; pm list packages --show-versioncode; "
+                   "echo @@disabled; pm list packages -d; echo @@end")
+
+# Actions, dans leur ordre d'exécution
+ACTION_UNINSTALL = "uninstall"
+ACTION_DISABLE = "disable"
+ACTION_INSTALL = "install"
+ACTION_PUSH = "push"
+
+# Exécutées ensemble, en une seule commande shell par casque
+SHELL_ACTIONS = (ACTION_UNINSTALL, ACTION_DISABLE)
+
+ACTION_LABELS = {
+    ACTION_UNINSTALL: "désinstaller",
+    ACTION_DISABLE: "désactiver",
+    ACTION_INSTALL: "installer",
+    ACTION_PUSH: "copier",
+}
+
+# Nom de package Android (aussi garantie qu'il passe tel quel dans le shell)
+PACKAGE_PATTERN = re.compile(r'^[A-Za-z][\w]*(\.[A-Za-z_][\w]*)+$')
+
+Profile = namedtuple("Profile", ["apks", "forbidden", "disabled", "sync"])
+SyncFolder = namedtuple("SyncFolder", ["pc", "headset"])
+DeviceSnapshot = namedtuple("DeviceSnapshot", ["versions", "disabled", "files"])
+
+# target: package, chemins de l'APK et de ses splits, ou (chemin local, chemin distant)
+Action = namedtuple("Action", ["kind", "target", "detail"])
+
+
+def empty_profile():
+    return Profile([], [], [], [])
+
+
+def profile_filename(group):
+    return re.sub(r'[^\w.-]', '_', group) + ".json"
+
+
+def _packages(values, field, group):
+    packages = []
+    for package in values:
+        package = str(package).strip()
+        if PACKAGE_PATTERN.match(package):
+            packages.append(package)
+        elif package:
+            print(f"Profil '{group}': package invalide ignoré dans {field}: {package}")
+    return list(dict.fromkeys(packages))
+
+
+# =============================================================================
+# FICHIERS DE PROFIL
+# =============================================================================
+
+class ProfileStore:
+    """Profils des groupes, un fichier JSON par groupe dans directory
+
+    {"group": "Salle A", "apks": [...], "forbidden": [...], "disabled": [...],
+     "sync": [{"pc": "C:\\Videos", "headset": "/sdcard/Movies/"}]}
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, group):
+        return os.path.join(self.directory, profile_filename(group))
+
+    def exists(self, group):
+        return os.path.exists(self.path(group))
+
+    def load(self, group):
+        """Profil du groupe (vide si absent ou illisible)"""
+        path = self.path(group)
+        if not os.path.exists(path):
+            return empty_profile()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return Profile([str(apk) for apk in data.get("apks", [])],
+                           _packages(data.get("forbidden", []), "forbidden", group),
+                           _packages(data.get("disabled", []), "disabled", group),
+                           [SyncFolder(str(folder["pc"]), str(folder["headset"]))
+                            for folder in data.get("sync", [])])
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            print(f"Profil illisible ({path}): {e}")
+            return empty_profile()
+
+    def save(self, group, profile):
+        os.makedirs(self.directory, exist_ok=True)
+        data = {"group": group,
+                "apks": list(profile.apks),
+                "forbidden": _packages(profile.forbidden, "forbidden", group),
+                "disabled": _packages(profile.disabled, "disabled", group),
+                "sync": [{"pc": folder.pc, "headset": folder.headset} for folder in profile.sync]}
+        path = self.path(group)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+
+# =============================================================================
+# ÉTAT D'UN CASQUE ET ACTIONS NÉCESSAIRES
+# =============================================================================
+
+def parse_snapshot(text):
+    """Sortie de SNAPSHOT_SCRIPT -> ({package: versionCode}, {packages désactivés}), None si tronquée"""
+    sections = {}
+    current = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("@@"):
+            current = line[2:]
+            sections[current] = []
+        elif current and line:
+            sections[current].append(line)
+    if "end" not in sections:
+        return None
+    versions = parse_package_versions("\n".join(sections.get("versions", [])))
+    disabled = {line[len("package:"):].strip() for line in sections.get("disabled", [])
+                if line.startswith("package:")}
+    return versions, disabled
+
+
+def local_files(pc_folder):
+    """{chemin relatif (/): (chemin local, taille)} d'un dossier PC, fichiers cachés exclus"""
+    files = {}
+    for root, dirs, names in os.walk(pc_folder):
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        for name in names:
+            if name.startswith('.'):
+                continue
+            local_path = os.path.join(root, name)
+            relative_path = os.path.relpath(local_path, pc_folder).replace('\\', '/')
+            files[relative_path] = (local_path, os.path.getsize(local_path))
+    return files
+
+
+def remote_path(headset_folder, relative_path):
+    return f"{headset_folder.rstrip('/')}/{relative_path}"
+
+
+def plan_device(profile, snapshot, apks, folders):
+    """Actions qui amènent un casque à son profil, dans l'ordre d'exécution
+
+    apks: [(chemins de l'APK et de ses splits, ApkInfo ou None)];
+    folders: [(SyncFolder, local_files du dossier PC)]. Un APK illisible
+    (sans versionCode) est toujours réinstallé.
+    """
+    actions = []
+    for package in profile.forbidden:
+        if package in snapshot.versions:
+            actions.append(Action(ACTION_UNINSTALL, package, ""))
+    for package in profile.disabled:
+        if package in snapshot.versions and package not in snapshot.disabled \
+                and package not in profile.forbidden:
+            actions.append(Action(ACTION_DISABLE, package, ""))
+    for apk_paths, info in apks:
+        if info is None:
+            actions.append(Action(ACTION_INSTALL, tuple(apk_paths), "version inconnue"))
+        elif info.package not in snapshot.versions:
+            actions.append(Action(ACTION_INSTALL, tuple(apk_paths), "absent"))
+        elif snapshot.versions[info.package] != info.version_code:
+            actions.append(Action(ACTION_INSTALL, tuple(apk_paths),
+                                  f"versionCode {snapshot.versions[info.package]} -> {info.version_code}"))
+    for folder, files in folders:
+        existing = snapshot.files.get(folder.headset, {})
+        for relative_path, (local_path, size) in sorted(files.items()):
+            remote_size = existing.get(relative_path, -1)
+            # Taille inconnue (listing sans tailles): un fichier présent est gardé
+            if remote_size == -1 or (remote_size is not None and remote_size != size):
+                detail = "absent" if remote_size == -1 else f"{remote_size} -> {size} octets"
+                actions.append(Action(ACTION_PUSH, (local_path, remote_path(folder.headset, relative_path)),
+                                      detail))
+    return actions
+
+
+def describe(action):
+    """Texte d'une action pour les logs"""
+    if action.kind == ACTION_INSTALL:
+        name = os.path.basename(action.target[0])
+        if len(action.target) > 1:
+            name += f" (+{len(action.target) - 1} splits)"
+    elif action.kind == ACTION_PUSH:
+        name = action.target[1]
+    else:
+        name = action.target
+    detail = f" ({action.detail})" if action.detail else ""
+    return f"{ACTION_LABELS[action.kind]} {name}{detail}"
+
+
+def shell_actions_script(actions):
+    """Désinstallations et désactivations d'un casque en une seule commande shell"""
+    commands = []
+    for action in actions:
+        if action.kind == ACTION_UNINSTALL:
+            commands.append(f"echo @@{action.kind} {action.target}; pm uninstall {action.target} 2>&1")
+        elif action.kind == ACTION_DISABLE:
+            commands.append(f"echo @@{action.kind} {action.target}; "
+                            f"pm disable-user --user 0 {action.target} 2>&1")
+    return "; ".join(commands + ["echo @@end"])
+
+
+def parse_shell_actions(text):
+    """Sortie de shell_actions_script -> {(action, package): message d'erreur ou None}"""
+    outputs = {}
+    current = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("@@"):
+            kind, _, package = line[2:].partition(" ")
+            current = (kind, package) if package else None
+            if current:
+                outputs[current] = []
+        elif current and line:
+            outputs[current].append(line)
+    results = {}
+    for (kind, package), lines in outputs.items():
+        output = " ".join(lines)
+        ok = "Success" in output if kind == ACTION_UNINSTALL else "disabled" in output
+        results[(kind, package)] = None if ok else (output or "pas de réponse")
+    return results
+
+
+# =============================================================================
+# RÉCONCILIATION
+# =============================================================================
+
+class ProfileReconciler:
+    """Relève l'état des casques et applique les actions manquantes de leur profil
+
+    shell(device_id, commande) -> (stdout, code retour),
+    list_files(device_id, dossier) -> {chemin relatif: taille ou None},
+    push(device_id, chemin local, chemin distant) -> message d'erreur ou None,
+    inspect(apk_path) -> ApkInfo; executor: FleetExecutor. Les installations
+    passent par l'InstallEngine donné à apply (sans vérification des
+    versions, déjà faite ici).
+    """
+
+    def __init__(self, shell, list_files, push, inspect, executor):
+        self.shell = shell
+        self.list_files = list_files
+        self.push = push
+        self.inspect = inspect
+        self.executor = executor
+
+    def snapshot(self, device_id, profile):
+        """DeviceSnapshot d'un casque (une commande shell, un listing par dossier synchronisé)"""
+        stdout, returncode = self.shell(device_id, SNAPSHOT_SCRIPT)
+        parsed = parse_snapshot(stdout) if returncode == 0 else None
+        if parsed is None:
+            raise RuntimeError("état illisible (pm list packages)")
+        files = {folder.headset: self.list_files(device_id, folder.headset) for folder in profile.sync}
+        return DeviceSnapshot(parsed[0], parsed[1], files)
+
+    def plan(self, targets):
+        """targets {device_id: Profile} -> ({device_id: [Action]}, {device_id: erreur})
+
+        Les APK et dossiers PC d'un profil sont lus une fois pour tous ses casques.
+        """
+        sources = {}
+        for profile in targets.values():
+            if id(profile) in sources:
+                continue
+            apks = [(group, self.inspect(group[0])) for group in group_splits(profile.apks)]
+            folders = [(folder, local_files(folder.pc) if os.path.isdir(folder.pc) else {})
+                       for folder in profile.sync]
+            sources[id(profile)] = (apks, folders)
+
+        plans, errors = {}, {}
+        run = self.executor.submit(list(targets), lambda device_id: self.snapshot(device_id, targets[device_id]))
+        for result in run:
+            if not result.ok:
+                errors[result.device_id] = str(result.error)
+                continue
+            profile = targets[result.device_id]
+            plans[result.device_id] = plan_device(profile, result.value, *sources[id(profile)])
+        return plans, errors
+
+    def apply(self, plans, engine, on_action=None):
+        """Exécute les actions (bloquant), retourne [(device_id, Action, erreur ou None)]
+
+        Désinstallations et désactivations d'abord (une commande par casque),
+        puis installations (engine.run), puis copies de fichiers.
+        on_action(device_id, action, erreur) est appelé à chaque action terminée.
+        """
+        results = []
+        reported = set()
+
+        def done(device_id, action, error):
+            # Un casque en échec en cours de route: ses actions déjà terminées restent acquises
+            if (device_id, action) in reported:
+                return
+            reported.add((device_id, action))
+            results.append((device_id, action, error))
+            if on_action:
+                on_action(device_id, action, error)
+
+        def run_shell(device_id):
+            actions = [action for action in plans[device_id] if action.kind in SHELL_ACTIONS]
+            stdout, returncode = self.shell(device_id, shell_actions_script(actions))
+            outputs = parse_shell_actions(stdout) if returncode == 0 else {}
+            for action in actions:
+                done(device_id, action, outputs.get((action.kind, action.target), "pas de réponse"))
+
+        def run_pushes(device_id):
+            for action in plans[device_id]:
+                if action.kind == ACTION_PUSH:
+                    done(device_id, action, self.push(device_id, *action.target))
+
+        self._run(plans, SHELL_ACTIONS, run_shell, done)
+
+        tasks = {}
+        for device_id, actions in plans.items():
+            for action in actions:
+                if action.kind == ACTION_INSTALL:
+                    task = InstallTask(device_id, action.target)
+                    task.info = self.inspect(task.apk_path)
+                    tasks[task] = (device_id, action)
+        if tasks:
+            engine.run(list(tasks))
+            for task, (device_id, action) in tasks.items():
+                done(device_id, action, (task.error or "échec") if task.state == INSTALL_FAILED else None)
+
+        self._run(plans, (ACTION_PUSH,), run_pushes, done)
+        return results
+
+    def _run(self, plans, kinds, operation, done):
+        """operation(device_id) sur les casques qui ont des actions de ces types
+
+        Si l'opération échoue, done() reçoit l'erreur pour chaque action de
+        ces types (il ignore celles déjà signalées).
+        """
+        devices = [device_id for device_id, actions in plans.items()
+                   if any(action.kind in kinds for action in actions)]
+        if not devices:
+            return
+        for result in self.executor.submit(devices, operation):
+            if not result.ok:
+                for action in plans[result.device_id]:
+                    if action.kind in kinds:
+                        done(result.device_id, action, str(result.error))
@@ -0,0 +1,90 @@
+"""
+Reconnexion WiFi de toute la flotte
+Les 'adb connect' partent en parallèle (taille de pool réglable), avec un
+léger décalage aléatoire pour ne pas saturer le point d'accès, et un délai
+global unique: toute la salle est reconnectée en environ un délai de connexion.
+"""
+
+import random
+import threading
+import time
+
+from fleet import FleetExecutor
+
+
+# Connexions simultanées, décalage maximal avant chaque connexion (s)
+RECONNECT_POOL = 16
+RECONNECT_JITTER = 0.3
+
+# Délai d'un 'adb connect' et délai global de la reconnexion (s)
+CONNECT_TIMEOUT = 5
+RECONNECT_DEADLINE = 8
+
+# États publiés pour chaque IP
+RECONNECT_PENDING = "pending"
+RECONNECT_CONNECTING = "connecting"
+RECONNECT_CONNECTED = "connected"
+RECONNECT_FAILED = "failed"
+RECONNECT_TIMEOUT = "timeout"
+
+
+class ReconnectEngine:
+    """Reconnecte une liste d'IP en parallèle
+
+    connect(ip, timeout) -> bool fait une tentative 'adb connect ip:5555'.
+    executor: FleetExecutor partagé de l'application, sinon un pool propre.
+    """
+
+    def __init__(self, connect, pool_size=RECONNECT_POOL, jitter=RECONNECT_JITTER,
+                 deadline=RECONNECT_DEADLINE, connect_timeout=CONNECT_TIMEOUT, executor=None):
+        self.connect = connect
+        self.jitter = jitter
+        self.deadline = deadline
+        self.connect_timeout = connect_timeout
+        self.executor = executor or FleetExecutor(max_total=pool_size, max_wifi=pool_size)
+
+    def run(self, ips, on_status=None):
+        """Reconnecte les IP, retourne {ip: état final}
+
+        on_status(ip, état) est appelé à chaque changement (depuis les threads
+        de connexion), jamais après le retour de run().
+        """
+        ips = list(dict.fromkeys(ip for ip in ips if ip))
+        status = {ip: RECONNECT_PENDING for ip in ips}
+        if not ips:
+            return status
+        end = time.monotonic() + self.deadline
+        lock = threading.Lock()
+        finished = []
+
+        def notify(ip, state):
+            with lock:
+                if finished:
+                    return
+                status[ip] = state
+            if on_status:
+                on_status(ip, state)
+
+        def connect_one(device_id):
+            ip = device_id.rsplit(":", 1)[0]
+            time.sleep(random.uniform(0, self.jitter))
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                notify(ip, RECONNECT_TIMEOUT)
+                return False
+            notify(ip, RECONNECT_CONNECTING)
+            connected = self.connect(ip, min(self.connect_timeout, remaining))
+            notify(ip, RECONNECT_CONNECTED if connected else RECONNECT_FAILED)
+            return connected
+
+        run = self.executor.submit([f"{ip}:5555" for ip in ips], connect_one)
+        # Petite marge: les connexions en cours ont reçu au plus le temps restant
+        run.wait(max(0, end - time.monotonic()) + 0.5)
+        run.cancel()
+
+        for ip in ips:
+            if status[ip] in (RECONNECT_PENDING, RECONNECT_CONNECTING):
+                notify(ip, RECONNECT_TIMEOUT)
+        with lock:
+            finished.append(True)
+            return dict(status)
@@ -0,0 +1,175 @@
+"""
+Balayage du sous-réseau pour retrouver les casques qui ont changé d'IP
+Après un week-end, le DHCP redistribue les adresses: plutôt que de rebrancher
+chaque casque en USB, toutes les adresses du sous-réseau sont testées en
+parallèle sur le port 5555 (asyncio, délai court par hôte). Chaque réponse
+est confirmée par une identité lue sur le casque (numéro de série, MAC).
+"""
+
+import asyncio
+import ipaddress
+import re
+import socket
+from collections import namedtuple
+
+from fleet import FleetExecutor
+
+
+ADB_PORT = 5555
+
+# Délai de connexion TCP par hôte et nombre de passes (un casque en veille
+# WiFi peut rater la première), connexions ouvertes simultanément
+SWEEP_TIMEOUT = 0.4
+SWEEP_ROUNDS = 2
+SWEEP_CONCURRENCY = 256
+
+# Au-delà d'un /22, le balayage n'est plus "rapide": refusé
+MAX_SWEEP_HOSTS = 1024
+
+# Casques identifiés en même temps (adb connect + une commande shell)
+IDENTIFY_POOL = 16
+
+# Identité d'un casque en une seule commande shell
+IDENTITY_SCRIPT = "echo @@serial; getprop ro.serialno; echo @@link; ip link show wlan0 2>/dev/null; echo @@end"
+
+DeviceIdentity = namedtuple("DeviceIdentity", ["ip", "serial", "mac"])
+
+
+def subnet_hosts(subnets):
+    """Adresses IPv4 des sous-réseaux ('192.168.1.0/24', séparés par des virgules ou en liste)"""
+    if isinstance(subnets, str):
+        subnets = subnets.split(",")
+    hosts = []
+    for subnet in subnets:
+        subnet = subnet.strip()
+        if not subnet:
+            continue
+        network = ipaddress.ip_network(subnet, strict=False)
+        if network.num_addresses > MAX_SWEEP_HOSTS:
+            raise ValueError(f"Sous-réseau trop grand pour un balayage: {subnet} (/22 au maximum)")
+        hosts.extend(str(host) for host in network.hosts())
+    return list(dict.fromkeys(hosts))
+
+
+def local_ipv4():
+    """Adresse IPv4 du PC sur le réseau local (aucun paquet envoyé), None si inconnue"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect(("10.255.255.255", 1))
+            ip = sock.getsockname()[0]
+    except OSError:
+        return None
+    return None if ip.startswith("127.") else ip
+
+
+def default_subnets(known_ips=()):
+    """Les /24 des IP connues des casques, et celui du PC"""
+    subnets = []
+    for ip in list(known_ips) + [local_ipv4()]:
+        try:
+            network = ipaddress.ip_network(f"{ip}/24", strict=False)
+        except ValueError:
+            continue
+        if str(network) not in subnets:
+            subnets.append(str(network))
+    return subnets
+
+
+async def _probe(host, port, timeout, limit):
+    async with limit:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+
+
+async def _sweep(hosts, port, timeout, rounds, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+    found = set()
+    remaining = list(hosts)
+    for _ in range(rounds):
+        answers = await asyncio.gather(*(_probe(host, port, timeout, limit) for host in remaining))
+        found.update(host for host, ok in zip(remaining, answers) if ok)
+        remaining = [host for host, ok in zip(remaining, answers) if not ok]
+        if not remaining:
+            break
+    return found
+
+
+def sweep(hosts, port=ADB_PORT, timeout=SWEEP_TIMEOUT, rounds=SWEEP_ROUNDS,
+          concurrency=SWEEP_CONCURRENCY):
+    """Hôtes qui acceptent une connexion TCP sur le port, dans l'ordre de hosts
+
+    Bloquant (boucle asyncio dédiée): à appeler depuis un thread de travail.
+    """
+    hosts = list(hosts)
+    if not hosts:
+        return []
+    found = asyncio.run(_sweep(hosts, port, timeout, rounds, concurrency))
+    return [host for host in hosts if host in found]
+
+
+def parse_identity(text, ip):
+    """Analyse la sortie de IDENTITY_SCRIPT, retourne DeviceIdentity ou None"""
+    sections = {}
+    current = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("@@"):
+            current = line[2:]
+            sections[current] = []
+        elif current and line:
+            sections[current].append(line)
+    if "end" not in sections or not sections.get("serial"):
+        return None
+    match = re.search(r'link/ether ([0-9a-fA-F:]{17})', "\n".join(sections.get("link", [])))
+    return DeviceIdentity(ip, sections["serial"][0], match.group(1).lower() if match else None)
+
+
+class SubnetSweeper:
+    """Retrouve les casques ADB WiFi d'un sous-réseau
+
+    adb doit fournir connect_wifi(ip, timeout) et run_command(commande, device_id, timeout).
+    executor: FleetExecutor partagé de l'application, sinon un pool propre.
+    """
+
+    def __init__(self, adb, port=ADB_PORT, timeout=SWEEP_TIMEOUT, pool_size=IDENTIFY_POOL,
+                 executor=None):
+        self.adb = adb
+        self.port = port
+        self.timeout = timeout
+        self.executor = executor or FleetExecutor(max_total=pool_size, max_wifi=pool_size)
+
+    def identify(self, ip):
+        """Connecte ip:5555 et lit son identité, None si ce n'est pas un casque adb"""
+        if not self.adb.connect_wifi(ip, timeout=5):
+            return None
+        stdout, _, rc = self.adb.run_command(["shell", IDENTITY_SCRIPT], f"{ip}:{self.port}", timeout=10)
+        return parse_identity(stdout, ip) if rc == 0 else None
+
+    def discover(self, hosts, wanted=None):
+        """Balaye hosts et retourne les DeviceIdentity des casques trouvés
+
+        wanted(identity) -> bool: les casques refusés (inconnus) sont
+        déconnectés aussitôt pour ne pas encombrer la liste adb.
+        """
+        responders = sweep(hosts, self.port, self.timeout)
+        if not responders:
+            return []
+        identities = []
+        device_ids = [f"{ip}:{self.port}" for ip in responders]
+        for result in self.executor.submit(device_ids, lambda device_id: self.identify(device_id.rsplit(":", 1)[0])):
+            identity = result.value if result.ok else None
+            if not identity:
+                continue
+            if wanted is None or wanted(identity):
+                identities.append(identity)
+            else:
+                self.adb.run_command(["disconnect", result.device_id], timeout=5)
+        return sorted(identities, key=lambda identity: ipaddress.ip_address(identity.ip))
@@ -10,10 +10,19 @@ import winsound
 import tkinter as tk
 from tkinter import filedialog
 
+from adb_client import AdbClient, AdbConnectionError, AdbError
+from throughput import ThroughputEstimator
+
 # Configuration
 ADB_PATH = os.path.join(os.path.dirname(__file__), "scrcpy-win64-v3.3.1-quest3-fix", "adb.exe")
 DEST_CASQUE = "/sdcard/Download/"
 
+# Client natif: stat et push via le service sync, sans lancer adb.exe
+CLIENT = AdbClient(ADB_PATH)
+
+# Débit mesuré de chaque casque (délais de copie adaptés au lien réel)
+DEBITS = ThroughputEstimator(os.path.join(os.path.dirname(os.path.abspath(__file__)), "throughput.json"))
+
 # Sons
 def bip_succes():
     """Double bip aigu = succès"""
@@ -31,6 +40,12 @@ def bip_deja_copie():
 # Fonctions ADB
 def get_casques_connectes():
     """Retourne la liste des IDs des casques connectés via USB"""
+    # Liste tenue à jour par host:track-devices (repli sur adb devices)
+    etats = CLIENT.track_devices().snapshot()
+    if etats is not None:
+        return [device_id for device_id, etat in etats.items()
+                if etat == "device" and not device_id.startswith('192.')]
+
     result = subprocess.run([ADB_PATH, "devices"], capture_output=True, text=True)
     casques = []
     for line in result.stdout.strip().split('\n')[1:]:
@@ -47,10 +62,50 @@ def fichier_existe_sur_casque(device_id, fichier_distant):
     )
     return "EXISTE" in result.stdout
 
+def tailles_fichiers_casque(device_id, fichiers_distants):
+    """Retourne {fichier: taille} (-1 si absent) en une seule session sync"""
+    try:
+        with CLIENT.sync(device_id) as sync:
+            return {fichier: (st.size if st else -1)
+                    for fichier, st in sync.stat_many(fichiers_distants).items()}
+    except AdbError:
+        pass
+
+    # Repli: deux appels shell par fichier
+    tailles = {}
+    for fichier in fichiers_distants:
+        if fichier_existe_sur_casque(device_id, fichier):
+            tailles[fichier] = get_taille_fichier_casque(device_id, fichier)
+        else:
+            tailles[fichier] = -1
+    return tailles
+
+def afficher_progression(pct):
+    """Affiche la barre de progression de la copie en cours"""
+    bar_width = 30
+    filled = int(bar_width * pct / 100)
+    bar = '█' * filled + '░' * (bar_width - filled)
+    print(f"\r    [{bar}] {pct}%", end="", flush=True)
+
 def copier_fichier_avec_progression(device_id, source_locale, dest_distante, taille_fichier):
     """Copie un fichier vers le casque avec barre de progression"""
     import re
 
+    # Service sync natif (les dossiers distants sont créés automatiquement)
+    try:
+        debut = time.monotonic()
+        with CLIENT.sync(device_id, DEBITS.timeout_for(device_id, taille_fichier)) as sync:
+            sync.push(source_locale, dest_distante,
+                      progress=lambda envoye: afficher_progression(envoye * 100 // max(taille_fichier, 1)))
+        DEBITS.record(device_id, taille_fichier, time.monotonic() - debut)
+        print("\r" + " " * 50 + "\r", end="")  # Effacer la ligne
+        return True
+    except AdbConnectionError:
+        pass
+    except AdbError:
+        print("\r" + " " * 50 + "\r", end="")
+        return False
+
     process = subprocess.Popen(
         [ADB_PATH, "-s", device_id, "push", source_locale, dest_distante],
         stdout=subprocess.PIPE,
@@ -71,11 +126,7 @@ def copier_fichier_avec_progression(device_id, source_locale, dest_distante, tai
         if '%' in output:
             match = re.search(r'(\d+)%', output)
             if match:
-                pct = int(match.group(1))
-                bar_width = 30
-                filled = int(bar_width * pct / 100)
-                bar = '█' * filled + '░' * (bar_width - filled)
-                print(f"\r    [{bar}] {pct}%", end="", flush=True)
+                afficher_progression(int(match.group(1)))
 
         # Reset si retour chariot
         if char == '\r' or char == '\n':
@@ -147,6 +198,9 @@ def main():
     print("\n[2] En attente de casques VR...")
     print("    (Branchez un casque USB - Ctrl+C pour quitter)\n")
 
+    # Réveil dès qu'un casque est branché (sinon nouvelle vérification chaque seconde)
+    attente = CLIENT.track_devices().waiter()
+
     try:
         while True:
             casques = get_casques_connectes()
@@ -158,20 +212,18 @@ def main():
                 print(f"\n>>> Casque détecté: {device_id}")
                 casque_ok = True
 
-                # Étape 2: Vérifier tous les fichiers d'abord
+                # Étape 2: Vérifier tous les fichiers d'abord (un seul lot de STAT)
                 print("    Analyse des fichiers...")
                 fichiers_a_copier = []
+                chemins_distants = [DEST_CASQUE + nom_dossier_base + "/" + chemin_relatif.replace("\\", "/")
+                                    for chemin_relatif, _, _ in fichiers]
+                tailles_distantes = tailles_fichiers_casque(device_id, chemins_distants)
 
-                for chemin_relatif, chemin_local, taille_locale in fichiers:
-                    chemin_distant = DEST_CASQUE + nom_dossier_base + "/" + chemin_relatif.replace("\\", "/")
-                    dossier_distant = "/".join(chemin_distant.rsplit("/", 1)[:-1])
+                for (chemin_relatif, chemin_local, taille_locale), chemin_distant in zip(fichiers, chemins_distants):
+                    if tailles_distantes[chemin_distant] == taille_locale:
+                        continue  # Fichier déjà présent, on passe
 
-                    if fichier_existe_sur_casque(device_id, chemin_distant):
-                        taille_distante = get_taille_fichier_casque(device_id, chemin_distant)
-                        if taille_distante == taille_locale:
-                            continue  # Fichier déjà présent, on passe
-
-                    fichiers_a_copier.append((chemin_relatif, chemin_local, taille_locale, chemin_distant, dossier_distant))
+                    fichiers_a_copier.append((chemin_relatif, chemin_local, taille_locale, chemin_distant))
 
                 print(f"    {len(fichiers_a_copier)} fichier(s) à copier / {len(fichiers)} fichier(s) total")
 
@@ -185,20 +237,14 @@ def main():
 
                 # Étape 3: Copier les fichiers manquants
                 fichiers_copies = 0
-                for idx, (chemin_relatif, chemin_local, taille_locale, chemin_distant, dossier_distant) in enumerate(fichiers_a_copier):
+                for idx, (chemin_relatif, chemin_local, taille_locale, chemin_distant) in enumerate(fichiers_a_copier):
                     nom_fichier = os.path.basename(chemin_relatif)
                     print(f"\n    [{idx + 1}/{len(fichiers_a_copier)}] {nom_fichier}")
 
-                    # Créer le dossier distant si nécessaire
-                    subprocess.run(
-                        [ADB_PATH, "-s", device_id, "shell", f"mkdir -p \"{dossier_distant}\""],
-                        capture_output=True
-                    )
-
-                    # Copier avec progression
+                    # Copier avec progression (adb push crée le dossier distant si nécessaire)
                     if copier_fichier_avec_progression(device_id, chemin_local, chemin_distant, taille_locale):
                         # Vérifier la copie
-                        taille_copiee = get_taille_fichier_casque(device_id, chemin_distant)
+                        taille_copiee = tailles_fichiers_casque(device_id, [chemin_distant])[chemin_distant]
                         if taille_copiee == taille_locale:
                             print(f"    OK ({taille_locale / 1024 / 1024:.1f} MB)")
                             fichiers_copies += 1
@@ -223,7 +269,7 @@ def main():
                 print("Débranchez ce casque et branchez le suivant...")
 
             # Étape 6: Attendre le prochain casque
-            time.sleep(1)
+            attente.wait(1)
 
     except KeyboardInterrupt:
         print(f"\n\nArrêt demandé. {len(casques_traites)} casque(s) traité(s).")
@@ -0,0 +1,208 @@
+"""
+Génère les APK signés de tests/fixtures (à relancer seulement pour les refaire)
+Sans SDK Android: le manifeste binaire (AXML) est écrit ici, les signatures
+sont calculées selon les schémas APK v1 (JAR, PKCS#7), v2 et v3 avec openssl
+(clés RSA 2048, RSASSA-PKCS1-v1_5 SHA-256).
+
+    python tests/fixtures/make_apks.py
+
+Affiche le SHA-256 du certificat de chaque APK (comme 'apksigner verify
+--print-certs'), à reporter dans tests/test_apk_info.py.
+"""
+
+import base64
+import hashlib
+import io
+import os
+import struct
+import subprocess
+import tempfile
+import zipfile
+
+
+FIXTURES = os.path.dirname(os.path.abspath(__file__))
+ANDROID_NS = "http://schemas.android.com/apk/res/android"
+
+ATTR_IDS = {"versionCode": 0x0101021b, "versionName": 0x0101021c, "versionCodeMajor": 0x01010576}
+
+SIG_RSA_PKCS1_SHA256 = 0x0103
+SIG_V2_ID = 0x7109871a
+SIG_V3_ID = 0xf05368c0
+CHUNK = 1024 * 1024
+
+
+# ---------- Manifeste binaire ----------
+
+def _length_utf8(value):
+    return bytes([value]) if value < 0x80 else bytes([0x80 | (value >> 8), value & 0xff])
+
+
+def string_pool(strings, utf8):
+    data = b""
+    offsets = []
+    for string in strings:
+        offsets.append(len(data))
+        if utf8:
+            encoded = string.encode('utf-8')
+            data += _length_utf8(len(string)) + _length_utf8(len(encoded)) + encoded + b"\0"
+        else:
+            data += struct.pack("<H", len(string)) + string.encode('utf-16-le') + b"\0\0"
+    data += b"\0" * (-len(data) % 4)
+    strings_start = 28 + 4 * len(strings)
+    body = struct.pack(f"<{len(offsets)}I", *offsets) + data
+    return struct.pack("<HHIIIIII", 0x0001, 28, 28 + len(body), len(strings), 0,
+                       0x100 if utf8 else 0, strings_start, 0) + body
+
+
+def manifest(package, version_code, version_name, utf8, version_code_major=None):
+    """AndroidManifest.xml binaire: <manifest> et un <application> vide"""
+    names = ["versionCode", "versionName"] + (["versionCodeMajor"] if version_code_major else [])
+    strings = names + ["android", ANDROID_NS, "package", "manifest", "application", package, version_name]
+    index = {string: i for i, string in enumerate(strings)}
+    resource_map = struct.pack("<HHI", 0x0180, 8, 8 + 4 * len(names)) + \
+        struct.pack(f"<{len(names)}I", *(ATTR_IDS[name] for name in names))
+    namespace = struct.pack("<HHIIIII", 0x0100, 16, 24, 1, 0xffffffff, index["android"], index[ANDROID_NS])
+
+    def attribute(ns, name, raw, data_type, value):
+        return struct.pack("<IIIHBBI", ns, index[name], raw, 8, 0, data_type, value)
+
+    android = index[ANDROID_NS]
+    attributes = [attribute(android, "versionCode", 0xffffffff, 0x10, version_code),
+                  attribute(android, "versionName", index[version_name], 0x03, index[version_name])]
+    if version_code_major:
+        attributes.append(attribute(android, "versionCodeMajor", 0xffffffff, 0x10, version_code_major))
+    attributes.append(attribute(0xffffffff, "package", index[package], 0x03, index[package]))
+
+    def start(name, attrs):
+        body = struct.pack("<IIHHHHHH", 0xffffffff, index[name], 20, 20, len(attrs), 0, 0, 0) + b"".join(attrs)
+        return struct.pack("<HHIII", 0x0102, 16, 16 + len(body), 1, 0xffffffff) + body
+
+    def end(name):
+        return struct.pack("<HHIIIII", 0x0103, 16, 24, 1, 0xffffffff, 0xffffffff, index[name])
+
+    chunks = (string_pool(strings, utf8) + resource_map + namespace +
+              start("manifest", attributes) + start("application", []) + end("application") + end("manifest") +
+              struct.pack("<HHIIIII", 0x0101, 16, 24, 1, 0xffffffff, index["android"], index[ANDROID_NS]))
+    return struct.pack("<HHI", 0x0003, 8, 8 + len(chunks)) + chunks
+
+
+# ---------- Clés et signatures (openssl) ----------
+
+class Signer:
+    def __init__(self, folder, name):
+        self.key = os.path.join(folder, f"{name}.key")
+        self.cert = os.path.join(folder, f"{name}.pem")
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", self.key,
+                        "-out", self.cert, "-days", "10000", "-subj", f"/CN={name}/O=VR Manager tests",
+                        "-sha256"], check=True, capture_output=True)
+        self.cert_der = subprocess.run(["openssl", "x509", "-in", self.cert, "-outform", "DER"],
+                                       check=True, capture_output=True).stdout
+        self.public_key = subprocess.run(["openssl", "pkey", "-in", self.key, "-pubout", "-outform", "DER"],
+                                         check=True, capture_output=True).stdout
+
+    def sign(self, data):
+        return subprocess.run(["openssl", "dgst", "-sha256", "-sign", self.key], input=data,
+                              check=True, capture_output=True).stdout
+
+    def pkcs7(self, data):
+        return subprocess.run(["openssl", "smime", "-sign", "-binary", "-noattr", "-md", "sha256",
+                               "-signer", self.cert, "-inkey", self.key, "-outform", "DER"],
+                              input=data, check=True, capture_output=True).stdout
+
+
+def _zip(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries:
+            info = zipfile.ZipInfo(name, date_time=(2024, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_STORED if name.endswith(".arsc") else zipfile.ZIP_DEFLATED
+            archive.writestr(info, data)
+    return buffer.getvalue()
+
+
+def sign_v1(entries, signer):
+    """Ajoute META-INF/MANIFEST.MF, CERT.SF et CERT.RSA (signature JAR)"""
+    def digest(data):
+        return base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+    sections = {name: f"Name: {name}\r\nSHA-256-Digest: {digest(data)}\r\n\r\n" for name, data in entries}
+    main = "Manifest-Version: 1.0\r\nCreated-By: make_apks.py\r\n\r\n"
+    manifest_mf = (main + "".join(sections.values())).encode()
+    cert_sf = (f"Signature-Version: 1.0\r\nCreated-By: make_apks.py\r\n"
+               f"SHA-256-Digest-Manifest: {digest(manifest_mf)}\r\n\r\n" +
+               "".join(f"Name: {name}\r\nSHA-256-Digest: {digest(section.encode())}\r\n\r\n"
+                       for name, section in sections.items())).encode()
+    return [("META-INF/MANIFEST.MF", manifest_mf), ("META-INF/CERT.SF", cert_sf),
+            ("META-INF/CERT.RSA", signer.pkcs7(cert_sf))] + entries
+
+
+def _lp(data):
+    return struct.pack("<I", len(data)) + data
+
+
+def _chunked_digest(sections):
+    digests = []
+    for section in sections:
+        for i in range(0, len(section), CHUNK):
+            chunk = section[i:i + CHUNK]
+            digests.append(hashlib.sha256(b"\xa5" + struct.pack("<I", len(chunk)) + chunk).digest())
+    return hashlib.sha256(b"\x5a" + struct.pack("<I", len(digests)) + b"".join(digests)).digest()
+
+
+def _signer_block(signer, digest, v3):
+    digests = _lp(_lp(struct.pack("<I", SIG_RSA_PKCS1_SHA256) + _lp(digest)))
+    certificates = _lp(_lp(signer.cert_der))
+    sdk = struct.pack("<II", 28, 0x7fffffff) if v3 else b""
+    signed_data = digests + certificates + sdk + _lp(b"")
+    signatures = _lp(_lp(struct.pack("<I", SIG_RSA_PKCS1_SHA256) + _lp(signer.sign(signed_data))))
+    return _lp(_lp(_lp(signed_data) + sdk + signatures + _lp(signer.public_key)))
+
+
+def sign_block(apk, schemes):
+    """Insère le bloc de signature APK avant le répertoire central; schemes: [(id, Signer)]"""
+    eocd = apk.rfind(b"PK\x05\x06")
+    cd_offset = struct.unpack_from("<I", apk, eocd + 16)[0]
+    entries, central, end = apk[:cd_offset], apk[cd_offset:eocd], apk[eocd:]
+
+    def block(pairs):
+        body = b"".join(struct.pack("<QI", len(value) + 4, pair_id) + value for pair_id, value in pairs)
+        size = len(body) + 8 + 16
+        return struct.pack("<Q", size) + body + struct.pack("<Q", size) + b"APK Sig Block 42"
+
+    # Digest du contenu: l'EOCD y pointe vers le début du bloc (offset inchangé)
+    digest = _chunked_digest([entries, central, end])
+    signing_block = block([(scheme, _signer_block(signer, digest, scheme == SIG_V3_ID))
+                           for scheme, signer in schemes])
+    end = end[:16] + struct.pack("<I", cd_offset + len(signing_block)) + end[20:]
+    return entries + signing_block + central + end
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        old, new = Signer(folder, "ancienne-cle"), Signer(folder, "nouvelle-cle")
+        resources = [("resources.arsc", b"\x02\x00\x0c\x00" + bytes(8)), ("classes.dex", b"dex\n035\0" + bytes(104))]
+
+        apks = {
+            # v1 + v2, pool UTF-8 (aapt2)
+            "signed_v2.apk": sign_block(_zip(sign_v1(
+                [("AndroidManifest.xml", manifest("com.vrmanager.fixture", 42, "1.4.2", utf8=True))] + resources,
+                old)), [(SIG_V2_ID, old)]),
+            # v2 (ancienne clé) + v3 (clé après rotation), pool UTF-16 (aapt), versionCode long
+            "signed_v3.apk": sign_block(_zip(
+                [("AndroidManifest.xml", manifest("com.vrmanager.fixture.long", 5, "2.0 (long)", utf8=False,
+                                                  version_code_major=1))] + resources),
+                [(SIG_V2_ID, old), (SIG_V3_ID, new)]),
+            # v1 seule (META-INF/CERT.RSA), pool UTF-16
+            "signed_v1.apk": _zip(sign_v1(
+                [("AndroidManifest.xml", manifest("com.vrmanager.fixture.jar", 7, "0.7", utf8=False))] + resources,
+                new)),
+        }
+        for name, data in apks.items():
+            with open(os.path.join(FIXTURES, name), 'wb') as f:
+                f.write(data)
+        print("ancienne-cle", hashlib.sha256(old.cert_der).hexdigest())
+        print("nouvelle-cle", hashlib.sha256(new.cert_der).hexdigest())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,661 @@
+"""
+Tests du client ADB natif contre un serveur adb factice
+Le serveur écoute sur un port local libre et rejoue le protocole smart
+socket (requêtes préfixées en hexadécimal, OKAY/FAIL), le shell v2 et les
+trames du service sync.
+"""
+
+import io
+import os
+import re
+import socket
+import stat as stat_module
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adb_client import (AdbClient, AdbConnectionError, AdbError, AdbUnsupported, SYNC_DATA_MAX, SHELL_STDIN, SHELL_STDOUT, SHELL_STDERR,
+                        SHELL_EXIT, DEVICE_CONNECTED, DEVICE_DISCONNECTED, DEVICE_STATE_CHANGED,
+                        shell_packet)
+
+
+SERIAL = "1WMHH000000000"
+WIFI = "192.168.1.20:5555"
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+# =============================================================================
+# SERVEUR ADB FACTICE
+# =============================================================================
+
+class StubConnection:
+    """Côté serveur d'une connexion smart socket"""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def read_exactly(self, size):
+        """size octets, None si le client a fermé (ou réinitialisé) la connexion"""
+        data = b""
+        while len(data) < size:
+            try:
+                chunk = self.sock.recv(size - len(data))
+            except OSError:
+                return None
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def read_request(self):
+        length = self.read_exactly(4)
+        if length is None:
+            return None
+        return self.read_exactly(int(length, 16)).decode('utf-8')
+
+    def okay(self, data=b""):
+        self.sock.sendall(b"OKAY" + data)
+
+    def fail(self, message):
+        data = message.encode('utf-8')
+        self.sock.sendall(b"FAIL" + b"%04x" % len(data) + data)
+
+    def send_string(self, text):
+        data = text.encode('utf-8')
+        self.okay(b"%04x" % len(data) + data)
+
+
+class StubAdbServer:
+    """Serveur adb d'un seul casque: features, host:transport, shell v2, sync:
+    et host:track-devices-l
+
+    shell_replies: {commande: (stdout, stderr, code retour ou None si coupée)}
+    files: {chemin: (mode, contenu, mtime)}, modifié par les SEND reçus
+    set_devices() publie une nouvelle liste aux suivis ouverts,
+    drop_trackers() les coupe comme un serveur adb qui redémarre.
+    Le shell persistant (shell,v2,raw: sans commande) répond aussi selon
+    shell_replies et note chaque commande reçue dans shell_commands;
+    drop_shells() coupe les sessions ouvertes (casque débranché).
+    exec: renvoie le stdout de shell_replies; host:connect réussit pour les
+    adresses de reachable.
+    """
+
+    def __init__(self, features=("shell_v2",), shell_replies=None, files=None):
+        self.features = ",".join(features)
+        self.shell_replies = shell_replies or {}
+        self.files = dict(files or {})
+        self.requests = []
+        self.requests_sync = []
+        self.data_frames = []
+        self.devices = {SERIAL: "device"}
+        self.trackers = []
+        self.shells = []
+        self.shell_commands = []
+        self.reachable = set()
+        self.lock = threading.Lock()
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(8)
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self._accept, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.sock.close()
+        self.drop_trackers()
+
+    def set_devices(self, devices):
+        with self.lock:
+            self.devices = dict(devices)
+            for conn in self.trackers:
+                self._send_devices(conn)
+
+    def drop_trackers(self):
+        with self.lock:
+            trackers, self.trackers = self.trackers, []
+        self._drop(trackers)
+
+    def drop_shells(self):
+        with self.lock:
+            shells, self.shells = self.shells, []
+        self._drop(shells)
+
+    @staticmethod
+    def _drop(conns):
+        for conn in conns:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _send_devices(self, conn):
+        # Format long de host:devices-l, une liste complète par changement
+        text = "".join(f"{serial:<22} {state} usb:1-1 product:hollywood model:Quest_2\n"
+                       for serial, state in self.devices.items())
+        data = text.encode('utf-8')
+        conn.sock.sendall(b"%04x" % len(data) + data)
+
+    def client(self):
+        return AdbClient(host="127.0.0.1", port=self.port)
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, sock):
+        with sock:
+            conn = StubConnection(sock)
+            request = conn.read_request()
+            self.requests.append(request)
+            if request == "host:version":
+                conn.send_string("0029")
+            elif request == f"host-serial:{SERIAL}:features":
+                conn.send_string(self.features)
+            elif request in ("host:devices", "host:devices-l"):
+                conn.send_string("".join(f"{serial}\t{state}\n" for serial, state in self.devices.items()))
+            elif request.startswith("host:connect:"):
+                target = request[len("host:connect:"):]
+                if target not in self.reachable:
+                    conn.send_string(f"failed to connect to '{target}': Connection refused")
+                elif target in self.devices:
+                    conn.send_string(f"already connected to {target}")
+                else:
+                    self.devices[target] = "device"
+                    conn.send_string(f"connected to {target}")
+            elif request.startswith("host:disconnect:"):
+                target = request[len("host:disconnect:"):]
+                if self.devices.pop(target, None):
+                    conn.send_string(f"disconnected {target}")
+                else:
+                    conn.fail(f"no such device '{target}'")
+            elif request == f"host-serial:{SERIAL}:get-state":
+                conn.send_string(self.devices.get(SERIAL, "offline"))
+            elif request.startswith("host-serial:") and request.endswith(":get-state"):
+                conn.fail(f"device '{request.split(':')[1]}' not found")
+            elif request == f"host:transport:{SERIAL}":
+                conn.okay()
+                service = conn.read_request()
+                self.requests.append(service)
+                if service == "shell,v2,raw:":
+                    self._interactive(conn)
+                elif service.startswith("shell,v2,raw:"):
+                    self._shell(conn, service[len("shell,v2,raw:"):])
+                elif service == "sync:":
+                    conn.okay()
+                    self._sync(conn)
+                elif service.startswith("exec:"):
+                    conn.okay()
+                    conn.sock.sendall(self.shell_replies[service[len("exec:"):]][0])
+                elif service.startswith("tcpip:"):
+                    conn.okay()
+                    conn.sock.sendall(b"restarting in TCP mode port: %s\n" % service[len("tcpip:"):].encode())
+                else:
+                    conn.fail(f"unknown service {service}")
+            elif request == "host:track-devices-l":
+                conn.okay()
+                with self.lock:
+                    self.trackers.append(conn)
+                    self._send_devices(conn)
+                # Flux ouvert jusqu'à ce que le client ou drop_trackers() le ferme
+                conn.read_exactly(1)
+            elif request.startswith("host:transport:"):
+                conn.fail(f"device '{request[len('host:transport:'):]}' not found")
+            else:
+                conn.fail(f"unknown host service {request}")
+
+    def _shell(self, conn, command):
+        stdout, stderr, returncode = self.shell_replies[command]
+        conn.okay()
+        conn.sock.sendall(shell_packet(SHELL_STDOUT, stdout) + shell_packet(SHELL_STDERR, stderr))
+        # Code retour None: connexion coupée avant la fin de la commande
+        if returncode is not None:
+            conn.sock.sendall(shell_packet(SHELL_EXIT, bytes([returncode])))
+
+    def _interactive(self, conn):
+        """Shell persistant: une commande encadrée par marqueur par paquet stdin"""
+        conn.okay()
+        with self.lock:
+            self.shells.append(conn)
+        while True:
+            header = conn.read_exactly(5)
+            if header is None:
+                return
+            data = conn.read_exactly(int.from_bytes(header[1:], 'little'))
+            if data is None or header[0] != SHELL_STDIN:
+                return
+            match = re.match(rb'\( (.*)\n\) </dev/null; echo "(\S+) \$\?"', data, re.S)
+            command, marker = match.group(1).decode('utf-8'), match.group(2)
+            self.shell_commands.append(command)
+            stdout, stderr, returncode = self.shell_replies[command]
+            if returncode is None:
+                # Coupure en pleine commande: une partie de la sortie seulement
+                conn.sock.sendall(shell_packet(SHELL_STDOUT, stdout))
+                conn.sock.shutdown(socket.SHUT_RDWR)
+                return
+            if command.startswith("exit"):
+                conn.sock.sendall(shell_packet(SHELL_EXIT, bytes([returncode])))
+                return
+            conn.sock.sendall(shell_packet(SHELL_STDOUT, stdout + marker + b" %d\n" % returncode) +
+                              shell_packet(SHELL_STDERR, stderr + marker + b"\n"))
+
+    # ---------- Service sync ----------
+
+    def _sync(self, conn):
+        while True:
+            header = conn.read_exactly(8)
+            if header is None:
+                return
+            command, length = header[:4], struct.unpack("<I", header[4:])[0]
+            self.requests_sync.append(command.decode())
+            if command == b"QUIT":
+                return
+            path = conn.read_exactly(length).decode('utf-8')
+            if command == b"STAT":
+                mode, data, mtime = self.files.get(path, (0, b"", 0))
+                conn.sock.sendall(b"STAT" + struct.pack("<III", mode, len(data), mtime))
+            elif command == b"STA2":
+                if path in self.files:
+                    mode, data, mtime = self.files[path]
+                    conn.sock.sendall(self._stat_v2(b"STA2", 0, mode, len(data), mtime))
+                else:
+                    conn.sock.sendall(self._stat_v2(b"STA2", 2, 0, 0, 0))
+            elif command in (b"LIST", b"LIS2"):
+                self._list(conn, path, command == b"LIS2")
+            elif command == b"SEND":
+                self._receive_file(conn, path)
+            elif command == b"RECV":
+                self._send_file(conn, path)
+
+    @staticmethod
+    def _stat_v2(command, error, mode, size, mtime):
+        # id, erreur, dev, ino, mode, nlink, uid, gid, taille, atime, mtime, ctime
+        return struct.pack("<4sIQQIIIIQqqq", command, error, 0, 0, mode, 1, 0, 0, size, mtime, mtime, mtime)
+
+    def _list(self, conn, folder, v2):
+        entries = [(".", 0o040775, b"", 0), ("..", 0o040775, b"", 0)]
+        entries += [(path[len(folder) + 1:], mode, data, mtime)
+                    for path, (mode, data, mtime) in self.files.items()
+                    if os.path.dirname(path) == folder]
+        for name, mode, data, mtime in entries:
+            encoded = name.encode('utf-8')
+            if v2:
+                conn.sock.sendall(self._stat_v2(b"DNT2", 0, mode, len(data), mtime) +
+                                  struct.pack("<I", len(encoded)) + encoded)
+            else:
+                conn.sock.sendall(b"DENT" + struct.pack("<IIII", mode, len(data), mtime, len(encoded)) + encoded)
+        conn.sock.sendall(b"DONE" + bytes(72 if v2 else 16))
+
+    def _receive_file(self, conn, spec):
+        path, mode = spec.rsplit(",", 1)
+        data = b""
+        while True:
+            header = conn.read_exactly(8)
+            value = struct.unpack("<I", header[4:])[0]
+            if header[:4] == b"DONE":
+                break
+            chunk = conn.read_exactly(value)
+            self.data_frames.append(len(chunk))
+            data += chunk
+        self.files[path] = (int(mode), data, value)
+        conn.sock.sendall(b"OKAY" + struct.pack("<I", 0))
+
+    def _send_file(self, conn, path):
+        if path not in self.files:
+            message = b"No such file or directory"
+            conn.sock.sendall(b"FAIL" + struct.pack("<I", len(message)) + message)
+            return
+        data = self.files[path][1]
+        for i in range(0, len(data), SYNC_DATA_MAX):
+            chunk = data[i:i + SYNC_DATA_MAX]
+            conn.sock.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+        conn.sock.sendall(b"DONE" + struct.pack("<I", 0))
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+class StubServerTestCase(unittest.TestCase):
+    features = ("shell_v2",)
+    shell_replies = None
+    files = None
+
+    def setUp(self):
+        self.server = StubAdbServer(self.features, self.shell_replies, self.files)
+        self.addCleanup(self.server.close)
+        self.client = self.server.client()
+
+
+class TransportTest(StubServerTestCase):
+
+    def test_service_routed_through_transport(self):
+        """host:transport:<serial> précède la requête du service"""
+        self.server.shell_replies["true"] = (b"", b"", 0)
+        self.client.shell(SERIAL, "true", timeout=5)
+        index = self.server.requests.index(f"host:transport:{SERIAL}")
+        self.assertEqual(self.server.requests[index + 1], "shell,v2,raw:true")
+
+    def test_unknown_device_raises_server_message(self):
+        """Le message FAIL du serveur remonte dans AdbError"""
+        with self.assertRaises(AdbError) as context:
+            self.client.open_service("absent", "shell:true", timeout=5)
+        self.assertEqual(str(context.exception), "device 'absent' not found")
+
+
+class RunTest(StubServerTestCase):
+    """AdbClient.run: mêmes (stdout, stderr, code retour) que la ligne de commande adb"""
+    shell_replies = {
+        "pm uninstall com.example.jeu": (b"Success\n", b"", 0),
+        "pm uninstall com.example.absent": (b"Failure [DELETE_FAILED_INTERNAL_ERROR]\n", b"", 1),
+        "cat /sdcard/notes.txt": (b"ligne 1\nligne 2\n", b"", 0),
+    }
+
+    def test_devices(self):
+        self.assertEqual(self.client.run(["devices"]),
+                         (f"List of devices attached\n{SERIAL}\tdevice\n\n", "", 0))
+
+    def test_connect(self):
+        """Adresse sans port: :5555 ajouté; l'échec sort sur stdout avec le code 1, comme adb.exe"""
+        self.assertEqual(self.client.run(["connect", "192.168.1.20"]),
+                         (f"failed to connect to '{WIFI}': Connection refused\n", "", 1))
+        self.server.reachable.add(WIFI)
+        self.assertEqual(self.client.run(["connect", "192.168.1.20"]), (f"connected to {WIFI}\n", "", 0))
+        self.assertEqual(self.client.run(["connect", WIFI]), (f"already connected to {WIFI}\n", "", 0))
+        self.assertIn(f"host:connect:{WIFI}", self.server.requests)
+
+    def test_disconnect(self):
+        self.server.devices[WIFI] = "device"
+        self.assertEqual(self.client.run(["disconnect", WIFI]), (f"disconnected {WIFI}\n", "", 0))
+        self.assertEqual(self.client.run(["disconnect", WIFI]), ("", f"error: no such device '{WIFI}'\n", 1))
+
+    def test_get_state(self):
+        self.assertEqual(self.client.run(["get-state"], SERIAL), ("device\n", "", 0))
+        self.server.devices[SERIAL] = "unauthorized"
+        self.assertEqual(self.client.run(["get-state"], SERIAL), ("unauthorized\n", "", 0))
+        self.assertEqual(self.client.run(["get-state"], "absent"), ("", "error: device 'absent' not found\n", 1))
+
+    def test_tcpip(self):
+        self.assertEqual(self.client.run(["tcpip", "5555"], SERIAL),
+                         ("restarting in TCP mode port: 5555\n", "", 0))
+        self.assertIn("tcpip:5555", self.server.requests)
+
+    def test_uninstall(self):
+        self.assertEqual(self.client.run(["uninstall", "com.example.jeu"], SERIAL), ("Success\n", "", 0))
+        self.assertEqual(self.client.run(["uninstall", "com.example.absent"], SERIAL),
+                         ("", "Failure [DELETE_FAILED_INTERNAL_ERROR]\n", 1))
+
+    def test_exec_out(self):
+        self.assertEqual(self.client.run(["exec-out", "cat", "/sdcard/notes.txt"], SERIAL),
+                         ("ligne 1\nligne 2\n", "", 0))
+        self.assertIn("exec:cat /sdcard/notes.txt", self.server.requests)
+
+    def test_unknown_device(self):
+        self.assertEqual(self.client.run(["exec-out", "cat", "/sdcard/notes.txt"], "absent"),
+                         ("", "error: device 'absent' not found\n", 1))
+
+    def test_unsupported_commands_left_to_adb_exe(self):
+        for command in ([], ["install", "jeu.apk"], ["shell", "-t", "top"], ["push", "absent.apk", "/sdcard/"]):
+            with self.subTest(command=command):
+                with self.assertRaises(AdbUnsupported):
+                    self.client.run(command, SERIAL)
+
+    def test_server_down(self):
+        """Serveur adb arrêté: AdbConnectionError (repli sur adb.exe qui le démarre)"""
+        self.server.close()
+        with self.assertRaises(AdbConnectionError):
+            self.client.run(["devices"], timeout=2)
+
+
+@unittest.skipIf(os.name == 'nt', "faux adb.exe en script Python")
+class RunBenchmarkTest(unittest.TestCase):
+    """Mêmes réponses lues sur le disque (fixture dumpsys) par le client natif
+    et par un faux adb.exe: un processus par commande coûte bien plus cher"""
+
+    COMMANDS = 20
+
+    def setUp(self):
+        self.fixture = os.path.join(FIXTURES, "dumpsys_battery.txt")
+        with open(self.fixture, 'rb') as f:
+            output = f.read()
+        self.server = StubAdbServer(shell_replies={"dumpsys battery": (output, b"", 0)})
+        self.addCleanup(self.server.close)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.adb_path = os.path.join(folder.name, "adb")
+        with open(self.adb_path, 'w', encoding='utf-8') as f:
+            f.write(f"#!{sys.executable}\nimport sys\n"
+                    f"sys.stdout.buffer.write(open({self.fixture!r}, 'rb').read())\n")
+        os.chmod(self.adb_path, os.stat(self.adb_path).st_mode | stat_module.S_IEXEC)
+
+    def test_native_client_faster_than_one_process_per_command(self):
+        client = self.server.client()
+        start = time.perf_counter()
+        native = [client.run(["shell", "dumpsys", "battery"], SERIAL, timeout=5) for _ in range(self.COMMANDS)]
+        native_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        processes = [subprocess.run([self.adb_path, "-s", SERIAL, "shell", "dumpsys", "battery"],
+                                    capture_output=True, text=True, timeout=30)
+                     for _ in range(self.COMMANDS)]
+        process_time = time.perf_counter() - start
+
+        self.assertEqual({result for result in native}, {(processes[0].stdout, "", 0)})
+        self.assertEqual(self.server.requests.count("shell,v2,raw:"), 1)
+        self.assertLess(native_time, process_time)
+
+
+class ShellV2Test(StubServerTestCase):
+    shell_replies = {
+        "ls /sdcard": (b"Download\nMovies\n", b"", 0),
+        "ls /absent": (b"", b"ls: /absent: No such file or directory\n", 1),
+        "exit 42": (b"", b"", 42),
+    }
+
+    def test_stdout_and_exit_code(self):
+        self.assertEqual(self.client.shell(SERIAL, "ls /sdcard", timeout=5),
+                         (b"Download\nMovies\n", b"", 0))
+
+    def test_stderr_kept_apart_with_exit_code(self):
+        stdout, stderr, returncode = self.client.shell(SERIAL, "ls /absent", timeout=5)
+        self.assertEqual(stdout, b"")
+        self.assertIn(b"No such file", stderr)
+        self.assertEqual(returncode, 1)
+
+    def test_exit_code_above_one(self):
+        self.assertEqual(self.client.shell(SERIAL, "exit 42", timeout=5)[2], 42)
+
+
+class ShellChannelTest(StubServerTestCase):
+    """Shell persistant (ShellChannelPool): découpage par marqueur et reconnexion"""
+    shell_replies = {
+        "getprop ro.serialno": (SERIAL.encode() + b"\n", b"", 0),
+        "ls /absent": (b"", b"ls: /absent: No such file or directory\n", 1),
+        "echo sans-fin": (b"sans-fin", b"", 0),
+        "pm install lent.apk": (b"Performing Streamed Install\n", b"", None),
+        "exit 3": (b"", b"", 3),
+    }
+
+    def channel_run(self, command):
+        return self.client.channels.run(SERIAL, command, timeout=5)
+
+    def test_marker_framing_reuses_session(self):
+        for _ in range(3):
+            self.assertEqual(self.channel_run("getprop ro.serialno"), (SERIAL.encode() + b"\n", b"", 0))
+        # Sortie sans retour à la ligne: le marqueur n'y reste pas collé
+        self.assertEqual(self.channel_run("echo sans-fin"), (b"sans-fin", b"", 0))
+        self.assertEqual(self.server.requests.count("shell,v2,raw:"), 1)
+
+    def test_stderr_and_exit_code(self):
+        stdout, stderr, returncode = self.channel_run("ls /absent")
+        self.assertEqual((stdout, returncode), (b"", 1))
+        self.assertEqual(stderr, b"ls: /absent: No such file or directory\n")
+
+    def test_exit_closes_session(self):
+        self.assertEqual(self.channel_run("exit 3")[2], 3)
+        self.channel_run("getprop ro.serialno")
+        self.assertEqual(self.server.requests.count("shell,v2,raw:"), 2)
+
+    def test_reconnects_when_idle_session_was_cut(self):
+        """Session coupée pendant l'inactivité: la commande repart sur une nouvelle session"""
+        self.channel_run("getprop ro.serialno")
+        self.server.drop_shells()
+        self.assertEqual(self.channel_run("getprop ro.serialno")[2], 0)
+        self.assertEqual(self.server.requests.count("shell,v2,raw:"), 2)
+        self.assertEqual(self.server.shell_commands.count("getprop ro.serialno"), 2)
+
+    def test_no_resend_after_partial_output(self):
+        """Coupure après une partie de la sortie: erreur, la commande n'est pas relancée"""
+        self.channel_run("getprop ro.serialno")
+        with self.assertRaises(AdbError):
+            self.channel_run("pm install lent.apk")
+        self.assertEqual(self.server.shell_commands.count("pm install lent.apk"), 1)
+        self.assertEqual(self.server.requests.count("shell,v2,raw:"), 1)
+
+
+class DeviceTrackerTest(StubServerTestCase):
+    """Suivi host:track-devices-l: événements publiés aux abonnés et DeviceWaiter"""
+
+    def setUp(self):
+        super().setUp()
+        self.events = []
+        self.received = threading.Condition()
+        self.tracker = self.client.track_devices()
+        self.addCleanup(self.tracker.stop)
+        self.tracker.subscribe(self.on_event)
+
+    def on_event(self, *event):
+        with self.received:
+            self.events.append(event)
+            self.received.notify_all()
+
+    def wait_events(self, count, timeout=5):
+        with self.received:
+            self.assertTrue(self.received.wait_for(lambda: len(self.events) >= count, timeout))
+            return list(self.events)
+
+    def test_first_list(self):
+        self.assertEqual(self.tracker.snapshot(), {SERIAL: "device"})
+
+    def test_connect_state_change_disconnect(self):
+        other = "192.168.1.20:5555"
+        self.server.set_devices({SERIAL: "device", other: "unauthorized"})
+        self.server.set_devices({SERIAL: "device", other: "device"})
+        self.server.set_devices({SERIAL: "device"})
+        self.assertEqual(self.wait_events(3), [
+            (DEVICE_CONNECTED, other, "unauthorized", None),
+            (DEVICE_STATE_CHANGED, other, "device", "unauthorized"),
+            (DEVICE_DISCONNECTED, other, None, "device"),
+        ])
+        self.assertEqual(self.tracker.snapshot(), {SERIAL: "device"})
+
+    def test_reconnects_after_server_drop(self):
+        """Serveur adb redémarré: le suivi se rouvre et publie la nouvelle liste"""
+        self.server.set_devices({})
+        self.wait_events(1)
+        self.server.drop_trackers()
+        self.server.set_devices({SERIAL: "offline"})
+        events = self.wait_events(2, timeout=10)
+        self.assertEqual(events[1], (DEVICE_CONNECTED, SERIAL, "offline", None))
+        self.assertEqual(self.server.requests.count("host:track-devices-l"), 2)
+        self.assertEqual(self.tracker.snapshot(), {SERIAL: "offline"})
+
+    def test_waiter_wakes_on_event(self):
+        waiter = self.tracker.waiter()
+        self.addCleanup(waiter.close)
+        self.assertFalse(waiter.wait(0.05))
+        threading.Timer(0.1, self.server.set_devices, args=({SERIAL: "offline"},)).start()
+        self.assertTrue(waiter.wait(5))
+        # Réveil consommé: l'attente suivante dort jusqu'au prochain événement
+        self.assertFalse(waiter.wait(0.05))
+        waiter.close()
+        self.server.set_devices({SERIAL: "device"})
+        self.wait_events(2)
+        self.assertFalse(waiter.wait(0.05))
+
+
+class SyncTest(StubServerTestCase):
+    files = {"/sdcard/video.mp4": (0o100644, b"x" * (SYNC_DATA_MAX + 10), 1700000000),
+             "/sdcard/Movies": (0o040775, b"", 1700000001)}
+
+    def test_stat_v1(self):
+        with self.client.sync(SERIAL, timeout=5) as sync:
+            self.assertEqual(sync.stat("/sdcard/video.mp4"), (0o100644, SYNC_DATA_MAX + 10, 1700000000))
+            self.assertTrue(stat_module.S_ISDIR(sync.stat("/sdcard/Movies").mode))
+            self.assertIsNone(sync.stat("/sdcard/absent"))
+
+    def test_stat_many_pipelined(self):
+        paths = ["/sdcard/video.mp4", "/sdcard/absent", "/sdcard/Movies"]
+        with self.client.sync(SERIAL, timeout=5) as sync:
+            results = sync.stat_many(paths)
+        self.assertEqual(list(results), paths)
+        self.assertIsNone(results["/sdcard/absent"])
+        self.assertEqual(results["/sdcard/Movies"].mtime, 1700000001)
+
+    def test_send_then_recv(self):
+        """Un SEND puis un RECV sur la même session rendent le contenu envoyé"""
+        content = os.urandom(3000)
+        with tempfile.TemporaryDirectory() as folder:
+            local_path = os.path.join(folder, "config.json")
+            with open(local_path, 'wb') as f:
+                f.write(content)
+            with self.client.sync(SERIAL, timeout=5) as sync:
+                self.assertEqual(sync.push(local_path, "/sdcard/config.json"), len(content))
+                received = io.BytesIO()
+                self.assertEqual(sync.recv("/sdcard/config.json", received), len(content))
+            local_stat = os.stat(local_path)
+        self.assertEqual(received.getvalue(), content)
+        mode, data, mtime = self.server.files["/sdcard/config.json"]
+        self.assertEqual((mode, mtime), (local_stat.st_mode, int(local_stat.st_mtime)))
+
+    def test_send_partial_final_chunk(self):
+        """Les paquets DATA sont pleins sauf le dernier, et le contenu arrive entier"""
+        content = os.urandom(2 * SYNC_DATA_MAX + 123)
+        with self.client.sync(SERIAL, timeout=5) as sync:
+            sent = sync.send(io.BytesIO(content), "/sdcard/big.bin", mtime=1700000002)
+        self.assertEqual(sent, len(content))
+        self.assertEqual(self.server.data_frames, [SYNC_DATA_MAX, SYNC_DATA_MAX, 123])
+        self.assertEqual(self.server.files["/sdcard/big.bin"], (0o100644, content, 1700000002))
+
+    def test_list(self):
+        """Entrées du dossier sans '.' ni '..', noms UTF-8 compris"""
+        self.server.files["/sdcard/Movies/Scène 1.mp4"] = (0o100644, b"abc", 1700000003)
+        self.server.files["/sdcard/Movies/vidéo.mp4"] = (0o100600, b"", 1700000004)
+        with self.client.sync(SERIAL, timeout=5) as sync:
+            entries = sync.list("/sdcard/Movies")
+        self.assertEqual(entries, [("Scène 1.mp4", 0o100644, 3, 1700000003),
+                                   ("vidéo.mp4", 0o100600, 0, 1700000004)])
+        self.assertIn("LIS2" if sync.ls_v2 else "LIST", self.server.requests_sync)
+
+    def test_list_tree(self):
+        with self.client.sync(SERIAL, timeout=5) as sync:
+            self.assertEqual(sorted(sync.list_tree("/sdcard")), ["video.mp4"])
+            self.assertEqual(sync.list("/sdcard/vide"), [])
+
+    def test_recv_missing_file(self):
+        with self.client.sync(SERIAL, timeout=5) as sync:
+            with self.assertRaises(AdbError) as context:
+                sync.recv("/sdcard/absent", io.BytesIO())
+        self.assertIn("No such file", str(context.exception))
+
+
+class SyncV2Test(SyncTest):
+    features = ("shell_v2", "stat_v2", "ls_v2")
+
+    def test_stat_v2_requested(self):
+        with self.client.sync(SERIAL, timeout=5) as sync:
+            self.assertTrue(sync.stat_v2)
+            self.assertEqual(sync.stat("/sdcard/video.mp4").size, SYNC_DATA_MAX + 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Tests de la lecture d'identité des APK (apk_info) sur des APK signés
+Les fixtures sont générées par tests/fixtures/make_apks.py: manifeste
+binaire (pools de chaînes UTF-8 et UTF-16, versionCodeMajor), signatures
+v1 (PKCS#7), v2 et v3 vérifiables par openssl.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import apk_info
+from apk_info import ApkInfo, ApkInspector, parse_manifest, read_apk, signer_digest
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# SHA-256 des certificats (apksigner verify --print-certs)
+OLD_KEY = "620fe1d63bd69cfef0617f2e99b83fdcb4d804c1b75520a3477ad8051767e05d"
+NEW_KEY = "d142cfe635c858c5a00510d6ef02e4fbab0070d4df086866bab9f93435c26204"
+
+
+def fixture(name):
+    return os.path.join(FIXTURES, name)
+
+
+class ManifestTest(unittest.TestCase):
+
+    def manifest(self, name):
+        with zipfile.ZipFile(fixture(name)) as archive:
+            return archive.read("AndroidManifest.xml")
+
+    def test_utf8_string_pool(self):
+        self.assertEqual(parse_manifest(self.manifest("signed_v2.apk")), ("com.vrmanager.fixture", 42, "1.4.2"))
+
+    def test_utf16_string_pool(self):
+        self.assertEqual(parse_manifest(self.manifest("signed_v1.apk")), ("com.vrmanager.fixture.jar", 7, "0.7"))
+
+    def test_version_code_major(self):
+        """versionCodeMajor=1, versionCode=5: versionCode long 2^32 + 5"""
+        self.assertEqual(parse_manifest(self.manifest("signed_v3.apk")),
+                         ("com.vrmanager.fixture.long", (1 << 32) + 5, "2.0 (long)"))
+
+
+class SignerTest(unittest.TestCase):
+
+    def test_v2_block(self):
+        self.assertEqual(signer_digest(fixture("signed_v2.apk")), OLD_KEY)
+
+    def test_v3_preferred_over_v2(self):
+        """Clé changée (rotation): v3 porte la nouvelle, v2 l'ancienne"""
+        self.assertEqual(signer_digest(fixture("signed_v3.apk")), NEW_KEY)
+
+    def test_v1_pkcs7_fallback(self):
+        self.assertIsNone(signer_digest(fixture("signed_v1.apk")))
+        with zipfile.ZipFile(fixture("signed_v1.apk")) as archive:
+            self.assertEqual(signer_digest(fixture("signed_v1.apk"), archive), NEW_KEY)
+
+    def test_read_apk(self):
+        self.assertEqual(read_apk(fixture("signed_v2.apk")),
+                         ApkInfo("com.vrmanager.fixture", 42, "1.4.2", OLD_KEY))
+        self.assertEqual(read_apk(fixture("signed_v1.apk")),
+                         ApkInfo("com.vrmanager.fixture.jar", 7, "0.7", NEW_KEY))
+        self.assertIsNone(read_apk(fixture("dumpsys_battery.txt")))
+
+
+class InspectorTest(unittest.TestCase):
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.cache_path = os.path.join(folder.name, "apk_cache.json")
+        self.apk = os.path.join(folder.name, "jeu.apk")
+        shutil.copy(fixture("signed_v2.apk"), self.apk)
+
+    def test_cache_saved_only_when_changed(self):
+        inspector = ApkInspector(self.cache_path)
+        info = inspector.inspect(self.apk)
+        self.assertEqual(info.signer, OLD_KEY)
+        self.assertTrue(os.path.exists(self.cache_path))
+        # Lectures suivantes servies par le cache: le fichier n'est pas réécrit
+        os.remove(self.cache_path)
+        for _ in range(3):
+            self.assertEqual(inspector.inspect(self.apk), info)
+        self.assertFalse(os.path.exists(self.cache_path))
+        # Nouveau contenu: le cache change et est enregistré
+        shutil.copy(fixture("signed_v3.apk"), self.apk)
+        os.utime(self.apk, (1, 1))
+        self.assertEqual(inspector.inspect(self.apk).signer, NEW_KEY)
+        self.assertTrue(os.path.exists(self.cache_path))
+
+    def test_cache_reused_between_sessions(self):
+        ApkInspector(self.cache_path).inspect(self.apk)
+        inspector = ApkInspector(self.cache_path)
+        original = apk_info.read_apk
+        apk_info.read_apk = lambda path: self.fail("APK relu malgré le cache")
+        try:
+            self.assertEqual(inspector.inspect(self.apk).package, "com.vrmanager.fixture")
+        finally:
+            apk_info.read_apk = original
+        self.assertFalse(inspector.changed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Vérification statique des classes de l'application
+Chaque attribut lu via self.x doit être défini dans la classe (méthode,
+attribut de classe ou affectation self.x = ...). Les classes qui héritent
+d'une autre classe sont ignorées (attributs hérités inconnus ici).
+"""
+
+import ast
+import glob
+import os
+import unittest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def undefined_attributes(tree):
+    """[(classe, attribut, ligne)] des self.x lus mais jamais définis"""
+    missing = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.ClassDef):
+            continue
+        if any(not (isinstance(base, ast.Name) and base.id == "object") for base in node.bases):
+            continue
+        defined = set()
+        for item in node.body:
+            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                defined.add(item.name)
+            elif isinstance(item, ast.Assign):
+                defined.update(target.id for target in item.targets if isinstance(target, ast.Name))
+        loads = []
+        for child in ast.walk(node):
+            if (isinstance(child, ast.Attribute) and isinstance(child.value, ast.Name)
+                    and child.value.id == "self"):
+                if isinstance(child.ctx, (ast.Store, ast.Del)):
+                    defined.add(child.attr)
+                else:
+                    loads.append(child)
+        missing += [(node.name, child.attr, child.lineno) for child in loads if child.attr not in defined]
+    return missing
+
+
+class UndefinedAttributesTest(unittest.TestCase):
+
+    def test_application_modules(self):
+        for path in sorted(glob.glob(os.path.join(ROOT, "*.py"))):
+            with open(path, 'r', encoding='utf-8') as f:
+                tree = ast.parse(f.read(), path)
+            with self.subTest(module=os.path.basename(path)):
+                self.assertEqual(undefined_attributes(tree), [])
+
+    def test_detects_missing_method(self):
+        tree = ast.parse("class A:\n    def f(self):\n        return self.g()\n")
+        self.assertEqual(undefined_attributes(tree), [("A", "g", 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
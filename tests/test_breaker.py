@@ -0,0 +1,69 @@
+"""
+Tests du disjoncteur par casque WiFi (breaker)
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from breaker import DeviceBreakers, BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN, is_link_error
+
+
+DEVICE = "192.168.1.20:5555"
+
+
+class LinkErrorTest(unittest.TestCase):
+
+    def test_transport_errors(self):
+        for message in ("error: device offline",
+                        "error: device '192.168.1.20:5555' not found",
+                        "error: no devices/emulators found",
+                        "failed to connect to '192.168.1.20:5555': Connection refused",
+                        "cannot connect to 192.168.1.20:5555: No route to host (113)",
+                        "Serveur adb injoignable (127.0.0.1:5037): [Errno 111] Connection refused",
+                        "error: 192.168.1.20:5555 injoignable (nouvel essai dans 5s)"):
+            with self.subTest(message=message):
+                self.assertTrue(is_link_error(message))
+
+    def test_slow_or_failed_commands(self):
+        """Délai dépassé, flux fermé en cours de commande, erreur de la commande: pas la liaison"""
+        for message in ("Command timeout",
+                        "error: closed",
+                        "error: Connexion fermée par le serveur adb\n",
+                        "error: Session shell fermée\n",
+                        "adb: error: failed to copy 'a.mp4' to '/sdcard/a.mp4': remote No space left on device",
+                        "Failure [INSTALL_FAILED_VERSION_DOWNGRADE]",
+                        "",
+                        None):
+            with self.subTest(message=message):
+                self.assertFalse(is_link_error(message))
+
+
+class DeviceBreakersTest(unittest.TestCase):
+
+    def test_opens_after_threshold_then_half_open(self):
+        breakers = DeviceBreakers(threshold=2, backoff_base=0)
+        changes = []
+        breakers.subscribe(lambda *change: changes.append(change[1:3]))
+        breakers.failure(DEVICE)
+        self.assertEqual(breakers.state(DEVICE), BREAKER_CLOSED)
+        breakers.failure(DEVICE)
+        self.assertEqual(breakers.state(DEVICE), BREAKER_OPEN)
+        self.assertTrue(breakers.allow(DEVICE))
+        self.assertEqual(breakers.state(DEVICE), BREAKER_HALF_OPEN)
+        self.assertFalse(breakers.allow(DEVICE))
+        breakers.success(DEVICE)
+        self.assertEqual(changes, [(BREAKER_CLOSED, BREAKER_OPEN), (BREAKER_OPEN, BREAKER_HALF_OPEN),
+                                   (BREAKER_HALF_OPEN, BREAKER_CLOSED)])
+
+    def test_open_blocks_until_backoff(self):
+        breakers = DeviceBreakers(threshold=1, backoff_base=60)
+        breakers.failure(DEVICE)
+        self.assertFalse(breakers.allow(DEVICE))
+        self.assertGreater(breakers.retry_in(DEVICE), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+"""
+Tests des parseurs dumpsys au fil de l'eau
+Les sorties enregistrées (tests/fixtures) sont découpées en petits morceaux
+d'octets comme le flux adb, et chaque parseur doit donner le même résultat
+que l'ancienne analyse par expressions régulières sur la sortie complète.
+"""
+
+import importlib.util
+import os
+import re
+import stat as stat_module
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from adb_client import AdbError, AdbTimeout, adb_exe_shell_lines, iter_lines
+from dumpsys import PACKAGES_COMMAND, parse_battery_level, parse_current_focus, parse_system_packages
+from test_adb_client import SERIAL, StubAdbServer
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def stream(data, size=7):
+    """Lignes d'une sortie reçue par morceaux de size octets (UTF-8 coupé en deux)"""
+    return iter_lines(data[i:i + size] for i in range(0, len(data), size))
+
+
+def section(text, title):
+    """Section 'WINDOW MANAGER ...' seule, comme la renvoie 'dumpsys window <section>'"""
+    lines = text.split('\n')
+    start = next(i for i, line in enumerate(lines) if line.startswith(title))
+    end = next((i for i in range(start + 1, len(lines)) if lines[i].startswith("WINDOW MANAGER ")), len(lines))
+    return '\n'.join(lines[start:end]).encode('utf-8')
+
+
+# Anciennes analyses (sortie complète en mémoire), références des tests
+
+def old_current_app(stdout):
+    matches = re.findall(r'mCurrentFocus=Window\{[^}]+ ([^\s}]+)\}', stdout)
+    return matches[-1] if matches else None
+
+
+def old_battery_level(stdout):
+    match = re.search(r'level: (\d+)', stdout)
+    return int(match.group(1)) if match else None
+
+
+def old_system_packages(stdout):
+    system_packages = set()
+    current_package = None
+    for line in stdout.split('\n'):
+        line = line.strip()
+        if line.startswith('Package ['):
+            current_package = line.split('[')[1].split(']')[0]
+        elif current_package and 'flags=' in line and 'SYSTEM' in line:
+            system_packages.add(current_package)
+    return system_packages
+
+
+class CurrentFocusTest(unittest.TestCase):
+
+    def check(self, name, expected):
+        data = fixture(name)
+        text = data.decode('utf-8')
+        self.assertEqual(old_current_app(text), expected)
+        self.assertEqual(parse_current_focus(stream(data)), expected)
+        # WINDOWS_COMMAND ne demande que la section des fenêtres
+        self.assertEqual(parse_current_focus(stream(section(text, "WINDOW MANAGER WINDOWS"))), expected)
+
+    def test_single_display(self):
+        self.check("dumpsys_window.txt", "com.oculus.vrshell/com.oculus.vrshell.MainActivity")
+
+    def test_multi_display_keeps_last_focus(self):
+        """Un mCurrentFocus par écran: le dernier l'emporte, comme avant"""
+        self.check("dumpsys_window_multidisplay.txt",
+                   "com.beatgames.beatsaber/com.unity3d.player.UnityPlayerActivity")
+
+    def test_no_focus(self):
+        self.assertIsNone(parse_current_focus(stream(b"  mCurrentFocus=null\n  mFocusedApp=null\n")))
+        self.assertIsNone(parse_current_focus(iter([])))
+
+
+class BatteryLevelTest(unittest.TestCase):
+
+    def test_matches_old_parser(self):
+        data = fixture("dumpsys_battery.txt")
+        self.assertEqual(old_battery_level(data.decode('utf-8')), 87)
+        self.assertEqual(parse_battery_level(stream(data)), 87)
+
+    def test_stops_at_level(self):
+        """Les lignes après 'level:' ne sont pas lues"""
+        lines = iter(["Current Battery Service state:", "  level: 42", "  scale: 100"])
+        self.assertEqual(parse_battery_level(lines), 42)
+        self.assertEqual(next(lines), "  scale: 100")
+
+    def test_missing_level(self):
+        self.assertIsNone(parse_battery_level(iter(["Current Battery Service state:"])))
+
+
+class SystemPackagesTest(unittest.TestCase):
+
+    def test_matches_old_parser(self):
+        data = fixture("dumpsys_package.txt")
+        expected = {"com.oculus.vrshell", "com.oculus.systemux", "com.android.settings"}
+        self.assertEqual(old_system_packages(data.decode('utf-8')), expected)
+        self.assertEqual(parse_system_packages(stream(data)), expected)
+
+    def test_stops_after_packages_section(self):
+        """Arrêt à la fin de la section 'Packages:', sans lire la suite"""
+        lines = stream(fixture("dumpsys_package.txt"))
+        parse_system_packages(lines)
+        self.assertEqual(next(lines), "  Package [com.oculus.systemux] (5e3a21b):")
+
+    def test_missing_section(self):
+        self.assertIsNone(parse_system_packages(stream(b"")))
+        self.assertIsNone(parse_system_packages(stream(b"Error: permission denied\n")))
+
+
+class TruncatedStreamTest(unittest.TestCase):
+    """Sortie coupée au milieu de la section 'Packages:': erreur, jamais une liste partielle"""
+
+    def setUp(self):
+        data = fixture("dumpsys_package.txt")
+        self.cut = data[:data.index(b"  Package [com.oculus.systemux]")]
+        self.server = StubAdbServer(shell_replies={PACKAGES_COMMAND: (self.cut, b"", None),
+                                                   "dumpsys package": (data, b"", 0)})
+        self.addCleanup(self.server.close)
+        self.client = self.server.client()
+
+    def test_complete_stream(self):
+        lines = self.client.shell_lines(SERIAL, "dumpsys package", timeout=5)
+        self.assertEqual(parse_system_packages(lines),
+                         {"com.oculus.vrshell", "com.oculus.systemux", "com.android.settings"})
+
+    def test_native_stream_cut(self):
+        with self.assertRaises(AdbError):
+            parse_system_packages(self.client.shell_lines(SERIAL, PACKAGES_COMMAND, timeout=5))
+
+    def test_manager_does_not_cache_partial_list(self):
+        """ADBManager.shell_lines propage l'erreur, le cache ne garde rien"""
+        spec = importlib.util.spec_from_file_location(
+            "usb_vr_manager", os.path.join(ROOT, "USB-VR-Manager.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        manager = module.ADBManager.__new__(module.ADBManager)
+        manager.adb_path = "adb"
+        manager.client = self.client
+        manager.tracer = module.AdbTracer()
+        manager.cache = module.PropertyCache(lambda serial: "boot")
+
+        def load():
+            try:
+                return parse_system_packages(manager.shell_lines(SERIAL, PACKAGES_COMMAND, timeout=5))
+            except AdbError:
+                return None
+
+        self.assertIsNone(manager.cache.get(SERIAL, "system_packages", load))
+        self.assertNotIn((SERIAL, "system_packages"), manager.cache.entries)
+        self.assertEqual(manager.tracer.devices[SERIAL].failures, 1)
+
+    def fake_adb(self, body):
+        """Faux adb.exe (script Python) qui écrit la sortie coupée puis exécute body"""
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        path = os.path.join(folder.name, "adb")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"#!{sys.executable}\nimport sys, time\n"
+                    f"sys.stdout.buffer.write({self.cut!r}); sys.stdout.flush()\n{body}\n")
+        os.chmod(path, os.stat(path).st_mode | stat_module.S_IEXEC)
+        return path
+
+    @unittest.skipIf(os.name == 'nt', "faux adb.exe en script Python")
+    def test_adb_exe_error_exit(self):
+        adb_path = self.fake_adb("sys.exit(1)")
+        with self.assertRaises(AdbError):
+            parse_system_packages(adb_exe_shell_lines(adb_path, SERIAL, PACKAGES_COMMAND, 5))
+
+    @unittest.skipIf(os.name == 'nt', "faux adb.exe en script Python")
+    def test_adb_exe_killed_by_timeout(self):
+        adb_path = self.fake_adb("time.sleep(30)")
+        with self.assertRaises(AdbTimeout):
+            parse_system_packages(adb_exe_shell_lines(adb_path, SERIAL, PACKAGES_COMMAND, 0.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
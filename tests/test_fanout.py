@@ -0,0 +1,123 @@
+"""
+Tests de la lecture partagée des fichiers envoyés à plusieurs casques (FanoutCache)
+Des threads lisent le même fichier en parallèle, par vagues derrière un
+sémaphore comme les transferts limités par transport.
+"""
+
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fanout import FanoutCache
+
+
+CHUNK = 4096
+
+
+class FailingFile:
+    """Fichier dont la lecture échoue après quelques blocs (disque débranché)"""
+
+    def __init__(self, file, good_chunks):
+        self.file = file
+        self.good_chunks = good_chunks
+
+    def read(self, size):
+        if self.good_chunks == 0:
+            raise OSError("erreur de lecture")
+        self.good_chunks -= 1
+        return self.file.read(size)
+
+    def close(self):
+        self.file.close()
+
+
+class FanoutTest(unittest.TestCase):
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, "jeu.apk")
+        self.data = random.Random(1).randbytes(CHUNK * 40 + 123)
+        with open(self.path, 'wb') as f:
+            f.write(self.data)
+
+    def transfer(self, cache, slots, results, errors, key):
+        with slots:
+            try:
+                with cache.open(self.path) as reader:
+                    digest = hashlib.sha256()
+                    while True:
+                        data = reader.read(1000)
+                        if not data:
+                            break
+                        digest.update(data)
+                    results[key] = digest.hexdigest()
+            except OSError as e:
+                errors[key] = e
+
+    def run_transfers(self, cache, count, slots):
+        """count transferts, au plus slots à la fois; ({n: sha256}, {n: erreur})"""
+        semaphore = threading.Semaphore(slots)
+        results, errors = {}, {}
+        threads = [threading.Thread(target=self.transfer, args=(cache, semaphore, results, errors, i))
+                   for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        return results, errors
+
+    def test_concurrent_readers_get_whole_file(self):
+        cache = FanoutCache(chunk_size=CHUNK, window=4)
+        results, errors = self.run_transfers(cache, 8, 8)
+        self.assertEqual(errors, {})
+        self.assertEqual(set(results.values()), {hashlib.sha256(self.data).hexdigest()})
+
+    def test_planned_waves_read_file_once(self):
+        """20 transferts derrière 4 créneaux: une seule lecture du fichier"""
+        cache = FanoutCache(chunk_size=CHUNK, window=4)
+        with cache.planned({self.path: 20}):
+            results, errors = self.run_transfers(cache, 20, 4)
+        self.assertEqual(errors, {})
+        self.assertEqual(len(results), 20)
+        self.assertEqual(set(results.values()), {hashlib.sha256(self.data).hexdigest()})
+        disk, served = cache.stats()
+        self.assertEqual(served, 20 * len(self.data))
+        self.assertEqual(disk, len(self.data))
+        self.assertEqual(cache.sources, {})
+
+    def test_waves_above_retain_limit_still_complete(self):
+        """Fichier plus gros que la mémoire autorisée: une lecture par vague, fichiers intacts"""
+        cache = FanoutCache(chunk_size=CHUNK, window=4, retain_max=CHUNK)
+        with cache.planned({self.path: 20}):
+            results, errors = self.run_transfers(cache, 20, 4)
+        self.assertEqual(errors, {})
+        self.assertEqual(set(results.values()), {hashlib.sha256(self.data).hexdigest()})
+        disk, _ = cache.stats()
+        self.assertLessEqual(disk, 20 * len(self.data))
+
+    def test_read_error_reaches_every_reader(self):
+        """Erreur disque au milieu: chaque lecteur la reçoit, aucun fichier tronqué envoyé"""
+        cache = FanoutCache(chunk_size=CHUNK, window=64)
+        readers = [cache.open(self.path) for _ in range(3)]
+        source = readers[0].source
+        self.assertTrue(all(reader.source is source for reader in readers))
+        source.file = FailingFile(source.file, 5)
+        for reader in readers:
+            with self.assertRaises(OSError):
+                while reader.read(CHUNK):
+                    pass
+            reader.close()
+        # Une nouvelle ouverture relit le fichier au lieu de reprendre la source en erreur
+        with cache.open(self.path) as reader:
+            self.assertEqual(reader.read(), self.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Tests des limites de concurrence de FleetExecutor
+Une opération factice compte les exécutions simultanées (par casque, par
+transport et au total) et retient le maximum atteint.
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fleet import FleetExecutor, TRANSPORT_USB, TRANSPORT_WIFI, transport_of
+
+
+USB_DEVICES = [f"1WMHH00000000{i}" for i in range(6)]
+WIFI_DEVICES = [f"192.168.1.{10 + i}:5555" for i in range(6)]
+
+
+class PeakRecorder:
+    """Opération factice: note les exécutions simultanées, retient les maximums"""
+
+    def __init__(self, duration=0.05):
+        self.duration = duration
+        self.lock = threading.Lock()
+        self.active = Counter()
+        self.peak = Counter()
+        self.calls = Counter()
+
+    def _enter(self, keys):
+        with self.lock:
+            for key in keys:
+                self.active[key] += 1
+                self.peak[key] = max(self.peak[key], self.active[key])
+
+    def _leave(self, keys):
+        with self.lock:
+            for key in keys:
+                self.active[key] -= 1
+
+    def __call__(self, device_id):
+        keys = ("total", transport_of(device_id), device_id)
+        self._enter(keys)
+        try:
+            time.sleep(self.duration)
+        finally:
+            self._leave(keys)
+        with self.lock:
+            self.calls[device_id] += 1
+        return device_id
+
+
+class FleetLimitsTest(unittest.TestCase):
+
+    def executor(self, **limits):
+        executor = FleetExecutor(**limits)
+        self.addCleanup(executor.shutdown)
+        return executor
+
+    def test_global_limit(self):
+        executor = self.executor(max_total=3, max_usb=10, max_wifi=10)
+        recorder = PeakRecorder()
+        results = executor.map(USB_DEVICES + WIFI_DEVICES, recorder)
+        self.assertTrue(all(result.ok for result in results.values()))
+        self.assertEqual(recorder.peak["total"], 3)
+
+    def test_transport_limits(self):
+        executor = self.executor(max_total=16, max_usb=2, max_wifi=3)
+        recorder = PeakRecorder()
+        executor.map(USB_DEVICES + WIFI_DEVICES, recorder)
+        self.assertEqual(recorder.peak[TRANSPORT_USB], 2)
+        self.assertEqual(recorder.peak[TRANSPORT_WIFI], 3)
+        self.assertEqual(recorder.peak["total"], 5)
+
+    def test_per_device_limit(self):
+        """Plusieurs soumissions simultanées sur les mêmes casques: un créneau par casque"""
+        executor = self.executor(max_total=16, max_usb=16, max_wifi=16, max_per_device=1)
+        recorder = PeakRecorder()
+        devices = USB_DEVICES[:2] + WIFI_DEVICES[:2]
+        runs = [executor.submit(devices, recorder) for _ in range(3)]
+        for run in runs:
+            run.wait()
+        for device_id in devices:
+            self.assertEqual(recorder.calls[device_id], 3)
+            self.assertEqual(recorder.peak[device_id], 1)
+        self.assertEqual(recorder.peak["total"], len(devices))
+
+    def test_per_device_limit_above_one(self):
+        executor = self.executor(max_total=16, max_usb=16, max_wifi=16, max_per_device=2)
+        recorder = PeakRecorder()
+        device_id = WIFI_DEVICES[0]
+        runs = [executor.submit([device_id], recorder) for _ in range(4)]
+        for run in runs:
+            run.wait()
+        self.assertEqual(recorder.peak[device_id], 2)
+
+    def test_all_limits_together(self):
+        executor = self.executor(max_total=4, max_usb=2, max_wifi=3, max_per_device=1)
+        recorder = PeakRecorder(duration=0.02)
+        runs = [executor.submit(USB_DEVICES + WIFI_DEVICES, recorder) for _ in range(2)]
+        for run in runs:
+            run.wait()
+        self.assertLessEqual(recorder.peak["total"], 4)
+        self.assertLessEqual(recorder.peak[TRANSPORT_USB], 2)
+        self.assertLessEqual(recorder.peak[TRANSPORT_WIFI], 3)
+        self.assertEqual(max(recorder.peak[device_id] for device_id in USB_DEVICES + WIFI_DEVICES), 1)
+        self.assertEqual(sum(recorder.calls.values()), 2 * len(USB_DEVICES + WIFI_DEVICES))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Tests de InstallEngine avec l'exécuteur partagé de l'application
+Des transferts factices (push / pm install) remplacent adb.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fleet import FleetExecutor
+from install_engine import InstallEngine, summarize
+
+
+DEVICES = ["1WMHH000000001", "1WMHH000000002", "192.168.1.20:5555"]
+
+
+class SharedExecutorTest(unittest.TestCase):
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.apks = []
+        for name in ("jeu.apk", "outil.apk"):
+            path = os.path.join(folder.name, name)
+            with open(path, 'wb') as f:
+                f.write(b"PK" + name.encode())
+            self.apks.append(path)
+        self.executor = FleetExecutor()
+        self.addCleanup(self.executor.shutdown)
+
+    def engine(self, executor):
+        return InstallEngine(lambda task: None, lambda task: None, executor=executor)
+
+    def fleet_loops(self):
+        return sum(1 for thread in threading.enumerate() if thread.name == "fleet-loop")
+
+    def test_runs_reuse_application_executor(self):
+        """Un engin par installation: aucun nouvel exécuteur"""
+        self.engine(self.executor).run(self.engine(self.executor).plan(DEVICES, self.apks))
+        loops = self.fleet_loops()
+        for _ in range(5):
+            engine = self.engine(self.executor)
+            self.assertIs(engine.executor, self.executor)
+            tasks = engine.run(engine.plan(DEVICES, self.apks))
+            self.assertEqual(summarize(tasks), (6, 0, 0, 6))
+            engine.shutdown()
+        self.assertEqual(self.fleet_loops(), loops)
+        # shutdown() de l'engin n'arrête pas l'exécuteur partagé
+        self.assertEqual(summarize(self.engine(self.executor).run(
+            self.engine(self.executor).plan(DEVICES[:1], self.apks))), (2, 0, 0, 2))
+
+    def test_own_executor_is_shut_down(self):
+        engine = self.engine(None)
+        self.assertIsNot(engine.executor, self.executor)
+        tasks = engine.run(engine.plan(DEVICES, self.apks))
+        self.assertEqual(summarize(tasks), (6, 0, 0, 6))
+        engine.shutdown()
+        self.assertTrue(engine.executor.pool._shutdown)
+
+
+if __name__ == '__main__':
+    unittest.main()
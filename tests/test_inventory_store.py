@@ -0,0 +1,97 @@
+"""
+Tests des instantanés d'inventaire (InventoryStore) sur une base SQLite en mémoire
+"""
+
+import hashlib
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apk_info import parse_package_inventory
+from inventory_store import InventoryDiff, InventoryStore, inventory_fingerprint, parse_md5sum
+
+
+DEVICE = "1WMHH000000001"
+OTHER = "1WMHH000000002"
+
+MONDAY = """package:/data/app/~~a1/com.beatgames.beatsaber-b1/base.apk=com.beatgames.beatsaber versionCode:1180 uid:10123
+package:/system/app/VrShell/VrShell.apk=com.oculus.vrshell versionCode:52 uid:10045
+package:/data/app/~~c1/com.example.jeu-d1/base.apk=com.example.jeu versionCode:7 uid:10130
+"""
+
+# Mise à jour de Beat Saber, com.example.jeu désinstallé, un nouveau jeu
+FRIDAY = """package:/data/app/~~a2/com.beatgames.beatsaber-b2/base.apk=com.beatgames.beatsaber versionCode:1200 uid:10123
+package:/system/app/VrShell/VrShell.apk=com.oculus.vrshell versionCode:52 uid:10045
+package:/data/app/~~e1/com.example.nouveau-f1/base.apk=com.example.nouveau versionCode:3 uid:10131
+"""
+
+
+class FingerprintTest(unittest.TestCase):
+
+    def test_independent_of_line_order(self):
+        lines = MONDAY.splitlines()
+        self.assertEqual(inventory_fingerprint(MONDAY), inventory_fingerprint("\n".join(reversed(lines))))
+        self.assertNotEqual(inventory_fingerprint(MONDAY), inventory_fingerprint(FRIDAY))
+
+    def test_matches_headset_md5sum(self):
+        """Même valeur que 'sort | md5sum' sur le casque"""
+        sorted_output = "".join(line + "\n" for line in sorted(MONDAY.splitlines()))
+        digest = hashlib.md5(sorted_output.encode()).hexdigest()
+        self.assertEqual(parse_md5sum(f"{digest}  -\n"), inventory_fingerprint(MONDAY))
+        self.assertIsNone(parse_md5sum("md5sum: not found\n"))
+        self.assertIsNone(parse_md5sum(""))
+
+
+class InventoryStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = InventoryStore(":memory:")
+        self.addCleanup(self.store.close)
+
+    def record(self, device, text, when):
+        return self.store.record(device, inventory_fingerprint(text), parse_package_inventory(text), when)
+
+    def test_record_and_confirm(self):
+        """Inventaire inchangé: pas de nouvel instantané, la date de vérification avance"""
+        first = self.record(DEVICE, MONDAY, 100)
+        self.assertEqual(self.record(DEVICE, MONDAY, 200), first)
+        latest = self.store.latest(DEVICE)
+        self.assertEqual((latest.id, latest.taken_at, latest.checked_at), (first, 100, 200))
+        self.store.confirm(first, 300)
+        self.assertEqual(self.store.latest(DEVICE).checked_at, 300)
+        self.assertEqual(self.store.packages(first), parse_package_inventory(MONDAY))
+        self.assertIsNone(self.store.latest(OTHER))
+
+    def test_changes_since(self):
+        self.record(DEVICE, MONDAY, 100)
+        self.record(DEVICE, FRIDAY, 500)
+        start, difference = self.store.changes_since(DEVICE, 300)
+        self.assertEqual(start.taken_at, 100)
+        self.assertEqual(difference, InventoryDiff({"com.example.nouveau": 3}, {"com.example.jeu": 7},
+                                                   {"com.beatgames.beatsaber": (1180, 1200)}))
+        # Depuis une date postérieure au dernier inventaire: aucun changement
+        self.assertFalse(any(self.store.changes_since(DEVICE, 600)[1]))
+        # Date antérieure au premier audit: comparaison avec le premier instantané
+        self.assertEqual(self.store.changes_since(DEVICE, 0)[0].taken_at, 100)
+        self.assertEqual(self.store.changes_since(OTHER, 0), (None, None))
+
+    def test_drift_from_baseline(self):
+        self.record(DEVICE, MONDAY, 100)
+        self.record(OTHER, MONDAY, 100)
+        self.assertIsNone(self.store.drift("Salle A", [DEVICE, OTHER]))
+        self.store.set_baseline("Salle A", DEVICE)
+        self.assertEqual(self.store.drift("Salle A", [DEVICE, OTHER, "jamais-audité"]), {})
+        self.record(OTHER, FRIDAY, 500)
+        drifted = self.store.drift("Salle A", [DEVICE, OTHER])
+        self.assertEqual(list(drifted), [OTHER])
+        self.assertEqual(drifted[OTHER].removed, {"com.example.jeu": 7})
+        # La référence reste l'instantané choisi, même si le casque de référence change ensuite
+        self.record(DEVICE, FRIDAY, 600)
+        self.assertEqual(set(self.store.drift("Salle A", [DEVICE, OTHER])), {DEVICE, OTHER})
+        self.assertEqual(self.store.devices(), [DEVICE, OTHER])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+"""
+Tests des profils: actions calculées pour un casque (plan_device), analyse
+des sorties shell et application (ProfileReconciler.apply)
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apk_info import ApkInfo
+from fleet import FleetExecutor
+from profiles import (ProfileReconciler, Action, DeviceSnapshot, Profile, SyncFolder, ACTION_DISABLE,
+                      ACTION_INSTALL, ACTION_PUSH, ACTION_UNINSTALL, parse_shell_actions, parse_snapshot,
+                      plan_device, shell_actions_script)
+
+
+DEVICE = "1WMHH000000000"
+
+SNAPSHOT_OUTPUT = """@@versions
+package:com.beatgames.beatsaber versionCode:1180
+package:com.oculus.vrshell versionCode:52
+package:com.facebook.arvr.quillplayer versionCode:3
+@@disabled
+package:com.oculus.vrshell
+@@end
+"""
+
+GAME = ApkInfo("com.beatgames.beatsaber", 1180, "1.18.0", None)
+VIDEOS = SyncFolder("C:\\Videos", "/sdcard/Movies/")
+
+
+class ParseTest(unittest.TestCase):
+
+    def test_snapshot(self):
+        versions, disabled = parse_snapshot(SNAPSHOT_OUTPUT)
+        self.assertEqual(versions, {"com.beatgames.beatsaber": 1180, "com.oculus.vrshell": 52,
+                                    "com.facebook.arvr.quillplayer": 3})
+        self.assertEqual(disabled, {"com.oculus.vrshell"})
+
+    def test_truncated_snapshot(self):
+        """Sortie coupée avant @@end: pas d'état (sinon tout serait réinstallé)"""
+        self.assertIsNone(parse_snapshot(SNAPSHOT_OUTPUT.replace("@@end\n", "")))
+        self.assertIsNone(parse_snapshot(""))
+
+    def test_shell_actions(self):
+        actions = [Action(ACTION_UNINSTALL, "com.example.jeu", ""),
+                   Action(ACTION_UNINSTALL, "com.example.absent", ""),
+                   Action(ACTION_DISABLE, "com.oculus.vrshell", "")]
+        script = shell_actions_script(actions)
+        self.assertTrue(script.endswith("echo @@end"))
+        output = ("@@uninstall com.example.jeu\nSuccess\n"
+                  "@@uninstall com.example.absent\nFailure [DELETE_FAILED_INTERNAL_ERROR]\n"
+                  "@@disable com.oculus.vrshell\n"
+                  "Package com.oculus.vrshell new state: disabled-user\n@@end\n")
+        self.assertEqual(parse_shell_actions(output), {
+            (ACTION_UNINSTALL, "com.example.jeu"): None,
+            (ACTION_UNINSTALL, "com.example.absent"): "Failure [DELETE_FAILED_INTERNAL_ERROR]",
+            (ACTION_DISABLE, "com.oculus.vrshell"): None,
+        })
+
+    def test_shell_actions_without_output(self):
+        results = parse_shell_actions("@@uninstall com.example.jeu\n@@end\n")
+        self.assertEqual(results, {(ACTION_UNINSTALL, "com.example.jeu"): "pas de réponse"})
+
+
+class PlanDeviceTest(unittest.TestCase):
+
+    def setUp(self):
+        versions, disabled = parse_snapshot(SNAPSHOT_OUTPUT)
+        self.snapshot = DeviceSnapshot(versions, disabled, {VIDEOS.headset: {"intro.mp4": 1000}})
+        self.apks = [(["beatsaber.apk"], GAME)]
+        self.folders = [(VIDEOS, {"intro.mp4": ("C:\\Videos\\intro.mp4", 1000)})]
+
+    def plan(self, profile, apks=None, folders=None):
+        return plan_device(profile, self.snapshot, self.apks if apks is None else apks,
+                           self.folders if folders is None else folders)
+
+    def test_conforming_device_has_no_actions(self):
+        profile = Profile(["beatsaber.apk"], ["com.example.interdit"], ["com.oculus.vrshell"], [VIDEOS])
+        self.assertEqual(self.plan(profile), [])
+
+    def test_version_change_installs(self):
+        newer = GAME._replace(version_code=1200)
+        actions = self.plan(Profile(["beatsaber.apk"], [], [], []), apks=[(["beatsaber.apk", "split.apk"], newer)],
+                            folders=[])
+        self.assertEqual(actions, [Action(ACTION_INSTALL, ("beatsaber.apk", "split.apk"),
+                                          "versionCode 1180 -> 1200")])
+
+    def test_missing_or_unreadable_apk_installs(self):
+        other = ApkInfo("com.example.nouveau", 1, "1.0", None)
+        actions = self.plan(Profile([], [], [], []), apks=[(["nouveau.apk"], other), (["casse.apk"], None)],
+                            folders=[])
+        self.assertEqual([(action.target, action.detail) for action in actions],
+                         [(("nouveau.apk",), "absent"), (("casse.apk",), "version inconnue")])
+
+    def test_size_mismatch_pushes(self):
+        folders = [(VIDEOS, {"intro.mp4": ("C:\\Videos\\intro.mp4", 2000),
+                             "outro.mp4": ("C:\\Videos\\outro.mp4", 10)})]
+        actions = self.plan(Profile([], [], [], [VIDEOS]), apks=[], folders=folders)
+        self.assertEqual(actions, [
+            Action(ACTION_PUSH, ("C:\\Videos\\intro.mp4", "/sdcard/Movies/intro.mp4"), "1000 -> 2000 octets"),
+            Action(ACTION_PUSH, ("C:\\Videos\\outro.mp4", "/sdcard/Movies/outro.mp4"), "absent"),
+        ])
+
+    def test_unknown_remote_size_keeps_file(self):
+        self.snapshot.files[VIDEOS.headset]["intro.mp4"] = None
+        folders = [(VIDEOS, {"intro.mp4": ("C:\\Videos\\intro.mp4", 2000)})]
+        self.assertEqual(self.plan(Profile([], [], [], [VIDEOS]), apks=[], folders=folders), [])
+
+    def test_forbidden_and_disabled_uninstalled_once(self):
+        """Package interdit et à désactiver: désinstallé seulement, pas désactivé en plus"""
+        profile = Profile([], ["com.facebook.arvr.quillplayer"], ["com.facebook.arvr.quillplayer"], [])
+        self.assertEqual(self.plan(profile, apks=[], folders=[]),
+                         [Action(ACTION_UNINSTALL, "com.facebook.arvr.quillplayer", "")])
+
+    def test_disable_only_when_enabled(self):
+        profile = Profile([], [], ["com.oculus.vrshell", "com.facebook.arvr.quillplayer", "com.example.absent"], [])
+        self.assertEqual(self.plan(profile, apks=[], folders=[]),
+                         [Action(ACTION_DISABLE, "com.facebook.arvr.quillplayer", "")])
+
+
+class ApplyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = FleetExecutor()
+        self.addCleanup(self.executor.shutdown)
+        self.pushed = []
+
+    def reconciler(self, shell):
+        def push(device_id, local_path, remote_path):
+            if remote_path.endswith("casse.mp4"):
+                raise OSError("casque débranché")
+            self.pushed.append(remote_path)
+            return None
+
+        return ProfileReconciler(shell, None, push, None, self.executor)
+
+    def test_push_failure_keeps_finished_actions(self):
+        """Une copie qui lève: les copies terminées gardent leur résultat, une seule ligne par action"""
+        actions = [Action(ACTION_PUSH, ("a.mp4", "/sdcard/Movies/a.mp4"), ""),
+                   Action(ACTION_PUSH, ("casse.mp4", "/sdcard/Movies/casse.mp4"), ""),
+                   Action(ACTION_PUSH, ("b.mp4", "/sdcard/Movies/b.mp4"), "")]
+        reported = []
+        results = self.reconciler(None).apply({DEVICE: actions}, None,
+                                              lambda *result: reported.append(result))
+        self.assertEqual(results, reported)
+        self.assertEqual([(action, error) for _, action, error in results],
+                         [(actions[0], None),
+                          (actions[1], "casque débranché"),
+                          (actions[2], "casque débranché")])
+
+    def test_shell_failure_reports_each_action_once(self):
+        def shell(device_id, script):
+            raise OSError("adb injoignable")
+
+        actions = [Action(ACTION_UNINSTALL, "com.example.jeu", ""),
+                   Action(ACTION_UNINSTALL, "com.example.autre", "")]
+        results = self.reconciler(shell).apply({DEVICE: actions}, None)
+        self.assertEqual([(action, error) for _, action, error in results],
+                         [(action, "adb injoignable") for action in actions])
+
+
+if __name__ == '__main__':
+    unittest.main()
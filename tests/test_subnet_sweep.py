@@ -0,0 +1,127 @@
+"""
+Tests du balayage de sous-réseau (subnet_sweep)
+Les "casques" sont des sockets en écoute sur des adresses de bouclage
+(127.0.1.x, 127.0.2.x) toutes sur le même port, balayées comme deux /24.
+"""
+
+import os
+import socket
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fleet import FleetExecutor
+from subnet_sweep import (DeviceIdentity, SubnetSweeper, parse_identity, subnet_hosts, sweep,
+                          MAX_SWEEP_HOSTS)
+
+
+LISTENERS = ["127.0.1.5", "127.0.1.200", "127.0.2.3"]
+SUBNETS = "127.0.1.0/24, 127.0.2.0/24"
+
+IDENTITY_OUTPUT = """@@serial
+1WMHH000000005
+@@link
+3: wlan0: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc mq state UP mode DORMANT group default qlen 3000
+    link/ether 2C:26:17:AA:BB:05 brd ff:ff:ff:ff:ff:ff
+@@end
+"""
+
+
+def listen_all(addresses):
+    """Sockets en écoute sur addresses, même port pour toutes; SkipTest si impossible"""
+    sockets = []
+    port = 0
+    try:
+        for address in addresses:
+            sock = socket.socket()
+            sockets.append(sock)
+            sock.bind((address, port))
+            sock.listen(8)
+            port = sock.getsockname()[1]
+    except OSError as e:
+        for sock in sockets:
+            sock.close()
+        raise unittest.SkipTest(f"adresses de bouclage 127.0.x.y indisponibles: {e}")
+    return sockets, port
+
+
+class FakeAdb:
+    """connect_wifi / run_command d'un ADBManager, identités selon l'IP"""
+
+    def __init__(self, identities):
+        self.identities = identities
+        self.disconnected = []
+
+    def connect_wifi(self, ip, timeout=5):
+        return ip in self.identities
+
+    def run_command(self, command, device_id=None, timeout=30):
+        if command[0] == "disconnect":
+            self.disconnected.append(command[1])
+            return "", "", 0
+        output = self.identities.get(device_id.rsplit(":", 1)[0])
+        return (output, "", 0) if output is not None else ("", "error: closed", 1)
+
+
+class SubnetHostsTest(unittest.TestCase):
+
+    def test_hosts_of_several_subnets(self):
+        hosts = subnet_hosts(SUBNETS)
+        self.assertEqual(len(hosts), 2 * 254)
+        self.assertEqual(hosts[0], "127.0.1.1")
+        self.assertEqual(hosts[-1], "127.0.2.254")
+        self.assertEqual(subnet_hosts(["192.168.1.7/30", "", "192.168.1.4/30"]), ["192.168.1.5", "192.168.1.6"])
+
+    def test_rejects_larger_than_22(self):
+        self.assertEqual(len(subnet_hosts("10.0.0.0/22")), MAX_SWEEP_HOSTS - 2)
+        with self.assertRaises(ValueError):
+            subnet_hosts("10.0.0.0/21")
+        with self.assertRaises(ValueError):
+            subnet_hosts("192.168.1.0/24,10.0.0.0/16")
+
+
+class ParseIdentityTest(unittest.TestCase):
+
+    def test_serial_and_mac(self):
+        self.assertEqual(parse_identity(IDENTITY_OUTPUT, "127.0.1.5"),
+                         DeviceIdentity("127.0.1.5", "1WMHH000000005", "2c:26:17:aa:bb:05"))
+
+    def test_missing_interface(self):
+        text = "@@serial\n1WMHH000000005\n@@link\n@@end\n"
+        self.assertEqual(parse_identity(text, "127.0.1.5"), DeviceIdentity("127.0.1.5", "1WMHH000000005", None))
+
+    def test_truncated_or_empty(self):
+        """Sortie coupée avant @@end ou sans numéro de série: pas une identité"""
+        self.assertIsNone(parse_identity(IDENTITY_OUTPUT.replace("@@end\n", ""), "127.0.1.5"))
+        self.assertIsNone(parse_identity("@@serial\n@@link\n@@end\n", "127.0.1.5"))
+        self.assertIsNone(parse_identity("", "127.0.1.5"))
+
+
+class SweepTest(unittest.TestCase):
+
+    def setUp(self):
+        sockets, self.port = listen_all(LISTENERS)
+        for sock in sockets:
+            self.addCleanup(sock.close)
+
+    def test_finds_listeners_in_host_order(self):
+        self.assertEqual(sweep(subnet_hosts(SUBNETS), self.port, timeout=0.5), LISTENERS)
+
+    def test_empty(self):
+        self.assertEqual(sweep([], self.port), [])
+
+    def test_discover_identifies_and_filters(self):
+        """Réponses confirmées par l'identité, casques refusés déconnectés"""
+        adb = FakeAdb({"127.0.1.5": IDENTITY_OUTPUT,
+                       "127.0.2.3": IDENTITY_OUTPUT.replace("05", "03").replace("000000005", "000000003")})
+        executor = FleetExecutor()
+        self.addCleanup(executor.shutdown)
+        sweeper = SubnetSweeper(adb, port=self.port, timeout=0.5, executor=executor)
+        identities = sweeper.discover(subnet_hosts(SUBNETS), lambda identity: identity.serial != "1WMHH000000003")
+        self.assertEqual(identities, [DeviceIdentity("127.0.1.5", "1WMHH000000005", "2c:26:17:aa:bb:05")])
+        self.assertEqual(adb.disconnected, [f"127.0.2.3:{self.port}"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Tests de ThroughputEstimator (moyenne des débits et sauvegardes espacées)
+"""
+
+import atexit
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import throughput
+from throughput import ThroughputEstimator, MIN_SAMPLE_BYTES
+
+
+USB_DEVICE = "1WMHH000000000"
+WIFI_DEVICE = "192.168.1.10:5555"
+
+
+class ThroughputEstimatorTest(unittest.TestCase):
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.filepath = os.path.join(folder.name, "throughput.json")
+
+    def estimator(self):
+        estimator = ThroughputEstimator(self.filepath)
+        self.addCleanup(atexit.unregister, estimator.flush)
+        return estimator
+
+    def test_batch_of_pushes_saved_once(self):
+        """Un lot de push dans l'intervalle: aucune écriture avant flush(), une seule ensuite"""
+        estimator = self.estimator()
+        with mock.patch.object(estimator, "save", wraps=estimator.save) as save:
+            for _ in range(50):
+                estimator.record(USB_DEVICE, 10 * MIN_SAMPLE_BYTES, 1.0)
+            self.assertEqual(save.call_count, 0)
+            estimator.flush()
+            estimator.flush()
+            self.assertEqual(save.call_count, 1)
+        self.assertAlmostEqual(self.estimator().rate(USB_DEVICE), 10 * MIN_SAMPLE_BYTES)
+
+    def test_saved_again_after_interval(self):
+        estimator = self.estimator()
+        estimator.saved_at -= throughput.SAVE_INTERVAL
+        estimator.record(WIFI_DEVICE, 4 * MIN_SAMPLE_BYTES, 2.0)
+        self.assertFalse(estimator.dirty)
+        self.assertAlmostEqual(self.estimator().rate(WIFI_DEVICE), 2 * MIN_SAMPLE_BYTES)
+
+    def test_programs_sharing_file_keep_each_others_measures(self):
+        """Gestionnaire USB et copieur sur le même fichier: aucune mesure écrasée"""
+        manager, copier = self.estimator(), self.estimator()
+        manager.record(USB_DEVICE, 10 * MIN_SAMPLE_BYTES, 1.0)
+        copier.record(WIFI_DEVICE, 4 * MIN_SAMPLE_BYTES, 2.0)
+        manager.flush()
+        copier.flush()
+        reloaded = self.estimator()
+        self.assertAlmostEqual(reloaded.rate(USB_DEVICE), 10 * MIN_SAMPLE_BYTES)
+        self.assertAlmostEqual(reloaded.rate(WIFI_DEVICE), 2 * MIN_SAMPLE_BYTES)
+        # Le copieur reprend la mesure USB du gestionnaire à son écriture
+        self.assertAlmostEqual(copier.rate(USB_DEVICE), 10 * MIN_SAMPLE_BYTES)
+
+    def test_only_own_measures_replace_file_values(self):
+        """Une valeur ancienne en mémoire n'écrase pas la mesure plus récente d'un autre programme"""
+        manager, copier = self.estimator(), self.estimator()
+        manager.record(USB_DEVICE, 10 * MIN_SAMPLE_BYTES, 1.0)
+        manager.flush()
+        copier.load()
+        manager.record(USB_DEVICE, 10 * MIN_SAMPLE_BYTES, 10.0)
+        manager.flush()
+        copier.record(WIFI_DEVICE, 4 * MIN_SAMPLE_BYTES, 2.0)
+        copier.flush()
+        self.assertAlmostEqual(self.estimator().rate(USB_DEVICE), manager.rate(USB_DEVICE))
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.filepath))), ["throughput.json"])
+
+    def test_small_transfers_ignored(self):
+        estimator = self.estimator()
+        estimator.record(USB_DEVICE, MIN_SAMPLE_BYTES - 1, 0.01)
+        self.assertIsNone(estimator.rate(USB_DEVICE))
+        self.assertFalse(estimator.dirty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Débit de transfert mesuré par casque
+Moyenne glissante (EWMA) du débit des push terminés, par appareil et par
+transport (USB/WiFi), sauvegardée entre les sessions. Sert à calculer le
+délai d'un transfert à partir de sa durée attendue plutôt que de sa seule
+taille. Les mesures sont écrites au plus toutes les SAVE_INTERVAL secondes,
+et à la fermeture du programme. Plusieurs programmes (gestionnaire USB,
+copieur, synchro) partagent le même fichier: chaque écriture repart du
+fichier sur le disque et n'y remplace que les débits mesurés par ce
+programme depuis sa dernière écriture.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+
+from fleet import transport_of
+
+
+# Poids de la dernière mesure dans la moyenne glissante
+EWMA_ALPHA = 0.3
+
+# Les petits fichiers mesurent surtout la latence: pas pris en compte
+MIN_SAMPLE_BYTES = 1024 * 1024
+
+# Délai = durée attendue x marge + base, jamais moins que le minimum
+TIMEOUT_MARGIN = 3
+TIMEOUT_BASE = 30
+TIMEOUT_MIN = 30
+
+# Écart minimal entre deux écritures du fichier des débits (secondes)
+SAVE_INTERVAL = 30
+
+
+def default_timeout(size):
+    """Délai historique sans mesure: 60s de base + 1s par Mo (min 120s)"""
+    return max(120, 60 + size // (1024 * 1024))
+
+
+class ThroughputEstimator:
+    """Débit moyen en octets/s par appareil, avec repli sur la moyenne du transport"""
+
+    def __init__(self, filepath=None, alpha=EWMA_ALPHA):
+        self.filepath = filepath
+        self.alpha = alpha
+        self.devices = {}
+        self.transports = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.changed = set()  # (table, clé) mesurés depuis la dernière écriture
+        self.saved_at = time.monotonic()
+        self.load()
+        if filepath:
+            atexit.register(self.flush)
+
+    def _read(self):
+        """{"devices": {...}, "transports": {...}} du fichier, None s'il est absent ou illisible"""
+        if not self.filepath or not os.path.exists(self.filepath):
+            return None
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {table: {k: float(v) for k, v in data.get(table, {}).items()}
+                    for table in ("devices", "transports")}
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"Débits mesurés illisibles ({self.filepath}): {e}")
+            return None
+
+    def load(self):
+        data = self._read()
+        if data:
+            self.devices = data["devices"]
+            self.transports = data["transports"]
+
+    def save(self):
+        """Écrit les débits mesurés ici par-dessus ceux du fichier (autres programmes)"""
+        if not self.filepath:
+            return
+        data = self._read() or {"devices": {}, "transports": {}}
+        with self.lock:
+            changed, self.changed = self.changed, set()
+            tables = {"devices": self.devices, "transports": self.transports}
+            for table, key in changed:
+                data[table][key] = tables[table][key]
+            # Mesures des autres programmes reprises pour les délais de celui-ci
+            for table, values in data.items():
+                tables[table].update(values)
+            self.dirty = False
+            self.saved_at = time.monotonic()
+        try:
+            # Fichier temporaire propre au processus: deux programmes peuvent écrire en même temps
+            temp_path = f"{self.filepath}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.filepath)
+        except OSError as e:
+            with self.lock:
+                self.changed |= changed
+                self.dirty = True
+            print(f"Erreur sauvegarde débits: {e}")
+
+    def flush(self):
+        """Sauvegarde les mesures pas encore écrites (fin d'un lot, fermeture)"""
+        if self.dirty:
+            self.save()
+
+    def _blend(self, table, key, rate):
+        previous = table.get(key)
+        table[key] = rate if previous is None else self.alpha * rate + (1 - self.alpha) * previous
+
+    def record(self, device_id, size, elapsed):
+        """Ajoute la mesure d'un transfert réussi (taille en octets, durée en secondes)"""
+        if size < MIN_SAMPLE_BYTES or elapsed <= 0:
+            return
+        rate = size / elapsed
+        with self.lock:
+            self._blend(self.devices, device_id, rate)
+            self._blend(self.transports, transport_of(device_id), rate)
+            self.changed.update({("devices", device_id), ("transports", transport_of(device_id))})
+            self.dirty = True
+            due = time.monotonic() - self.saved_at >= SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def rate(self, device_id):
+        """Débit estimé en octets/s, ou None si rien n'a encore été mesuré"""
+        with self.lock:
+            rate = self.devices.get(device_id)
+            if rate is None:
+                rate = self.transports.get(transport_of(device_id))
+        return rate
+
+    def timeout_for(self, device_id, size):
+        """Délai en secondes pour envoyer size octets vers l'appareil"""
+        rate = self.rate(device_id)
+        if not rate:
+            return default_timeout(size)
+        return max(TIMEOUT_MIN, int(size / rate * TIMEOUT_MARGIN + TIMEOUT_BASE))